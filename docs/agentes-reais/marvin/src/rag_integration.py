@@ -29,6 +29,7 @@ class RAGIntegration:
         self.rag_server_script = self.rag_server_path / "rag_server.py"
         self.rag_process = None
         self.is_rag_running = False
+        self._replica = None
         
         # Adicionar o path do RAG server ao PYTHONPATH
         if str(self.rag_server_path) not in sys.path:
@@ -94,25 +95,30 @@ class RAGIntegration:
             logger.error(f"Erro ao iniciar RAG server: {e}")
             return False
     
+    def get_replica(self):
+        """
+        Retorna réplica somente leitura do RAG server (criada uma vez)
+        
+        A réplica mapeia os vetores publicados pelo writer em vez de carregar
+        uma cópia própria do corpus a cada consulta.
+        """
+        if self._replica is None:
+            from rag_server import RAGServer
+            self._replica = RAGServer(mode='enhanced', read_only=True)
+        return self._replica
+    
     async def query_rag(self, query: str, category: Optional[str] = None) -> Dict[str, Any]:
         """
         Consulta o RAG server para obter informações
         """
         try:
-            # Importar módulos do RAG server
-            import sys
-            sys.path.insert(0, str(self.rag_server_path))
-            
-            from a2a_content_manager import A2AContentManager
-            
-            # Criar instância do content manager
-            manager = A2AContentManager()
+            replica = self.get_replica()
             
-            # Fazer a busca
+            # Fazer a busca (a categoria restringe os candidatos antes do top-k)
             if category:
-                results = manager.search_by_category(query, category)
+                results = replica.search_filtered(query, 10, {'category': category})
             else:
-                results = manager.search(query)
+                results = replica.search(query, limit=10)
             
             return {
                 "success": True,
@@ -22,14 +22,15 @@ import hashlib
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
-import requests
 from urllib.parse import urlparse
+import asyncio
 
 # Adicionar o diretório do servidor MCP ao path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from rag_server import RAGServer
+from rag_server import CompiledQuery, RAGServer
 from config import Config
+from web_fetch import AsyncFetcher, FetchResult, create_extract_executor, extract_page
 
 class A2AContentManager:
     """Gerenciador de conteúdos A2A para o RAG Server"""
@@ -67,12 +68,14 @@ class A2AContentManager:
         'https://a2a.ac/#agents': 'a2a:agents'
     }
     
-    def __init__(self):
+    def __init__(self, server: Optional[RAGServer] = None):
         self.config = Config()
-        self.server = RAGServer(mode='enhanced')
+        self.server = server if server is not None else RAGServer(mode='enhanced')
         self.sync_state_file = Path.home() / ".claude" / "mcp-rag-cache" / "a2a_sync_state.json"
         self.saved_searches_file = Path.home() / ".claude" / "mcp-rag-cache" / "a2a_saved_searches.json"
         self.frontend_cache_dir = Path.home() / ".claude" / "todos" / "app_todos_bd_tasks" / "frontend"
+        self.last_fetch_stats: Dict[str, int] = {}
+        self.compiled_searches: Dict[str, Tuple[Dict, CompiledQuery]] = {}  # nome -> (definição, consulta)
         
         # Carregar estado de sincronização
         self.sync_state = self.load_sync_state()
@@ -207,47 +210,86 @@ class A2AContentManager:
     
     def ingest_url(self, url: str, category: str = None, tags: List[str] = None) -> Dict:
         """Ingere conteúdo de uma URL"""
+        return self.ingest_urls([{'content': url, 'category': category, 'tags': tags}])[0]
+    
+    def ingest_urls(self, items: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Busca várias URLs concorrentemente e devolve os documentos na mesma ordem
         
-        print(f"Ingerindo URL: {url}")
+        items: dicionários com content (URL) e, opcionalmente, category e tags.
+        Falhas de rede viram None na posição correspondente.
+        """
+        if not items:
+            return []
+        return asyncio.run(self.ingest_urls_async(items))
+    
+    async def ingest_urls_async(self, items: List[Dict]) -> List[Optional[Dict]]:
+        """Fetch em pool de conexões por host; extração do HTML em processos auxiliares"""
+        cache_dir = self.config.CACHE_PATH / 'web_cache' if self.config.FETCH_CACHE else None
+        workers = self.config.FETCH_EXTRACT_WORKERS or os.cpu_count() or 1
+        executor = create_extract_executor(workers, len(items))
+        loop = asyncio.get_running_loop()
+        
+        async def ingest_one(fetcher: AsyncFetcher, item: Dict) -> Optional[Dict]:
+            url = item['content']
+            print(f"Ingerindo URL: {url}")
+            result = await fetcher.fetch(url)
+            if not result.ok:
+                print(f"Erro ao ingerir URL {url}: {result.error or f'HTTP {result.status}'}")
+                return None
+            page = await loop.run_in_executor(executor, extract_page, result.body,
+                                              result.headers.get('content-type', ''))
+            return self._url_document(url, result, page, item.get('category'), item.get('tags'))
         
         try:
-            # Simular fetch (em produção, usar WebFetch ou requests)
-            # Por ora, criar documento placeholder
-            parsed = urlparse(url)
-            domain = parsed.netloc
-            
-            # Determinar categoria
-            if not category:
-                category = self.categorize_content(url=url)
-            
-            # Gerar tags
-            if not tags:
-                tags = self.DEFAULT_TAGS.get(category, ['a2a'])
-            else:
-                # Adicionar tags padrão às fornecidas
-                tags = list(set(tags + self.DEFAULT_TAGS.get(category, ['a2a'])))
-            
-            # Criar documento
-            doc = {
-                'title': f"A2A Content from {domain}",
-                'content': f"Conteúdo A2A de {url}",
-                'type': 'webpage',
-                'source': 'a2a',
-                'category': category,
-                'tags': tags,
-                'metadata': {
-                    'url': url,
-                    'domain': domain,
-                    'ingested_at': datetime.now().isoformat(),
-                    'ingestion_method': 'url'
-                }
+            async with AsyncFetcher(concurrency=self.config.FETCH_CONCURRENCY,
+                                    per_host=self.config.FETCH_PER_HOST,
+                                    timeout=self.config.FETCH_TIMEOUT,
+                                    cache_dir=cache_dir) as fetcher:
+                docs = await asyncio.gather(*(ingest_one(fetcher, item) for item in items))
+                self.last_fetch_stats = dict(fetcher.stats)
+        finally:
+            executor.shutdown(wait=True)
+        return list(docs)
+    
+    def _url_document(self, url: str, result: FetchResult, page: Dict,
+                      category: str = None, tags: List[str] = None) -> Dict:
+        """Documento a partir da página baixada"""
+        domain = urlparse(result.url).netloc
+        text = page['text']
+        
+        # Determinar categoria
+        if not category:
+            category = self.categorize_content(url=url)
+        
+        # Gerar tags
+        extracted_tags = self.extract_tags_from_content(text)
+        if not tags:
+            tags = self.DEFAULT_TAGS.get(category, ['a2a']) + extracted_tags
+        else:
+            # Adicionar tags padrão às fornecidas
+            tags = list(set(tags + self.DEFAULT_TAGS.get(category, ['a2a']) + extracted_tags))
+        
+        return {
+            'title': f"A2A: {page['title'] or domain}",
+            'content': text[:2000],  # Limitar tamanho
+            'type': 'webpage',
+            'source': 'a2a',
+            'category': category,
+            'tags': tags,
+            'metadata': {
+                'url': url,
+                'final_url': result.url,
+                'domain': domain,
+                'http_status': result.status,
+                'etag': result.headers.get('etag'),
+                'last_modified': result.headers.get('last-modified'),
+                'content_type': result.headers.get('content-type', ''),
+                'not_modified': result.not_modified,
+                'ingested_at': datetime.now().isoformat(),
+                'ingestion_method': 'url'
             }
-            
-            return doc
-            
-        except Exception as e:
-            print(f"Erro ao ingerir URL {url}: {e}")
-            return None
+        }
     
     def ingest_markdown(self, file_path: str, category: str = None, tags: List[str] = None) -> Dict:
         """Ingere conteúdo de arquivo Markdown"""
@@ -348,16 +390,16 @@ class A2AContentManager:
         success_count = 0
         error_count = 0
         
+        # URLs são buscadas todas de uma vez; a escrita segue a ordem dos itens
+        url_items = [item for item in items if item.get('type') == 'url']
+        fetched = dict(zip(map(id, url_items), self.ingest_urls(url_items)))
+        
         for item in items:
             doc = None
             item_type = item.get('type')
             
             if item_type == 'url':
-                doc = self.ingest_url(
-                    item['content'],
-                    item.get('category'),
-                    item.get('tags')
-                )
+                doc = fetched[id(item)]
             elif item_type == 'markdown':
                 doc = self.ingest_markdown(
                     item['content'],
@@ -460,54 +502,60 @@ class A2AContentManager:
         # Executar sincronização
         return self.batch_ingest(items_to_sync)
     
-    def execute_saved_search(self, search_name: str, limit: int = 10) -> List[Dict]:
-        """Executa uma busca salva"""
-        
-        # Carregar buscas salvas
+    def load_saved_searches(self) -> Dict:
+        """Buscas salvas do arquivo (ou as padrão, se ele não existir)"""
         if self.saved_searches_file.exists():
             with open(self.saved_searches_file, 'r') as f:
-                saved_searches = json.load(f)
-        else:
-            saved_searches = self.init_saved_searches()
+                return json.load(f)
+        return self.init_saved_searches()
+    
+    def execute_saved_search(self, search_name: str, limit: int = 10) -> List[Dict]:
+        """
+        Executa uma busca salva pela busca filtrada do servidor: todos os
+        documentos que passam nos filtros, ordenados por relevância (ou pela
+        ordenação da busca). A consulta é compilada uma vez por definição e
+        os resultados ficam em cache até o corpus mudar.
+        """
+        saved_searches = self.load_saved_searches()
         
         if search_name not in saved_searches:
             print(f"Busca '{search_name}' não encontrada")
             return []
         
         search_config = saved_searches[search_name]
-        query = search_config['query']
-        filters = search_config.get('filters', {})
-        
-        # Carregar documentos
-        self.server.load_documents()
-        
-        # Aplicar filtros
-        filtered_docs = self.server.documents
-        
-        if 'source' in filters:
-            filtered_docs = [d for d in filtered_docs if d.get('source') == filters['source']]
-        
-        if 'category' in filters:
-            filtered_docs = [d for d in filtered_docs if d.get('category') == filters['category']]
-        
-        if 'tags' in filters:
-            required_tags = filters['tags']
-            filtered_docs = [d for d in filtered_docs 
-                           if any(tag in d.get('tags', []) for tag in required_tags)]
-        
-        # Executar busca
-        results = []
-        for doc in filtered_docs[:limit]:
-            # Adicionar score simples baseado em relevância
-            content = f"{doc.get('title', '')} {doc.get('content', '')}".lower()
-            score = sum(1 for word in query.split() if word.lower() in content) / len(query.split())
-            doc['score'] = score
-            results.append(doc)
-        
-        # Ordenar por score
-        results.sort(key=lambda x: x.get('score', 0), reverse=True)
-        
-        return results[:limit]
+        # refresh() só recarrega réplicas; um writer confere a geração aqui
+        # para não servir do cache documentos já mudados por outro processo
+        if self.server.store.read_generation() != self.server.generation:
+            self.server.load_documents()
+            self.server.build_indices()
+        
+        cached = self.compiled_searches.get(search_name)
+        if cached is None or cached[0] != search_config:
+            compiled = self.server.compile_query(
+                search_config['query'],
+                search_config.get('filters'),
+                min_score=search_config.get('min_score', 0.0)
+            )
+            cached = self.compiled_searches[search_name] = (search_config, compiled)
+        
+        return self.server.search_compiled(cached[1], limit)
+    
+    def subscribe_saved_searches(self, threshold: Optional[float] = None) -> List[str]:
+        """
+        Registra as buscas salvas como consultas permanentes do servidor:
+        documentos novos ou atualizados que as satisfazem vão para o log de
+        correspondências, sem reexecutar as buscas periodicamente.
+        """
+        names = []
+        for name, search_config in self.load_saved_searches().items():
+            self.server.register_standing_query(
+                name,
+                search_config['query'],
+                search_config.get('filters'),
+                search_config.get('threshold', threshold)
+            )
+            names.append(name)
+        return names
     
     def show_stats(self):
         """Mostra estatísticas dos conteúdos A2A"""
@@ -557,6 +605,8 @@ def main():
     parser.add_argument('--category', type=str, help='Categoria (ex: a2a:docs)')
     parser.add_argument('--tags', type=str, help='Tags separadas por vírgula')
     parser.add_argument('--search', type=str, help='Executar busca salva')
+    parser.add_argument('--subscribe', action='store_true', help='Registrar buscas salvas como consultas permanentes')
+    parser.add_argument('--matches', type=int, metavar='SINCE', help='Correspondências do log após a sequência SINCE')
     parser.add_argument('--stats', action='store_true', help='Mostrar estatísticas')
     parser.add_argument('--batch', type=str, help='Arquivo JSON com itens para ingestão em lote')
     
@@ -615,6 +665,16 @@ def main():
             print(f"   Tags: {', '.join(r.get('tags', [])[:5])}")
             print(f"   Score: {r.get('score', 0):.2f}")
     
+    elif args.subscribe:
+        names = manager.subscribe_saved_searches()
+        print(f"\n🔔 {len(names)} consultas permanentes: {', '.join(names)}")
+    
+    elif args.matches is not None:
+        found = manager.server.percolator.matches(since=args.matches)
+        for match in found['matches']:
+            print(f"#{match['seq']} [{match['query']}] {match['title']} ({match['score']:.2f}, {match['event']})")
+        print(f"\nPróxima leitura: --matches {found['next_since']}")
+    
     elif args.stats:
         manager.show_stats()
     
@@ -9,22 +9,24 @@ Autor: Claude AI Assistant
 Data: 2025-08-09
 """
 
-import json
 import sys
+import os
 import re
 import time
+import asyncio
+import hashlib
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 from datetime import datetime
-import xml.etree.ElementTree as ET
-from urllib.parse import urlparse, urljoin
-import hashlib
+from urllib.parse import urlparse
 
 # Adicionar o diretório do servidor MCP ao path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from rag_server import RAGServer
 from a2a_content_manager import A2AContentManager
+from crawl_frontier import CrawlFrontier, iter_sitemap
+from crawl_state import CrawlState
+from web_fetch import AsyncFetcher, FetchResult, create_extract_executor, extract_page
 
 class A2AWebScraper:
     """Scraper automático para sites A2A"""
@@ -101,27 +103,32 @@ class A2AWebScraper:
     }
     
     def __init__(self):
-        self.server = RAGServer(mode='enhanced')
+        # Compartilhar a instância do content manager: um único writer por processo
         self.content_manager = A2AContentManager()
+        self.server = self.content_manager.server
+        self.config = self.content_manager.config
         self.scraped_urls_file = Path.home() / ".claude" / "mcp-rag-cache" / "scraped_urls.json"
-        self.scraped_urls = self.load_scraped_urls()
-        self.batch_size = 5  # Processar em lotes
-        
-    def load_scraped_urls(self) -> Set[str]:
-        """Carrega URLs já processadas"""
-        if self.scraped_urls_file.exists():
-            try:
-                with open(self.scraped_urls_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                return set()
-        return set()
+        self.crawl_state = CrawlState(Path.home() / ".claude" / "mcp-rag-cache" / "crawl_state.json",
+                                      self.config.CRAWL_RECRAWL_MIN_INTERVAL,
+                                      self.config.CRAWL_RECRAWL_MAX_INTERVAL)
+        # Sem estado ainda: URLs da lista antiga entram como devidas
+        self.crawl_state.load(legacy_path=self.scraped_urls_file)
+        self.url_index: Dict[str, List[str]] = {}
+        self.last_crawl_stats: Dict[str, Dict] = {}
+    
+    @property
+    def scraped_urls(self) -> Set[str]:
+        """URLs conhecidas (com estado de crawl)"""
+        return set(self.crawl_state.entries)
     
     def save_scraped_urls(self):
-        """Salva URLs processadas"""
-        self.scraped_urls_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.scraped_urls_file, 'w') as f:
-            json.dump(list(self.scraped_urls), f, indent=2)
+        """Salva o estado de crawl"""
+        self.crawl_state.save()
+    
+    @staticmethod
+    def content_hash(doc: Dict) -> str:
+        """Hash do texto que vai para o índice (título + conteúdo)"""
+        return hashlib.sha256(f"{doc['title']}\n{doc['content']}".encode('utf-8')).hexdigest()[:32]
     
     def categorize_url(self, url: str) -> str:
         """Categoriza URL baseado em padrões"""
@@ -170,44 +177,48 @@ class A2AWebScraper:
         """Extrai URLs de um sitemap XML"""
         urls = []
         try:
-            # Buscar URLs com regex simples
-            url_pattern = r'<loc>(https?://[^<]+)</loc>'
-            matches = re.findall(url_pattern, sitemap_content)
-            urls.extend(matches)
+            urls.extend(loc for _, loc, _ in iter_sitemap(sitemap_content.encode('utf-8')))
         except Exception as e:
             print(f"Erro ao processar sitemap: {e}")
         
         return urls
     
-    def discover_urls(self, base_url: str) -> List[str]:
-        """Descobre URLs de um site via sitemap e padrões conhecidos"""
-        discovered = []
-        
-        # Tentar sitemap.xml
-        sitemap_urls = [
-            f"{base_url}/sitemap.xml",
-            f"{base_url}/sitemap_index.xml",
-            f"{base_url}/sitemap-posts.xml",
-            f"{base_url}/sitemap-pages.xml"
+    def known_urls(self, base_url: str) -> List[str]:
+        """URLs conhecidas do site (posts importantes e páginas principais)"""
+        if 'a2aprotocol.ai' not in base_url:
+            return []
+        return [post['url'] for post in self.IMPORTANT_POSTS] + [
+            f"{base_url}/",
+            f"{base_url}/blog",
+            f"{base_url}/docs"
         ]
-        
+    
+    def _fetcher(self) -> AsyncFetcher:
+        cache_dir = self.config.CACHE_PATH / 'web_cache' if self.config.FETCH_CACHE else None
+        return AsyncFetcher(concurrency=self.config.FETCH_CONCURRENCY,
+                            per_host=self.config.FETCH_PER_HOST,
+                            timeout=self.config.FETCH_TIMEOUT,
+                            cache_dir=cache_dir)
+    
+    def _frontier(self, fetcher: AsyncFetcher) -> CrawlFrontier:
+        return CrawlFrontier(fetcher,
+                             domain_delay=self.config.CRAWL_DOMAIN_DELAY,
+                             robots_ttl=self.config.CRAWL_ROBOTS_TTL,
+                             max_pages=self.config.CRAWL_MAX_PAGES)
+    
+    async def _discover(self, frontier: CrawlFrontier, base_url: str) -> List[str]:
         print(f"🔍 Descobrindo URLs de {base_url}")
-        
-        for sitemap_url in sitemap_urls:
-            # Simular fetch do sitemap (em produção, usar requests ou WebFetch)
-            print(f"  Tentando {sitemap_url}")
-            # Por enquanto, retornar URLs conhecidas
-        
-        # Adicionar URLs conhecidas manualmente
-        if 'a2aprotocol.ai' in base_url:
-            discovered.extend([post['url'] for post in self.IMPORTANT_POSTS])
-            discovered.extend([
-                f"{base_url}/",
-                f"{base_url}/blog",
-                f"{base_url}/docs"
-            ])
-        
-        return discovered
+        found = await frontier.discover(base_url)
+        print(f"  {frontier.stats['sitemaps']} sitemaps lidos, {len(found)} URLs")
+        # Adicionar URLs conhecidas, sem repetir as do sitemap
+        return list(dict.fromkeys(found + self.known_urls(base_url)))
+    
+    def discover_urls(self, base_url: str) -> List[str]:
+        """Descobre URLs de um site via robots.txt/sitemaps e padrões conhecidos"""
+        async def run():
+            async with self._fetcher() as fetcher:
+                return await self._discover(self._frontier(fetcher), base_url.rstrip('/'))
+        return asyncio.run(run())
     
     def create_document_from_url(self, url: str, title: str = None, 
                                  content_preview: str = None) -> Dict:
@@ -261,69 +272,152 @@ class A2AWebScraper:
             }
         }
     
-    def scrape_site(self, base_url: str) -> Tuple[int, int]:
-        """Faz scraping de um site A2A completo"""
+    async def crawl_site(self, base_url: str, force: bool = False) -> Tuple[List[Tuple[Dict, FetchResult, str]], int]:
+        """
+        Busca as URLs devidas do site com um único fetcher (conexões e
+        robots.txt compartilhados). Cada busca é condicional (ETag /
+        Last-Modified do estado) e o texto extraído é comparado pelo hash:
+        só voltam documentos novos ou alterados. Com force, todas as URLs
+        conhecidas do site são verificadas. Retorna ([(documento, resposta,
+        hash)], erros); páginas bloqueadas pelo robots.txt não contam como erro.
+        """
+        base_url = base_url.rstrip('/')
+        site = urlparse(base_url).netloc
+        workers = self.config.FETCH_EXTRACT_WORKERS or os.cpu_count() or 1
+        async with self._fetcher() as fetcher:
+            frontier = self._frontier(fetcher)
+            urls = await self._discover(frontier, base_url)
+            # URLs já conhecidas que saíram do sitemap continuam sendo verificadas
+            urls = list(dict.fromkeys(urls + [url for url in self.crawl_state.entries
+                                              if urlparse(url).netloc == site]))
+            due = urls if force else self.crawl_state.due(urls, lastmod=frontier.lastmod)
+            due = due[:self.config.CRAWL_MAX_PAGES]
+            if not due:
+                print(f"  ✅ Nenhuma das {len(urls)} URLs precisa ser buscada agora")
+                return [], 0
+            new_count = sum(1 for url in due if url not in self.crawl_state)
+            print(f"  📄 {len(due)} URLs para buscar ({new_count} novas)")
+            
+            indexed = self.build_url_index()
+            counts = {'due': len(due), 'new': new_count, 'changed': 0, 'unchanged': 0, 'not_modified': 0}
+            now = time.time()
+            executor = create_extract_executor(workers, len(due))
+            loop = asyncio.get_running_loop()
+            
+            async def crawl_one(url: str) -> Tuple[Optional[Tuple], bool]:
+                state = self.crawl_state.entries.get(url)
+                # 304 só vale quando o texto dessa versão já foi indexado por aqui
+                known = url in indexed and state is not None and state.content_hash is not None
+                result = await frontier.fetch(url, self.crawl_state.validators(url))
+                if result is not None and result.not_modified and not result.body and not known:
+                    # 304 sem corpo em cache para um documento que sumiu: buscar inteiro
+                    result = await frontier.fetch(url)
+                if result is None:
+                    print(f"    ⊘ {url} bloqueada pelo robots.txt")
+                    return None, False
+                if not result.ok:
+                    print(f"    ✗ Erro em {url}: {result.error or f'HTTP {result.status}'}")
+                    self.crawl_state.record_failure(url, result.status, now)
+                    return None, True
+                if result.not_modified and known:
+                    self.crawl_state.record(url, result, None, now)
+                    counts['not_modified'] += 1
+                    return None, False
+                page = await loop.run_in_executor(executor, extract_page, result.body,
+                                                  result.headers.get('content-type', ''))
+                doc = self.create_document_from_url(url, page['title'] or None, page['text'][:2000] or None)
+                doc['metadata'].update({
+                    'final_url': result.url,
+                    'http_status': result.status,
+                    'etag': result.headers.get('etag'),
+                    'last_modified': result.headers.get('last-modified'),
+                    'sitemap_lastmod': frontier.lastmod.get(url)
+                })
+                content_hash = self.content_hash(doc)
+                if url in indexed and not self.crawl_state.is_changed(url, content_hash):
+                    # Corpo novo, mesmo texto (datas, tokens...): nada a reindexar
+                    self.crawl_state.record(url, result, content_hash, now)
+                    counts['unchanged'] += 1
+                    return None, False
+                doc['metadata']['content_hash'] = content_hash
+                print(f"    ✓ {doc['title'][:50]}")
+                return (doc, result, content_hash), False
+            
+            try:
+                outcomes = await asyncio.gather(*(crawl_one(url) for url in due))
+            finally:
+                executor.shutdown(wait=True)
+            changed = [item for item, _ in outcomes if item]
+            counts['changed'] = len(changed)
+            self.last_crawl_stats = {'crawl': dict(frontier.stats), 'http': dict(fetcher.stats),
+                                     'recrawl': counts}
+        
+        return changed, sum(1 for _, failed in outcomes if failed)
+    
+    def build_url_index(self) -> Dict[str, List[str]]:
+        """metadata.url -> ids dos documentos, numa única passada pelo corpus"""
+        index: Dict[str, List[str]] = {}
+        for doc in self.server.documents:
+            url = doc.get('metadata', {}).get('url')
+            if url:
+                index.setdefault(url, []).append(doc['id'])
+        return index
+    
+    def upsert_documents(self, docs: List[Dict]) -> Tuple[int, int]:
+        """
+        Grava documentos por URL: atualiza os existentes e adiciona os novos
+        em lote. O conteúdo só é regravado (e recodificado) se o texto mudou.
+        """
+        self.url_index = self.build_url_index()
+        updates = {}
+        new_docs = []
+        for doc in docs:
+            url = doc['metadata']['url']
+            doc_ids = [doc_id for doc_id in self.url_index.get(url, ()) if doc_id in self.server.document_index]
+            if not doc_ids:
+                new_docs.append(doc)
+                continue
+            print(f"    ⚠️  {url} já existe, atualizando...")
+            fields = {key: doc[key] for key in ('title', 'content', 'category', 'tags', 'metadata')}
+            existing = self.server.get_document(doc_ids[0])
+            if existing.get('title') == doc['title'] and existing.get('hash') == self.server.compute_hash(doc['content']):
+                del fields['content']
+            updates[doc_ids[0]] = fields
+            # Cópias antigas da mesma URL
+            for stale_id in doc_ids[1:]:
+                self.server.remove_document(stale_id)
+            self.url_index[url] = doc_ids[:1]
+        
+        if updates:
+            self.server.update_documents(updates)
+        if new_docs:
+            for doc in self.server.add_documents(new_docs, deduplicate=False):
+                self.url_index.setdefault(doc['metadata']['url'], []).append(doc['id'])
+        return len(new_docs), len(updates)
+    
+    def scrape_site(self, base_url: str, force: bool = False) -> Tuple[int, int]:
+        """Faz scraping de um site A2A: busca as URLs devidas e reindexa só o que mudou"""
         
         print(f"\n🌐 Iniciando scraping de {base_url}")
         
-        # Descobrir URLs
-        urls = self.discover_urls(base_url)
-        
-        # Filtrar URLs já processadas
-        new_urls = [url for url in urls if url not in self.scraped_urls]
-        
-        if not new_urls:
-            print(f"  ✅ Todas as {len(urls)} URLs já foram processadas")
-            return 0, 0
-        
-        print(f"  📄 {len(new_urls)} novas URLs para processar")
+        changed, error_count = asyncio.run(self.crawl_site(base_url, force))
+        stats = self.last_crawl_stats.get('recrawl')
+        if stats and stats['not_modified'] + stats['unchanged']:
+            print(f"  ♻️  {stats['not_modified']} não modificadas (304), {stats['unchanged']} com o mesmo texto")
         
-        # Processar em lotes
-        success_count = 0
-        error_count = 0
-        
-        self.server.load_documents()
-        
-        for i in range(0, len(new_urls), self.batch_size):
-            batch = new_urls[i:i + self.batch_size]
-            print(f"\n  Lote {i//self.batch_size + 1}: Processando {len(batch)} URLs")
-            
-            for url in batch:
-                try:
-                    # Criar documento
-                    doc = self.create_document_from_url(url)
-                    
-                    # Verificar duplicação por URL
-                    existing = [d for d in self.server.documents 
-                               if d.get('metadata', {}).get('url') == url]
-                    
-                    if existing:
-                        print(f"    ⚠️  {url} já existe, atualizando...")
-                        for old_doc in existing:
-                            self.server.remove_document(old_doc['id'])
-                    
-                    # Adicionar documento
-                    result = self.server.add_document(doc)
-                    print(f"    ✓ {doc['title'][:50]}")
-                    
-                    # Marcar como processada
-                    self.scraped_urls.add(url)
-                    success_count += 1
-                    
-                except Exception as e:
-                    print(f"    ✗ Erro em {url}: {e}")
-                    error_count += 1
-            
-            # Pequena pausa entre lotes
-            if i + self.batch_size < len(new_urls):
-                time.sleep(0.5)
-        
-        # Salvar alterações
-        if success_count > 0:
+        if changed:
+            # Outro writer pode ter mudado o store: índices (id -> posição) refeitos antes de gravar
+            self.server.load_documents()
+            self.server.build_indices()
+            self.upsert_documents([doc for doc, _, _ in changed])
             self.server.save_documents()
-            self.save_scraped_urls()
         
-        return success_count, error_count
+        # Estado só avança depois que os documentos foram gravados
+        for doc, result, content_hash in changed:
+            self.crawl_state.record(doc['metadata']['url'], result, content_hash)
+        self.save_scraped_urls()
+        
+        return len(changed), error_count
     
     def scrape_all_sites(self) -> Dict:
         """Faz scraping de todos os sites A2A conhecidos"""
@@ -365,6 +459,19 @@ class A2AWebScraper:
         print(f"Total de páginas indexadas: {len(web_docs)}")
         print(f"URLs únicas processadas: {len(self.scraped_urls)}")
         
+        # Agenda de recrawl
+        states = list(self.crawl_state.entries.values())
+        if states:
+            now = time.time()
+            fetched = [state for state in states if state.fetched_at]
+            due = len(self.crawl_state.due(self.crawl_state.entries, now))
+            changing = sum(1 for state in fetched if state.changes)
+            print(f"Devidas para nova busca: {due} ({len(states) - len(fetched)} nunca buscadas)")
+            if fetched:
+                hours = sorted(state.interval / 3600 for state in fetched)
+                print(f"Intervalo de recrawl: mediana {hours[len(hours) // 2]:.1f}h "
+                      f"(mín {hours[0]:.1f}h, máx {hours[-1]:.1f}h); {changing} páginas já mudaram")
+        
         print(f"\nPor domínio:")
         for domain, count in sorted(domain_stats.items()):
             print(f"  {domain}: {count} páginas")
@@ -397,6 +504,7 @@ def main():
     
     parser = argparse.ArgumentParser(description='Web Scraper para sites A2A')
     parser.add_argument('--scrape', type=str, help='URL do site para scraping')
+    parser.add_argument('--force', action='store_true', help='Verificar todas as URLs, devidas ou não')
     parser.add_argument('--scrape-all', action='store_true', help='Scraping de todos os sites A2A')
     parser.add_argument('--discover', type=str, help='Descobrir URLs de um site')
     parser.add_argument('--stats', action='store_true', help='Mostrar estatísticas')
@@ -408,7 +516,7 @@ def main():
     scraper = A2AWebScraper()
     
     if args.reset:
-        scraper.scraped_urls = set()
+        scraper.crawl_state.entries = {}
         scraper.save_scraped_urls()
         print("✅ Cache de URLs resetado")
     
@@ -422,7 +530,7 @@ def main():
             print(f"  ... e mais {len(urls) - 20} URLs")
     
     elif args.scrape:
-        success, errors = scraper.scrape_site(args.scrape)
+        success, errors = scraper.scrape_site(args.scrape, force=args.force)
         print(f"\n✅ Scraping completo: {success} páginas indexadas, {errors} erros")
     
     elif args.scrape_all:
@@ -437,6 +545,7 @@ def main():
         # Indexar posts importantes rapidamente
         print("⭐ Indexando posts importantes do A2A...")
         scraper.server.load_documents()
+        scraper.server.build_indices()
         
         indexed = 0
         for post in scraper.IMPORTANT_POSTS:
@@ -449,7 +558,7 @@ def main():
                 doc['tags'] = post['tags']
                 
                 scraper.server.add_document(doc)
-                scraper.scraped_urls.add(post['url'])
+                scraper.crawl_state.touch(post['url'])  # devida: ainda sem busca real
                 print(f"  ✓ {post['title']}")
                 indexed += 1
         
@@ -469,6 +578,7 @@ def main():
         
         # Indexar posts importantes
         scraper.server.load_documents()
+        scraper.server.build_indices()
         indexed = 0
         
         for post in scraper.IMPORTANT_POSTS[:6]:  # Primeiros 6 posts
@@ -481,7 +591,7 @@ def main():
                 doc['tags'] = post['tags']
                 
                 scraper.server.add_document(doc)
-                scraper.scraped_urls.add(post['url'])
+                scraper.crawl_state.touch(post['url'])  # devida: ainda sem busca real
                 print(f"  ✓ {post['title']}")
                 indexed += 1
         
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Catálogo de backups (JSONL append-only)
+========================================
+Cada backup criado ou removido vira uma linha em `catalog.jsonl`:
+
+    {"op": "create", "file": "daily/rag_backup_...", "type": "daily", ...}
+    {"op": "delete", "file": "daily/rag_backup_..."}
+
+O arquivo é reaplicado em memória na abertura; listagem, totais por tipo e
+escolhas de retenção são consultas a esse índice, sem varrer diretórios nem
+abrir metadados. Outros processos só acrescentam linhas, então basta ler o
+final do arquivo desde o último offset lido para enxergar as mudanças.
+Quando os registros mortos passam dos vivos o arquivo é compactado. Sem
+catálogo (instalações antigas) ele é reconstruído varrendo os diretórios.
+"""
+
+import os
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Lock entre processos (POSIX)
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+logger = logging.getLogger("backup-catalog")
+
+CATALOG_FILENAME = "catalog.jsonl"
+MANIFEST_SUFFIX = ".manifest.json"
+COMPACT_MIN_RECORDS = 64
+
+
+class BackupCatalog:
+    """Índice em memória dos backups, persistido como log de eventos"""
+
+    def __init__(self, base_path: Path, backup_types: List[str]):
+        self.base_path = Path(base_path)
+        self.path = self.base_path / CATALOG_FILENAME
+        self.backup_types = list(backup_types)
+        self._lock = threading.RLock()
+        self._reset()
+
+        if not self.path.exists():
+            self.rebuild()
+        self._refresh()
+
+    def _reset(self):
+        self.records: Dict[str, Dict] = {}       # arquivo relativo -> registro (ordem de criação)
+        self.totals: Dict[str, List[float]] = {}  # tipo -> [quantidade, MB]
+        self._offset = 0
+        self._inode = None
+        self._dead = 0
+
+    # ------------------------------------------------------------------
+    # Log
+    # ------------------------------------------------------------------
+
+    def _apply(self, event: Dict):
+        name = event['file']
+        previous = self.records.pop(name, None)
+        if previous is not None:
+            totals = self.totals[previous['type']]
+            totals[0] -= 1
+            totals[1] -= previous['size_mb']
+            self._dead += 1
+        if event['op'] == 'create':
+            record = {key: value for key, value in event.items() if key != 'op'}
+            self.records[name] = record
+            totals = self.totals.setdefault(record['type'], [0, 0.0])
+            totals[0] += 1
+            totals[1] += record['size_mb']
+        else:
+            self._dead += 1
+
+    def _refresh(self):
+        """Aplica as linhas acrescentadas (por este ou outro processo) desde a última leitura"""
+        with self._lock:
+            try:
+                stat = self.path.stat()
+            except FileNotFoundError:
+                return
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # Compactado por outro processo: reler do início
+                self._reset()
+                self._inode = stat.st_ino
+            if stat.st_size == self._offset:
+                return
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+            # Linha parcial de um append em andamento fica para a próxima leitura
+            end = data.rfind(b'\n') + 1
+            for line in data[:end].splitlines():
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    logger.warning("Linha inválida no catálogo de backups ignorada")
+            self._offset += end
+
+    @contextmanager
+    def _file_lock(self):
+        """Serializa appends e compactação entre processos via flock"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not HAS_FCNTL:
+            yield
+            return
+        with open(self.path.with_name(self.path.name + '.lock'), 'a') as lock_handle:
+            fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+    def _append(self, event: Dict):
+        with self._lock, self._file_lock():
+            self._refresh()
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            self._refresh()
+            if self._dead > max(COMPACT_MIN_RECORDS, len(self.records)):
+                self._compact()
+
+    def compact(self):
+        """Reescreve o catálogo só com os backups existentes"""
+        with self._lock, self._file_lock():
+            self._compact()
+
+    def _compact(self):
+        self._refresh()
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self.records.values():
+                f.write(json.dumps(dict(record, op='create'), ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+        self._reset()
+        self._refresh()
+
+    def rebuild(self):
+        """Reconstrói o catálogo varrendo os diretórios de backup (uma vez)"""
+        with self._lock, self._file_lock():
+            events = []
+            for backup_type in self.backup_types:
+                backup_dir = self.base_path / backup_type
+                if not backup_dir.exists():
+                    continue
+                # Metadados dos tar antigos (".tar.json") também casam com o glob
+                files = list(backup_dir.glob(f"rag_backup_*{MANIFEST_SUFFIX}")) + [
+                    path for path in backup_dir.glob("rag_backup_*.tar*") if path.suffix != '.json'
+                ]
+                for backup_file in files:
+                    events.append(self._scan_record(backup_file, backup_type))
+            events.sort(key=lambda event: event['created'])
+
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for event in events:
+                    f.write(json.dumps(event, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.path)
+            self._reset()
+            self._refresh()
+            if events:
+                logger.info(f"Catálogo de backups reconstruído com {len(events)} backups")
+
+    def _scan_record(self, backup_file: Path, backup_type: str) -> Dict:
+        """Registro de um backup existente a partir do manifest/metadados"""
+        is_manifest = backup_file.name.endswith(MANIFEST_SUFFIX)
+        metadata_file = backup_file if is_manifest else backup_file.with_suffix('.json')
+        metadata = {}
+        if metadata_file.exists():
+            try:
+                with open(metadata_file, 'r') as f:
+                    metadata = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                pass
+        metadata.pop('files', None)
+        stat_info = backup_file.stat()
+        return {
+            'op': 'create',
+            'file': backup_file.relative_to(self.base_path).as_posix(),
+            'type': backup_type,
+            # Manifests contam só os bytes novos que o backup gravou
+            'size_mb': metadata.get('size_mb', 0.0) if is_manifest else stat_info.st_size / 1024 / 1024,
+            'created': datetime.fromtimestamp(stat_info.st_mtime).isoformat(),
+            'metadata': metadata
+        }
+
+    # ------------------------------------------------------------------
+    # API
+    # ------------------------------------------------------------------
+
+    def add(self, backup_file: Path, backup_type: str, size_mb: float,
+            created: Optional[str] = None, metadata: Optional[Dict] = None):
+        self._append({
+            'op': 'create',
+            'file': Path(backup_file).relative_to(self.base_path).as_posix(),
+            'type': backup_type,
+            'size_mb': size_mb,
+            'created': created or datetime.now().isoformat(),
+            'metadata': metadata or {}
+        })
+
+    def remove(self, backup_file: Path):
+        name = Path(backup_file).relative_to(self.base_path).as_posix()
+        with self._lock:
+            self._refresh()
+            if name in self.records:
+                self._append({'op': 'delete', 'file': name})
+
+    def backups(self, backup_type: Optional[str] = None) -> List[Dict]:
+        """Registros em ordem de criação (mais antigo primeiro), com caminho absoluto"""
+        with self._lock:
+            self._refresh()
+            return [
+                dict(record, file=str(self.base_path / name))
+                for name, record in self.records.items()
+                if backup_type is None or record['type'] == backup_type
+            ]
+
+    def latest(self, backup_type: str) -> Optional[Path]:
+        with self._lock:
+            self._refresh()
+            for name in reversed(self.records):
+                if self.records[name]['type'] == backup_type:
+                    return self.base_path / name
+            return None
+
+    def summary(self, backup_types: List[str]) -> Dict:
+        """Quantidade/tamanho por tipo (totais mantidos incrementalmente) e extremos de data"""
+        with self._lock:
+            self._refresh()
+            # Registros estão em ordem de criação: extremos saem das pontas
+            wanted = (record['created'] for record in self.records.values() if record['type'] in backup_types)
+            oldest = next(wanted, None)
+            newest = next((self.records[name]['created'] for name in reversed(self.records)
+                           if self.records[name]['type'] in backup_types), None)
+            return {
+                'by_type': {
+                    backup_type: {
+                        'count': int(self.totals.get(backup_type, [0, 0.0])[0]),
+                        'size_mb': self.totals.get(backup_type, [0, 0.0])[1]
+                    }
+                    for backup_type in backup_types
+                },
+                'oldest_backup': oldest,
+                'newest_backup': newest
+            }
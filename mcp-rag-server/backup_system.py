@@ -1,46 +1,113 @@
 #!/usr/bin/env python3
 """
 Sistema de Backup Automático - MCP RAG Server
-Backup completo com cronograma, compressão e restauração
+Backup incremental com cronograma, deduplicação por conteúdo e restauração
+
+Cada backup é um manifest (arquivo -> lista de chunks); os chunks ficam
+uma única vez em backups/chunks, então o custo de um backup é
+proporcional ao que mudou desde o anterior.
+
+Os arquivos vêm de um snapshot consistente (hard links tirados sob o lock
+do writer), nunca dos arquivos vivos que o servidor pode estar regravando.
 """
 import os
 import json
 import time
 import shutil
-import gzip
 import tarfile
+import tempfile
 import threading
 import schedule
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import datetime, timedelta
 import logging
 
+from chunk_store import ChunkStore, CODEC_ZSTD, CODEC_ZLIB
+from backup_catalog import BackupCatalog
+from segment_store import SegmentStore, SEGMENT_PREFIX, WAL_PREFIX, link_or_copy
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
 # Configuração
 BASE_PATH = Path.home() / ".claude" / "mcp-rag-cache"
 BACKUP_BASE_PATH = BASE_PATH / "backups"
 LOG_FILE = BASE_PATH / "backup.log"
 
+SEGMENTS_PATH = BASE_PATH / "segments"
+CHUNKS_PATH = BACKUP_BASE_PATH / "chunks"
+MANIFEST_SUFFIX = ".manifest.json"
+
+# Coordenação com o writer (mesmos nomes do rag_server, sob BASE_PATH)
+GENERATION_FILENAME = "generation"
+WRITER_LOCK_FILENAME = "writer.lock"
+STORE_MANIFEST_ARCNAME = "segments/manifest.json"
+
+BACKUP_TYPES = ['hourly', 'daily', 'weekly', 'monthly', 'manual']
+
+# Niceness da thread de backup (19 = menor prioridade de CPU)
+BACKUP_NICENESS = 19
+
+
+def lower_io_priority():
+    """
+    Baixa a prioridade de CPU e de I/O da thread atual (melhor esforço,
+    Linux). Prioridades são por thread e herdadas pelas threads que ela
+    criar, então o pool de compressão também roda em segundo plano sem
+    afetar as threads que atendem o servidor.
+    """
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, BACKUP_NICENESS)
+    except (AttributeError, OSError):
+        pass
+    if HAS_PSUTIL and hasattr(psutil, 'IOPRIO_CLASS_IDLE'):
+        try:
+            psutil.Process(tid).ionice(psutil.IOPRIO_CLASS_IDLE)
+        except (psutil.Error, OSError):
+            pass
+
+
 class BackupSystem:
     """Sistema completo de backup automático"""
     
-    def __init__(self):
+    def __init__(self, snapshot_provider=None):
         self.setup_logging()
         self.running = False
         self.thread = None
         
+        # Fonte dos snapshots: RAGServer.snapshot quando roda no mesmo processo
+        # do servidor; senão um SegmentStore somente leitura (lock de writer)
+        self.snapshot_provider = snapshot_provider
+        
+        # Restauração preguiçosa: thread que ainda está trazendo os vetores
+        self.hydration_thread = None
+        
+        # Backups e limpeza de chunks nunca rodam ao mesmo tempo
+        self._lock = threading.RLock()
+        
         # Configuração de backup
         self.config = {
             'hourly_retention': 24,     # Manter 24 backups de hora em hora
             'daily_retention': 30,      # Manter 30 backups diários
             'weekly_retention': 12,     # Manter 12 backups semanais
             'monthly_retention': 12,    # Manter 12 backups mensais
-            'compression': True,        # Usar compressão gzip
+            'compression': True,        # Comprimir chunks (zstd se disponível, senão zlib)
+            'compression_workers': None,  # Threads de hash/compressão (None = núcleos)
+            'low_priority': True,       # Serviço roda com prioridade de CPU/I/O reduzida
             'max_backup_size_mb': 100   # Alertar se backup > 100MB
         }
         
         # Criar diretórios de backup
         self.create_backup_directories()
         
+        # Catálogo append-only: listagem, estatísticas e retenção sem varrer diretórios
+        self.catalog = BackupCatalog(BACKUP_BASE_PATH, BACKUP_TYPES + ['pre_restore'])
+        
         # Configurar agendamentos
         self.setup_schedule()
         
@@ -60,9 +127,7 @@ class BackupSystem:
     
     def create_backup_directories(self):
         """Cria estrutura de diretórios para backups"""
-        directories = ['hourly', 'daily', 'weekly', 'monthly', 'manual']
-        
-        for directory in directories:
+        for directory in BACKUP_TYPES:
             backup_dir = BACKUP_BASE_PATH / directory
             backup_dir.mkdir(parents=True, exist_ok=True)
         
@@ -106,6 +171,8 @@ class BackupSystem:
     
     def _backup_loop(self):
         """Loop principal do serviço de backup"""
+        if self.config['low_priority']:
+            lower_io_priority()
         while self.running:
             try:
                 schedule.run_pending()
@@ -115,79 +182,164 @@ class BackupSystem:
                 time.sleep(300)  # Aguardar 5  em caso de erro
     
     def create_backup(self, backup_type="manual", include_logs=True):
-        """Cria backup completo dos dados"""
-        try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"rag_backup_{backup_type}_{timestamp}"
-            
-            if self.config['compression']:
-                backup_file = BACKUP_BASE_PATH / backup_type / f"{backup_name}.tar.gz"
-            else:
-                backup_file = BACKUP_BASE_PATH / backup_type / f"{backup_name}.tar"
-            
-            self.logger.info(f"Creating {backup_type} backup: {backup_file}")
-            
-            # Criar arquivo tar
-            mode = 'w:gz' if self.config['compression'] else 'w'
-            with tarfile.open(backup_file, mode) as tar:
-                # Adicionar cache principal
-                cache_file = BASE_PATH / "documents.json"
-                if cache_file.exists():
-                    tar.add(cache_file, arcname="documents.json")
+        """
+        Cria backup incremental: só chunks ainda não guardados são gravados.
+        Se os dados não mudaram desde o último backup do mesmo tipo, nada é
+        criado e o manifest anterior é retornado.
+        """
+        with self._lock:
+            try:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+                backup_name = f"rag_backup_{backup_type}_{timestamp}"
+                backup_file = BACKUP_BASE_PATH / backup_type / f"{backup_name}{MANIFEST_SUFFIX}"
+                backup_file.parent.mkdir(parents=True, exist_ok=True)
                 
-                # Adicionar índices
-                for index_file in ["index.pkl", "vectors.npy"]:
-                    file_path = BASE_PATH / index_file
-                    if file_path.exists():
-                        tar.add(file_path, arcname=index_file)
+                self.logger.info(f"Creating {backup_type} backup: {backup_file}")
                 
-                # Adicionar logs se solicitado
-                if include_logs:
-                    for log_file in BASE_PATH.glob("*.log"):
-                        tar.add(log_file, arcname=f"logs/{log_file.name}")
+                previous_file, previous = self._latest_manifest(backup_type)
+                previous_files = previous.get('files', {}) if previous else {}
                 
-                # Adicionar configurações
-                config_files = ["urls_to_index.json"]
-                for config_file in config_files:
-                    file_path = BASE_PATH / config_file
-                    if file_path.exists():
-                        tar.add(file_path, arcname=f"config/{config_file}")
-            
-            # Verificar tamanho do backup
-            backup_size_mb = backup_file.stat().st_size / 1024 / 1024
-            if backup_size_mb > self.config['max_backup_size_mb']:
-                self.logger.warning(f"Backup size ({backup_size_mb:.1f}MB) exceeds threshold")
-            
-            # Criar metadados do backup
-            metadata = {
-                'timestamp': timestamp,
-                'type': backup_type,
-                'size_bytes': backup_file.stat().st_size,
-                'size_mb': backup_size_mb,
-                'compression': self.config['compression'],
-                'files_included': self._get_backup_contents(backup_file),
-                'created_at': datetime.now().isoformat()
-            }
-            
-            metadata_file = backup_file.with_suffix('.json')
-            with open(metadata_file, 'w') as f:
-                json.dump(metadata, f, indent=2)
+                with self._chunk_store() as chunk_store, self._snapshot() as (files, generation):
+                    # Dados primeiro: arquivos com mesmo tamanho/mtime reaproveitam os chunks
+                    entries = {
+                        arcname: chunk_store.store_file(path, previous_files.get(arcname))
+                        for arcname, path in files.items()
+                    }
+                    if previous and self._same_data(previous_files, entries):
+                        self.logger.info(f"No changes since {previous_file.name}, skipping {backup_type} backup")
+                        return previous_file
+                    
+                    # Logs mudam sempre e não contam para a comparação acima
+                    if include_logs:
+                        for log_file in BASE_PATH.glob("*.log"):
+                            arcname = f"logs/{log_file.name}"
+                            entries[arcname] = chunk_store.store_file(log_file, previous_files.get(arcname))
+                    codec = {CODEC_ZSTD: 'zstd', CODEC_ZLIB: 'zlib'}.get(chunk_store.codec, 'none')
+                
+                new_chunks = sum(entry.pop('new_chunks') for entry in entries.values())
+                new_bytes = sum(entry.pop('new_bytes') for entry in entries.values())
+                logical_size = sum(entry['size'] for entry in entries.values())
+                
+                backup_size_mb = new_bytes / 1024 / 1024
+                if backup_size_mb > self.config['max_backup_size_mb']:
+                    self.logger.warning(f"Backup size ({backup_size_mb:.1f}MB) exceeds threshold")
+                
+                manifest = {
+                    'timestamp': timestamp,
+                    'type': backup_type,
+                    'format': 'chunked',
+                    'generation': generation,
+                    'size_bytes': new_bytes,
+                    'size_mb': backup_size_mb,
+                    'logical_size_bytes': logical_size,
+                    'compression': codec,
+                    'files_included': sorted(entries),
+                    'new_chunks': new_chunks,
+                    'total_chunks': len({digest for entry in entries.values() for digest in entry['chunks']}),
+                    'created_at': datetime.now().isoformat(),
+                    'files': entries
+                }
+                
+                tmp_file = backup_file.with_name(backup_file.name + '.tmp')
+                with open(tmp_file, 'w') as f:
+                    json.dump(manifest, f)
+                os.replace(tmp_file, backup_file)
+                
+                summary = {key: value for key, value in manifest.items() if key != 'files'}
+                self.catalog.add(backup_file, backup_type, backup_size_mb,
+                                 created=manifest['created_at'], metadata=summary)
+                
+                self.logger.info(f"Backup created successfully: {backup_size_mb:.1f}MB new "
+                                 f"({new_chunks} new chunks, {logical_size / 1024 / 1024:.1f}MB logical)")
+                return backup_file
+                
+            except Exception as e:
+                self.logger.error(f"Error creating backup: {e}")
+                return None
+    
+    def _chunk_store(self):
+        return ChunkStore(CHUNKS_PATH, compression=self.config['compression'],
+                          workers=self.config['compression_workers'])
+    
+    @contextmanager
+    def _snapshot(self):
+        """
+        Snapshot consistente do cache em diretório temporário
+        
+        Retorna ({nome no backup: caminho no snapshot}, geração). O store
+        segmentado é congelado por hard links sob o lock do writer; os demais
+        arquivos são trocados atomicamente por quem os grava, então um hard
+        link fixa uma versão inteira. Buscas nunca esperam pelo backup.
+        """
+        snapshot_dir = Path(tempfile.mkdtemp(prefix='.backup-snapshot-', dir=BASE_PATH))
+        try:
+            files = {}
+            generation = None
+            if (SEGMENTS_PATH / "manifest.json").exists():
+                # Store segmentado: segmentos vivos + manifest + WALs;
+                # documents.json/vectors.npy são derivados e ficam de fora
+                if self.snapshot_provider is not None:
+                    info = self.snapshot_provider(snapshot_dir)
+                    files.update(info['files'])
+                else:
+                    store = SegmentStore(SEGMENTS_PATH,
+                                         generation_file=BASE_PATH / GENERATION_FILENAME,
+                                         lock_file=BASE_PATH / WRITER_LOCK_FILENAME,
+                                         read_only=True)
+                    info = store.snapshot(snapshot_dir / "segments")
+                    files.update({f"segments/{name}": path for name, path in info['files'].items()})
+                generation = info['generation']
+                index_files = ["index.pkl"]
+            else:
+                index_files = ["documents.json", "index.pkl", "vectors.npy"]
             
-            self.logger.info(f"Backup created successfully: {backup_size_mb:.1f}MB")
-            return backup_file
+            # Configurações
+            extra_files = [(name, name) for name in index_files]
+            extra_files += [(name, f"config/{name}") for name in ["urls_to_index.json"]]
+            for name, arcname in extra_files:
+                file_path = BASE_PATH / name
+                if file_path.exists():
+                    destination = snapshot_dir / arcname
+                    destination.parent.mkdir(parents=True, exist_ok=True)
+                    files[arcname] = link_or_copy(file_path, destination)
             
-        except Exception as e:
-            self.logger.error(f"Error creating backup: {e}")
-            return None
+            yield files, generation
+        finally:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
     
-    def _get_backup_contents(self, backup_file):
-        """Lista conteúdo do backup"""
-        try:
-            mode = 'r:gz' if backup_file.suffix == '.gz' else 'r'
-            with tarfile.open(backup_file, mode) as tar:
-                return [member.name for member in tar.getmembers()]
-        except:
-            return []
+    @staticmethod
+    def _same_data(previous_files, entries):
+        """Mesmos arquivos de dados com o mesmo conteúdo (logs ignorados)"""
+        previous_data = {
+            name: entry['sha256'] for name, entry in previous_files.items() if not name.startswith('logs/')
+        }
+        return previous_data == {name: entry['sha256'] for name, entry in entries.items()}
+    
+    def _latest_manifest(self, backup_type):
+        """Manifest chunked mais recente do tipo, segundo o catálogo"""
+        for record in reversed(self.catalog.backups(backup_type)):
+            manifest_file = Path(record['file'])
+            if manifest_file.name.endswith(MANIFEST_SUFFIX) and manifest_file.exists():
+                with open(manifest_file, 'r') as f:
+                    return manifest_file, json.load(f)
+        return None, None
+    
+    def _gc_chunks(self):
+        """Remove chunks que nenhum manifest restante (de qualquer tipo) referencia"""
+        with self._lock:
+            referenced = set()
+            for record in self.catalog.backups():
+                manifest_file = Path(record['file'])
+                if not manifest_file.name.endswith(MANIFEST_SUFFIX):
+                    continue
+                with open(manifest_file, 'r') as f:
+                    for entry in json.load(f).get('files', {}).values():
+                        referenced.update(entry['chunks'])
+            
+            removed = self._chunk_store().gc(referenced)
+            if removed:
+                self.logger.info(f"Removed {removed} unreferenced chunks")
+            return removed
     
     def create_hourly_backup(self):
         """Cria backup de hora em hora"""
@@ -222,41 +374,42 @@ class BackupSystem:
             backup_types = ['hourly', 'daily', 'weekly', 'monthly']
         
         for btype in backup_types:
-            backup_dir = BACKUP_BASE_PATH / btype
-            if not backup_dir.exists():
-                continue
-            
             # Obter política de retenção
-            if retention_count is None:
-                retention_count = self.config.get(f'{btype}_retention', 30)
+            keep = retention_count if retention_count is not None else self.config.get(f'{btype}_retention', 30)
             
-            # Listar backups ordenados por data (mais antigos primeiro)
-            backup_files = sorted(
-                backup_dir.glob("rag_backup_*.tar*"),
-                key=lambda x: x.stat().st_mtime
-            )
+            # Backups do catálogo já estão em ordem de criação (mais antigos primeiro)
+            records = self.catalog.backups(btype)
             
             # Remover excesso de backups
-            if len(backup_files) > retention_count:
-                files_to_remove = backup_files[:-retention_count]
+            if len(records) > keep:
+                files_to_remove = [Path(record['file']) for record in records[:len(records) - keep]]
                 
                 for backup_file in files_to_remove:
                     try:
                         # Remover arquivo de backup
-                        backup_file.unlink()
+                        backup_file.unlink(missing_ok=True)
                         
-                        # Remover metadados associados
+                        # Remover metadados associados (backups tar)
                         metadata_file = backup_file.with_suffix('.json')
-                        if metadata_file.exists():
+                        if not backup_file.name.endswith(MANIFEST_SUFFIX) and metadata_file.exists():
                             metadata_file.unlink()
                         
+                        self.catalog.remove(backup_file)
                         self.logger.info(f"Removed old backup: {backup_file.name}")
                         
                     except Exception as e:
                         self.logger.error(f"Error removing backup {backup_file}: {e}")
+        
+        self._gc_chunks()
     
-    def restore_backup(self, backup_file, target_dir=None):
-        """Restaura backup"""
+    def restore_backup(self, backup_file, target_dir=None, lazy_vectors=False, pre_restore=True):
+        """
+        Restaura backup
+        
+        Com lazy_vectors, retorna assim que documentos, postings e manifests
+        estão no lugar; os vectors.npy chegam em background (ver
+        wait_for_hydration) e réplicas buscam por TF-IDF até lá.
+        """
         try:
             if target_dir is None:
                 target_dir = BASE_PATH
@@ -269,10 +422,17 @@ class BackupSystem:
             
             self.logger.info(f"Restoring backup: {backup_path}")
             
-            # Criar backup do estado atual antes de restaurar
-            current_backup = self.create_backup("pre_restore")
+            # Criar backup do estado atual antes de restaurar (incremental: só o que mudou)
+            if pre_restore:
+                current_backup = self.create_backup("pre_restore")
+            
+            if backup_path.name.endswith(MANIFEST_SUFFIX):
+                with open(backup_path, 'r') as f:
+                    manifest = json.load(f)
+                self._restore_manifest(manifest['files'], target_path, lazy_vectors)
+                return True
             
-            # Extrair backup
+            # Backup tar antigo
             mode = 'r:gz' if backup_path.suffix == '.gz' else 'r'
             with tarfile.open(backup_path, mode) as tar:
                 tar.extractall(target_path)
@@ -284,76 +444,133 @@ class BackupSystem:
             self.logger.error(f"Error restoring backup: {e}")
             return False
     
-    def list_backups(self, backup_type=None):
-        """Lista backups disponíveis"""
-        backups = []
-        
-        if backup_type:
-            backup_types = [backup_type]
-        else:
-            backup_types = ['hourly', 'daily', 'weekly', 'monthly', 'manual']
+    def _restore_manifest(self, files, target_path, lazy_vectors):
+        """
+        Restaura os arquivos de um backup chunked conferindo o sha256 de cada um
         
-        for btype in backup_types:
-            backup_dir = BACKUP_BASE_PATH / btype
-            if not backup_dir.exists():
-                continue
+        Todos os chunks são conferidos antes de tocar no destino. O manifest
+        do store vem por último, então quem abrir o destino nunca vê um
+        manifest apontando para segmentos incompletos. Junto com ele, sob o
+        lock do writer, saem do destino os WALs e segmentos que o backup não
+        lista: a restauração volta ao ponto do backup, sem escritas posteriores.
+        """
+        start = time.perf_counter()
+        chunk_store = self._chunk_store()
+        try:
+            missing = {
+                digest for entry in files.values() for digest in entry['chunks']
+                if not chunk_store.has(digest)
+            }
+            if missing:
+                raise FileNotFoundError(f"{len(missing)} chunks missing from backup store")
             
-            for backup_file in backup_dir.glob("rag_backup_*.tar*"):
-                metadata_file = backup_file.with_suffix('.json')
-                
-                # Carregar metadados se existir
-                metadata = {}
-                if metadata_file.exists():
-                    try:
-                        with open(metadata_file, 'r') as f:
-                            metadata = json.load(f)
-                    except:
-                        pass
-                
-                # Informações básicas do arquivo
-                stat_info = backup_file.stat()
-                
-                backup_info = {
-                    'file': str(backup_file),
-                    'type': btype,
-                    'size_mb': stat_info.st_size / 1024 / 1024,
-                    'created': datetime.fromtimestamp(stat_info.st_mtime).isoformat(),
-                    'metadata': metadata
-                }
-                
-                backups.append(backup_info)
+            deferred = sorted(name for name in files if lazy_vectors and name.endswith('/vectors.npy'))
+            ordered = sorted(
+                (name for name in files if name not in deferred),
+                key=lambda name: name == STORE_MANIFEST_ARCNAME
+            )
+            for arcname in ordered:
+                if arcname != STORE_MANIFEST_ARCNAME:
+                    chunk_store.restore_file(files[arcname], target_path / arcname)
+            if STORE_MANIFEST_ARCNAME in files:
+                with self._target_store(target_path).writer_lock():
+                    discarded = self._discard_unlisted(files, target_path / "segments")
+                    chunk_store.restore_file(files[STORE_MANIFEST_ARCNAME], target_path / STORE_MANIFEST_ARCNAME)
+                if discarded:
+                    self.logger.info(f"Discarded {len(discarded)} WAL/segment entries newer than the backup")
+            self._publish_generation(target_path)
+        except Exception:
+            chunk_store.close()
+            raise
         
-        # Ordenar por data de criação (mais recente primeiro)
-        backups.sort(key=lambda x: x['created'], reverse=True)
+        self.logger.info(f"Backup restored to {target_path} in {time.perf_counter() - start:.2f}s"
+                         f"{f', hydrating {len(deferred)} vector files in background' if deferred else ''}")
+        if not deferred:
+            chunk_store.close()
+            return
+        self.hydration_thread = threading.Thread(
+            target=self._hydrate_vectors, args=(chunk_store, files, deferred, target_path),
+            name="backup-hydration", daemon=True
+        )
+        self.hydration_thread.start()
+    
+    def _hydrate_vectors(self, chunk_store, files, names, target_path):
+        """Restaura os vetores em background e publica nova geração ao final"""
+        start = time.perf_counter()
+        try:
+            with chunk_store:
+                for arcname in names:
+                    chunk_store.restore_file(files[arcname], target_path / arcname)
+            self._publish_generation(target_path)
+            self.logger.info(f"Vectors hydrated in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            self.logger.error(f"Error hydrating vectors: {e}")
+    
+    @staticmethod
+    def _target_store(target_path):
+        return SegmentStore(target_path / "segments",
+                            generation_file=target_path / GENERATION_FILENAME,
+                            lock_file=target_path / WRITER_LOCK_FILENAME,
+                            read_only=True)
+    
+    @staticmethod
+    def _discard_unlisted(files, segments_path):
+        """Remove WALs e segmentos do destino que o backup não referencia"""
+        listed = {name.split('/')[1] for name in files if name.startswith('segments/')}
+        discarded = []
+        if not segments_path.exists():
+            return discarded
+        for path in sorted(segments_path.iterdir()):
+            if path.name in listed:
+                continue
+            if path.name.startswith(WAL_PREFIX) and path.name.endswith('.jsonl'):
+                path.unlink()
+            elif path.name.startswith(SEGMENT_PREFIX) and path.is_dir():
+                shutil.rmtree(path)
+            else:
+                continue
+            discarded.append(path.name)
+        return discarded
+    
+    @staticmethod
+    def _publish_generation(target_path):
+        """Réplicas abertas no destino recarregam ao ver a nova geração"""
+        if (target_path / STORE_MANIFEST_ARCNAME).exists():
+            BackupSystem._target_store(target_path).publish_generation()
+    
+    def wait_for_hydration(self, timeout=None):
+        """Aguarda a restauração preguiçosa dos vetores; True se terminou"""
+        if self.hydration_thread is not None:
+            self.hydration_thread.join(timeout)
+            if self.hydration_thread.is_alive():
+                return False
+            self.hydration_thread = None
+        return True
+    
+    def list_backups(self, backup_type=None):
+        """Lista backups disponíveis (mais recente primeiro)"""
+        if backup_type:
+            backups = self.catalog.backups(backup_type)
+        else:
+            backups = [record for record in self.catalog.backups() if record['type'] in BACKUP_TYPES]
+        backups.reverse()
         return backups
     
     def get_backup_stats(self):
         """Retorna estatísticas dos backups"""
-        backups = self.list_backups()
+        summary = self.catalog.summary(BACKUP_TYPES)
         
         stats = {
-            'total_backups': len(backups),
-            'total_size_mb': sum(b['size_mb'] for b in backups),
-            'by_type': {},
-            'oldest_backup': None,
-            'newest_backup': None,
+            'total_backups': sum(totals['count'] for totals in summary['by_type'].values()),
+            'total_size_mb': sum(totals['size_mb'] for totals in summary['by_type'].values()),
+            'by_type': summary['by_type'],
+            'oldest_backup': summary['oldest_backup'],
+            'newest_backup': summary['newest_backup'],
             'backup_health': 'good'
         }
         
-        # Estatísticas por tipo
-        for backup_type in ['hourly', 'daily', 'weekly', 'monthly', 'manual']:
-            type_backups = [b for b in backups if b['type'] == backup_type]
-            stats['by_type'][backup_type] = {
-                'count': len(type_backups),
-                'size_mb': sum(b['size_mb'] for b in type_backups)
-            }
-        
-        # Backup mais antigo e mais novo
-        if backups:
-            stats['oldest_backup'] = min(backups, key=lambda x: x['created'])['created']
-            stats['newest_backup'] = max(backups, key=lambda x: x['created'])['created']
-            
-            # Verificar saúde dos backups
+        # Verificar saúde dos backups
+        if stats['newest_backup']:
             newest_time = datetime.fromisoformat(stats['newest_backup'])
             if datetime.now() - newest_time > timedelta(hours=2):
                 stats['backup_health'] = 'warning'
@@ -381,9 +598,9 @@ def list_backups(backup_type=None):
     """Lista backups disponíveis"""
     return backup_system.list_backups(backup_type)
 
-def restore_backup(backup_file):
+def restore_backup(backup_file, lazy_vectors=False):
     """Restaura backup"""
-    return backup_system.restore_backup(backup_file)
+    return backup_system.restore_backup(backup_file, lazy_vectors=lazy_vectors)
 
 def get_backup_stats():
     """Retorna estatísticas dos backups"""
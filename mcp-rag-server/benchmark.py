@@ -0,0 +1,649 @@
+#!/usr/bin/env python3
+"""
+Benchmark do MCP RAG Server
+============================
+Mede os caminhos quentes do RAGServer sobre corpora sintéticos:
+
+- cold start (carregar segmentos + construir índices + modelo)
+- throughput e latência de add_document sobre um corpus de N documentos
+- latência p50/p99 de search por modo (classic/semantic/enhanced)
+- latência de list (página) e stats
+- pico de RSS por cenário
+- backup/restore: tar.gz (formato antigo) x chunk store paralelo
+  (tempo, taxa de compressão e custo do backup incremental)
+- crawl: busca serial x fronteira assíncrona contra um site local
+  (robots.txt, sitemap-index, páginas com latência simulada)
+
+Cada cenário (tamanho x modo) roda em um processo separado, com cache
+isolado em diretório temporário e um embedder determinístico (feature
+hashing), então o benchmark roda offline e é reprodutível.
+
+Uso:
+    python benchmark.py run --sizes 1000 10000 --output results.json
+    python benchmark.py compare baseline.json results.json --threshold 0.10
+    python benchmark.py backup --docs 20000 --workers 4
+    python benchmark.py crawl --pages 500 --latency 0.02
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import hashlib
+import logging
+import platform
+import tarfile
+import resource
+import tempfile
+import argparse
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_MODES = ['classic', 'semantic', 'enhanced']
+EMBEDDING_DIM = 384
+
+# Métricas em que menor é melhor (as demais: maior é melhor)
+LOWER_IS_BETTER = {
+    'cold_start_s', 'add_p50_ms', 'add_p99_ms', 'search_p50_ms', 'search_p99_ms',
+    'list_p50_ms', 'list_p99_ms', 'stats_p50_ms', 'stats_p99_ms', 'peak_rss_mb'
+}
+HIGHER_IS_BETTER = {'add_docs_per_s'}
+
+
+# ============================================================================
+# CORPUS E EMBEDDER SINTÉTICOS
+# ============================================================================
+
+class StubEmbedder:
+    """Embedder determinístico por feature hashing (sem download de modelo)"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in text.lower().split():
+                digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], 'little') % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vectors[i, bucket] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+def build_vocabulary(rng: random.Random, size: int = 5000) -> List[str]:
+    """Vocabulário de pseudo-palavras a partir de sílabas"""
+    syllables = ['ra', 'go', 'mi', 'te', 'lu', 'ca', 'si', 'no', 've', 'da', 'pro', 'tor', 'em', 'bed']
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def generate_corpus(size: int, seed: int = 42) -> List[Dict]:
+    """Gera documentos sintéticos com distribuição de termos tipo Zipf"""
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(rng)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    tags = [f'tag{i}' for i in range(40)]
+    categories = ['docs', 'chat', 'web', 'code', 'notes']
+
+    documents = []
+    for i in range(size):
+        words = rng.choices(vocabulary, weights=weights, k=rng.randint(50, 300))
+        documents.append({
+            'title': ' '.join(words[:4]).title(),
+            'content': ' '.join(words),
+            'tags': rng.sample(tags, rng.randint(1, 3)),
+            'category': rng.choice(categories),
+            'source': f'synthetic-{i % 10}'
+        })
+    return documents
+
+
+def generate_queries(count: int, seed: int = 7) -> List[str]:
+    """Queries de 1 a 3 termos do mesmo vocabulário do corpus"""
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(random.Random(42))[:1000]
+    return [' '.join(rng.sample(vocabulary, rng.randint(1, 3))) for _ in range(count)]
+
+
+# ============================================================================
+# CENÁRIOS
+# ============================================================================
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil por nearest-rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def peak_rss_mb() -> float:
+    """Pico de RSS do processo atual (ru_maxrss é KB no Linux e bytes no macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+@contextmanager
+def isolated_server_env(cache_dir: Path):
+    """Redireciona os paths do rag_server e injeta o embedder sintético"""
+    import rag_server
+
+    saved = {
+        name: getattr(rag_server, name, None)
+        for name in ('CACHE_PATH', 'CACHE_FILE', 'VECTORS_FILE', 'STATS_FILE',
+                     'HAS_EMBEDDINGS', 'SentenceTransformer')
+    }
+    rag_server.CACHE_PATH = cache_dir
+    rag_server.CACHE_FILE = cache_dir / 'documents.json'
+    rag_server.VECTORS_FILE = cache_dir / 'vectors.npy'
+    rag_server.STATS_FILE = cache_dir / 'stats.json'
+    rag_server.HAS_EMBEDDINGS = True
+    rag_server.SentenceTransformer = lambda model_name: StubEmbedder()
+
+    # Logging por documento distorceria as medições
+    log_levels = {name: logging.getLogger(name).level for name in (rag_server.logger.name, 'segment-store')}
+    for name in log_levels:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    try:
+        yield rag_server
+    finally:
+        for name, value in saved.items():
+            if value is None and name == 'SentenceTransformer':
+                if hasattr(rag_server, name):
+                    delattr(rag_server, name)
+            else:
+                setattr(rag_server, name, value)
+        for name, level in log_levels.items():
+            logging.getLogger(name).setLevel(level)
+
+
+def seed_cache(rag_server, mode: str, documents: List[Dict]):
+    """Grava o corpus direto em um segmento (sem pagar N add_document)"""
+    probe = rag_server.RAGServer(mode=mode)
+    for i, doc in enumerate(documents):
+        doc['id'] = f'bench-{i:07d}'
+        doc['hash'] = probe.compute_hash(doc['content'])
+        doc['created_at'] = doc['updated_at'] = datetime.now().isoformat()
+        doc['version'] = 1
+
+    vectors = None
+    if probe.model is not None:
+        texts = [f"{doc['title']} {doc['content']}" for doc in documents]
+        vectors = probe.model.encode(texts)
+    probe.store.import_documents(documents, vectors)
+    probe.close()
+
+
+def run_scenario(size: int, mode: str, queries: int = 200, adds: int = 100,
+                 seed: int = 42) -> Dict:
+    """Executa um cenário completo e retorna as métricas"""
+    cache_dir = Path(tempfile.mkdtemp(prefix='rag-bench-'))
+    try:
+        with isolated_server_env(cache_dir) as rag_server:
+            corpus = generate_corpus(size + adds, seed)
+            seed_cache(rag_server, mode, corpus[:size])
+
+            # Cold start: segmentos + índices + modelo
+            start = time.perf_counter()
+            server = rag_server.RAGServer(mode=mode)
+            cold_start_s = time.perf_counter() - start
+            server.start_background_merge()
+
+            # Ingestão incremental sobre o corpus existente
+            add_latencies = []
+            start = time.perf_counter()
+            for doc in corpus[size:]:
+                add_latencies.append(_timed(server.add_document, dict(doc)))
+            add_elapsed = time.perf_counter() - start
+
+            search_latencies = [_timed(server.search, query, 5) for query in generate_queries(queries)]
+            list_latencies = [
+                _timed(server.list_documents_page, None, limit=50, sort_by='updated_at', order='desc')
+                for _ in range(50)
+            ]
+            stats_latencies = [_timed(server.get_stats) for _ in range(20)]
+            server.close()
+
+        return {
+            'size': size,
+            'mode': mode,
+            'cold_start_s': round(cold_start_s, 4),
+            'add_docs_per_s': round(len(add_latencies) / add_elapsed, 2) if add_elapsed else 0.0,
+            'add_p50_ms': round(percentile(add_latencies, 50), 3),
+            'add_p99_ms': round(percentile(add_latencies, 99), 3),
+            'search_p50_ms': round(percentile(search_latencies, 50), 3),
+            'search_p99_ms': round(percentile(search_latencies, 99), 3),
+            'list_p50_ms': round(percentile(list_latencies, 50), 3),
+            'list_p99_ms': round(percentile(list_latencies, 99), 3),
+            'stats_p50_ms': round(percentile(stats_latencies, 50), 3),
+            'stats_p99_ms': round(percentile(stats_latencies, 99), 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1)
+        }
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def _scenario_worker(args):
+    return run_scenario(*args)
+
+
+def run_suite(sizes: List[int], modes: List[str], queries: int, adds: int, seed: int) -> Dict:
+    """Roda cada cenário em um processo novo (RSS e caches isolados)"""
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for size in sizes:
+        for mode in modes:
+            print(f"⏱️  size={size} mode={mode} ...", file=sys.stderr, flush=True)
+            with context.Pool(1) as pool:
+                result = pool.apply(_scenario_worker, ((size, mode, queries, adds, seed),))
+            print(f"   search p50={result['search_p50_ms']}ms p99={result['search_p99_ms']}ms "
+                  f"add={result['add_docs_per_s']}/s rss={result['peak_rss_mb']}MB", file=sys.stderr)
+            results.append(result)
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'sizes': sizes,
+            'modes': modes,
+            'queries': queries,
+            'adds': adds,
+            'seed': seed
+        },
+        'results': results
+    }
+
+
+# ============================================================================
+# BACKUP
+# ============================================================================
+
+def write_cache_files(cache_dir: Path, documents: List[Dict]):
+    """Grava um cache no formato clássico (documents.json + vectors.npy)"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    (cache_dir / 'documents.json').write_text(json.dumps({'documents': documents}))
+    vectors = StubEmbedder().encode([doc['content'] for doc in documents]).astype(np.float32)
+    np.save(cache_dir / 'vectors.npy', vectors)
+
+
+def run_backup_benchmark(docs: int = 10000, workers: Optional[int] = None,
+                         changed: float = 0.01, seed: int = 42) -> Dict:
+    """Compara tar.gz com o chunk store: backup, restore e backup incremental"""
+    from chunk_store import ChunkStore, CODEC_ZSTD, CODEC_ZLIB
+
+    work_dir = Path(tempfile.mkdtemp(prefix='rag-backup-bench-'))
+    try:
+        cache_dir = work_dir / 'cache'
+        documents = generate_corpus(docs, seed)
+        write_cache_files(cache_dir, documents)
+        files = sorted(p for p in cache_dir.iterdir() if p.is_file())
+        logical = sum(p.stat().st_size for p in files)
+
+        # Formato antigo: tar.gz de tudo
+        archive = work_dir / 'backup.tar.gz'
+        def make_tar():
+            with tarfile.open(archive, 'w:gz') as tar:
+                for path in files:
+                    tar.add(path, arcname=path.name)
+        tar_backup_ms = _timed(make_tar)
+        def extract_tar():
+            with tarfile.open(archive, 'r:gz') as tar:
+                tar.extractall(work_dir / 'restored-tar')
+        tar_restore_ms = _timed(extract_tar)
+        tar_size = archive.stat().st_size
+
+        # Chunk store: hash + compressão paralelos, restore com prefetch
+        with ChunkStore(work_dir / 'chunks', workers=workers) as store:
+            entries = {}
+            def store_all():
+                for path in files:
+                    entries[path.name] = store.store_file(path, entries.get(path.name))
+            chunk_backup_ms = _timed(store_all)
+            chunk_size = store.size_bytes()
+            def restore_all():
+                for name, entry in entries.items():
+                    store.restore_file(entry, work_dir / 'restored-chunks' / name)
+            chunk_restore_ms = _timed(restore_all)
+
+            # Incremental: altera uma fração dos documentos e refaz o backup
+            rng = random.Random(seed)
+            for index in rng.sample(range(docs), max(1, int(docs * changed))):
+                documents[index]['content'] += ' revisado'
+            (cache_dir / 'documents.json').write_text(json.dumps({'documents': documents}))
+            before = chunk_size
+            incremental_ms = _timed(store_all)
+            incremental_bytes = store.size_bytes() - before
+            codec = {CODEC_ZSTD: 'zstd', CODEC_ZLIB: 'zlib'}.get(store.codec, 'none')
+            used_workers = store.workers
+
+        mb = 1024 * 1024
+        return {
+            'docs': docs,
+            'logical_mb': round(logical / mb, 2),
+            'tar_gz': {
+                'backup_ms': round(tar_backup_ms, 1),
+                'restore_ms': round(tar_restore_ms, 1),
+                'size_mb': round(tar_size / mb, 2),
+                'ratio': round(logical / tar_size, 2)
+            },
+            'chunked': {
+                'codec': codec,
+                'workers': used_workers,
+                'backup_ms': round(chunk_backup_ms, 1),
+                'restore_ms': round(chunk_restore_ms, 1),
+                'size_mb': round(chunk_size / mb, 2),
+                'ratio': round(logical / chunk_size, 2),
+                'incremental_ms': round(incremental_ms, 1),
+                'incremental_mb': round(incremental_bytes / mb, 3)
+            }
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# ============================================================================
+# CRAWL
+# ============================================================================
+
+class FixtureSiteHandler(BaseHTTPRequestHandler):
+    """Páginas, robots.txt e sitemaps do site local (HTTP/1.1 keep-alive)"""
+
+    protocol_version = 'HTTP/1.1'
+    # Cabeçalho e corpo saem em dois writes: com Nagle, cada resposta esperaria o ACK atrasado
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        site = self.server
+        path = self.path.split('?', 1)[0]
+        with site.lock:
+            site.hits[path] = site.hits.get(path, 0) + 1
+        content = site.files.get(path)
+        if content is None:
+            body, content_type, headers = b'not found', 'text/plain', {}
+        else:
+            body, content_type = content
+            etag = '"%s"' % hashlib.md5(body).hexdigest()[:16]
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            headers = {'ETag': etag}
+            if path.endswith('.html') and site.latency:
+                time.sleep(site.latency)
+        self.send_response(200 if content is not None else 404)
+        self.send_header('Content-Type', content_type)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def build_fixture_site(base_url: str, pages: int, per_sitemap: int = 100, seed: int = 42) -> Dict:
+    """
+    caminho -> (corpo, content-type). robots.txt aponta para um sitemap-index
+    com partes de `per_sitemap` URLs (a última em .xml.gz); uma página em
+    cada dez fica sob /private/, bloqueada pelo robots.txt, e cada parte
+    lista também uma URL de outro domínio, que deve ser ignorada.
+    """
+    import gzip
+
+    rng = random.Random(seed)
+    vocabulary = build_vocabulary(rng, 500)
+    files = {}
+    paths = []
+    for i in range(pages):
+        path = f"/private/page-{i}.html" if i % 10 == 9 else f"/docs/page-{i}.html"
+        words = ' '.join(rng.choice(vocabulary) for _ in range(200))
+        html = (f"<html><head><title>Fixture page {i}</title><script>var i = {i};</script></head>"
+                f"<body><nav>home docs blog</nav><h1>Fixture page {i}</h1><p>{words}</p>"
+                f"<footer>copyright</footer></body></html>")
+        files[path] = (html.encode('utf-8'), 'text/html; charset=utf-8')
+        paths.append(path)
+
+    namespace = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+    parts = [paths[i:i + per_sitemap] for i in range(0, len(paths), per_sitemap)]
+    index_entries = []
+    for number, part in enumerate(parts):
+        entries = ''.join(f"<url><loc>{base_url}{path}</loc><lastmod>2025-01-01</lastmod></url>" for path in part)
+        entries += "<url><loc>https://elsewhere.example/page.html</loc></url>"
+        xml = f'<?xml version="1.0" encoding="UTF-8"?><urlset {namespace}>{entries}</urlset>'.encode('utf-8')
+        if number == len(parts) - 1:
+            files[f"/sitemaps/part-{number}.xml.gz"] = (gzip.compress(xml), 'application/x-gzip')
+            index_entries.append(f"{base_url}/sitemaps/part-{number}.xml.gz")
+        else:
+            files[f"/sitemaps/part-{number}.xml"] = (xml, 'application/xml')
+            index_entries.append(f"{base_url}/sitemaps/part-{number}.xml")
+    index = ''.join(f"<sitemap><loc>{loc}</loc></sitemap>" for loc in index_entries)
+    files['/sitemap_index.xml'] = (
+        f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex {namespace}>{index}</sitemapindex>'.encode('utf-8'),
+        'application/xml')
+    files['/robots.txt'] = (
+        f"User-agent: *\nDisallow: /private/\nSitemap: {base_url}/sitemap_index.xml\n".encode('utf-8'),
+        'text/plain')
+    return files
+
+
+@contextmanager
+def fixture_site(pages: int = 200, latency: float = 0.0, per_sitemap: int = 100):
+    """Sobe o site local numa porta livre; produz (base_url, servidor com .hits e .files)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureSiteHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = {}
+    server.latency = latency
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.files = build_fixture_site(base_url, pages, per_sitemap)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield base_url, server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run_crawl_benchmark(pages: int = 200, latency: float = 0.02, concurrency: int = 16,
+                        per_host: int = 8, domain_delay: float = 0.0) -> Dict:
+    """Crawl serial (uma conexão por URL) x fronteira assíncrona sobre o mesmo site local"""
+    import asyncio
+    import urllib.request
+    from crawl_frontier import CrawlFrontier, iter_sitemap
+    from web_fetch import AsyncFetcher, extract_page
+
+    with fixture_site(pages, latency) as (base_url, server):
+        # Serial: urllib bloqueante, sitemap a sitemap e página a página (sem robots.txt)
+        def crawl_serial():
+            queue, urls = [f"{base_url}/sitemap_index.xml"], []
+            while queue:
+                with urllib.request.urlopen(queue.pop(0)) as response:
+                    for kind, loc, _ in iter_sitemap(response.read()):
+                        if kind == 'sitemap':
+                            queue.append(loc)
+                        elif loc.startswith(base_url):
+                            urls.append(loc)
+            for url in urls:
+                with urllib.request.urlopen(url) as response:
+                    extract_page(response.read(), response.headers.get('Content-Type', ''))
+            return len(urls)
+
+        start = time.perf_counter()
+        serial_pages = crawl_serial()
+        serial_s = time.perf_counter() - start
+
+        async def crawl_frontier():
+            async with AsyncFetcher(concurrency=concurrency, per_host=per_host) as fetcher:
+                frontier = CrawlFrontier(fetcher, domain_delay=domain_delay, max_pages=pages * 2)
+                urls = await frontier.discover(base_url)
+                results = await frontier.fetch_all(urls)
+                for result in results:
+                    if result is not None and result.ok:
+                        extract_page(result.body, result.headers.get('content-type', ''))
+                return frontier.stats, dict(fetcher.stats)
+
+        start = time.perf_counter()
+        crawl_stats, http_stats = asyncio.run(crawl_frontier())
+        frontier_s = time.perf_counter() - start
+
+    return {
+        'pages': pages,
+        'latency_ms': round(latency * 1000, 1),
+        'serial': {
+            'pages': serial_pages,
+            'seconds': round(serial_s, 3),
+            'pages_per_s': round(serial_pages / serial_s, 1)
+        },
+        'frontier': {
+            'pages': crawl_stats['fetched'] - crawl_stats['sitemaps'],
+            'seconds': round(frontier_s, 3),
+            'pages_per_s': round((crawl_stats['fetched'] - crawl_stats['sitemaps']) / frontier_s, 1),
+            'speedup': round(serial_s / frontier_s, 2),
+            'domain_delay': domain_delay,
+            'crawl': crawl_stats,
+            'http': http_stats
+        }
+    }
+
+
+# ============================================================================
+# COMPARAÇÃO
+# ============================================================================
+
+def compare_runs(baseline: Dict, current: Dict, threshold: float = 0.10) -> List[Dict]:
+    """Lista métricas que pioraram mais que `threshold` (fração) entre execuções"""
+    previous = {(r['size'], r['mode']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in current.get('results', []):
+        before = previous.get((result['size'], result['mode']))
+        if before is None:
+            continue
+        for metric in sorted(LOWER_IS_BETTER | HIGHER_IS_BETTER):
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+            if worse:
+                regressions.append({
+                    'size': result['size'],
+                    'mode': result['mode'],
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                    'change_pct': round(change * 100, 1)
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do MCP RAG Server')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Executa o benchmark')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    run_parser.add_argument('--modes', nargs='+', default=DEFAULT_MODES, choices=DEFAULT_MODES)
+    run_parser.add_argument('--queries', type=int, default=200, help='Buscas por cenário')
+    run_parser.add_argument('--adds', type=int, default=100, help='add_document por cenário')
+    run_parser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--output', type=str, help='Arquivo JSON de saída (padrão: stdout)')
+    run_parser.add_argument('--compare', type=str, help='JSON de uma execução anterior para comparar')
+    run_parser.add_argument('--threshold', type=float, default=0.10)
+
+    compare_parser = subparsers.add_parser('compare', help='Compara duas execuções')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10)
+
+    backup_parser = subparsers.add_parser('backup', help='Compara tar.gz com o chunk store')
+    backup_parser.add_argument('--docs', type=int, default=10000)
+    backup_parser.add_argument('--workers', type=int, help='Threads de compressão (padrão: núcleos)')
+    backup_parser.add_argument('--changed', type=float, default=0.01,
+                               help='Fração de documentos alterados no backup incremental')
+    backup_parser.add_argument('--seed', type=int, default=42)
+
+    crawl_parser = subparsers.add_parser('crawl', help='Compara crawl serial com a fronteira assíncrona')
+    crawl_parser.add_argument('--pages', type=int, default=200)
+    crawl_parser.add_argument('--latency', type=float, default=0.02, help='Latência simulada por página (s)')
+    crawl_parser.add_argument('--concurrency', type=int, default=16)
+    crawl_parser.add_argument('--per-host', type=int, default=8)
+    crawl_parser.add_argument('--domain-delay', type=float, default=0.0,
+                              help='Intervalo mínimo entre requisições ao domínio (s)')
+
+    args = parser.parse_args()
+
+    if args.command == 'crawl':
+        print(json.dumps(run_crawl_benchmark(args.pages, args.latency, args.concurrency,
+                                             args.per_host, args.domain_delay), indent=2))
+        return 0
+
+    if args.command == 'backup':
+        print(json.dumps(run_backup_benchmark(args.docs, args.workers, args.changed, args.seed), indent=2))
+        return 0
+
+    if args.command == 'run':
+        report = run_suite(args.sizes, args.modes, args.queries, args.adds, args.seed)
+        payload = json.dumps(report, indent=2)
+        if args.output:
+            Path(args.output).write_text(payload)
+            print(f"✅ Resultados salvos em {args.output}", file=sys.stderr)
+        else:
+            print(payload)
+        if not args.compare:
+            return 0
+        baseline = json.loads(Path(args.compare).read_text())
+        current = report
+    else:
+        baseline = json.loads(Path(args.baseline).read_text())
+        current = json.loads(Path(args.current).read_text())
+
+    regressions = compare_runs(baseline, current, args.threshold)
+    if not regressions:
+        print(f"✅ Nenhuma regressão acima de {args.threshold:.0%}", file=sys.stderr)
+        return 0
+
+    print(f"❌ {len(regressions)} regressões acima de {args.threshold:.0%}:", file=sys.stderr)
+    for item in regressions:
+        print(f"  size={item['size']} mode={item['mode']} {item['metric']}: "
+              f"{item['baseline']} -> {item['current']} ({item['change_pct']:+}%)", file=sys.stderr)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
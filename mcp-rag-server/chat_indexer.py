@@ -12,30 +12,55 @@ Data: 2025-08-09
 import json
 import sys
 import os
+import time
+import signal
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any
 import hashlib
-import re
 
 # Adicionar o diretório do servidor MCP ao path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from rag_server import RAGServer
 from config import Config
+import chat_parser
+from file_watcher import create_watcher
+
+PROGRESS_INTERVAL = 2.0  # segundos entre linhas de progresso
+IN_FLIGHT_PER_WORKER = 4  # arquivos enviados ao pool por processo auxiliar
+WATCH_POOL_MIN_FILES = 8  # lotes menores do modo watch são extraídos sem pool
+SESSION_SEARCH_FANOUT = 10  # resultados buscados por sessão pedida (turnos se repetem)
+TURNS_PER_SESSION = 3  # snippets de turno por sessão na busca agregada
 
 class ChatIndexer:
     """Indexador de conversas do Claude para o RAG Server"""
     
-    def __init__(self):
+    def __init__(self, read_only: bool = False, project_dirs: Optional[List[Path]] = None):
         self.config = Config()
-        self.server = RAGServer(mode='enhanced')
+        self.server = RAGServer(mode='enhanced', read_only=read_only)
         self.projects_dir = Path.home() / ".claude" / "projects" / "-Users-agents--claude"
+        # Diretórios extras (CLI/RAG_CHAT_PROJECT_DIRS); vazio = só projects_dir
+        self.project_dirs = [Path(d) for d in (project_dirs or self.config.CHAT_PROJECT_DIRS)]
         self.indexed_cache = Path.home() / ".claude" / "mcp-rag-cache" / "indexed_chats.json"
         self.indexed_chats = self.load_indexed_cache()
+        self.last_extract_stats = {}
+        self.last_index_stats = {}
+        
+    def load_indexed_cache(self) -> Dict[str, Any]:
+        """
+        Carrega cache de conversas já indexadas
         
-    def load_indexed_cache(self) -> Dict[str, str]:
-        """Carrega cache de conversas já indexadas"""
+        session_id -> {signature, offset, digest, state}: assinatura
+        tamanho_mtime, até onde o arquivo foi lido e os agregados da sessão
+        até ali (caches antigos guardam só a assinatura e são relidos
+        inteiros uma vez).
+        """
         if self.indexed_cache.exists():
             try:
                 with open(self.indexed_cache, 'r') as f:
@@ -51,132 +76,49 @@ class ChatIndexer:
             json.dump(self.indexed_chats, f, indent=2)
     
     def extract_chat_info(self, jsonl_path: Path) -> Optional[Dict]:
-        """Extrai informações relevantes de um arquivo JSONL de conversa"""
+        """
+        Extrai informações relevantes de um arquivo JSONL de conversa
         
+        Leitura em streaming (memória constante, payloads grandes de
+        ferramentas não são decodificados); as estatísticas da leitura
+        ficam em self.last_extract_stats.
+        """
         try:
-            with open(jsonl_path, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            if not lines:
-                return None
-            
-            # Parsing das linhas JSONL
-            messages = []
-            for line in lines:
-                try:
-                    msg = json.loads(line.strip())
-                    messages.append(msg)
-                except:
-                    continue
-            
-            if not messages:
-                return None
-            
-            # Extrair informações
-            session_id = messages[0].get('sessionId', '')
-            first_msg = None
-            last_msg = None
-            tools_used = set()
-            files_modified = set()
-            topics = []
-            
-            for msg in messages:
-                # Primeira mensagem do usuário
-                if not first_msg and msg.get('type') == 'user':
-                    user_content = msg.get('message', {}).get('content')
-                    if isinstance(user_content, str):
-                        first_msg = user_content[:200]
-                    elif isinstance(user_content, list) and user_content:
-                        first_msg = str(user_content[0].get('content', ''))[:200]
-                
-                # Última mensagem com timestamp
-                if msg.get('timestamp'):
-                    last_msg = msg
-                
-                # Ferramentas usadas
-                if msg.get('type') == 'assistant':
-                    content = msg.get('message', {}).get('content', [])
-                    if isinstance(content, list):
-                        for item in content:
-                            if isinstance(item, dict) and item.get('type') == 'tool_use':
-                                tools_used.add(item.get('name', 'unknown'))
-                
-                # Arquivos mencionados
-                if 'toolUseResult' in msg:
-                    result = str(msg['toolUseResult'])
-                    # Extrair caminhos de arquivo
-                    paths = re.findall(r'/Users/[^\s\"\']+', result)
-                    files_modified.update(paths[:10])  # Limitar a 10 arquivos
-            
-            # Determinar título e resumo
-            title = first_msg[:100] if first_msg else f"Conversa {session_id[:8]}"
-            
-            # Criar resumo consolidado
-            summary_parts = []
-            if first_msg:
-                summary_parts.append(f"Início: {first_msg}")
-            if tools_used:
-                summary_parts.append(f"Ferramentas: {', '.join(list(tools_used)[:5])}")
-            if files_modified:
-                summary_parts.append(f"Arquivos: {len(files_modified)} modificados")
-            
-            content = '\n'.join(summary_parts)
-            
-            # Timestamps
-            timestamp_start = messages[0].get('timestamp', '')
-            timestamp_end = last_msg.get('timestamp', '') if last_msg else timestamp_start
-            
-            # Tags baseadas no conteúdo
-            tags = ['chat', session_id[:8]]
-            tags.extend(list(tools_used)[:5])
-            
-            # Detectar temas comuns
-            content_lower = content.lower()
-            if 'rag' in content_lower or 'mcp' in content_lower:
-                tags.append('rag')
-            if 'todo' in content_lower:
-                tags.append('todos')
-            if 'git' in content_lower:
-                tags.append('git')
-            if 'docker' in content_lower:
-                tags.append('docker')
-            if 'test' in content_lower:
-                tags.append('testing')
-            
-            return {
-                'title': f"Chat: {title}",
-                'content': content,
-                'type': 'chat',
-                'source': f'chat-{session_id}',
-                'category': 'chat-history',
-                'tags': tags,
-                'metadata': {
-                    'session_id': session_id,
-                    'timestamp_start': timestamp_start,
-                    'timestamp_end': timestamp_end,
-                    'tools_used': list(tools_used),
-                    'files_modified': list(files_modified)[:10],
-                    'message_count': len(messages),
-                    'file_path': str(jsonl_path)
-                }
-            }
-            
+            chat_info, self.last_extract_stats = chat_parser.extract_chat_info(jsonl_path)
+            return chat_info
         except Exception as e:
             print(f"Erro ao processar {jsonl_path}: {e}")
             return None
     
+    def chat_dirs(self) -> List[Path]:
+        """Diretórios de projeto com conversas"""
+        return self.project_dirs or [self.projects_dir]
+    
+    def list_chat_files(self) -> List[Path]:
+        """Arquivos JSONL de todos os diretórios de projeto"""
+        return sorted(path for directory in self.chat_dirs() for path in directory.glob("*.jsonl"))
+    
     def should_index(self, jsonl_path: Path) -> bool:
         """Verifica se o arquivo deve ser indexado"""
         # Calcular hash do arquivo
-        file_stat = jsonl_path.stat()
-        file_hash = f"{file_stat.st_size}_{file_stat.st_mtime}"
+        file_hash = chat_parser.file_signature(jsonl_path)
         
         session_id = jsonl_path.stem
-        cached_hash = self.indexed_chats.get(session_id)
+        cached = self.indexed_chats.get(session_id)
+        cached_hash = cached.get('signature') if isinstance(cached, dict) else cached
         
         # Indexar se novo ou modificado
         return cached_hash != file_hash
     
+    def _remember(self, result: Dict):
+        """Guarda assinatura, offset e agregados de uma sessão extraída"""
+        self.indexed_chats[result['session_id']] = {
+            'signature': result['signature'],
+            'offset': result['offset'],
+            'digest': result['digest'],
+            'state': result['state']
+        }
+    
     def index_chat(self, jsonl_path: Path) -> bool:
         """Indexa uma conversa no RAG Server"""
         
@@ -186,80 +128,325 @@ class ChatIndexer:
         
         print(f"Indexando {jsonl_path.name}...")
         
-        # Extrair informações
-        chat_info = self.extract_chat_info(jsonl_path)
-        if not chat_info:
+        # Extrair informações (só o trecho novo se a sessão já foi lida)
+        result = chat_parser.extract_for_index(jsonl_path, self.indexed_chats.get(jsonl_path.stem))
+        if result['error']:
+            print(f"Erro ao processar {jsonl_path}: {result['error']}")
+            return False
+        if not result['doc']:
             print(f"  Sem conteúdo relevante")
             return False
+        stats = self.last_extract_stats = result['stats']
+        resumed = f", retomado do byte {stats['start_offset']}" if result['incremental'] else ''
+        print(f"  {stats['bytes'] / 1024 / 1024:.1f}MB lidos em {stats['seconds']:.2f}s "
+              f"({stats['mb_per_s']}MB/s, {stats['skipped_payloads']} payloads pulados{resumed})")
         
-        # Remover documento antigo se existir
-        session_id = jsonl_path.stem
-        old_docs = [d for d in self.server.documents 
-                   if d.get('source') == f'chat-{session_id}']
-        for doc in old_docs:
-            self.server.remove_document(doc['id'])
-        
-        # Adicionar novo documento
-        try:
-            result = self.server.add_document(chat_info)
-            print(f"  ✓ Indexado: {chat_info['title'][:50]}")
-            
-            # Atualizar cache
-            file_stat = jsonl_path.stat()
-            self.indexed_chats[session_id] = f"{file_stat.st_size}_{file_stat.st_mtime}"
-            
-            return True
-        except Exception as e:
-            print(f"  ✗ Erro: {e}")
+        if not self._write_batch([result]):
+            print(f"  ✗ Erro: {self.last_index_stats['errors'][result['path']]}")
             return False
+        print(f"  ✓ Indexado: {result['doc']['title'][:50]}")
+        return True
     
-    def index_all_chats(self):
-        """Indexa todas as conversas disponíveis"""
-        
-        print(f"Indexando conversas de {self.projects_dir}")
+    def index_all_chats(self, workers: Optional[int] = None, batch_size: Optional[int] = None):
+        """Indexa todas as conversas disponíveis (só novas ou modificadas)"""
+        print(f"Indexando conversas de {', '.join(str(d) for d in self.chat_dirs())}")
         
-        # Carregar documentos existentes
+        # Carregar documentos existentes (outro writer pode ter mudado o store:
+        # os índices id -> posição usados nas gravações são refeitos junto)
         self.server.load_documents()
+        self.server.build_indices()
         print(f"Documentos no cache: {len(self.server.documents)}")
         
-        # Listar arquivos JSONL
-        jsonl_files = list(self.projects_dir.glob("*.jsonl"))
-        print(f"Conversas encontradas: {len(jsonl_files)}")
+        # Listar arquivos JSONL (só novos ou modificados vão para o pool)
+        jsonl_files = self.list_chat_files()
+        pending = [path for path in jsonl_files if self.should_index(path)]
+        print(f"Conversas encontradas: {len(jsonl_files)} ({len(pending)} novas ou modificadas)")
         
-        # Indexar cada conversa
-        indexed_count = 0
-        for jsonl_path in jsonl_files:
-            if self.index_chat(jsonl_path):
-                indexed_count += 1
+        stats = self.index_paths(pending, workers, batch_size)
+        if pending:
+            self._report_progress(stats, stats['seconds'])
         
-        # Salvar alterações
-        if indexed_count > 0:
-            self.server.save_documents()
-            self.save_indexed_cache()
-            print(f"\n✅ {indexed_count} conversas indexadas/atualizadas")
+        if stats['indexed'] > 0:
+            print(f"\n✅ {stats['indexed']} conversas indexadas/atualizadas em {stats['batches']} lotes "
+                  f"({stats['incremental']} só com o trecho novo)")
         else:
             print(f"\n✅ Todas as conversas já estavam atualizadas")
+        if stats['errors']:
+            print(f"⚠️  {len(stats['errors'])} conversas com erro:")
+            for path, error in stats['errors'].items():
+                print(f"   {Path(path).name}: {error}")
         
         # Estatísticas
-        chat_docs = [d for d in self.server.documents 
-                    if d.get('type') == 'chat']
+        chat_docs = self.server.categories_index.get('chat-history', ())
         print(f"Total de conversas no cache: {len(chat_docs)}")
         print(f"Total de documentos: {len(self.server.documents)}")
+        return stats
     
-    def search_chats(self, query: str, limit: int = 5):
-        """Busca nas conversas indexadas"""
+    def index_paths(self, paths: List[Path], workers: Optional[int] = None,
+                    batch_size: Optional[int] = None, report: bool = True) -> Dict:
+        """
+        Extrai e grava as sessões indicadas (sem recarregar o servidor)
         
-        self.server.load_documents()
-        results = self.server.search(query, limit=limit)
+        Processos auxiliares extraem as sessões em paralelo e este processo,
+        único writer, aplica os resultados no RAGServer em lotes (um encode,
+        uma gravação e uma reconstrução de índices por lote). Um arquivo que
+        falha vira erro no resumo final sem interromper os demais; o cache
+        só avança depois que o lote foi gravado.
+        """
+        workers = workers or self.config.CHAT_INDEX_WORKERS or os.cpu_count() or 1
+        batch_size = max(1, batch_size or self.config.CHAT_INDEX_BATCH_SIZE)
+        
+        stats = {'files': len(paths), 'done': 0, 'indexed': 0, 'empty': 0, 'incremental': 0,
+                 'bytes': 0, 'batches': 0, 'errors': {}, 'workers': workers, 'seconds': 0.0}
+        self.last_index_stats = stats
+        start = time.monotonic()
+        last_report = start
+        batch = []
+        
+        for result in self._extract_all(paths, workers):
+            stats['done'] += 1
+            if result['error']:
+                stats['errors'][result['path']] = result['error']
+            elif result['doc'] is None:
+                # Sem conteúdo relevante: não relê até o arquivo mudar
+                stats['empty'] += 1
+                self._remember(result)
+            else:
+                stats['bytes'] += result['stats']['bytes']
+                stats['incremental'] += result['incremental']
+                batch.append(result)
+                if len(batch) >= batch_size:
+                    stats['indexed'] += self._write_batch(batch)
+                    stats['batches'] += 1
+                    batch = []
+            
+            now = time.monotonic()
+            if report and now - last_report >= PROGRESS_INTERVAL:
+                self._report_progress(stats, now - start)
+                last_report = now
+        
+        if batch:
+            stats['indexed'] += self._write_batch(batch)
+            stats['batches'] += 1
+        if stats['empty']:
+            self.save_indexed_cache()
+        stats['seconds'] = round(time.monotonic() - start, 3)
+        return stats
+    
+    def watch(self, debounce: Optional[float] = None, max_delay: Optional[float] = None,
+              workers: Optional[int] = None, batch_size: Optional[int] = None,
+              stop: Optional[threading.Event] = None):
+        """
+        Modo daemon: observa os diretórios de projeto e indexa o que mudar
+        
+        Eventos são acumulados até `debounce` segundos sem novas escritas
+        (ou `max_delay` desde o primeiro evento pendente, para sessões que
+        não param de crescer) e então indexados incrementalmente em um lote.
+        O servidor e o modelo ficam carregados entre os lotes; a primeira
+        passada reindexa o que mudou enquanto o daemon estava parado.
+        """
+        debounce = self.config.CHAT_WATCH_DEBOUNCE if debounce is None else debounce
+        max_delay = self.config.CHAT_WATCH_MAX_DELAY if max_delay is None else max_delay
+        stop = stop or threading.Event()
+        
+        watcher = create_watcher(self.chat_dirs(), '.jsonl', self.config.CHAT_WATCH_POLL_INTERVAL)
+        print(f"Observando {', '.join(str(d) for d in self.chat_dirs())} ({watcher.backend})")
+        try:
+            self.index_all_chats(workers, batch_size)
+            pending: Dict[Path, None] = {}
+            first_event = last_event = 0.0
+            while not stop.is_set():
+                timeout = debounce if pending else 1.0
+                changed = watcher.poll(timeout)
+                now = time.monotonic()
+                if changed:
+                    if not pending:
+                        first_event = now
+                    last_event = now
+                    pending.update(dict.fromkeys(changed))
+                    if now - first_event < max_delay:
+                        continue
+                if not pending or (now - last_event < debounce and now - first_event < max_delay):
+                    continue
+                
+                paths = [path for path in pending if path.exists() and self.should_index(path)]
+                pending = {}
+                if not paths:
+                    continue
+                # Poucos arquivos com trechos novos: extrair aqui mesmo sai mais barato que subir o pool
+                pool_workers = workers if len(paths) >= WATCH_POOL_MIN_FILES else 1
+                stats = self.index_paths(paths, pool_workers, batch_size, report=False)
+                lag = time.monotonic() - first_event
+                print(f"[{datetime.now():%H:%M:%S}] {stats['indexed']} conversas atualizadas "
+                      f"({stats['bytes'] / 1024:.0f}KB, {lag:.1f}s após a escrita)"
+                      + (f", {len(stats['errors'])} erros" if stats['errors'] else ''))
+                for path, error in stats['errors'].items():
+                    print(f"   {Path(path).name}: {error}")
+        finally:
+            watcher.close()
+    
+    def _extract_all(self, paths: List[Path], workers: int) -> Iterator[Dict]:
+        """
+        Resultados de chat_parser.extract_for_index (retomando do estado
+        salvo de cada sessão) na ordem em que ficam
+        prontos. O pool usa spawn (os auxiliares importam só o chat_parser,
+        sem modelo nem store herdados do writer) e recebe no máximo
+        IN_FLIGHT_PER_WORKER arquivos por processo. Se um auxiliar morre,
+        os arquivos em voo viram erro e o restante segue num pool novo.
+        """
+        if workers <= 1 or len(paths) <= 1:
+            for path in paths:
+                yield chat_parser.extract_for_index(path, self.indexed_chats.get(path.stem))
+            return
+        
+        queue = deque(paths)
+        context = multiprocessing.get_context('spawn')
+        while queue:
+            in_flight = {}
+            with ProcessPoolExecutor(min(workers, len(queue)), mp_context=context) as pool:
+                try:
+                    while queue or in_flight:
+                        while queue and len(in_flight) < workers * IN_FLIGHT_PER_WORKER:
+                            path = queue.popleft()
+                            future = pool.submit(chat_parser.extract_for_index, path,
+                                                 self.indexed_chats.get(path.stem))
+                            in_flight[future] = path
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            result = future.result()
+                            del in_flight[future]
+                            yield result
+                except BrokenProcessPool as e:
+                    for path in in_flight.values():
+                        yield {'path': str(path), 'session_id': Path(path).stem, 'signature': None,
+                               'doc': None, 'stats': None, 'error': f"processo auxiliar encerrado: {e}"}
+    
+    def _write_batch(self, batch: List[Dict]) -> int:
+        """
+        Aplica um lote de sessões extraídas: documentos de sessão e de turno
+        que já existem (mesma source) são atualizados no lugar, os novos são
+        adicionados, tudo com um encode por chamada. Retomadas sem linhas
+        novas só atualizam o cache.
+        """
+        updates = {}
+        new_docs = []
+        stale = []
+        for result in batch:
+            if result['incremental'] and not result['stats']['lines']:
+                continue
+            for doc in [result['doc']] + result['turn_docs']:
+                existing = self.server.sources_index.get(doc['source'])
+                if existing:
+                    for doc_id in existing:
+                        updates[doc_id] = doc
+                else:
+                    new_docs.append(doc)
+            if not result['incremental']:
+                stale.extend(self._stale_turns(result))
+        try:
+            if stale:
+                self.server.remove_documents(stale)
+            if updates:
+                self.server.update_documents(updates)
+            if new_docs:
+                # Turnos curtos iguais ("ok", "continue") são de sessões diferentes: sem dedup
+                self.server.add_documents(new_docs, deduplicate=False)
+            if not self.config.AUTO_SAVE:
+                self.server.save_documents()
+        except Exception as e:
+            for result in batch:
+                self.last_index_stats.setdefault('errors', {})[result['path']] = str(e)
+            print(f"  ✗ Erro ao gravar lote de {len(batch)} conversas: {e}")
+            return 0
+        for result in batch:
+            self._remember(result)
+        self.save_indexed_cache()
+        return len(batch)
+    
+    def _stale_turns(self, result: Dict) -> List[str]:
+        """
+        Turnos de uma versão anterior da sessão que a releitura completa não
+        produziu mais. Vêm do índice de sources (não do cache, que --reindex
+        limpa): chat-<sessão>#n a partir do novo número de turnos, em sequência.
+        """
+        session_id = result['doc']['metadata']['session_id']
+        stale = []
+        turn = result['state']['turn_count']
+        while True:
+            doc_ids = self.server.sources_index.get(f'chat-{session_id}#{turn}')
+            if not doc_ids:
+                return stale
+            stale.extend(doc_ids)
+            turn += 1
+    
+    @staticmethod
+    def _report_progress(stats: Dict, elapsed: float):
+        rate = stats['done'] / elapsed if elapsed > 0 else 0.0
+        mb_rate = stats['bytes'] / 1024 / 1024 / elapsed if elapsed > 0 else 0.0
+        print(f"  [{stats['done']}/{stats['files']}] {rate:.1f} arquivos/s, {mb_rate:.1f}MB/s, "
+              f"{stats['indexed']} gravadas, {len(stats['errors'])} erros")
+    
+    def search_sessions(self, query: str, limit: int = 5,
+                        turns_per_session: int = TURNS_PER_SESSION) -> List[Dict]:
+        """
+        Busca nas conversas agregando por sessão
+        
+        Resumos e turnos competem na mesma busca; cada sessão fica com a
+        melhor nota entre seus documentos e os turnos mais relevantes viram
+        snippets (janela do turno com mais termos da query).
+        """
+        self.server.refresh(force=True)
+        results = self.server.search(query, limit=limit * SESSION_SEARCH_FANOUT)
         
-        print(f"\nBusca por '{query}': {len(results)} resultados")
+        sessions: Dict[str, Dict] = {}
         for r in results:
+            if r.get('type') not in ('chat', 'chat-turn'):
+                continue
+            metadata = r.get('metadata', {})
+            parent = metadata.get('parent_source') or r.get('source')
+            session = sessions.get(parent)
+            if session is None:
+                # Resultados vêm por nota decrescente: o primeiro define a nota da sessão
+                session = sessions[parent] = {
+                    'session_id': metadata.get('session_id', ''),
+                    'source': parent,
+                    'title': r.get('title', '') if r.get('type') == 'chat' else None,
+                    'score': r.get('score', 0),
+                    'turns': []
+                }
             if r.get('type') == 'chat':
-                metadata = r.get('metadata', {})
-                print(f"\n📝 {r.get('title', 'Sem título')}")
-                print(f"   Session: {metadata.get('session_id', 'unknown')[:8]}")
-                print(f"   Tools: {', '.join(metadata.get('tools_used', [])[:3])}")
-                print(f"   Score: {r.get('score', 0):.2f}")
+                session['title'] = r.get('title', '')
+            elif len(session['turns']) < turns_per_session:
+                shaped = self.server.shape_result(r, query, 'snippet')
+                session['turns'].append({
+                    'turn': metadata.get('turn'),
+                    'score': r.get('score', 0),
+                    'timestamp': metadata.get('timestamp_start'),
+                    'snippet': shaped['snippet'],
+                    'highlights': shaped['highlights']
+                })
+        
+        ranked = sorted(sessions.values(), key=lambda session: session['score'], reverse=True)[:limit]
+        for session in ranked:
+            if session['title'] is None:
+                # Sessão achada só pelos turnos: título vem do resumo
+                parent_ids = self.server.sources_index.get(session['source'], ())
+                parent = self.server.get_document(next(iter(parent_ids))) if parent_ids else None
+                session['title'] = parent.get('title', '') if parent else f"Chat {session['session_id'][:8]}"
+        return ranked
+    
+    def search_chats(self, query: str, limit: int = 5):
+        """Busca nas conversas indexadas"""
+        sessions = self.search_sessions(query, limit=limit)
+        
+        print(f"\nBusca por '{query}': {len(sessions)} conversas")
+        for session in sessions:
+            print(f"\n📝 {session['title']}")
+            print(f"   Session: {session['session_id'][:8]}")
+            print(f"   Score: {session['score']:.2f}")
+            for turn in session['turns']:
+                snippet = ' '.join(turn['snippet'].split())
+                print(f"   #{turn['turn']} ({turn['score']:.2f}): {snippet[:200]}")
 
 
 def main():
@@ -270,20 +457,36 @@ def main():
     parser.add_argument('--search', type=str, help='Buscar nas conversas')
     parser.add_argument('--limit', type=int, default=5, help='Limite de resultados')
     parser.add_argument('--reindex', action='store_true', help='Reindexar todas as conversas')
+    parser.add_argument('--workers', type=int, help='Processos de extração (padrão: um por CPU)')
+    parser.add_argument('--batch-size', type=int, help='Conversas gravadas por lote')
+    parser.add_argument('--projects-dir', action='append', type=Path,
+                        help='Diretório de conversas (repetível; padrão: RAG_CHAT_PROJECT_DIRS)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Continuar rodando e indexar conversas conforme são escritas')
+    parser.add_argument('--debounce', type=float, help='Segundos sem escrita antes de indexar (modo watch)')
     
     args = parser.parse_args()
     
-    indexer = ChatIndexer()
+    # Buscas usam uma réplica somente leitura (não disputam o lock do writer)
+    indexer = ChatIndexer(read_only=bool(args.search), project_dirs=args.projects_dir)
     
     if args.search:
         indexer.search_chats(args.search, args.limit)
     elif args.reindex:
         # Limpar cache para forçar reindexação
         indexer.indexed_chats = {}
-        indexer.index_all_chats()
+        indexer.index_all_chats(args.workers, args.batch_size)
+    elif args.watch:
+        # Daemon: SIGINT/SIGTERM terminam o lote atual e saem
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        indexer.watch(debounce=args.debounce, workers=args.workers,
+                      batch_size=args.batch_size, stop=stop)
+        indexer.server.close()
     else:
         # Indexação padrão (apenas novos/modificados)
-        indexer.index_all_chats()
+        indexer.index_all_chats(args.workers, args.batch_size)
 
 
 if __name__ == "__main__":
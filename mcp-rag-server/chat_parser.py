@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Parser em streaming das conversas JSONL do Claude
+==================================================
+Lê a sessão linha a linha (memória limitada ao tamanho de uma linha) e
+acumula só os agregados usados pelo ChatIndexer: primeira mensagem do
+usuário, timestamps, ferramentas, arquivos citados e contagem.
+
+Linhas grandes quase sempre carregam a saída de uma ferramenta em
+`toolUseResult` (às vezes dezenas de MB), gravado depois dos campos da
+mensagem. Nelas só o prefixo antes dessa chave é decodificado; o payload
+é apenas varrido por regex atrás dos primeiros caminhos de arquivo. Se o
+prefixo não basta (chave aninhada, campos depois dela), a linha volta ao
+json.loads normal. O payload nunca passa por str()/repr, que custava mais
+que o próprio parse.
+
+Sessões só crescem por append: os agregados viram um estado serializável
+(to_state/from_state) e a leitura pode continuar de um offset salvo, o
+que torna reindexar uma sessão ativa proporcional às linhas novas. Um
+digest dos bytes logo antes do offset confirma que o arquivo ainda é o
+mesmo prefixo; se não for, a sessão é relida do início.
+
+Além do resumo, a sessão é cortada em turnos (uma mensagem de texto do
+usuário e tudo que o assistente respondeu até a próxima), cada um com o
+próprio documento ligado à sessão. O turno ainda aberto faz parte do
+estado, então uma retomada continua o mesmo turno.
+
+Sem dependência do rag_server, para poder rodar em processos auxiliares.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+LARGE_LINE_BYTES = 256 * 1024    # acima disso o payload de ferramenta é pulado
+MAX_FILES_PER_MESSAGE = 10
+MAX_TRACKED_FILES = 1000
+DIGEST_BYTES = 64                # bytes antes do offset conferidos ao retomar
+MAX_TURN_CHARS = 4000            # texto indexado por turno (pergunta + resposta)
+MAX_TURN_USER_CHARS = 1500
+MAX_TURN_TOOLS = 10
+
+FILE_PATH_PATTERN = re.compile(r'/Users/[^\s\"\']+')
+_FILE_PATH_BYTES = re.compile(rb'/Users/[^\s\"\'\\]+')
+_TOOL_RESULT_KEY = b'"toolUseResult"'
+# Campos que precisam estar no prefixo para pular o payload
+_REQUIRED_FIELDS = ('type', 'timestamp')
+
+
+def find_key(line: bytes, key: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (início da chave, início do valor) da primeira ocorrência de `key` como
+    chave de objeto; aspas escapadas (dentro de strings) não contam. Usa
+    bytes.find, bem mais rápido que regex em linhas de vários MB.
+    """
+    pos = line.find(key)
+    while pos >= 0:
+        if pos == 0 or line[pos - 1] != 0x5C:  # barra invertida
+            end = pos + len(key)
+            while end < len(line) and line[end] in b' \t':
+                end += 1
+            if end < len(line) and line[end] == 0x3A:  # dois-pontos
+                return pos, end + 1
+        pos = line.find(key, pos + 1)
+    return None
+
+
+def user_text(msg: Dict) -> str:
+    """Texto digitado numa mensagem do usuário ('' para resultados de ferramenta)"""
+    content = (msg.get('message') or {}).get('content')
+    if isinstance(content, str):
+        return content.strip()
+    if isinstance(content, list):
+        return '\n'.join(item['text'] for item in content
+                         if isinstance(item, dict) and item.get('type') == 'text'
+                         and isinstance(item.get('text'), str)).strip()
+    return ''
+
+
+def find_file_paths(value: Any, limit: int = MAX_FILES_PER_MESSAGE) -> List[str]:
+    """Caminhos de arquivo nas strings de um valor JSON (para nos primeiros `limit`)"""
+    found: List[str] = []
+    stack = [value]
+    while stack and len(found) < limit:
+        item = stack.pop()
+        if isinstance(item, str):
+            for match in FILE_PATH_PATTERN.finditer(item):
+                found.append(match.group())
+                if len(found) >= limit:
+                    break
+        elif isinstance(item, dict):
+            stack.extend(reversed(list(item.values())))
+        elif isinstance(item, list):
+            stack.extend(reversed(item))
+    return found
+
+
+class ChatSummary:
+    """Agregados de uma sessão, atualizados mensagem a mensagem"""
+
+    def __init__(self):
+        self.session_id = ''
+        self.first_msg: Optional[str] = None
+        self.timestamp_start = ''
+        self.timestamp_end = ''
+        self.tools_used: Dict[str, None] = {}    # ordem de aparição
+        self.files_modified: Dict[str, None] = {}
+        self.message_count = 0
+        self.skipped_payloads = 0
+        self.turn_count = 0
+        self.open_turn: Optional[Dict] = None
+        self.closed_turns: List[Dict] = []   # fechados nesta passada (não persistidos)
+
+    # ------------------------------------------------------------------
+    # Entrada
+    # ------------------------------------------------------------------
+
+    def add_line(self, line: bytes, complete: bool = True) -> bool:
+        """
+        Processa uma linha do JSONL; retorna False se ela não virou mensagem
+        (linhas inválidas são ignoradas). Com complete=False (última linha
+        sem quebra, talvez ainda sendo escrita) o atalho do payload não é
+        usado: só um JSON inteiro conta.
+        """
+        if complete and len(line) > LARGE_LINE_BYTES and self._add_skipping_payload(line):
+            return True
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            return False
+        if not isinstance(msg, dict):
+            return False
+        files = find_file_paths(msg['toolUseResult']) if 'toolUseResult' in msg else []
+        self.add_message(msg, files)
+        return True
+
+    def _add_skipping_payload(self, line: bytes) -> bool:
+        """Decodifica só o prefixo antes de toolUseResult; False se não for possível"""
+        found = find_key(line, _TOOL_RESULT_KEY)
+        if found is None:
+            return False
+        key_start, value_start = found
+        head = line[:key_start].rstrip().rstrip(b',') + b'}'
+        try:
+            msg = json.loads(head)
+        except ValueError:
+            # Chave aninhada: o prefixo não fecha um objeto
+            return False
+        if not isinstance(msg, dict) or not all(field in msg for field in _REQUIRED_FIELDS):
+            return False
+
+        files = []
+        for path in _FILE_PATH_BYTES.finditer(line, value_start):
+            files.append(path.group().decode('utf-8', 'replace'))
+            if len(files) >= MAX_FILES_PER_MESSAGE:
+                break
+        self.skipped_payloads += 1
+        self.add_message(msg, files)
+        return True
+
+    def add_message(self, msg: Dict, files=()):
+        """Atualiza os agregados com uma mensagem já decodificada"""
+        if not self.message_count:
+            self.session_id = msg.get('sessionId', '')
+            self.timestamp_start = msg.get('timestamp', '')
+        self.message_count += 1
+
+        # Primeira mensagem do usuário
+        if not self.first_msg and msg.get('type') == 'user':
+            user_content = (msg.get('message') or {}).get('content')
+            if isinstance(user_content, str):
+                self.first_msg = user_content[:200]
+            elif isinstance(user_content, list) and user_content and isinstance(user_content[0], dict):
+                self.first_msg = str(user_content[0].get('content', ''))[:200]
+
+        # Última mensagem com timestamp
+        if msg.get('timestamp'):
+            self.timestamp_end = msg['timestamp']
+
+        # Pergunta do usuário abre um turno
+        timestamp = msg.get('timestamp', '')
+        if msg.get('type') == 'user':
+            text = user_text(msg)
+            if text:
+                self._start_turn(text, timestamp)
+
+        # Ferramentas usadas e resposta do assistente
+        if msg.get('type') == 'assistant':
+            content = (msg.get('message') or {}).get('content', [])
+            if isinstance(content, list):
+                turn = self._current_turn(timestamp)
+                for item in content:
+                    if not isinstance(item, dict):
+                        continue
+                    if item.get('type') == 'tool_use':
+                        name = item.get('name', 'unknown')
+                        self.tools_used.setdefault(name)
+                        if name not in turn['tools'] and len(turn['tools']) < MAX_TURN_TOOLS:
+                            turn['tools'].append(name)
+                    elif item.get('type') == 'text' and isinstance(item.get('text'), str):
+                        self._append_answer(turn, item['text'])
+
+        # Arquivos mencionados (limitados por mensagem e no total)
+        files = list(files)[:MAX_FILES_PER_MESSAGE]
+        for path in files:
+            if len(self.files_modified) >= MAX_TRACKED_FILES:
+                break
+            self.files_modified.setdefault(path)
+
+        if self.open_turn is not None:
+            for path in files:
+                if path not in self.open_turn['files'] and len(self.open_turn['files']) < MAX_FILES_PER_MESSAGE:
+                    self.open_turn['files'].append(path)
+            if timestamp:
+                self.open_turn['timestamp_end'] = timestamp
+
+    # ------------------------------------------------------------------
+    # Turnos
+    # ------------------------------------------------------------------
+
+    def _start_turn(self, text: str, timestamp: str) -> Dict:
+        if self.open_turn is not None:
+            self.closed_turns.append(self.open_turn)
+        self.open_turn = {
+            'turn': self.turn_count,
+            'user': text[:MAX_TURN_USER_CHARS],
+            'assistant': '',
+            'tools': [],
+            'files': [],
+            'timestamp_start': timestamp,
+            'timestamp_end': timestamp
+        }
+        self.turn_count += 1
+        return self.open_turn
+
+    def _current_turn(self, timestamp: str) -> Dict:
+        """Turno aberto (respostas antes de qualquer pergunta abrem um turno sem pergunta)"""
+        return self.open_turn if self.open_turn is not None else self._start_turn('', timestamp)
+
+    @staticmethod
+    def _append_answer(turn: Dict, text: str):
+        room = MAX_TURN_CHARS - len(turn['user']) - len(turn['assistant'])
+        text = text.strip()
+        if room > 1 and text:
+            turn['assistant'] += ('\n' if turn['assistant'] else '') + text[:room - 1]
+
+    # ------------------------------------------------------------------
+    # Estado persistido entre passadas
+    # ------------------------------------------------------------------
+
+    def to_state(self) -> Dict:
+        return {
+            'session_id': self.session_id,
+            'first_msg': self.first_msg,
+            'timestamp_start': self.timestamp_start,
+            'timestamp_end': self.timestamp_end,
+            'tools_used': list(self.tools_used),
+            'files_modified': list(self.files_modified),
+            'message_count': self.message_count,
+            'skipped_payloads': self.skipped_payloads,
+            'turn_count': self.turn_count,
+            'open_turn': self.open_turn
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'ChatSummary':
+        summary = cls()
+        summary.session_id = state.get('session_id', '')
+        summary.first_msg = state.get('first_msg')
+        summary.timestamp_start = state.get('timestamp_start', '')
+        summary.timestamp_end = state.get('timestamp_end', '')
+        summary.tools_used = dict.fromkeys(state.get('tools_used', []))
+        summary.files_modified = dict.fromkeys(state.get('files_modified', []))
+        summary.message_count = state.get('message_count', 0)
+        summary.skipped_payloads = state.get('skipped_payloads', 0)
+        summary.turn_count = state.get('turn_count', 0)
+        summary.open_turn = state.get('open_turn')
+        return summary
+
+    # ------------------------------------------------------------------
+    # Saída
+    # ------------------------------------------------------------------
+
+    def to_document(self, jsonl_path: Path) -> Optional[Dict]:
+        """Documento do RAG com o resumo da sessão (None se não há mensagens)"""
+        if not self.message_count:
+            return None
+
+        session_id = self.session_id
+        first_msg = self.first_msg
+        tools_used = list(self.tools_used)
+        files_modified = list(self.files_modified)
+
+        # Determinar título e resumo
+        title = first_msg[:100] if first_msg else f"Conversa {session_id[:8]}"
+
+        summary_parts = []
+        if first_msg:
+            summary_parts.append(f"Início: {first_msg}")
+        if tools_used:
+            summary_parts.append(f"Ferramentas: {', '.join(tools_used[:5])}")
+        if files_modified:
+            summary_parts.append(f"Arquivos: {len(files_modified)} modificados")
+        content = '\n'.join(summary_parts)
+
+        # Tags baseadas no conteúdo
+        tags = ['chat', session_id[:8]]
+        tags.extend(tools_used[:5])
+
+        # Detectar temas comuns
+        content_lower = content.lower()
+        if 'rag' in content_lower or 'mcp' in content_lower:
+            tags.append('rag')
+        if 'todo' in content_lower:
+            tags.append('todos')
+        if 'git' in content_lower:
+            tags.append('git')
+        if 'docker' in content_lower:
+            tags.append('docker')
+        if 'test' in content_lower:
+            tags.append('testing')
+
+        return {
+            'title': f"Chat: {title}",
+            'content': content,
+            'type': 'chat',
+            'source': f'chat-{session_id}',
+            'category': 'chat-history',
+            'tags': tags,
+            'metadata': {
+                'session_id': session_id,
+                'timestamp_start': self.timestamp_start,
+                'timestamp_end': self.timestamp_end or self.timestamp_start,
+                'tools_used': tools_used,
+                'files_modified': files_modified[:10],
+                'message_count': self.message_count,
+                'turn_count': self.turn_count,
+                'file_path': str(jsonl_path)
+            }
+        }
+
+    def turn_documents(self, jsonl_path: Path) -> List[Dict]:
+        """
+        Documentos dos turnos fechados nesta passada e do turno aberto
+        (que pode voltar a crescer). A source `chat-<sessão>#<n>` é estável,
+        então reindexar um turno atualiza o mesmo documento.
+        """
+        turns = self.closed_turns + ([self.open_turn] if self.open_turn else [])
+        return [self._turn_document(turn, jsonl_path) for turn in turns
+                if turn['user'] or turn['assistant']]
+
+    def _turn_document(self, turn: Dict, jsonl_path: Path) -> Dict:
+        session_id = self.session_id
+        parts = []
+        if turn['user']:
+            parts.append(f"Usuário: {turn['user']}")
+        if turn['assistant']:
+            parts.append(f"Assistente: {turn['assistant']}")
+        if turn['tools']:
+            parts.append(f"Ferramentas: {', '.join(turn['tools'])}")
+        if turn['files']:
+            parts.append(f"Arquivos: {', '.join(turn['files'])}")
+
+        headline = (turn['user'] or turn['assistant'])[:80].replace('\n', ' ')
+        return {
+            'title': f"Chat {session_id[:8]} #{turn['turn']}: {headline}",
+            'content': '\n\n'.join(parts),
+            'type': 'chat-turn',
+            'source': f"chat-{session_id}#{turn['turn']}",
+            'category': 'chat-turn',
+            'tags': ['chat-turn', session_id[:8]] + turn['tools'][:5],
+            'metadata': {
+                'session_id': session_id,
+                'parent_source': f'chat-{session_id}',
+                'turn': turn['turn'],
+                'timestamp_start': turn['timestamp_start'],
+                'timestamp_end': turn['timestamp_end'],
+                'tools_used': turn['tools'],
+                'files_modified': turn['files'],
+                'file_path': str(jsonl_path)
+            }
+        }
+
+
+def tail_digest(f, offset: int) -> str:
+    """Digest dos DIGEST_BYTES bytes que terminam em `offset` (arquivo binário aberto)"""
+    f.seek(max(0, offset - DIGEST_BYTES))
+    return hashlib.sha256(f.read(min(offset, DIGEST_BYTES))).hexdigest()[:16]
+
+
+def read_chat(jsonl_path: Path, summary: ChatSummary, offset: int = 0) -> Dict:
+    """
+    Acumula em `summary` as linhas completas a partir de `offset` e retorna
+    as estatísticas da leitura, com o offset e o digest para retomar depois.
+    Uma última linha sem quebra que ainda não é JSON válido fica para a
+    próxima passada.
+    """
+    size = 0
+    lines = 0
+    start = time.perf_counter()
+    with open(jsonl_path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if line.endswith(b'\n'):
+                summary.add_line(line)
+            elif not summary.add_line(line, complete=False):
+                break
+            size += len(line)
+            lines += 1
+        end = offset + size
+        digest = tail_digest(f, end)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'bytes': size,
+        'seconds': round(elapsed, 4),
+        'mb_per_s': round(size / 1024 / 1024 / elapsed, 1) if elapsed > 0 else 0.0,
+        'lines': lines,
+        'skipped_payloads': summary.skipped_payloads,
+        'start_offset': offset,
+        'offset': end,
+        'digest': digest
+    }
+
+
+def extract_chat_info(jsonl_path: Path) -> Tuple[Optional[Dict], Dict]:
+    """
+    Lê a sessão em uma passada e retorna (documento, estatísticas de
+    leitura: bytes, segundos, MB/s, linhas e payloads pulados)
+    """
+    summary = ChatSummary()
+    stats = read_chat(jsonl_path, summary)
+    return summary.to_document(jsonl_path), stats
+
+
+def resume_point(jsonl_path: Path, entry: Optional[Dict]) -> Tuple[Optional[ChatSummary], int]:
+    """
+    (agregados, offset) salvos numa passada anterior, ou (None, 0) se não há
+    estado ou o arquivo deixou de ser um append do que foi lido (truncado
+    ou reescrito).
+    """
+    if not isinstance(entry, dict) or not entry.get('state') or not entry.get('offset'):
+        return None, 0
+    offset = entry['offset']
+    with open(jsonl_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < offset or tail_digest(f, offset) != entry.get('digest'):
+            return None, 0
+    return ChatSummary.from_state(entry['state']), offset
+
+
+def file_signature(jsonl_path: Path) -> str:
+    """Assinatura tamanho_mtime usada pelo cache de conversas indexadas"""
+    file_stat = Path(jsonl_path).stat()
+    return f"{file_stat.st_size}_{file_stat.st_mtime}"
+
+
+def extract_for_index(jsonl_path: Path, previous: Optional[Dict] = None) -> Dict:
+    """
+    Unidade de trabalho dos processos auxiliares do ChatIndexer: extrai a
+    sessão (só o trecho novo, se `previous` traz um estado ainda válido) e
+    devolve o resultado pronto para o writer, incluindo o estado a
+    persistir. Falhas viram o campo `error` em vez de derrubar o lote. A
+    assinatura é tirada antes da leitura: se o arquivo crescer no meio, a
+    próxima passada lê o resto.
+    """
+    jsonl_path = Path(jsonl_path)
+    result = {'path': str(jsonl_path), 'session_id': jsonl_path.stem,
+              'signature': None, 'doc': None, 'stats': None, 'error': None,
+              'incremental': False, 'offset': 0, 'digest': None, 'state': None, 'turn_docs': []}
+    try:
+        result['signature'] = file_signature(jsonl_path)
+        summary, offset = resume_point(jsonl_path, previous)
+        result['incremental'] = summary is not None
+        summary = summary or ChatSummary()
+        stats = read_chat(jsonl_path, summary, offset)
+        result.update(doc=summary.to_document(jsonl_path), turn_docs=summary.turn_documents(jsonl_path),
+                      stats=stats, offset=stats['offset'], digest=stats['digest'], state=summary.to_state())
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Chunks endereçados por conteúdo para backups incrementais
+==========================================================
+Arquivos são cortados em chunks de tamanho variável por um hash rolante
+(janela de WINDOW bytes, vetorizado com numpy): o corte depende só do
+conteúdo ao redor, então inserir ou anexar bytes muda apenas os chunks
+vizinhos. Cada chunk é
+guardado uma vez, pelo sha256 do conteúdo, e um backup é só o manifest
+com a lista de chunks de cada arquivo.
+
+Formato do chunk em disco: 1 byte de codec + payload (N = cru, Z = zlib,
+S = zstd). Hash e compressão dos chunks rodam em um pool de threads (zlib,
+zstd e sha256 liberam o GIL) com leitura antecipada limitada, então o
+arquivo é processado em streaming sem ficar preso a um núcleo.
+"""
+
+import os
+import zlib
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+WINDOW = 48
+CHUNK_MIN = 64 * 1024
+CHUNK_MAX = 1024 * 1024
+CHUNK_AVG_BITS = 18          # ~256KB entre o mínimo e o corte
+READ_BLOCK = 8 * 1024 * 1024
+
+CODEC_RAW = b'N'
+CODEC_ZLIB = b'Z'
+CODEC_ZSTD = b'S'
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+# Tabela fixa byte -> valor pseudoaleatório (a mesma em todo processo)
+_GEAR = np.random.RandomState(0x5EED).randint(0, 2 ** 32, size=256, dtype=np.uint64)
+
+
+def cut_candidates(buffer: bytes) -> np.ndarray:
+    """
+    Posições (último byte da janela) onde o hash rolante marca um corte.
+
+    O hash é a soma dos valores da tabela _GEAR dos bytes da janela,
+    obtida por diferença de somas acumuladas (módulo 2^64), espalhada por
+    multiplicação de Fibonacci; corta quando os bits altos zeram.
+    """
+    n = len(buffer)
+    if n < WINDOW:
+        return np.zeros(0, dtype=np.int64)
+
+    sums = np.zeros(n + 1, dtype=np.uint64)
+    np.cumsum(_GEAR[np.frombuffer(buffer, dtype=np.uint8)], out=sums[1:])
+    window = sums[WINDOW:] - sums[:-WINDOW]
+    window *= _GOLDEN
+    window >>= np.uint64(64 - CHUNK_AVG_BITS)
+    return np.flatnonzero(window == 0) + (WINDOW - 1)
+
+
+def chunk_cuts(buffer: bytes, final: bool) -> List[int]:
+    """
+    Offsets de fim dos chunks completos do buffer (respeitando mínimo e
+    máximo). Sem `final`, o resto após o último corte fica para o próximo
+    bloco, então os cortes não dependem de como o arquivo foi lido.
+    """
+    n = len(buffer)
+    candidates = cut_candidates(buffer)
+    cuts = []
+    pos = 0
+    while pos < n:
+        limit = pos + CHUNK_MAX
+        k = np.searchsorted(candidates, pos + CHUNK_MIN - 1)
+        if k < len(candidates) and candidates[k] + 1 <= limit:
+            cut = int(candidates[k]) + 1
+        elif limit <= n:
+            cut = limit
+        elif final:
+            cut = n
+        else:
+            break
+        cuts.append(cut)
+        pos = cut
+    return cuts
+
+
+def iter_chunks(fileobj, block_size: int = READ_BLOCK) -> Iterator[bytes]:
+    """Lê o arquivo em blocos e devolve os chunks sem carregá-lo inteiro"""
+    pending = b''
+    while True:
+        block = fileobj.read(block_size)
+        final = not block
+        buffer = pending + block
+        if not buffer:
+            return
+        pos = 0
+        for cut in chunk_cuts(buffer, final):
+            yield buffer[pos:cut]
+            pos = cut
+        pending = buffer[pos:]
+        if final:
+            return
+
+
+class ChunkStore:
+    """Diretório de chunks deduplicados: root/ab/abcdef..."""
+
+    def __init__(self, root: Path, compression: bool = True, workers: Optional[int] = None):
+        self.root = Path(root)
+        self.compression = compression
+        self.codec = (CODEC_ZSTD if HAS_ZSTD else CODEC_ZLIB) if compression else CODEC_RAW
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._pool = None
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _map_ordered(self, fn, items: Iterable) -> Iterator:
+        """map em paralelo preservando a ordem, com no máximo 2x workers em voo"""
+        if self.workers == 1:
+            for item in items:
+                yield fn(item)
+            return
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='chunk-store')
+        in_flight = deque()
+        for item in items:
+            in_flight.append(self._pool.submit(fn, item))
+            if len(in_flight) >= self.workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+    def path_for(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def has(self, digest: str) -> bool:
+        return self.path_for(digest).exists()
+
+    def encode(self, data: bytes) -> bytes:
+        if self.codec == CODEC_ZSTD:
+            # Compressores zstd não são thread-safe: um por thread do pool
+            compressor = getattr(self._local, 'zstd', None)
+            if compressor is None:
+                compressor = self._local.zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+            packed = compressor.compress(data)
+        elif self.codec == CODEC_ZLIB:
+            packed = zlib.compress(data, ZLIB_LEVEL)
+        else:
+            return CODEC_RAW + data
+        if len(packed) < len(data):
+            return self.codec + packed
+        return CODEC_RAW + data
+
+    @staticmethod
+    def decode(blob: bytes) -> bytes:
+        codec, payload = blob[:1], blob[1:]
+        if codec == CODEC_ZLIB:
+            return zlib.decompress(payload)
+        if codec == CODEC_ZSTD:
+            if not HAS_ZSTD:
+                raise RuntimeError("Chunk comprimido com zstd: instale o pacote zstandard")
+            return zstandard.ZstdDecompressor().decompress(payload)
+        if codec == CODEC_RAW:
+            return payload
+        raise ValueError(f"Codec de chunk desconhecido: {codec!r}")
+
+    def put(self, data: bytes, digest: Optional[str] = None) -> int:
+        """Grava o chunk se ainda não existe; retorna os bytes gravados (0 se já existia)"""
+        digest = digest or hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if path.exists():
+            return 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        blob = self.encode(data)
+        tmp_path = path.with_name(f"{digest}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+        return len(blob)
+
+    def get(self, digest: str) -> bytes:
+        """Lê e confere o chunk pelo hash"""
+        data = self.decode(self.path_for(digest).read_bytes())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk corrompido: {digest}")
+        return data
+
+    def store_file(self, path: Path, previous: Optional[Dict] = None) -> Dict:
+        """
+        Guarda o arquivo e retorna a entrada do manifest. Se tamanho e mtime
+        batem com a entrada anterior, ela é reaproveitada sem ler o arquivo.
+        """
+        stat = Path(path).stat()
+        if (previous and previous.get('size') == stat.st_size
+                and previous.get('mtime_ns') == stat.st_mtime_ns
+                and all(self.has(digest) for digest in previous['chunks'])):
+            return dict(previous, new_chunks=0, new_bytes=0)
+
+        file_hash = hashlib.sha256()
+        chunks = []
+        new_chunks = 0
+        new_bytes = 0
+
+        def read_chunks(f):
+            for chunk in iter_chunks(f):
+                file_hash.update(chunk)
+                yield chunk
+
+        def store_chunk(chunk):
+            digest = hashlib.sha256(chunk).hexdigest()
+            return digest, self.put(chunk, digest)
+
+        with open(path, 'rb') as f:
+            for digest, written in self._map_ordered(store_chunk, read_chunks(f)):
+                if written:
+                    new_chunks += 1
+                    new_bytes += written
+                chunks.append(digest)
+
+        return {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_hash.hexdigest(),
+            'chunks': chunks,
+            'new_chunks': new_chunks,
+            'new_bytes': new_bytes
+        }
+
+    def restore_file(self, entry: Dict, target: Path):
+        """Remonta o arquivo chunk a chunk e confere o sha256 antes de publicá-lo"""
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.restore")
+        file_hash = hashlib.sha256()
+        with open(tmp_path, 'wb') as f:
+            # Próximos chunks são lidos e descomprimidos enquanto o atual é gravado
+            for data in self._map_ordered(self.get, entry['chunks']):
+                file_hash.update(data)
+                f.write(data)
+        if file_hash.hexdigest() != entry['sha256']:
+            tmp_path.unlink()
+            raise ValueError(f"Checksum não confere ao restaurar {target.name}")
+        os.replace(tmp_path, target)
+
+    def iter_digests(self) -> Iterator[str]:
+        if not self.root.exists():
+            return
+        for prefix in self.root.iterdir():
+            if prefix.is_dir():
+                for path in prefix.iterdir():
+                    if not path.name.endswith('.tmp'):
+                        yield path.name
+
+    def size_bytes(self) -> int:
+        return sum(self.path_for(digest).stat().st_size for digest in self.iter_digests())
+
+    def gc(self, referenced: Set[str]) -> int:
+        """Remove chunks que nenhum manifest referencia"""
+        removed = 0
+        for digest in list(self.iter_digests()):
+            if digest not in referenced:
+                self.path_for(digest).unlink()
+                removed += 1
+        return removed
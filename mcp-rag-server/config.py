@@ -52,6 +52,62 @@ class Config:
         self.AUTO_SAVE = os.getenv('RAG_AUTO_SAVE', 'true').lower() == 'true'
         self.SAVE_STATS = os.getenv('RAG_SAVE_STATS', 'true').lower() == 'true'
         
+        # Replica settings (single-writer / multi-reader)
+        self.READ_ONLY = os.getenv('RAG_READ_ONLY', 'false').lower() == 'true'
+        self.REPLICA_REFRESH_INTERVAL = float(os.getenv('RAG_REPLICA_REFRESH_INTERVAL', '1.0'))
+        
+        # Segment store settings (memtable + immutable segments)
+        self.SEGMENT_FLUSH_DOCS = int(os.getenv('RAG_SEGMENT_FLUSH_DOCS', '256'))
+        self.SEGMENT_MAX_COUNT = int(os.getenv('RAG_SEGMENT_MAX_COUNT', '8'))
+        self.SEGMENT_MERGE_FACTOR = int(os.getenv('RAG_SEGMENT_MERGE_FACTOR', '4'))
+        self.SEGMENT_MAINTENANCE_INTERVAL = float(os.getenv('RAG_SEGMENT_MAINTENANCE_INTERVAL', '30'))
+        self.SEGMENT_OBSOLETE_GRACE = float(os.getenv('RAG_SEGMENT_OBSOLETE_GRACE', '300'))
+        self.LEGACY_EXPORT = os.getenv('RAG_LEGACY_EXPORT', 'true').lower() == 'true'
+        
+        # Listing settings
+        self.LIST_DEFAULT_LIMIT = int(os.getenv('RAG_LIST_DEFAULT_LIMIT', '50'))
+        self.LIST_MAX_LIMIT = int(os.getenv('RAG_LIST_MAX_LIMIT', '500'))
+        self.LIST_STREAM_CHUNK = int(os.getenv('RAG_LIST_STREAM_CHUNK', '100'))
+        self.SEARCH_SNIPPET_CHARS = int(os.getenv('RAG_SEARCH_SNIPPET_CHARS', '300'))
+        
+        # Request metrics (latency histograms + Prometheus text file)
+        self.METRICS_ENABLED = os.getenv('RAG_METRICS_ENABLED', 'true').lower() == 'true'
+        self.METRICS_EXPORT_INTERVAL = float(os.getenv('RAG_METRICS_EXPORT_INTERVAL', '15'))
+        self.MONITORING_INTERVAL = float(os.getenv('RAG_MONITORING_INTERVAL', '30'))
+        
+        # Sampling profiler (opt-in via MCP tool or SIGUSR2)
+        self.PROFILE_DEFAULT_SECONDS = float(os.getenv('RAG_PROFILE_DEFAULT_SECONDS', '10'))
+        self.PROFILE_MAX_SECONDS = float(os.getenv('RAG_PROFILE_MAX_SECONDS', '120'))
+        self.PROFILE_INTERVAL_MS = float(os.getenv('RAG_PROFILE_INTERVAL_MS', '10'))
+        
+        # Chat indexing (0 workers = one per CPU)
+        self.CHAT_INDEX_WORKERS = int(os.getenv('RAG_CHAT_INDEX_WORKERS', '0'))
+        self.CHAT_INDEX_BATCH_SIZE = int(os.getenv('RAG_CHAT_INDEX_BATCH_SIZE', '100'))
+        # Watch mode: directories separated by os.pathsep (empty = default project)
+        self.CHAT_PROJECT_DIRS = [Path(d).expanduser() for d in
+                                  os.getenv('RAG_CHAT_PROJECT_DIRS', '').split(os.pathsep) if d]
+        self.CHAT_WATCH_DEBOUNCE = float(os.getenv('RAG_CHAT_WATCH_DEBOUNCE', '1.0'))
+        self.CHAT_WATCH_MAX_DELAY = float(os.getenv('RAG_CHAT_WATCH_MAX_DELAY', '5.0'))
+        self.CHAT_WATCH_POLL_INTERVAL = float(os.getenv('RAG_CHAT_WATCH_POLL_INTERVAL', '2.0'))
+        
+        # URL ingestion (0 extract workers = one per CPU)
+        self.FETCH_CONCURRENCY = int(os.getenv('RAG_FETCH_CONCURRENCY', '16'))
+        self.FETCH_PER_HOST = int(os.getenv('RAG_FETCH_PER_HOST', '4'))
+        self.FETCH_TIMEOUT = float(os.getenv('RAG_FETCH_TIMEOUT', '15'))
+        self.FETCH_CACHE = os.getenv('RAG_FETCH_CACHE', 'true').lower() == 'true'
+        self.FETCH_EXTRACT_WORKERS = int(os.getenv('RAG_FETCH_EXTRACT_WORKERS', '0'))
+        # Crawler: minimum seconds between requests to one domain (robots Crawl-delay wins if larger)
+        self.CRAWL_DOMAIN_DELAY = float(os.getenv('RAG_CRAWL_DOMAIN_DELAY', '0.5'))
+        self.CRAWL_MAX_PAGES = int(os.getenv('RAG_CRAWL_MAX_PAGES', '500'))
+        self.CRAWL_ROBOTS_TTL = float(os.getenv('RAG_CRAWL_ROBOTS_TTL', '3600'))
+        # Adaptive recrawl bounds (seconds between checks of one URL)
+        self.CRAWL_RECRAWL_MIN_INTERVAL = float(os.getenv('RAG_CRAWL_RECRAWL_MIN_INTERVAL', '3600'))
+        self.CRAWL_RECRAWL_MAX_INTERVAL = float(os.getenv('RAG_CRAWL_RECRAWL_MAX_INTERVAL', str(30 * 86400)))
+        
+        # Standing queries: default similarity threshold and MCP push of matches
+        self.PERCOLATE_THRESHOLD = float(os.getenv('RAG_PERCOLATE_THRESHOLD', '0.3'))
+        self.PERCOLATE_NOTIFY = os.getenv('RAG_PERCOLATE_NOTIFY', 'true').lower() == 'true'
+        
         # Development settings
         self.DEV_MODE = os.getenv('RAG_DEV_MODE', 'false').lower() == 'true'
         self.VERBOSE = os.getenv('RAG_VERBOSE', 'false').lower() == 'true'
@@ -88,6 +144,42 @@ class Config:
             'cache_embeddings': self.CACHE_EMBEDDINGS,
             'auto_save': self.AUTO_SAVE,
             'save_stats': self.SAVE_STATS,
+            'read_only': self.READ_ONLY,
+            'replica_refresh_interval': self.REPLICA_REFRESH_INTERVAL,
+            'segment_flush_docs': self.SEGMENT_FLUSH_DOCS,
+            'segment_max_count': self.SEGMENT_MAX_COUNT,
+            'segment_merge_factor': self.SEGMENT_MERGE_FACTOR,
+            'segment_maintenance_interval': self.SEGMENT_MAINTENANCE_INTERVAL,
+            'segment_obsolete_grace': self.SEGMENT_OBSOLETE_GRACE,
+            'legacy_export': self.LEGACY_EXPORT,
+            'list_default_limit': self.LIST_DEFAULT_LIMIT,
+            'list_max_limit': self.LIST_MAX_LIMIT,
+            'list_stream_chunk': self.LIST_STREAM_CHUNK,
+            'search_snippet_chars': self.SEARCH_SNIPPET_CHARS,
+            'metrics_enabled': self.METRICS_ENABLED,
+            'metrics_export_interval': self.METRICS_EXPORT_INTERVAL,
+            'monitoring_interval': self.MONITORING_INTERVAL,
+            'profile_default_seconds': self.PROFILE_DEFAULT_SECONDS,
+            'profile_max_seconds': self.PROFILE_MAX_SECONDS,
+            'profile_interval_ms': self.PROFILE_INTERVAL_MS,
+            'chat_index_workers': self.CHAT_INDEX_WORKERS,
+            'chat_index_batch_size': self.CHAT_INDEX_BATCH_SIZE,
+            'chat_project_dirs': [str(d) for d in self.CHAT_PROJECT_DIRS],
+            'chat_watch_debounce': self.CHAT_WATCH_DEBOUNCE,
+            'chat_watch_max_delay': self.CHAT_WATCH_MAX_DELAY,
+            'chat_watch_poll_interval': self.CHAT_WATCH_POLL_INTERVAL,
+            'fetch_concurrency': self.FETCH_CONCURRENCY,
+            'fetch_per_host': self.FETCH_PER_HOST,
+            'fetch_timeout': self.FETCH_TIMEOUT,
+            'fetch_cache': self.FETCH_CACHE,
+            'fetch_extract_workers': self.FETCH_EXTRACT_WORKERS,
+            'crawl_domain_delay': self.CRAWL_DOMAIN_DELAY,
+            'crawl_max_pages': self.CRAWL_MAX_PAGES,
+            'crawl_robots_ttl': self.CRAWL_ROBOTS_TTL,
+            'crawl_recrawl_min_interval': self.CRAWL_RECRAWL_MIN_INTERVAL,
+            'crawl_recrawl_max_interval': self.CRAWL_RECRAWL_MAX_INTERVAL,
+            'percolate_threshold': self.PERCOLATE_THRESHOLD,
+            'percolate_notify': self.PERCOLATE_NOTIFY,
             'dev_mode': self.DEV_MODE,
             'verbose': self.VERBOSE
         }
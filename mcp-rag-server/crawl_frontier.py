@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Fronteira de crawl educada
+===========================
+Descoberta e busca de páginas sobre o AsyncFetcher (web_fetch):
+
+- robots.txt por origem, baixado uma vez e guardado em memória com TTL
+  (4xx = tudo liberado; erro de rede ou 5xx = nada liberado, por pouco tempo);
+- intervalo mínimo entre requisições ao mesmo domínio (o maior entre o
+  configurado e o Crawl-delay do robots.txt), com reservas de horário: os
+  domínios andam em paralelo, cada um no seu ritmo;
+- sitemaps e sitemap-indexes (inclusive .xml.gz) lidos com iterparse, sem
+  montar a árvore inteira; as entradas do robots.txt têm precedência sobre
+  os caminhos padrão.
+"""
+
+import io
+import gzip
+import zlib
+import time
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+from web_fetch import AsyncFetcher, FetchResult
+
+logger = logging.getLogger("crawl-frontier")
+
+ROBOTS_AGENT = 'mcp-rag-server'
+ROBOTS_ERROR_TTL = 60.0          # segundos até tentar de novo um robots.txt inacessível
+MAX_CRAWL_DELAY = 30.0           # teto para Crawl-delay exagerado
+DEFAULT_SITEMAPS = ('/sitemap.xml', '/sitemap_index.xml')
+MAX_SITEMAP_DEPTH = 3            # níveis de sitemap-index seguidos
+
+
+def origin_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.lower()}"
+
+
+def iter_sitemap(body: bytes) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """('url' | 'sitemap', loc, lastmod) de um sitemap ou sitemap-index, em streaming"""
+    if body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+    loc = lastmod = None
+    root = None
+    for event, elem in ET.iterparse(io.BytesIO(body), events=('start', 'end')):
+        if root is None:
+            root = elem
+        if event == 'start':
+            continue
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if tag == 'loc':
+            loc = (elem.text or '').strip()
+        elif tag == 'lastmod':
+            lastmod = (elem.text or '').strip() or None
+        elif tag in ('url', 'sitemap'):
+            if loc:
+                yield tag, loc, lastmod
+            loc = lastmod = None
+            # Descarta as entradas já lidas: memória constante em sitemaps grandes
+            root.clear()
+
+
+class RobotsCache:
+    """robots.txt por origem, com uma única busca mesmo sob chamadas concorrentes"""
+
+    def __init__(self, fetcher: AsyncFetcher, ttl: float = 3600.0, agent: str = ROBOTS_AGENT):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.agent = agent
+        self._entries: Dict[str, Tuple[float, RobotFileParser]] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    async def get(self, url: str) -> RobotFileParser:
+        origin = origin_of(url)
+        entry = self._entries.get(origin)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        task = self._pending.get(origin)
+        if task is None:
+            task = self._pending[origin] = asyncio.ensure_future(self._load(origin))
+            task.add_done_callback(lambda _: self._pending.pop(origin, None))
+        return await asyncio.shield(task)
+
+    async def _load(self, origin: str) -> RobotFileParser:
+        result = await self.fetcher.fetch(f"{origin}/robots.txt")
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        ttl = self.ttl
+        if result.ok:
+            parser.parse(result.body.decode('utf-8', errors='replace').splitlines())
+        elif 400 <= result.status < 500:
+            parser.allow_all = True
+        else:
+            # Servidor fora do ar ou com erro: não arriscar, e tentar de novo logo
+            parser.disallow_all = True
+            ttl = ROBOTS_ERROR_TTL
+        self._entries[origin] = (time.monotonic() + ttl, parser)
+        return parser
+
+    async def allowed(self, url: str) -> bool:
+        return (await self.get(url)).can_fetch(self.agent, url)
+
+    async def crawl_delay(self, url: str) -> float:
+        delay = (await self.get(url)).crawl_delay(self.agent)
+        try:
+            return min(float(delay or 0.0), MAX_CRAWL_DELAY)
+        except (TypeError, ValueError):
+            return 0.0
+
+    async def sitemaps(self, url: str) -> List[str]:
+        return list((await self.get(url)).site_maps() or [])
+
+
+class DomainLimiter:
+    """Intervalo mínimo entre requisições ao mesmo domínio"""
+
+    def __init__(self):
+        self._next_slot: Dict[str, float] = {}
+
+    async def wait(self, domain: str, interval: float):
+        # Reserva o horário antes de dormir: chamadas concorrentes entram em fila
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_slot.get(domain, 0.0))
+        self._next_slot[domain] = slot + interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class CrawlFrontier:
+    """
+    Descobre URLs via sitemaps e busca páginas respeitando robots.txt e o
+    ritmo de cada domínio. Páginas bloqueadas pelo robots.txt voltam como None.
+    """
+
+    def __init__(self, fetcher: AsyncFetcher, domain_delay: float = 0.5, robots_ttl: float = 3600.0,
+                 max_pages: int = 500, agent: str = ROBOTS_AGENT):
+        self.fetcher = fetcher
+        self.domain_delay = domain_delay
+        self.max_pages = max_pages
+        self.robots = RobotsCache(fetcher, robots_ttl, agent)
+        self.limiter = DomainLimiter()
+        self.lastmod: Dict[str, Optional[str]] = {}
+        self.stats = {'sitemaps': 0, 'discovered': 0, 'robots_blocked': 0, 'fetched': 0, 'errors': 0}
+
+    async def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> Optional[FetchResult]:
+        if not await self.robots.allowed(url):
+            self.stats['robots_blocked'] += 1
+            return None
+        interval = max(self.domain_delay, await self.robots.crawl_delay(url))
+        await self.limiter.wait(urlsplit(url).netloc.lower(), interval)
+        result = await self.fetcher.fetch(url, validators)
+        self.stats['fetched' if result.ok else 'errors'] += 1
+        return result
+
+    async def fetch_all(self, urls: List[str]) -> List[Optional[FetchResult]]:
+        return list(await asyncio.gather(*(self.fetch(url) for url in urls)))
+
+    async def discover(self, base_url: str) -> List[str]:
+        """URLs do mesmo domínio listadas nos sitemaps do site (até max_pages)"""
+        site = urlsplit(base_url).netloc.lower()
+        origin = origin_of(base_url)
+        queue = await self.robots.sitemaps(base_url) or [origin + path for path in DEFAULT_SITEMAPS]
+
+        pages: Dict[str, Optional[str]] = {}
+        seen = set()
+        for _ in range(MAX_SITEMAP_DEPTH + 1):
+            batch = [url for url in dict.fromkeys(queue) if url not in seen]
+            if not batch or len(pages) >= self.max_pages:
+                break
+            seen.update(batch)
+            queue = []
+            for sitemap_url, result in zip(batch, await self.fetch_all(batch)):
+                if result is None or not result.ok:
+                    continue
+                self.stats['sitemaps'] += 1
+                try:
+                    for kind, loc, lastmod in iter_sitemap(result.body):
+                        if kind == 'sitemap':
+                            queue.append(loc)
+                        elif len(pages) < self.max_pages and urlsplit(loc).netloc.lower() == site:
+                            pages.setdefault(loc.split('#', 1)[0], lastmod)
+                except (ET.ParseError, OSError, EOFError, zlib.error) as e:
+                    logger.warning(f"Sitemap inválido {sitemap_url}: {e}")
+
+        self.lastmod.update(pages)
+        self.stats['discovered'] += len(pages)
+        return list(pages)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Estado por URL e agendamento de recrawl
+========================================
+Para cada URL rastreada guarda validadores HTTP (ETag/Last-Modified),
+hash do texto indexado, horários de busca e de mudança e quantas
+verificações encontraram mudança.
+
+A taxa de mudança é estimada pelo estimador de Cho & Garcia-Molina para
+mudanças de Poisson observadas em verificações periódicas:
+
+    taxa = -ln((n - X + 0.5) / (n + 0.5)) / intervalo_médio
+
+(n verificações, X com mudança). O próximo intervalo tende a 1/taxa, mas
+muda no máximo ADAPT_FACTOR vezes por verificação e fica entre os limites
+configurados. Páginas que mudam muito ficam com intervalos curtos e,
+atrasadas, passam à frente das estáveis.
+"""
+
+import os
+import json
+import math
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from web_fetch import FetchResult
+
+DEFAULT_INTERVAL = 86400.0       # primeiro intervalo (1 dia)
+ADAPT_FACTOR = 2.0               # variação máxima do intervalo por verificação
+GONE_STATUSES = {404, 410}
+
+
+@dataclass
+class URLState:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    status: int = 0
+    first_fetched: float = 0.0
+    fetched_at: float = 0.0
+    changed_at: float = 0.0
+    checks: int = 0              # buscas comparadas com uma versão anterior
+    changes: int = 0             # dessas, quantas mudaram
+    interval: float = DEFAULT_INTERVAL
+    next_fetch: float = 0.0
+
+    def change_rate(self) -> float:
+        """Mudanças por segundo estimadas (0 sem histórico)"""
+        if self.checks == 0 or self.fetched_at <= self.first_fetched:
+            return 0.0
+        mean_interval = (self.fetched_at - self.first_fetched) / self.checks
+        return -math.log((self.checks - self.changes + 0.5) / (self.checks + 0.5)) / mean_interval
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[float]:
+    """<lastmod> do sitemap (data ou data-hora W3C) -> timestamp"""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class CrawlState:
+    """Estado de todas as URLs rastreadas, persistido em um JSON"""
+
+    def __init__(self, path: Path, min_interval: float = 3600.0, max_interval: float = 30 * 86400.0):
+        self.path = Path(path)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.entries: Dict[str, URLState] = {}
+
+    def load(self, legacy_path: Optional[Path] = None):
+        """Carrega o estado; sem ele, importa a lista antiga de URLs (devidas já)"""
+        known = {f.name for f in fields(URLState)}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+                self.entries = {url: URLState(**{k: v for k, v in data.items() if k in known})
+                                for url, data in raw.items()}
+                return
+            except (OSError, ValueError, TypeError):
+                self.entries = {}
+        if legacy_path is not None and Path(legacy_path).exists():
+            try:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    for url in json.load(f):
+                        self.entries[url] = URLState(url)
+            except (OSError, ValueError):
+                pass
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({url: asdict(state) for url, state in self.entries.items()}, f)
+        os.replace(tmp_path, self.path)
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def touch(self, url: str) -> URLState:
+        """Estado da URL, criado (devido imediatamente) se ainda não existe"""
+        state = self.entries.get(url)
+        if state is None:
+            state = self.entries[url] = URLState(url)
+        return state
+
+    def validators(self, url: str) -> Dict[str, str]:
+        state = self.entries.get(url)
+        headers = {}
+        if state is not None:
+            if state.etag:
+                headers['If-None-Match'] = state.etag
+            if state.last_modified:
+                headers['If-Modified-Since'] = state.last_modified
+        return headers
+
+    def is_changed(self, url: str, content_hash: str) -> bool:
+        state = self.entries.get(url)
+        return state is None or state.content_hash != content_hash
+
+    def due(self, urls: Iterable[str], now: Optional[float] = None, limit: Optional[int] = None,
+            lastmod: Optional[Dict[str, Optional[str]]] = None) -> List[str]:
+        """
+        URLs a buscar agora, em ordem de prioridade: nunca buscadas (fora do
+        recuo de uma falha); com
+        <lastmod> do sitemap posterior à última busca; vencidas, as mais
+        atrasadas em relação ao próprio intervalo primeiro.
+        """
+        now = time.time() if now is None else now
+        lastmod = lastmod or {}
+        ranked = []
+        for position, url in enumerate(dict.fromkeys(urls)):
+            state = self.entries.get(url)
+            if state is None or not state.fetched_at:
+                # Nunca buscada com sucesso: falhas (record_failure) ainda respeitam o recuo
+                if state is None or state.next_fetch <= now:
+                    ranked.append((2, 0.0, position, url))
+                continue
+            modified = parse_lastmod(lastmod.get(url))
+            if modified is not None and modified > state.fetched_at:
+                ranked.append((1, 0.0, position, url))
+            elif state.next_fetch <= now:
+                ranked.append((0, (now - state.next_fetch) / state.interval, position, url))
+        ranked.sort(key=lambda item: (-item[0], -item[1], item[2]))
+        urls = [item[3] for item in ranked]
+        return urls if limit is None else urls[:limit]
+
+    def record(self, url: str, result: FetchResult, content_hash: Optional[str],
+               now: Optional[float] = None) -> bool:
+        """
+        Registra uma busca bem-sucedida (content_hash None = 304) e agenda a
+        próxima. Retorna se o conteúdo mudou (a primeira busca conta como mudança).
+        """
+        now = time.time() if now is None else now
+        state = self.touch(url)
+        first = not state.fetched_at
+        changed = first or (content_hash is not None and content_hash != state.content_hash)
+        if first:
+            state.first_fetched = now
+        else:
+            state.checks += 1
+            if changed:
+                state.changes += 1
+        if changed:
+            state.changed_at = now
+        if content_hash is not None:
+            state.content_hash = content_hash
+        # 304 nem sempre repete os validadores
+        state.etag = result.headers.get('etag') or state.etag
+        state.last_modified = result.headers.get('last-modified') or state.last_modified
+        state.status = 304 if result.not_modified else result.status
+        state.fetched_at = now
+        state.interval = self._next_interval(state)
+        state.next_fetch = now + state.interval
+        return changed
+
+    def record_failure(self, url: str, status: int = 0, now: Optional[float] = None):
+        """Página sumida espaça as verificações; erro transitório tenta de novo logo"""
+        now = time.time() if now is None else now
+        state = self.touch(url)
+        state.status = status
+        if status in GONE_STATUSES:
+            state.interval = min(self.max_interval, state.interval * ADAPT_FACTOR)
+            state.next_fetch = now + state.interval
+        else:
+            state.next_fetch = now + self.min_interval
+
+    def _next_interval(self, state: URLState) -> float:
+        if state.checks == 0:
+            interval = state.interval
+        else:
+            rate = state.change_rate()
+            target = 1.0 / rate if rate > 0 else math.inf
+            interval = min(max(target, state.interval / ADAPT_FACTOR), state.interval * ADAPT_FACTOR)
+        return min(self.max_interval, max(self.min_interval, interval))
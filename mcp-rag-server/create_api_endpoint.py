@@ -1,7 +1,11 @@
 #!/usr/bin/env python3
 """
-API HTTP para o RAG Server Improved
+API HTTP para o RAG Server
 Fornece endpoints REST para integração com o frontend em localhost:5173
+
+Leituras são servidas por uma réplica somente leitura do RAGServer (vetores
+mapeados em memória e compartilhados com os demais processos); escritas vão
+para um writer criado sob demanda.
 """
 from flask import Flask, request, jsonify
 from flask_cors import CORS
@@ -9,37 +13,70 @@ import sys
 import os
 from pathlib import Path
 
-# Adicionar caminho do servidor melhorado
+# Adicionar caminho do servidor
 sys.path.insert(0, str(Path(__file__).parent))
-from rag_server_improved import ImprovedRAGServer
+from rag_server import RAGServer, __version__
+from config import config
 
 app = Flask(__name__)
 CORS(app, origins=['http://localhost:5173'])  # Permitir CORS para o frontend
 
-# Instância única do servidor
-rag_server = ImprovedRAGServer()
+# Réplica para leituras; writer só é carregado quando houver escrita
+rag_server = RAGServer(mode='enhanced', read_only=True)
+_writer = None
+
+def get_writer() -> RAGServer:
+    """Retorna o writer, criando-o na primeira escrita"""
+    global _writer
+    if _writer is None:
+        _writer = RAGServer(mode='enhanced')
+    return _writer
+
+# Campos padrão de /api/rag/documents (formato esperado pelo frontend)
+DOCUMENT_FIELDS = ['id', 'title', 'content', 'type', 'source', 'metadata', 'created_at']
+
+def _split_param(name):
+    """Lê parâmetro de query separado por vírgulas"""
+    value = request.args.get(name)
+    return [item for item in value.split(',') if item] if value else None
 
 @app.route('/api/rag/documents', methods=['GET'])
 def get_documents():
-    """Lista todos os documentos"""
+    """Lista documentos paginados (limit, cursor, sort_by, order, fields)"""
     try:
-        documents = []
-        for doc in rag_server.documents:
-            documents.append({
-                'id': doc.id,
-                'title': doc.title,
-                'content': doc.content[:200] + '...' if len(doc.content) > 200 else doc.content,
-                'type': doc.type.value,
-                'source': doc.source,
-                'metadata': doc.metadata,
-                'created_at': doc.created_at
-            })
+        filters = {}
+        if request.args.get('category'):
+            filters['category'] = request.args['category']
+        if request.args.get('source'):
+            filters['source'] = request.args['source']
+        if _split_param('tags'):
+            filters['tags'] = _split_param('tags')
         
-        stats = rag_server.get_stats()
-        return jsonify({
-            'documents': documents,
-            'stats': stats
-        })
+        limit = min(request.args.get('limit', config.LIST_DEFAULT_LIMIT, type=int), config.LIST_MAX_LIMIT)
+        page = rag_server.list_documents_page(
+            filters or None,
+            limit=limit,
+            cursor=request.args.get('cursor'),
+            sort_by=request.args.get('sort_by', 'created_at'),
+            order=request.args.get('order', 'desc'),
+            fields=_split_param('fields') or DOCUMENT_FIELDS
+        )
+        
+        for doc in page['documents']:
+            content = doc.get('content')
+            if content and len(content) > 200:
+                doc['content'] = content[:200] + '...'
+            if 'type' in doc and doc['type'] is None:
+                doc['type'] = 'text'
+            if 'metadata' in doc and doc['metadata'] is None:
+                doc['metadata'] = {}
+        
+        # Só contadores baratos; estatísticas completas (O(N)) ficam em /api/rag/stats
+        page['generation'] = rag_server.generation
+        page['stats'] = {'total_documents': len(rag_server.documents), 'generation': rag_server.generation}
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -65,10 +102,10 @@ def add_document():
     """Adiciona novo documento"""
     try:
         data = request.json
-        doc = rag_server.add_document(data)
+        doc = get_writer().add_document(data)
         return jsonify({
             'success': True,
-            'document': doc.to_dict()
+            'document': doc
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -77,7 +114,7 @@ def add_document():
 def remove_document(doc_id):
     """Remove documento por ID"""
     try:
-        success = rag_server.remove_document(doc_id)
+        success = get_writer().remove_document(doc_id)
         if success:
             return jsonify({'success': True, 'message': f'Documento {doc_id} removido'})
         else:
@@ -99,7 +136,8 @@ def health_check():
     """Verifica se o servidor está funcionando"""
     return jsonify({
         'status': 'healthy',
-        'version': rag_server.version,
+        'version': __version__,
+        'generation': rag_server.generation,
         'documents_count': len(rag_server.documents)
     })
 
@@ -107,7 +145,7 @@ if __name__ == '__main__':
     print("🚀 RAG API Server iniciado em http://localhost:5001")
     print("📊 Documentos carregados:", len(rag_server.documents))
     print("✨ Endpoints disponíveis:")
-    print("  - GET  /api/rag/documents")
+    print("  - GET  /api/rag/documents?limit=&cursor=&sort_by=&order=&fields=")
     print("  - POST /api/rag/search")
     print("  - POST /api/rag/add")
     print("  - DELETE /api/rag/remove/<id>")
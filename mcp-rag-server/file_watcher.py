@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Observação de diretórios de conversas
+======================================
+Detecta arquivos criados ou alterados (por sufixo) em vários diretórios.
+No Linux usa inotify direto da libc via ctypes (sem dependências e sem
+varrer diretórios); nos demais sistemas, ou se inotify não puder ser
+inicializado, compara tamanho/mtime dos arquivos a cada intervalo.
+
+Ambos expõem poll(timeout) -> caminhos alterados desde a última chamada,
+para o chamador aplicar debounce e indexar em lote.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+# inotify via libc (Linux)
+try:
+    import ctypes
+    import ctypes.util
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    _libc.inotify_init1.argtypes = [ctypes.c_int]
+    _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    HAS_INOTIFY = sys.platform.startswith('linux')
+except (OSError, AttributeError):
+    HAS_INOTIFY = False
+
+logger = logging.getLogger("file-watcher")
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF
+
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len (seguido do nome)
+READ_SIZE = 64 * 1024
+MISSING_RETRY_INTERVAL = 5.0    # segundos entre tentativas de observar diretórios ausentes
+
+
+def scan(directories: Iterable[Path], suffix: str) -> Dict[Path, Tuple[int, int]]:
+    """Arquivos com o sufixo nos diretórios -> (tamanho, mtime_ns)"""
+    found = {}
+    for directory in directories:
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if entry.name.endswith(suffix):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+    return found
+
+
+class PollingWatcher:
+    """Compara tamanho/mtime a cada intervalo (funciona em qualquer sistema)"""
+
+    backend = 'polling'
+
+    def __init__(self, directories: Iterable[Path], suffix: str = '.jsonl', interval: float = 2.0):
+        self.directories = [Path(d) for d in directories]
+        self.suffix = suffix
+        self.interval = interval
+        self._seen = scan(self.directories, suffix)
+        self._next_scan = time.monotonic() + interval
+
+    def poll(self, timeout: float) -> Set[Path]:
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(max(0.0, timeout))
+            return set()
+        time.sleep(max(0.0, wait))
+        self._next_scan = time.monotonic() + self.interval
+
+        current = scan(self.directories, self.suffix)
+        changed = {path for path, signature in current.items() if self._seen.get(path) != signature}
+        self._seen = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Eventos do kernel para os diretórios observados (Linux)"""
+
+    backend = 'inotify'
+
+    def __init__(self, directories: Iterable[Path], suffix: str = '.jsonl'):
+        self.directories = [Path(d) for d in directories]
+        self.suffix = suffix
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1: {os.strerror(error)}")
+        self._watches: Dict[int, Path] = {}
+        self._missing: List[Path] = []
+        self._retry_at = 0.0
+        for directory in self.directories:
+            self._add_watch(directory)
+
+    def _add_watch(self, directory: Path) -> bool:
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error not in (errno.ENOENT, errno.ENOTDIR):
+                raise OSError(error, f"inotify_add_watch {directory}: {os.strerror(error)}")
+            # Diretório ainda não existe: nova tentativa periódica
+            if directory not in self._missing:
+                self._missing.append(directory)
+            return False
+        self._watches[wd] = directory
+        return True
+
+    def _retry_missing(self) -> Set[Path]:
+        """Passa a observar diretórios que surgiram; os arquivos já presentes contam como alterados"""
+        if not self._missing or time.monotonic() < self._retry_at:
+            return set()
+        self._retry_at = time.monotonic() + MISSING_RETRY_INTERVAL
+        appeared = [d for d in self._missing if self._add_watch(d)]
+        self._missing = [d for d in self._missing if d not in appeared]
+        return set(scan(appeared, self.suffix))
+
+    def poll(self, timeout: float) -> Set[Path]:
+        changed = self._retry_missing()
+        try:
+            readable, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        except InterruptedError:
+            return changed
+        if not readable:
+            return changed
+
+        while True:
+            try:
+                data = os.read(self.fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            changed |= self._parse(data)
+        return changed
+
+    def _parse(self, data: bytes) -> Set[Path]:
+        changed = set()
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+            offset += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Fila do kernel estourou: eventos perdidos, considerar tudo
+                logger.warning("Fila do inotify estourou; reescaneando diretórios")
+                changed |= set(scan(self._watches.values(), self.suffix))
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF):
+                # Diretório removido: volta para a lista de ausentes
+                self._watches.pop(wd, None)
+                if directory not in self._missing:
+                    self._missing.append(directory)
+                continue
+            filename = os.fsdecode(name)
+            if filename.endswith(self.suffix):
+                changed.add(directory / filename)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(directories: Iterable[Path], suffix: str = '.jsonl', poll_interval: float = 2.0):
+    """InotifyWatcher quando disponível, senão PollingWatcher"""
+    directories = list(directories)
+    if HAS_INOTIFY:
+        try:
+            return InotifyWatcher(directories, suffix)
+        except OSError as e:
+            logger.warning(f"inotify indisponível ({e}); usando polling")
+    return PollingWatcher(directories, suffix, poll_interval)
@@ -11,7 +11,7 @@ from pathlib import Path
 
 # Importar módulos do sistema
 try:
-    from monitoring import metrics_collector, start_monitoring, stop_monitoring
+    from monitoring import server_collector
     from backup_system import backup_system, start_backup_service, create_manual_backup
     from health_check import main as health_check
 except ImportError as e:
@@ -19,6 +19,9 @@ except ImportError as e:
     print("Certifique-se de que todos os arquivos estão no diretório correto")
     sys.exit(1)
 
+# Métricas de processo (RSS, CPU, threads, GC) descrevem o rag_server, não o monitor
+metrics_collector = server_collector()
+
 def show_dashboard():
     """Mostra dashboard em tempo real no terminal"""
     try:
@@ -40,6 +43,9 @@ def show_dashboard():
                 print(f"  💿 Disco: {metrics.get('disk_usage_percent', 0):.1f}%")
                 print(f"  📦 Cache: {metrics.get('cache_size_mb', 0):.1f} MB")
                 print(f"  📄 Docs: {metrics.get('document_count', 0)}")
+                print(f"  🧠 Processo: {metrics.get('process_rss_mb', 0):.1f} MB RSS, "
+                      f"{metrics.get('process_cpu_percent', 0):.1f}% CPU, "
+                      f"{int(metrics.get('process_threads', 0))} threads")
                 print()
             
             # Performance
@@ -151,7 +157,7 @@ def start_services():
     
     try:
         # Iniciar coleta de métricas
-        start_monitoring()
+        metrics_collector.start_monitoring()
         print("✅ Coleta de métricas iniciada")
         
         # Iniciar serviço de backup
@@ -170,7 +176,7 @@ def start_services():
                 print(f"⏰ {time.strftime('%H:%M:%S')} - Serviços rodando...")
         except KeyboardInterrupt:
             print("\n🛑 Parando serviços...")
-            stop_monitoring()
+            metrics_collector.stop_monitoring()
             backup_system.stop_backup_service()
             print("✅ Serviços parados")
             
@@ -3,8 +3,11 @@
 Sistema de Monitoramento Avançado - MCP RAG Server
 Monitoramento completo com métricas, alertas e dashboard em tempo real
 """
+import os
+import gc
 import json
 import time
+import bisect
 import psutil
 import threading
 from pathlib import Path
@@ -13,21 +16,90 @@ from collections import defaultdict, deque
 import logging
 from logging.handlers import RotatingFileHandler
 
+from config import config
+from timeseries import TimeSeriesStore
+
 # Configuração de paths
 BASE_PATH = Path.home() / ".claude" / "mcp-rag-cache"
 METRICS_FILE = BASE_PATH / "metrics.json"
 ALERTS_FILE = BASE_PATH / "alerts.json"
 DASHBOARD_FILE = BASE_PATH / "dashboard.json"
+STATS_FILE = BASE_PATH / "stats.json"
+SERVER_PROCESS_FILE = BASE_PATH / "server_process.json"  # pid e GC publicados pelo rag_server
+TIMESERIES_PATH = BASE_PATH / "timeseries"
+
+# Métricas persistidas nas séries temporais (uma coluna por métrica)
+SERIES_METRICS = [
+    'cpu_percent', 'memory_percent', 'memory_used_mb', 'disk_usage_percent',
+    'cache_size_mb', 'document_count', 'uptime_hours', 'error_rate_percent',
+    'avg_response_time_ms', 'process_rss_mb', 'process_cpu_percent', 'process_open_fds',
+    'process_threads', 'gc_collections_per_min', 'embedding_mb'
+]
+
+# Amostras recentes mantidas em memória para alertas e dashboard (1h a cada 30s)
+RECENT_SAMPLES = 120
+
+# Limites superiores (ms) dos buckets dos histogramas de latência
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Histograma de latência com buckets fixos (memória constante por série)"""
+    
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # último bucket: +Inf
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def record(self, value_ms: float):
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+    
+    def percentile(self, pct: float) -> float:
+        """Estimativa pelo limite superior do bucket (máximo observado no +Inf)"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], self.max_ms) if index < len(self.buckets) else self.max_ms
+        return self.max_ms
+    
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': round(self.max_ms, 3)
+        }
 
 class MetricsCollector:
     """Coleta métricas do sistema em tempo real"""
     
-    def __init__(self):
-        self.metrics = defaultdict(deque)
+    def __init__(self, pid=None, interval=None):
+        self.metrics = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+        self.timeseries = None
+        self.gauges = {}
         self.alerts = []
         self.start_time = time.time()
         self.running = False
         self.thread = None
+        self.interval = interval if interval is not None else config.MONITORING_INTERVAL
+        self._stop_event = threading.Event()
+        
+        # Processo observado (padrão: este; monitor.py passa o pid do rag_server) e amostra anterior
+        self.process = psutil.Process(pid)
+        self._previous_sample = None
+        self._previous_requests = None
+        psutil.cpu_percent(interval=None)  # primeira chamada só inicializa a referência
         
         # Configurar logging com rotação
         self.setup_logging()
@@ -54,9 +126,14 @@ class MetricsCollector:
             'list_count': 0,
             'stats_count': 0
         }
+        
+        # Histogramas por (ferramenta, fase); a fase 'total' cobre a requisição inteira
+        self.latency = {}
+        self.latency_lock = threading.Lock()
     
     def setup_logging(self):
         """Configura sistema de logs com rotação automática"""
+        BASE_PATH.mkdir(parents=True, exist_ok=True)
         log_file = BASE_PATH / "monitoring.log"
         
         # Criar handler com rotação (max 5MB, keep 10 files)
@@ -75,7 +152,10 @@ class MetricsCollector:
         # Configurar logger
         self.logger = logging.getLogger("metrics-collector")
         self.logger.setLevel(logging.INFO)
-        self.logger.addHandler(handler)
+        if self.logger.handlers:
+            handler.close()  # outro coletor (ex.: o do pid do servidor) já configurou o logger
+        else:
+            self.logger.addHandler(handler)
         
         self.logger.info("Metrics Collector initialized")
     
@@ -85,6 +165,7 @@ class MetricsCollector:
             return
         
         self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self._monitoring_loop, daemon=True)
         self.thread.start()
         self.logger.info("Monitoring started")
@@ -92,8 +173,12 @@ class MetricsCollector:
     def stop_monitoring(self):
         """Para monitoramento"""
         self.running = False
+        self._stop_event.set()
         if self.thread:
             self.thread.join(timeout=5)
+        if self.timeseries is not None:
+            self.timeseries.close()
+            self.timeseries = None
         self.logger.info("Monitoring stopped")
     
     def _monitoring_loop(self):
@@ -115,19 +200,19 @@ class MetricsCollector:
                 # Atualizar dashboard
                 self._update_dashboard()
                 
-                # Aguardar próximo ciclo
-                time.sleep(30)  # Coleta a cada 30 segundos
+                # Aguardar próximo ciclo (RAG_MONITORING_INTERVAL)
+                self._stop_event.wait(self.interval)
                 
             except Exception as e:
                 self.logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(60)  # Aguardar mais tempo em caso de erro
+                self._stop_event.wait(self.interval * 2)  # Aguardar mais tempo em caso de erro
     
     def _collect_system_metrics(self):
         """Coleta métricas do sistema operacional"""
         timestamp = time.time()
         
-        # CPU
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # CPU do host desde a amostra anterior (interval=None não bloqueia)
+        cpu_percent = psutil.cpu_percent(interval=None)
         self.metrics['cpu_percent'].append((timestamp, cpu_percent))
         
         # Memória
@@ -140,10 +225,44 @@ class MetricsCollector:
         disk_percent = (disk.used / disk.total) * 100
         self.metrics['disk_usage_percent'].append((timestamp, disk_percent))
         
-        # Manter apenas últimas 2880 medições (24h com coleta a cada 30s)
-        for key in self.metrics:
-            if len(self.metrics[key]) > 2880:
-                self.metrics[key].popleft()
+        self._collect_process_metrics(timestamp)
+    
+    def _collect_process_metrics(self, timestamp):
+        """Métricas do processo do servidor; taxas vêm do delta entre amostras"""
+        with self.process.oneshot():
+            rss = self.process.memory_info().rss
+            cpu_times = self.process.cpu_times()
+            threads = self.process.num_threads()
+            open_fds = self.process.num_fds() if hasattr(self.process, 'num_fds') else None
+        
+        cpu_time = cpu_times.user + cpu_times.system
+        gc_collections = self._gc_collections()
+        
+        self.metrics['process_rss_mb'].append((timestamp, rss / 1024 / 1024))
+        self.metrics['process_threads'].append((timestamp, threads))
+        if open_fds is not None:
+            self.metrics['process_open_fds'].append((timestamp, open_fds))
+        
+        previous = self._previous_sample
+        if previous is not None and timestamp > previous['timestamp']:
+            elapsed = timestamp - previous['timestamp']
+            self.metrics['process_cpu_percent'].append(
+                (timestamp, (cpu_time - previous['cpu_time']) / elapsed * 100)
+            )
+            if gc_collections is not None and previous['gc_collections'] is not None:
+                self.metrics['gc_collections_per_min'].append(
+                    (timestamp, (gc_collections - previous['gc_collections']) / elapsed * 60)
+                )
+        self._previous_sample = {
+            'timestamp': timestamp,
+            'cpu_time': cpu_time,
+            'gc_collections': gc_collections
+        }
+        
+        # Matriz de embeddings do servidor (gauge no mesmo processo; senão stats.json)
+        embedding_bytes = self._server_value('embedding_bytes', 'embedding_bytes')
+        if embedding_bytes is not None:
+            self.metrics['embedding_mb'].append((timestamp, embedding_bytes / 1024 / 1024))
     
     def _collect_rag_metrics(self):
         """Coleta métricas específicas do RAG"""
@@ -155,32 +274,65 @@ class MetricsCollector:
             if cache_file.exists():
                 cache_size_mb = cache_file.stat().st_size / 1024 / 1024
                 self.metrics['cache_size_mb'].append((timestamp, cache_size_mb))
-                
-                # Número de documentos
-                with open(cache_file, 'r') as f:
-                    data = json.load(f)
-                    doc_count = len(data.get('documents', []))
-                    self.metrics['document_count'].append((timestamp, doc_count))
+            
+            # Número de documentos: contador do servidor, sem reler o cache
+            doc_count = self._document_count()
+            if doc_count is not None:
+                self.metrics['document_count'].append((timestamp, doc_count))
             
             # Uptime
             uptime_hours = (time.time() - self.start_time) / 3600
             self.metrics['uptime_hours'].append((timestamp, uptime_hours))
             
-            # Taxa de erro
-            if self.performance_stats['total_requests'] > 0:
-                error_rate = (self.performance_stats['failed_requests'] / 
-                            self.performance_stats['total_requests']) * 100
+            # Taxa de erro e tempo médio de resposta no intervalo (delta dos contadores)
+            stats = self.performance_stats
+            previous = self._previous_requests or {key: 0 for key in stats}
+            total = stats['total_requests'] - previous['total_requests']
+            successful = stats['successful_requests'] - previous['successful_requests']
+            
+            if total > 0:
+                error_rate = (stats['failed_requests'] - previous['failed_requests']) / total * 100
                 self.metrics['error_rate_percent'].append((timestamp, error_rate))
             
-            # Tempo médio de resposta
-            if self.performance_stats['successful_requests'] > 0:
-                avg_response_time = (self.performance_stats['total_response_time'] / 
-                                   self.performance_stats['successful_requests']) * 1000
+            if successful > 0:
+                avg_response_time = (stats['total_response_time'] - previous['total_response_time']) / successful * 1000
                 self.metrics['avg_response_time_ms'].append((timestamp, avg_response_time))
             
+            self._previous_requests = dict(stats)
+            
         except Exception as e:
             self.logger.error(f"Error collecting RAG metrics: {e}")
     
+    def _gc_collections(self):
+        """Coletas do GC do processo observado: as próprias ou as publicadas pelo servidor"""
+        if self.process.pid == os.getpid():
+            return sum(generation['collections'] for generation in gc.get_stats())
+        info = read_server_process()
+        if info and info.get('pid') == self.process.pid:
+            return info.get('gc_collections')
+        return None
+    
+    def register_gauge(self, name, fn):
+        """Registra uma função barata que devolve o valor atual de uma métrica"""
+        self.gauges[name] = fn
+    
+    def _document_count(self):
+        """Contagem via gauge do servidor no mesmo processo; senão o stats.json que ele grava"""
+        return self._server_value('document_count', 'total_documents')
+    
+    def _server_value(self, gauge_name, stats_key):
+        """Valor do gauge registrado pelo servidor ou, em outro processo, do stats.json"""
+        gauge = self.gauges.get(gauge_name)
+        if gauge is not None:
+            return gauge()
+        if STATS_FILE.exists():
+            try:
+                with open(STATS_FILE, 'r') as f:
+                    return json.load(f).get(stats_key)
+            except (OSError, ValueError):
+                return None
+        return None
+    
     def _check_alerts(self):
         """Verifica condições de alerta"""
         current_time = time.time()
@@ -237,18 +389,23 @@ class MetricsCollector:
         return False
     
     def _save_metrics(self):
-        """Salva métricas em arquivo JSON"""
+        """Grava a amostra atual nas séries temporais e o resumo em JSON"""
         try:
-            # Converter deque para lista para serialização
-            metrics_data = {}
-            for key, values in self.metrics.items():
-                metrics_data[key] = list(values)
+            timestamp = time.time()
+            current = self.get_current_metrics()
+            
+            # Uma linha por ciclo no ring buffer (histórico não é reescrito)
+            if self.timeseries is None:
+                self.timeseries = TimeSeriesStore(TIMESERIES_PATH, SERIES_METRICS)
+            self.timeseries.append(timestamp, current)
+            self.timeseries.flush()
             
             data = {
-                'timestamp': time.time(),
-                'metrics': metrics_data,
+                'timestamp': timestamp,
+                'current': current,
+                'timeseries_path': str(TIMESERIES_PATH),
                 'performance_stats': self.performance_stats,
-                'uptime_seconds': time.time() - self.start_time
+                'uptime_seconds': timestamp - self.start_time
             }
             
             with open(METRICS_FILE, 'w') as f:
@@ -347,8 +504,17 @@ class MetricsCollector:
         else:
             return f"{minutes}m"
     
-    def record_request(self, method, success, response_time):
-        """Registra uma requisição para métricas"""
+    def record_request(self, method, success, response_time, phases=None):
+        """
+        Registra uma requisição para métricas
+        
+        `response_time` e os valores de `phases` ({fase: duração}) são em segundos.
+        """
+        with self.latency_lock:
+            self._record_latency(method, 'total', response_time)
+            for phase, elapsed in (phases or {}).items():
+                self._record_latency(method, phase, elapsed)
+        
         self.performance_stats['total_requests'] += 1
         
         if success:
@@ -361,6 +527,60 @@ class MetricsCollector:
         if method in ['search', 'add', 'remove', 'list', 'stats']:
             self.performance_stats[f'{method}_count'] += 1
     
+    def _record_latency(self, method, phase, seconds):
+        histogram = self.latency.get((method, phase))
+        if histogram is None:
+            histogram = self.latency[(method, phase)] = LatencyHistogram()
+        histogram.record(seconds * 1000.0)
+    
+    def get_latency_summary(self):
+        """Retorna percentis por ferramenta e fase: {ferramenta: {fase: {...}}}"""
+        summary = defaultdict(dict)
+        with self.latency_lock:
+            for (method, phase), histogram in sorted(self.latency.items()):
+                summary[method][phase] = histogram.snapshot()
+        return dict(summary)
+    
+    def render_prometheus(self):
+        """Exposição em formato texto do Prometheus (histogramas em segundos)"""
+        lines = [
+            '# HELP rag_request_duration_seconds Latência das requisições MCP por ferramenta e fase',
+            '# TYPE rag_request_duration_seconds histogram'
+        ]
+        with self.latency_lock:
+            for (method, phase), histogram in sorted(self.latency.items()):
+                labels = f'tool="{method}",phase="{phase}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'rag_request_duration_seconds_bucket{{{labels},le="{bound / 1000.0:g}"}} {cumulative}')
+                lines.append(f'rag_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'rag_request_duration_seconds_sum{{{labels}}} {histogram.total_ms / 1000.0:.6f}')
+                lines.append(f'rag_request_duration_seconds_count{{{labels}}} {histogram.count}')
+        
+        lines.append('# HELP rag_requests_total Requisições MCP por resultado')
+        lines.append('# TYPE rag_requests_total counter')
+        lines.append(f'rag_requests_total{{status="success"}} {self.performance_stats["successful_requests"]}')
+        lines.append(f'rag_requests_total{{status="error"}} {self.performance_stats["failed_requests"]}')
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path):
+        """Grava a exposição de forma atômica (para o textfile collector do node_exporter)"""
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + '.tmp')
+        tmp_path.write_text(self.render_prometheus(), encoding='utf-8')
+        os.replace(tmp_path, path)
+    
+    def get_history(self, metric, resolution='raw', since=None):
+        """Pontos (timestamp, valor) de uma métrica na resolução raw, 1m ou 1h"""
+        if self.timeseries is None:
+            self.timeseries = TimeSeriesStore(TIMESERIES_PATH, SERIES_METRICS)
+        return [
+            (timestamp, values[metric])
+            for timestamp, values in self.timeseries.read(resolution, since)
+            if metric in values
+        ]
+    
     def get_current_metrics(self):
         """Retorna métricas atuais"""
         current = {}
@@ -390,6 +610,25 @@ class MetricsCollector:
 # Instância global do coletor de métricas
 metrics_collector = MetricsCollector()
 
+def read_server_process():
+    """pid e contadores publicados pelo rag_server (None se ausente ou ilegível)"""
+    try:
+        with open(SERVER_PROCESS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def server_collector():
+    """
+    Coletor das métricas do processo do rag_server: psutil segue o pid
+    publicado por ele. Sem servidor vivo, usa o coletor deste processo.
+    """
+    info = read_server_process()
+    pid = info.get('pid') if info else None
+    if pid and pid != os.getpid() and psutil.pid_exists(pid):
+        return MetricsCollector(pid=pid)
+    return metrics_collector
+
 def start_monitoring():
     """Inicia sistema de monitoramento"""
     metrics_collector.start_monitoring()
@@ -406,9 +645,9 @@ def get_alerts():
     """Retorna alertas atuais"""
     return metrics_collector.get_alerts_summary()
 
-def record_request(method, success, response_time):
+def record_request(method, success, response_time, phases=None):
     """Registra requisição para métricas"""
-    metrics_collector.record_request(method, success, response_time)
+    metrics_collector.record_request(method, success, response_time, phases)
 
 if __name__ == "__main__":
     # Teste standalone
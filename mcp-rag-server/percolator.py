@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Consultas permanentes (percolator)
+==================================
+Em vez de reexecutar buscas salvas periodicamente, registra-se a consulta
+uma vez (texto, filtros e limiar) e cada documento adicionado ou
+atualizado é comparado com todas as consultas registradas numa única
+operação matricial: documentos × consultas, no mesmo espaço da busca
+(embeddings, TF-IDF ou, sem nenhum dos dois, fração de termos).
+
+Cada correspondência vai para um log JSONL com número de sequência (os
+assinantes leem a partir do último número visto) e para os listeners
+registrados, por onde o servidor MCP envia notificações ao cliente.
+
+Vários processos (servidor MCP, CLI, indexadores) compartilham os arquivos:
+registro e remoção relêem as consultas sob flock antes de gravar, cada
+processo relê o arquivo quando ele muda, e a sequência do log vem da última
+linha gravada, lida com o lock retido.
+"""
+
+import os
+import json
+import logging
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from segment_store import tokenize
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+LOG_TAIL_BYTES = 64 * 1024       # janela lida do fim do log para achar a última sequência
+
+logger = logging.getLogger("percolator")
+
+
+@dataclass
+class StandingQuery:
+    name: str
+    query: str
+    filters: Dict = field(default_factory=dict)
+    threshold: float = 0.3
+    created_at: str = ''
+
+    def accepts(self, doc: Dict) -> bool:
+        """Mesma semântica de _filter_candidates, avaliada no próprio documento"""
+        if 'category' in self.filters and doc.get('category') != self.filters['category']:
+            return False
+        if 'tags' in self.filters and not set(self.filters['tags']).intersection(doc.get('tags', [])):
+            return False
+        if 'source' in self.filters and doc.get('source') != self.filters['source']:
+            return False
+        return True
+
+
+class Percolator:
+    """Consultas permanentes de um RAGServer, com log de correspondências"""
+
+    def __init__(self, queries_file: Path, log_file: Path, default_threshold: float = 0.3,
+                 lock_file: Optional[Path] = None):
+        self.queries_file = Path(queries_file)
+        self.log_file = Path(log_file)
+        self.lock_file = Path(lock_file) if lock_file else self.queries_file.with_suffix('.lock')
+        self.default_threshold = default_threshold
+        self.queries: Dict[str, StandingQuery] = {}
+        self.listeners: List[Callable[[Dict], None]] = []
+        self.last_seq = 0
+        self._signature = None  # (inode, mtime) do arquivo de consultas lido por último
+        # Vetores das consultas: embeddings valem até o conjunto mudar; TF-IDF até o corpus mudar
+        self._query_embeddings: Optional[np.ndarray] = None
+        self._query_tfidf: Any = None
+        self._tfidf_version = -1
+
+    def load(self):
+        self._read_queries()
+        self.last_seq = self.tail_seq()
+
+    @contextmanager
+    def _locked(self):
+        """Serializa gravações de consultas e do log entre processos"""
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        if not HAS_FCNTL:
+            yield
+            return
+        with open(self.lock_file, 'a') as lock_handle:
+            fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+    def _file_signature(self):
+        try:
+            stat = self.queries_file.stat()
+        except OSError:
+            return None
+        # Gravações usam os.replace: inode novo a cada versão
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _read_queries(self):
+        known = {f.name for f in fields(StandingQuery)}
+        signature = self._file_signature()
+        queries = {}
+        if signature is not None:
+            try:
+                with open(self.queries_file, 'r', encoding='utf-8') as f:
+                    raw = json.load(f)
+                queries = {name: StandingQuery(**{k: v for k, v in data.items() if k in known})
+                           for name, data in raw.items()}
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Consultas permanentes ilegíveis, ignorando: {e}")
+        self.queries = queries
+        self._signature = signature
+        self._invalidate()
+
+    def refresh(self) -> bool:
+        """Relê as consultas se outro processo mudou o arquivo"""
+        if self._file_signature() == self._signature:
+            return False
+        self._read_queries()
+        return True
+
+    def _write_queries(self):
+        self.queries_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.queries_file.with_name(f"{self.queries_file.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({name: asdict(query) for name, query in self.queries.items()}, f,
+                      ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.queries_file)
+        self._signature = self._file_signature()
+
+    def register(self, name: str, query: str, filters: Optional[Dict] = None,
+                 threshold: Optional[float] = None) -> StandingQuery:
+        """Registra (ou substitui) uma consulta permanente"""
+        if not name or not query:
+            raise ValueError("Consulta permanente precisa de nome e texto")
+        filters = {key: value for key, value in (filters or {}).items()
+                   if key in ('category', 'tags', 'source')}
+        standing = StandingQuery(
+            name, query, filters,
+            self.default_threshold if threshold is None else float(threshold),
+            datetime.now().isoformat()
+        )
+        with self._locked():
+            # Parte do arquivo atual: registros de outros processos não se perdem
+            self._read_queries()
+            self.queries[name] = standing
+            self._write_queries()
+        return standing
+
+    def remove(self, name: str) -> bool:
+        with self._locked():
+            self._read_queries()
+            if self.queries.pop(name, None) is None:
+                return False
+            self._invalidate()
+            self._write_queries()
+        return True
+
+    def _invalidate(self):
+        self._query_embeddings = None
+        self._query_tfidf = None
+        self._tfidf_version = -1
+
+    def percolate(self, server, positions: Sequence[int], event: str = 'add') -> List[Dict]:
+        """
+        Compara os documentos nas posições dadas (após build_indices) com
+        todas as consultas; registra e publica as correspondências.
+        """
+        self.refresh()
+        if not self.queries or not len(positions):
+            return []
+        queries = list(self.queries.values())
+        docs = [server.documents[idx] for idx in positions]
+
+        scores = self._scores(server, queries, list(positions), docs)  # documentos × consultas
+        thresholds = np.array([query.threshold for query in queries])
+        allowed = np.array([[query.accepts(doc) for query in queries] for doc in docs], dtype=bool)
+        hits = np.argwhere((scores >= thresholds) & allowed)
+
+        now = datetime.now().isoformat()
+        matches = []
+        for row, col in hits:
+            doc = docs[row]
+            matches.append({
+                'seq': 0,  # definida ao gravar, com o lock
+                'query': queries[col].name,
+                'event': event,
+                'doc_id': doc.get('id'),
+                'title': doc.get('title', ''),
+                'category': doc.get('category'),
+                'source': doc.get('source'),
+                'score': float(scores[row, col]),
+                'matched_at': now
+            })
+        if matches:
+            with self._locked():
+                # A sequência continua a do log, que outros processos também gravam
+                seq = self.tail_seq()
+                for match in matches:
+                    seq += 1
+                    match['seq'] = seq
+                self._append_log(matches)
+            self.last_seq = seq
+            for match in matches:
+                for listener in self.listeners:
+                    try:
+                        listener(match)
+                    except Exception as e:
+                        logger.warning(f"Listener de consultas permanentes falhou: {e}")
+        return matches
+
+    def _scores(self, server, queries: List[StandingQuery], positions: List[int], docs: List[Dict]) -> np.ndarray:
+        texts = [query.query for query in queries]
+
+        if server.model is not None and server.embeddings is not None \
+                and len(server.embeddings) == len(server.documents):
+            try:
+                if self._query_embeddings is None:
+                    self._query_embeddings = _normalize(np.asarray(server.model.encode(texts)))
+                vectors = _normalize(np.vstack([server._vector_at(idx) for idx in positions]))
+                return vectors @ self._query_embeddings.T
+            except Exception as e:
+                logger.warning(f"Percolação por embeddings falhou, tentando TF-IDF: {e}")
+
+        if server.tfidf is not None and server.tfidf_matrix is not None:
+            try:
+                # Linhas TF-IDF já saem com norma L2: o produto é o cosseno
+                if self._tfidf_version != server.corpus_version:
+                    self._query_tfidf = server.tfidf.transform(texts)
+                    self._tfidf_version = server.corpus_version
+                return np.asarray((server.tfidf_matrix[positions] @ self._query_tfidf.T).todense())
+            except Exception as e:
+                logger.warning(f"Percolação por TF-IDF falhou, usando termos: {e}")
+
+        terms = [{term for term, _ in tokenize(text) if len(term) > 1} for text in texts]
+        scores = np.zeros((len(docs), len(queries)))
+        for row, doc in enumerate(docs):
+            words = {term for term, _ in tokenize(f"{doc.get('title', '')} {doc.get('content', '')}")}
+            for col, query_terms in enumerate(terms):
+                if query_terms:
+                    scores[row, col] = len(query_terms & words) / len(query_terms)
+        return scores
+
+    def _append_log(self, matches: List[Dict]):
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            for match in matches:
+                f.write(json.dumps(match, ensure_ascii=False) + '\n')
+
+    def tail_seq(self) -> int:
+        """Sequência da última linha completa do log (0 se vazio)"""
+        try:
+            with open(self.log_file, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                f.seek(max(0, end - LOG_TAIL_BYTES))
+                lines = f.read().splitlines()
+        except OSError:
+            return 0
+        for line in reversed(lines):
+            try:
+                return int(json.loads(line)['seq'])
+            except (ValueError, KeyError, TypeError):
+                continue
+        return 0
+
+    def _read_log(self):
+        if not self.log_file.exists():
+            return
+        with open(self.log_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def matches(self, since: int = 0, name: Optional[str] = None, limit: int = 100) -> Dict:
+        """Correspondências com seq > since (de uma consulta, se name); next_since continua a leitura"""
+        found = []
+        next_since = since
+        for entry in self._read_log():
+            if entry['seq'] <= since or (name and entry['query'] != name):
+                continue
+            if len(found) >= limit:
+                break
+            found.append(entry)
+            next_since = entry['seq']
+        return {'matches': found, 'next_since': next_since, 'last_seq': self.tail_seq()}
+
+    def describe(self) -> List[Dict]:
+        self.refresh()
+        return [asdict(query) for query in self.queries.values()]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
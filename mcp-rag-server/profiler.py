@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Profiler por amostragem do MCP RAG Server
+==========================================
+Diagnóstico em produção sem reiniciar sob cProfile:
+
+- SamplingProfiler: uma thread lê `sys._current_frames()` a cada intervalo
+  (sem sys.setprofile, então o custo não cresce com o número de chamadas)
+  durante uma janela limitada e grava as pilhas no formato collapsed
+  (`thread;frame;frame contagem`), aceito por flamegraph.pl e speedscope.
+- tracemalloc sob demanda: liga o rastreamento e captura os maiores
+  alocadores por linha.
+"""
+
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+
+def collapse_stack(frame, thread_name: str) -> str:
+    """Pilha da raiz para a folha em uma linha (frames separados por ';')"""
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    frames.append(str(thread_name).replace(';', '_'))
+    return ';'.join(reversed(frames))
+
+
+class SamplingProfiler:
+    """Amostrador periódico de pilhas de todas as threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._stacks = Counter()
+        self.samples = 0
+        self.interval = 0.0
+        self.started_at = None
+        self.output_dir = None
+        self.last_profile = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, output_dir: Path, duration: float, interval: float) -> Dict:
+        """Inicia a amostragem por `duration` segundos, uma amostra a cada `interval`"""
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Profiler já está em execução")
+            self._stacks = Counter()
+            self._stop_event.clear()
+            self.samples = 0
+            self.interval = interval
+            self.output_dir = Path(output_dir)
+            self.started_at = datetime.now()
+            self._thread = threading.Thread(
+                target=self._run, args=(duration,), name='rag-profiler', daemon=True
+            )
+            self._thread.start()
+        return self.status()
+
+    def stop(self) -> Dict:
+        """Encerra a janela antes do prazo e grava o perfil"""
+        thread = self._thread
+        if thread is not None:
+            self._stop_event.set()
+            thread.join()
+        return self.status()
+
+    def status(self) -> Dict:
+        return {
+            'running': self.running,
+            'samples': self.samples,
+            'interval_ms': round(self.interval * 1000, 3),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'last_profile': str(self.last_profile) if self.last_profile else None
+        }
+
+    def _run(self, duration: float):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + duration
+
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own_ident:
+                    self._stacks[collapse_stack(frame, names.get(ident, ident))] += 1
+            self.samples += 1
+            self._stop_event.wait(self.interval)
+
+        self.last_profile = self._write()
+
+    def _write(self) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"profile-{self.started_at:%Y%m%d-%H%M%S}.collapsed"
+        lines = [f"{stack} {count}" for stack, count in self._stacks.most_common()]
+        path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        return path
+
+
+# ============================================================================
+# TRACEMALLOC
+# ============================================================================
+
+def start_tracemalloc(frames: int = 1) -> Dict:
+    """Liga o rastreamento de alocações (custo de memória/CPU até o stop)"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return tracemalloc_status()
+
+
+def stop_tracemalloc() -> Dict:
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return tracemalloc_status()
+
+
+def tracemalloc_status() -> Dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {
+        'tracing': tracing,
+        'current_kb': round(current / 1024, 1),
+        'peak_kb': round(peak / 1024, 1)
+    }
+
+
+def allocation_snapshot(limit: int = 20, output_dir: Optional[Path] = None) -> Dict:
+    """Maiores alocadores por linha; com `output_dir` também grava o JSON"""
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc não está ativo (use tracemalloc_start)")
+
+    statistics = tracemalloc.take_snapshot().statistics('lineno')
+    result = tracemalloc_status()
+    result['top'] = [
+        {
+            'location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'size_kb': round(stat.size / 1024, 1),
+            'count': stat.count
+        }
+        for stat in statistics[:limit]
+    ]
+
+    if output_dir is not None:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        path = output_dir / f"allocations-{datetime.now():%Y%m%d-%H%M%S}.json"
+        path.write_text(json.dumps(result, indent=2), encoding='utf-8')
+        result['file'] = str(path)
+    return result
@@ -47,23 +47,33 @@ __version__ = "3.1.0"
 __author__ = "Claude AI Assistant"
 __license__ = "MIT"
 
+import gc
 import json
 import sys
 import os
+import signal
+import base64
+import bisect
 import hashlib
 import time
 import uuid
 import logging
+import contextvars
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import numpy as np
 from collections import defaultdict, deque
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
 from enum import Enum
 
 # Importar configurações
 from config import config
+from segment_store import SegmentStore, VectorView, tokenize
+from percolator import Percolator
+from profiler import (SamplingProfiler, start_tracemalloc, stop_tracemalloc,
+                      tracemalloc_status, allocation_snapshot)
 
 # Importações para embeddings
 try:
@@ -72,6 +82,12 @@ try:
 except ImportError:
     HAS_EMBEDDINGS = False
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 try:
     from sklearn.feature_extraction.text import TfidfVectorizer
     from sklearn.metrics.pairwise import cosine_similarity
@@ -79,6 +95,12 @@ try:
 except ImportError:
     HAS_TFIDF = False
 
+try:
+    from monitoring import metrics_collector
+    HAS_MONITORING = True
+except ImportError:
+    HAS_MONITORING = False
+
 # ============================================================================
 # CONFIGURAÇÃO E PATHS
 # ============================================================================
@@ -90,6 +112,16 @@ INDEX_FILE = config.get_cache_file("index.pkl")
 STATS_FILE = config.get_cache_file("stats.json")
 LOG_FILE = config.get_cache_file("rag_server.log")
 
+# Arquivos de coordenação writer/réplicas (resolvidos sob CACHE_PATH em runtime)
+GENERATION_FILENAME = "generation"
+WRITER_LOCK_FILENAME = "writer.lock"
+SEGMENTS_DIRNAME = "segments"
+PROMETHEUS_FILENAME = "metrics.prom"
+PROFILES_DIRNAME = "profiles"
+STANDING_QUERIES_FILENAME = "standing_queries.json"
+PERCOLATOR_LOG_FILENAME = "percolator_matches.jsonl"
+SERVER_PROCESS_FILENAME = "server_process.json"
+
 # Arquivos do Episodic RAG
 EPISODIC_FILE = config.get_cache_file("episodic_memory.json")
 SEMANTIC_FILE = config.get_cache_file("semantic_memory.json")
@@ -128,6 +160,120 @@ logger = setup_logging()
 # RAG SERVER PRINCIPAL
 # ============================================================================
 
+class ReadOnlyError(RuntimeError):
+    """Mutação tentada em uma réplica somente leitura"""
+
+
+# Durações por fase (encode/score/rank/serialize/persist...) da requisição corrente
+_request_phases = contextvars.ContextVar('request_phases', default=None)
+
+@contextmanager
+def timed_phase(name: str):
+    """Acumula a duração do bloco na fase `name` da requisição corrente (no-op fora de uma)"""
+    phases = _request_phases.get()
+    if phases is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+# Campos com índice ordenado para list_documents
+SORTABLE_FIELDS = ('created_at', 'updated_at', 'version')
+
+# Modos de conteúdo dos resultados de busca
+CONTENT_MODES = ('full', 'snippet', 'truncate', 'none')
+
+
+def query_terms(query: str) -> List[str]:
+    """Termos distintos da query, com o mesmo tokenizador dos postings"""
+    terms = []
+    for term, _ in tokenize(query):
+        if len(term) > 1 and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def build_snippet(content: str, terms: List[str], positions: Dict[str, List[int]],
+                  max_chars: int) -> Dict:
+    """
+    Escolhe a janela de até max_chars com mais termos distintos da query
+    (desempate pelo total de ocorrências) e devolve os offsets de destaque
+    relativos ao snippet.
+    """
+    hits = sorted(
+        (offset, offset + len(term), term)
+        for term in terms for offset in positions.get(term, [])
+    )
+    if not hits:
+        return {'snippet': content[:max_chars], 'snippet_start': 0, 'highlights': []}
+    
+    # Janela deslizante sobre as ocorrências
+    best = (0, 0, 0, 0)  # (termos distintos, ocorrências, i, j)
+    counts = defaultdict(int)
+    left = 0
+    for right, (_, end, term) in enumerate(hits):
+        counts[term] += 1
+        while end - hits[left][0] > max_chars:
+            counts[hits[left][2]] -= 1
+            if counts[hits[left][2]] == 0:
+                del counts[hits[left][2]]
+            left += 1
+        candidate = (len(counts), right - left + 1, left, right)
+        if candidate[:2] > best[:2]:
+            best = candidate
+    
+    _, _, first, last = best
+    span_start, span_end = hits[first][0], hits[last][1]
+    
+    # Centralizar a janela nas ocorrências e alinhar ao início de palavra
+    start = max(0, span_start - (max_chars - (span_end - span_start)) // 2)
+    start = min(start, max(0, len(content) - max_chars))
+    if start > 0:
+        boundary = content.find(' ', start, span_start)
+        if boundary != -1:
+            start = boundary + 1
+    end = min(len(content), start + max_chars)
+    
+    highlights = [
+        [hit_start - start, hit_end - start]
+        for hit_start, hit_end, _ in hits
+        if hit_start >= start and hit_end <= end
+    ]
+    return {'snippet': content[start:end], 'snippet_start': start, 'highlights': highlights}
+
+
+# Projeção padrão de list_documents (resumo do documento)
+LIST_SUMMARY_FIELDS = [
+    'id', 'title', 'category', 'tags', 'source',
+    'created_at', 'updated_at', 'version', 'content_preview'
+]
+
+# Ordenações de buscas filtradas além da relevância: nome -> decrescente
+QUERY_SORTS = {'date_desc': True, 'date_asc': False}
+
+
+@dataclass
+class CompiledQuery:
+    """
+    Consulta pré-compilada (buscas salvas): o embedding da query é gerado uma
+    única vez; o vetor TF-IDF e os resultados valem para uma versão do corpus
+    e são descartados quando ela muda.
+    """
+    query: str
+    filters: Dict = field(default_factory=dict)
+    sort: Optional[str] = None
+    min_score: Optional[float] = None  # None = limiar do backend, como em search
+    embedding: Optional[np.ndarray] = None
+    tfidf_vector: Any = None
+    tfidf_version: int = -1
+    corpus_version: int = -1
+    results: Dict[int, List[Dict]] = field(default_factory=dict)  # limit -> resultados
+
+
 class RAGServer:
     """
     Servidor RAG unificado com suporte a múltiplos modos
@@ -137,10 +283,17 @@ class RAGServer:
     - semantic: Com embeddings e TF-IDF (v2.0)
     - enhanced: Com UUID, logging, dedup (v3.0)
     - episodic: Com memória episódica (v3.1)
+    
+    A persistência fica no SegmentStore (segmentos imutáveis + WAL). Réplicas
+    (read_only=True) não fazem mutações: mapeiam os vetores dos segmentos em
+    memória (compartilhando o page cache entre processos) e recarregam quando
+    o writer publica uma nova geração no arquivo `generation`.
     """
     
-    def __init__(self, mode='enhanced'):
-        logger.info(f"Inicializando RAGServer v{__version__} em modo '{mode}'")
+    def __init__(self, mode='enhanced', read_only: Optional[bool] = None):
+        self.read_only = config.READ_ONLY if read_only is None else read_only
+        logger.info(f"Inicializando RAGServer v{__version__} em modo '{mode}'"
+                    f"{' (réplica somente leitura)' if self.read_only else ''}")
         
         self.mode = mode
         self.documents = []
@@ -152,6 +305,29 @@ class RAGServer:
         self.legacy_id_map = {}  # legacy_id -> new_id mapping
         self.tags_index = defaultdict(set)  # tag -> document_ids
         self.categories_index = defaultdict(set)  # category -> document_ids
+        self.sources_index = defaultdict(set)  # source -> document_ids
+        self.sorted_indexes = {}  # campo -> [(chave, id)] ordenado, sob demanda
+        self.filter_bitmaps = {}  # (campo, valor) -> máscara bool por posição, sob demanda
+        self.corpus_version = 0  # incrementada a cada reconstrução de índices
+        self.generation = None  # geração carregada do disco
+        self._last_refresh_check = time.monotonic()
+        self.store = SegmentStore(
+            CACHE_PATH / SEGMENTS_DIRNAME,
+            generation_file=CACHE_PATH / GENERATION_FILENAME,
+            lock_file=CACHE_PATH / WRITER_LOCK_FILENAME,
+            read_only=self.read_only,
+            flush_threshold=config.SEGMENT_FLUSH_DOCS,
+            max_segments=config.SEGMENT_MAX_COUNT,
+            merge_factor=config.SEGMENT_MERGE_FACTOR,
+            obsolete_grace=config.SEGMENT_OBSOLETE_GRACE,
+            export_file=CACHE_FILE if config.LEGACY_EXPORT else None
+        )
+        self.percolator = Percolator(
+            CACHE_PATH / STANDING_QUERIES_FILENAME,
+            CACHE_PATH / PERCOLATOR_LOG_FILENAME,
+            default_threshold=config.PERCOLATE_THRESHOLD
+        )
+        self.percolator.load()
         
         # Inicializar componentes baseado no modo
         self._initialize_mode()
@@ -184,28 +360,137 @@ class RAGServer:
                 logger.info(f"TF-IDF inicializado (max_features={config.TFIDF_MAX_FEATURES})")
     
     def load_documents(self):
-        """Carrega documentos do cache com suporte a novos campos"""
-        if CACHE_FILE.exists():
-            try:
-                logger.info(f"Carregando documentos de {CACHE_FILE}")
-                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.documents = data.get('documents', [])
-                    logger.info(f"Carregados {len(self.documents)} documentos do cache")
-                    
-                    # Migrar documentos antigos se no modo enhanced
-                    if self.mode in ['enhanced', 'episodic']:
-                        self._migrate_documents()
-            except Exception as e:
-                logger.error(f"Erro ao carregar documentos: {e}")
-                self.documents = []
+        """Carrega documentos do store segmentado (migrando o cache legado)"""
+        # Ler a geração antes dos arquivos: se o writer publicar no meio da
+        # leitura, a próxima verificação detecta e recarrega
+        self.generation = self.store.read_generation()
+        
+        if not self.store.exists() and CACHE_FILE.exists():
+            self._load_legacy_cache()
+            if not self.read_only:
+                try:
+                    self.store.import_documents(self.documents, self.embeddings)
+                    self.generation = self.store.generation
+                    logger.info(f"Cache legado migrado para segmentos em {self.store.root}")
+                except Exception as e:
+                    logger.error(f"Erro ao migrar cache legado para segmentos: {e}")
+            return
+        
+        try:
+            documents, vectors = self.store.load()
+        except Exception as e:
+            logger.error(f"Erro ao carregar segmentos: {e}")
+            documents, vectors = [], None
+        
+        self.documents = documents
+        if vectors is None or not HAS_EMBEDDINGS:
+            self.embeddings = None
+        elif self.read_only:
+            # Blocos mapeados em memória, sem cópia
+            self.embeddings = vectors
+        else:
+            self.embeddings = vectors.materialize()
+        logger.info(f"Carregados {len(self.documents)} documentos de {len(self.store.segment_names)} segmentos")
+    
+    def _load_legacy_cache(self):
+        """Lê documents.json + vectors.npy do formato anterior aos segmentos"""
+        try:
+            logger.info(f"Carregando documentos de {CACHE_FILE}")
+            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                self.documents = data.get('documents', [])
+                logger.info(f"Carregados {len(self.documents)} documentos do cache")
+                
+                # Migrar documentos antigos se no modo enhanced
+                # (réplicas não migram: os IDs gerados divergiriam do writer)
+                if self.mode in ['enhanced', 'episodic'] and not self.read_only:
+                    self._migrate_documents()
+        except Exception as e:
+            logger.error(f"Erro ao carregar documentos: {e}")
+            self.documents = []
         
         # Carregar embeddings se existirem
         if VECTORS_FILE.exists() and HAS_EMBEDDINGS:
             try:
-                self.embeddings = np.load(VECTORS_FILE)
+                if self.read_only:
+                    self.embeddings = np.load(VECTORS_FILE, mmap_mode='r')
+                else:
+                    self.embeddings = np.load(VECTORS_FILE)
             except:
                 self.embeddings = None
+        
+        # Vetores desalinhados não são usados (nem migrados)
+        if self.embeddings is not None and len(self.embeddings) != len(self.documents):
+            logger.warning("Vetores desalinhados com documentos, ignorando vectors.npy")
+            self.embeddings = None
+    
+    def _vector_at(self, idx: int) -> Optional[np.ndarray]:
+        """Embedding do documento na posição idx (se alinhado)"""
+        if self.embeddings is None or len(self.embeddings) != len(self.documents):
+            return None
+        return np.asarray(self.embeddings[idx])
+    
+    def _similarities(self, query_embedding) -> np.ndarray:
+        """Similaridade de cosseno da query contra o corpus"""
+        if isinstance(self.embeddings, VectorView):
+            return self.embeddings.similarities(query_embedding)
+        return cosine_similarity(query_embedding, self.embeddings)[0]
+    
+    def start_background_merge(self):
+        """Inicia merge de segmentos e export legado em background (writer)"""
+        if not self.read_only:
+            self.store.start_maintenance(config.SEGMENT_MAINTENANCE_INTERVAL)
+    
+    def close(self):
+        """Persiste pendências (WAL e export legado) e libera recursos do store"""
+        self.store.stop_maintenance()
+        if not self.read_only:
+            self.store.sync()
+            self.store.export_documents(self.documents)
+        self.store.close()
+    
+    def snapshot(self, target: Path) -> Dict:
+        """
+        Snapshot consistente do índice em `target` sem bloquear buscas
+
+        O writer grava antes as escritas pendentes no WAL, então o snapshot
+        inclui tudo que já foi confirmado ao cliente. Retorna a geração e os
+        arquivos ({caminho relativo ao cache: caminho no snapshot}).
+        """
+        if not self.read_only:
+            self.store.sync()
+        info = self.store.snapshot(Path(target) / SEGMENTS_DIRNAME)
+        info['files'] = {f"{SEGMENTS_DIRNAME}/{name}": path for name, path in info['files'].items()}
+        return info
+    
+    def _check_writable(self):
+        """Garante que a instância pode mutar o índice"""
+        if self.read_only:
+            raise ReadOnlyError("Réplica somente leitura: mutações devem ir para o writer")
+    
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Recarrega o índice se o writer publicou uma nova geração.
+        
+        Só tem efeito em réplicas; a verificação do arquivo de geração é
+        limitada a uma vez por REPLICA_REFRESH_INTERVAL segundos.
+        """
+        if not self.read_only:
+            return False
+        
+        now = time.monotonic()
+        if not force and now - self._last_refresh_check < config.REPLICA_REFRESH_INTERVAL:
+            return False
+        self._last_refresh_check = now
+        
+        previous = self.generation
+        if self.store.read_generation() == previous:
+            return False
+        
+        logger.info(f"Nova geração detectada ({previous} -> {self.store.generation}), recarregando")
+        self.load_documents()
+        self.build_indices()
+        return True
     
     def _migrate_documents(self):
         """Migra documentos antigos para novo formato"""
@@ -237,17 +522,18 @@ class RAGServer:
         if migrated_count > 0:
             logger.info(f"Migrados {migrated_count} documentos para UUID4")
     
+    @timed_phase('persist')
     def save_documents(self):
-        """Salva documentos e embeddings no cache"""
+        """Grava as escritas pendentes no store e publica nova geração"""
+        self._check_writable()
         CACHE_PATH.mkdir(parents=True, exist_ok=True)
         
-        # Salvar documentos
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump({'documents': self.documents}, f, ensure_ascii=False, indent=2)
+        # WAL (e flush para segmento quando a memtable enche)
+        self.store.sync()
+        self.generation = self.store.generation
         
-        # Salvar embeddings
-        if self.embeddings is not None:
-            np.save(VECTORS_FILE, self.embeddings)
+        # documents.json legado para leitores externos
+        self.store.export_documents(self.documents)
         
         # Atualizar estatísticas
         if config.SAVE_STATS:
@@ -259,12 +545,17 @@ class RAGServer:
         with open(STATS_FILE, 'w', encoding='utf-8') as f:
             json.dump(stats, f, ensure_ascii=False, indent=2)
     
+    @timed_phase('index')
     def build_indices(self):
         """Constrói índices para busca rápida"""
         self.document_index = {}
         self.tags_index = defaultdict(set)
         self.categories_index = defaultdict(set)
-        
+        self.sources_index = defaultdict(set)
+        self.sorted_indexes = {}
+        self.filter_bitmaps = {}
+        self.corpus_version += 1
+
         for i, doc in enumerate(self.documents):
             doc_id = doc.get('id')
             if doc_id:
@@ -277,6 +568,9 @@ class RAGServer:
                 # Índice de categorias
                 category = doc.get('category', 'uncategorized')
                 self.categories_index[category.lower()].add(doc_id)
+                
+                # Índice de fontes
+                self.sources_index[doc.get('source')].add(doc_id)
         
         # Construir matriz TF-IDF se disponível
         if HAS_TFIDF and self.tfidf and len(self.documents) > 0:
@@ -317,6 +611,7 @@ class RAGServer:
         """
         Busca principal - delega para o modo apropriado
         """
+        self.refresh()
         if self.mode in ['semantic', 'enhanced', 'episodic']:
             return self.semantic_search(query, limit)
         else:
@@ -333,20 +628,30 @@ class RAGServer:
         if self.model and HAS_EMBEDDINGS:
             try:
                 # Gerar embedding da query
-                query_embedding = self.model.encode([query])
+                with timed_phase('encode'):
+                    query_embedding = self.model.encode([query])
                 
                 # Se não temos embeddings dos documentos, criar agora
+                # (réplicas não recodificam o corpus: usam o fallback até a próxima geração)
                 if self.embeddings is None or len(self.embeddings) != len(self.documents):
+                    if self.read_only:
+                        raise ReadOnlyError("Réplica sem vetores alinhados")
                     texts = [f"{doc.get('title', '')} {doc.get('content', '')}" for doc in self.documents]
-                    self.embeddings = self.model.encode(texts, batch_size=config.EMBEDDING_BATCH_SIZE)
+                    with timed_phase('encode'):
+                        self.embeddings = self.model.encode(texts, batch_size=config.EMBEDDING_BATCH_SIZE)
                     if config.CACHE_EMBEDDINGS:
-                        np.save(VECTORS_FILE, self.embeddings)
+                        with timed_phase('persist'):
+                            for doc, vector in zip(self.documents, self.embeddings):
+                                self.store.put(doc, vector)
+                            self.store.sync()
                 
                 # Calcular similaridade
-                similarities = cosine_similarity(query_embedding, self.embeddings)[0]
+                with timed_phase('score'):
+                    similarities = self._similarities(query_embedding)
                 
                 # Ordenar por similaridade
-                indices = np.argsort(similarities)[::-1][:limit]
+                with timed_phase('rank'):
+                    indices = np.argsort(similarities)[::-1][:limit]
                 
                 for idx in indices:
                     if similarities[idx] > config.SIMILARITY_THRESHOLD:
@@ -362,9 +667,12 @@ class RAGServer:
         # Fallback para TF-IDF
         if HAS_TFIDF and self.tfidf_matrix is not None:
             try:
-                query_vec = self.tfidf.transform([query])
-                similarities = cosine_similarity(query_vec, self.tfidf_matrix)[0]
-                indices = np.argsort(similarities)[::-1][:limit]
+                with timed_phase('encode'):
+                    query_vec = self.tfidf.transform([query])
+                with timed_phase('score'):
+                    similarities = cosine_similarity(query_vec, self.tfidf_matrix)[0]
+                with timed_phase('rank'):
+                    indices = np.argsort(similarities)[::-1][:limit]
                 
                 for idx in indices:
                     if similarities[idx] > 0.05:
@@ -384,21 +692,145 @@ class RAGServer:
         query_lower = query.lower()
         results = []
         
-        for doc in self.documents:
-            content = f"{doc.get('title', '')} {doc.get('content', '')} {' '.join(doc.get('tags', []))}".lower()
-            if query_lower in content:
-                # Calcular score simples
-                score = content.count(query_lower) / max(len(content.split()), 1)
-                doc_copy = doc.copy()
-                doc_copy['score'] = score
-                results.append(doc_copy)
+        with timed_phase('score'):
+            for doc in self.documents:
+                content = f"{doc.get('title', '')} {doc.get('content', '')} {' '.join(doc.get('tags', []))}".lower()
+                if query_lower in content:
+                    # Calcular score simples
+                    score = content.count(query_lower) / max(len(content.split()), 1)
+                    doc_copy = doc.copy()
+                    doc_copy['score'] = score
+                    results.append(doc_copy)
         
         # Ordenar por score
-        results.sort(key=lambda x: x.get('score', 0), reverse=True)
+        with timed_phase('rank'):
+            results.sort(key=lambda x: x.get('score', 0), reverse=True)
         return results[:limit]
-    
+
+    def compile_query(self, query: str, filters: Optional[Dict] = None,
+                      min_score: Optional[float] = None) -> CompiledQuery:
+        """Prepara uma consulta filtrada para execuções repetidas (filters pode trazer 'sort')"""
+        filters = dict(filters or {})
+        sort = filters.pop('sort', None)
+        if sort is not None and sort not in QUERY_SORTS:
+            raise ValueError(f"sort inválido: {sort} (use {', '.join(QUERY_SORTS)})")
+        return CompiledQuery(query, filters, sort, min_score)
+
+    def search_filtered(self, query: str, limit: int = 5, filters: Optional[Dict] = None,
+                        min_score: Optional[float] = None) -> List[Dict]:
+        """Busca restrita a category/tags/source, resolvidos pelos índices"""
+        return self.search_compiled(self.compile_query(query, filters, min_score), limit)
+
+    def search_compiled(self, compiled: CompiledQuery, limit: int = 5) -> List[Dict]:
+        """
+        Executa uma consulta compilada. Os filtros viram máscaras de bits por
+        posição (em cache até a próxima versão do corpus), a similaridade é
+        calculada só para os candidatos e o top-k sai de um argpartition.
+        Resultados ficam na consulta por limit até o corpus mudar.
+        """
+        self.refresh()
+        if compiled.corpus_version != self.corpus_version:
+            compiled.results = {}
+            compiled.corpus_version = self.corpus_version
+        results = compiled.results.get(limit)
+        if results is None:
+            results = compiled.results[limit] = self._run_compiled(compiled, limit)
+        return [doc.copy() for doc in results]
+
+    def _filter_mask(self, filters: Dict) -> Optional[np.ndarray]:
+        """Interseção das máscaras de cada filtro (None = corpus inteiro)"""
+        mask = None
+        for name in ('category', 'tags', 'source'):
+            if name not in filters:
+                continue
+            key = (name, json.dumps(filters[name], sort_keys=True))
+            bitmap = self.filter_bitmaps.get(key)
+            if bitmap is None:
+                bitmap = np.zeros(len(self.documents), dtype=bool)
+                ids = self._filter_candidates({name: filters[name]})
+                if ids:
+                    bitmap[[self.document_index[doc_id] for doc_id in ids]] = True
+                self.filter_bitmaps[key] = bitmap
+            mask = bitmap if mask is None else mask & bitmap
+        return mask
+
+    def _query_scores(self, compiled: CompiledQuery, positions: np.ndarray) -> Tuple[np.ndarray, float]:
+        """Similaridade da consulta com os documentos em positions e o limiar do backend usado"""
+        if self.model and HAS_EMBEDDINGS and self.embeddings is not None \
+                and len(self.embeddings) == len(self.documents):
+            try:
+                if compiled.embedding is None:
+                    with timed_phase('encode'):
+                        compiled.embedding = self.model.encode([compiled.query])
+                with timed_phase('score'):
+                    if isinstance(self.embeddings, VectorView):
+                        similarities = self.embeddings.similarities(compiled.embedding, positions)
+                    else:
+                        similarities = cosine_similarity(compiled.embedding, self.embeddings[positions])[0]
+                return similarities, config.SIMILARITY_THRESHOLD
+            except Exception as e:
+                logger.warning(f"Erro na busca filtrada com embeddings, tentando fallback: {e}")
+
+        if HAS_TFIDF and self.tfidf_matrix is not None:
+            try:
+                # O vocabulário é reajustado a cada build_indices
+                if compiled.tfidf_version != self.corpus_version:
+                    with timed_phase('encode'):
+                        compiled.tfidf_vector = self.tfidf.transform([compiled.query])
+                    compiled.tfidf_version = self.corpus_version
+                with timed_phase('score'):
+                    similarities = cosine_similarity(compiled.tfidf_vector, self.tfidf_matrix[positions])[0]
+                return similarities, 0.05
+            except Exception as e:
+                logger.warning(f"Erro na busca filtrada com TF-IDF, usando termos: {e}")
+
+        # Fallback: fração dos termos da query presentes no documento
+        terms = query_terms(compiled.query)
+        with timed_phase('score'):
+            similarities = np.zeros(len(positions))
+            if terms:
+                for i, idx in enumerate(positions):
+                    doc = self.documents[idx]
+                    text = f"{doc.get('title', '')} {doc.get('content', '')}".lower()
+                    similarities[i] = sum(1 for term in terms if term in text) / len(terms)
+        return similarities, 0.0
+
+    def _run_compiled(self, compiled: CompiledQuery, limit: int) -> List[Dict]:
+        if not self.documents or limit <= 0:
+            return []
+        mask = self._filter_mask(compiled.filters)
+        positions = np.arange(len(self.documents)) if mask is None else np.flatnonzero(mask)
+        if not len(positions):
+            return []
+
+        scores, threshold = self._query_scores(compiled, positions)
+        if compiled.min_score is None:
+            keep = scores > threshold
+        else:
+            keep = scores >= compiled.min_score
+        positions, scores = positions[keep], scores[keep]
+
+        with timed_phase('rank'):
+            if compiled.sort is not None:
+                descending = QUERY_SORTS[compiled.sort]
+                keys = [self._sort_key(self.documents[idx], 'created_at') for idx in positions]
+                order = sorted(range(len(positions)), key=keys.__getitem__, reverse=descending)[:limit]
+            else:
+                top = np.arange(len(scores))
+                if len(scores) > limit:
+                    top = np.argpartition(-scores, limit - 1)[:limit]
+                order = top[np.argsort(-scores[top], kind='stable')]
+
+        results = []
+        for i in order:
+            doc = self.documents[positions[i]].copy()
+            doc['score'] = float(scores[i])
+            results.append(doc)
+        return results
+
     def search_by_tags(self, tags: List[str], limit: int = 10) -> List[Dict]:
         """Busca documentos por tags"""
+        self.refresh()
         matching_ids = set()
         
         for tag in tags:
@@ -414,6 +846,7 @@ class RAGServer:
     
     def search_by_category(self, category: str, limit: int = 10) -> List[Dict]:
         """Busca documentos por categoria"""
+        self.refresh()
         doc_ids = self.categories_index.get(category.lower(), set())
         results = []
         
@@ -424,47 +857,57 @@ class RAGServer:
         
         return results[:limit]
     
-    def add_document(self, doc: Dict) -> Dict:
-        """Adiciona documento com deduplicação e versionamento"""
+    def _prepare_document(self, doc: Dict):
+        """Preenche ID, hash, timestamps, versão e campos opcionais de um documento novo"""
         # Gerar ID apropriado baseado no modo
         if 'id' not in doc:
             if self.mode in ['enhanced', 'episodic']:
                 doc['id'] = str(uuid.uuid4())
             else:
-                doc['id'] = f"doc_{int(time.time() * 1000)}"
+                # Sufixo aleatório: documentos de um mesmo lote caem no mesmo milissegundo
+                doc['id'] = f"doc_{int(time.time() * 1000)}_{uuid.uuid4().hex[:8]}"
             logger.debug(f"Novo documento criado com ID: {doc['id']}")
-        
+
         # Adicionar campos obrigatórios
-        content = doc.get('content', '')
-        doc['hash'] = self.compute_hash(content)
+        doc['hash'] = self.compute_hash(doc.get('content', ''))
         doc['created_at'] = datetime.now().isoformat()
         doc['updated_at'] = datetime.now().isoformat()
         doc['version'] = 1
-        
+
         # Garantir campos opcionais
         if 'tags' not in doc:
             doc['tags'] = []
         if 'category' not in doc:
             doc['category'] = 'uncategorized'
-        
+
+    def _merge_duplicate(self, existing_doc: Dict, doc: Dict):
+        """Documento duplicado - atualiza metadados do existente"""
+        existing_doc['updated_at'] = doc['updated_at']
+        if config.ENABLE_VERSIONING:
+            existing_doc['version'] = existing_doc.get('version', 1) + 1
+
+        # Mesclar tags
+        existing_tags = set(existing_doc.get('tags', []))
+        new_tags = set(doc.get('tags', []))
+        existing_doc['tags'] = list(existing_tags.union(new_tags))
+
+    def add_document(self, doc: Dict) -> Dict:
+        """Adiciona documento com deduplicação e versionamento"""
+        self._check_writable()
+        self._prepare_document(doc)
+        content = doc.get('content', '')
+
         # Verificar duplicação se configurado
         if config.ENABLE_DEDUPLICATION and self.mode in ['enhanced', 'episodic']:
             for existing_doc in self.documents:
                 if existing_doc.get('hash') == doc['hash']:
-                    # Documento duplicado - atualizar metadados
-                    existing_doc['updated_at'] = doc['updated_at']
-                    if config.ENABLE_VERSIONING:
-                        existing_doc['version'] = existing_doc.get('version', 1) + 1
-                    
-                    # Mesclar tags
-                    existing_tags = set(existing_doc.get('tags', []))
-                    new_tags = set(doc.get('tags', []))
-                    existing_doc['tags'] = list(existing_tags.union(new_tags))
-                    
+                    self._merge_duplicate(existing_doc, doc)
                     logger.info(f"Documento duplicado encontrado, versão incrementada")
+                    self.store.put(existing_doc, self._vector_at(self.document_index.get(existing_doc['id'], -1)))
                     if config.AUTO_SAVE:
                         self.save_documents()
                     self.build_indices()
+                    self._percolate([existing_doc['id']], 'update')
                     return existing_doc
         
         # Adicionar novo documento
@@ -475,7 +918,8 @@ class RAGServer:
         if self.model and HAS_EMBEDDINGS:
             try:
                 text = f"{doc.get('title', '')} {content}"
-                new_embedding = self.model.encode([text])
+                with timed_phase('encode'):
+                    new_embedding = self.model.encode([text])
                 
                 if self.embeddings is None:
                     self.embeddings = new_embedding
@@ -484,13 +928,93 @@ class RAGServer:
             except:
                 pass
         
+        self.store.put(doc, self._vector_at(len(self.documents) - 1))
         if config.AUTO_SAVE:
             self.save_documents()
         self.build_indices()
+        self._percolate([doc['id']], 'add')
         return doc
-    
+
+    def add_documents(self, docs: List[Dict], replace_sources: bool = False,
+                      deduplicate: bool = True) -> List[Dict]:
+        """
+        Adiciona um lote de documentos com um único encode, uma gravação e
+        uma reconstrução de índices (add_document paga os três por
+        documento). Com replace_sources, documentos existentes com a mesma
+        source são removidos antes, como numa reindexação; deduplicate=False
+        grava conteúdos repetidos como documentos próprios (trechos curtos
+        iguais de origens diferentes). Retorna, na ordem de entrada, o
+        documento gravado (o existente se duplicado).
+        """
+        self._check_writable()
+        if not docs:
+            return []
+
+        if replace_sources:
+            stale = set()
+            for doc in docs:
+                if doc.get('source'):
+                    stale.update(self.sources_index.get(doc['source'], ()))
+            if stale:
+                self._drop_documents(stale)
+                logger.info(f"{len(stale)} documentos substituídos no lote")
+
+        dedup = deduplicate and config.ENABLE_DEDUPLICATION and self.mode in ['enhanced', 'episodic']
+        by_hash = {}
+        if dedup:
+            for existing_doc in self.documents:
+                by_hash.setdefault(existing_doc.get('hash'), existing_doc)
+
+        results = []
+        added = []
+        updated = {}
+        for doc in docs:
+            self._prepare_document(doc)
+            existing_doc = by_hash.get(doc['hash']) if dedup else None
+            if existing_doc is not None:
+                self._merge_duplicate(existing_doc, doc)
+                updated[existing_doc['id']] = existing_doc
+                results.append(existing_doc)
+                continue
+            if dedup:
+                by_hash[doc['hash']] = doc
+            added.append(doc)
+            results.append(doc)
+
+        first_new = len(self.documents)
+        self.documents.extend(added)
+
+        # Embeddings do lote inteiro de uma vez
+        if added and self.model and HAS_EMBEDDINGS:
+            try:
+                texts = [f"{doc.get('title', '')} {doc.get('content', '')}" for doc in added]
+                with timed_phase('encode'):
+                    new_embeddings = self.model.encode(texts, batch_size=config.EMBEDDING_BATCH_SIZE)
+
+                if self.embeddings is None:
+                    self.embeddings = new_embeddings
+                else:
+                    self.embeddings = np.vstack([self.embeddings, new_embeddings])
+            except Exception as e:
+                logger.warning(f"Erro ao gerar embeddings do lote, documentos gravados sem vetores: {e}")
+
+        positions = {doc.get('id'): i for i, doc in enumerate(self.documents)}
+        for doc_id, existing_doc in updated.items():
+            self.store.put(existing_doc, self._vector_at(positions[doc_id]))
+        for offset, doc in enumerate(added):
+            self.store.put(doc, self._vector_at(first_new + offset))
+        logger.info(f"Lote adicionado: {len(added)} novos, {len(updated)} duplicados")
+
+        if config.AUTO_SAVE:
+            self.save_documents()
+        self.build_indices()
+        self._percolate([doc['id'] for doc in added], 'add')
+        self._percolate(list(updated), 'update')
+        return results
+
     def update_document(self, doc_id: str, updates: Dict) -> bool:
         """Atualiza documento existente"""
+        self._check_writable()
         # Resolver ID legado se necessário
         resolved_id = self._resolve_id(doc_id)
         
@@ -517,18 +1041,96 @@ class RAGServer:
             if self.model and HAS_EMBEDDINGS and self.embeddings is not None:
                 try:
                     text = f"{doc.get('title', '')} {doc.get('content', '')}"
-                    new_embedding = self.model.encode([text])
+                    with timed_phase('encode'):
+                        new_embedding = self.model.encode([text])
                     self.embeddings[idx] = new_embedding[0]
                 except:
                     pass
         
+        self.store.put(doc, self._vector_at(idx))
         if config.AUTO_SAVE:
             self.save_documents()
         self.build_indices()
+        self._percolate([resolved_id], 'update')
         return True
-    
+
+    def update_documents(self, updates: Dict[str, Dict]) -> int:
+        """
+        Atualiza vários documentos (id -> campos) em lote: conteúdos
+        alterados são recodificados num único encode, com uma gravação e
+        uma reconstrução de índices. Retorna quantos documentos existiam.
+        """
+        self._check_writable()
+        changed = []
+        reencode = []
+        for doc_id, fields in updates.items():
+            resolved_id = self._resolve_id(doc_id)
+            if resolved_id not in self.document_index:
+                continue
+            idx = self.document_index[resolved_id]
+            doc = self.documents[idx]
+
+            for key, value in fields.items():
+                if key not in ['id', 'created_at']:
+                    doc[key] = value
+            doc['updated_at'] = datetime.now().isoformat()
+            if self.mode in ['enhanced', 'episodic']:
+                doc['version'] = doc.get('version', 1) + 1
+            if 'content' in fields:
+                doc['hash'] = self.compute_hash(fields['content'])
+                reencode.append(idx)
+            changed.append(idx)
+
+        if not changed:
+            return 0
+
+        if reencode and self.model and HAS_EMBEDDINGS and self.embeddings is not None:
+            try:
+                texts = [f"{self.documents[idx].get('title', '')} {self.documents[idx].get('content', '')}"
+                         for idx in reencode]
+                with timed_phase('encode'):
+                    new_embeddings = self.model.encode(texts, batch_size=config.EMBEDDING_BATCH_SIZE)
+                self.embeddings[reencode] = new_embeddings
+            except Exception as e:
+                logger.warning(f"Erro ao recodificar embeddings do lote, vetores antigos mantidos: {e}")
+
+        for idx in changed:
+            self.store.put(self.documents[idx], self._vector_at(idx))
+        changed_ids = [self.documents[idx]['id'] for idx in changed]
+        if config.AUTO_SAVE:
+            self.save_documents()
+        self.build_indices()
+        self._percolate(changed_ids, 'update')
+        return len(changed)
+
+    def register_standing_query(self, name: str, query: str, filters: Optional[Dict] = None,
+                                threshold: Optional[float] = None) -> Dict:
+        """Registra uma consulta permanente, avaliada em cada add/update"""
+        self._check_writable()
+        return asdict(self.percolator.register(name, query, filters, threshold))
+
+    def remove_standing_query(self, name: str) -> bool:
+        self._check_writable()
+        return self.percolator.remove(name)
+
+    def _percolate(self, doc_ids: List[str], event: str):
+        """Compara documentos recém-gravados com as consultas permanentes (nunca falha a mutação)"""
+        if not doc_ids:
+            return
+        try:
+            # Consultas registradas por outro processo (CLI, outro servidor) valem sem reiniciar
+            self.percolator.refresh()
+            if not self.percolator.queries:
+                return
+            positions = [self.document_index[doc_id] for doc_id in doc_ids if doc_id in self.document_index]
+            with timed_phase('percolate'):
+                self.percolator.percolate(self, positions, event)
+        except Exception as e:
+            logger.warning(f"Falha ao avaliar consultas permanentes: {e}")
+
     def remove_document(self, doc_id: str) -> bool:
         """Remove documento e seus embeddings"""
+        self._check_writable()
         # Resolver ID legado se necessário
         resolved_id = self._resolve_id(doc_id)
         
@@ -537,7 +1139,8 @@ class RAGServer:
         
         idx = self.document_index[resolved_id]
         
-        # Remover documento
+        # Remover documento (tombstone no próximo flush)
+        self.store.delete(resolved_id)
         self.documents.pop(idx)
         
         # Remover embedding correspondente
@@ -549,40 +1152,230 @@ class RAGServer:
         self.build_indices()
         return True
     
+    def remove_documents(self, doc_ids: List[str]) -> int:
+        """
+        Remove vários documentos com uma gravação e uma reconstrução de
+        índices (remove_document paga as duas por documento). Retorna
+        quantos existiam.
+        """
+        self._check_writable()
+        stale = {self._resolve_id(doc_id) for doc_id in doc_ids}
+        stale &= self.document_index.keys()
+        if not stale:
+            return 0
+        self._drop_documents(stale)
+        if config.AUTO_SAVE:
+            self.save_documents()
+        self.build_indices()
+        return len(stale)
+    
+    def _drop_documents(self, stale: set):
+        """Uma passada sobre documentos e vetores em vez de np.delete por id (índices ficam para o chamador)"""
+        keep = [i for i, d in enumerate(self.documents) if d.get('id') not in stale]
+        if self.embeddings is not None:
+            self.embeddings = self.embeddings[[i for i in keep if i < len(self.embeddings)]]
+        self.documents = [self.documents[i] for i in keep]
+        for doc_id in stale:
+            self.store.delete(doc_id)
+    
+    def shape_result(self, doc: Dict, query: Optional[str] = None, content_mode: str = 'full',
+                     max_chars: Optional[int] = None) -> Dict:
+        """
+        Reduz o content de um resultado conforme o modo pedido
+        
+        - full: documento completo
+        - snippet: janela mais densa em termos da query, com destaques
+        - truncate: primeiros max_chars caracteres
+        - none: sem content (apenas content_length)
+        """
+        if content_mode not in CONTENT_MODES:
+            raise ValueError(f"content_mode inválido: {content_mode} (use {', '.join(CONTENT_MODES)})")
+        if content_mode == 'full':
+            return doc
+        
+        max_chars = max_chars or config.SEARCH_SNIPPET_CHARS
+        content = doc.get('content', '')
+        shaped = {key: value for key, value in doc.items() if key != 'content'}
+        shaped['content_length'] = len(content)
+        
+        if content_mode == 'truncate':
+            shaped['content'] = content[:max_chars]
+            shaped['content_truncated'] = len(content) > max_chars
+        elif content_mode == 'snippet':
+            shaped.update(build_snippet(content, *self._term_positions(doc, query), max_chars))
+        
+        return shaped
+    
+    def _term_positions(self, doc: Dict, query: Optional[str]) -> Tuple[List[str], Dict[str, List[int]]]:
+        """Termos da query e seus offsets no content (postings do segmento ou tokenização)"""
+        terms = query_terms(query or '')
+        if not terms:
+            return terms, {}
+        
+        positions = self.store.positions(doc.get('id'), terms)
+        if positions is None:
+            # Documento ainda na memtable/WAL: tokenizar só este content
+            wanted = set(terms)
+            positions = defaultdict(list)
+            for term, offset in tokenize(doc.get('content', '')):
+                if term in wanted:
+                    positions[term].append(offset)
+        return terms, positions
+    
+    def get_document(self, doc_id: str) -> Optional[Dict]:
+        """Retorna o documento completo pelo ID (aceita IDs legados)"""
+        self.refresh()
+        resolved_id = self._resolve_id(doc_id)
+        if resolved_id not in self.document_index:
+            return None
+        return self.documents[self.document_index[resolved_id]]
+    
     def list_documents(self, filters: Optional[Dict] = None) -> List[Dict]:
-        """Lista documentos com filtros opcionais"""
-        results = []
+        """Lista documentos com filtros opcionais (todas as páginas)"""
+        return self.list_documents_page(filters, limit=None)['documents']
+    
+    def list_documents_page(self, filters: Optional[Dict] = None, limit: Optional[int] = None,
+                            cursor: Optional[str] = None, sort_by: str = 'created_at',
+                            order: str = 'asc', fields: Optional[List[str]] = None) -> Dict:
+        """
+        Lista uma página de documentos usando os índices
         
-        for doc in self.documents:
-            # Aplicar filtros
-            if filters:
-                if 'category' in filters and doc.get('category') != filters['category']:
-                    continue
-                if 'tags' in filters:
-                    doc_tags = set(doc.get('tags', []))
-                    filter_tags = set(filters['tags'])
-                    if not filter_tags.intersection(doc_tags):
-                        continue
-                if 'source' in filters and doc.get('source') != filters['source']:
-                    continue
-            
-            # Resumo do documento
-            results.append({
-                'id': doc.get('id'),
-                'title': doc.get('title'),
-                'category': doc.get('category'),
-                'tags': doc.get('tags', []),
-                'source': doc.get('source'),
-                'created_at': doc.get('created_at'),
-                'updated_at': doc.get('updated_at'),
-                'version': doc.get('version', 1),
-                'content_preview': doc.get('content', '')[:100] + '...' if len(doc.get('content', '')) > 100 else doc.get('content', '')
-            })
+        Filtros (category, tags, source) são resolvidos pelos índices invertidos e
+        a ordenação por índices ordenados de (chave, id); o cursor guarda a
+        última chave retornada, então páginas seguintes não reescaneiam o corpus.
+        """
+        self.refresh()
+        if sort_by not in SORTABLE_FIELDS:
+            raise ValueError(f"sort_by inválido: {sort_by} (use {', '.join(SORTABLE_FIELDS)})")
+        if order not in ('asc', 'desc'):
+            raise ValueError(f"order inválido: {order} (use asc ou desc)")
         
-        return results
+        entries = self._sorted_index(sort_by)
+        candidates = self._filter_candidates(filters)
+        if candidates is not None:
+            entries = sorted(
+                (self._sort_key(self.documents[self.document_index[doc_id]], sort_by), doc_id)
+                for doc_id in candidates
+            )
+        
+        if limit is None:
+            limit = len(entries)
+        
+        # Posição inicial a partir do cursor (keyset pagination)
+        if cursor:
+            cursor_sort, cursor_order, key, last_id = self._decode_cursor(cursor)
+            if (cursor_sort, cursor_order) != (sort_by, order):
+                raise ValueError("Cursor não corresponde à ordenação solicitada")
+            boundary = (key, last_id)
+        else:
+            boundary = None
+        
+        if order == 'asc':
+            start = bisect.bisect_right(entries, boundary) if boundary else 0
+            page = entries[start:start + limit]
+            has_more = start + len(page) < len(entries)
+        else:
+            end = bisect.bisect_left(entries, boundary) if boundary else len(entries)
+            page = entries[max(0, end - limit):end][::-1]
+            has_more = end - len(page) > 0
+        
+        next_cursor = None
+        if has_more and page:
+            next_cursor = self._encode_cursor(sort_by, order, *page[-1])
+        
+        return {
+            'documents': [
+                self._project(self.documents[self.document_index[doc_id]], fields)
+                for _, doc_id in page
+            ],
+            'total': len(entries),
+            'next_cursor': next_cursor,
+            'sort_by': sort_by,
+            'order': order
+        }
+    
+    def _filter_candidates(self, filters: Optional[Dict]) -> Optional[set]:
+        """IDs que satisfazem os filtros (None = corpus inteiro)"""
+        if not filters:
+            return None
+        
+        candidates = None
+        
+        def narrow(ids):
+            return set(ids) if candidates is None else candidates.intersection(ids)
+        
+        if 'category' in filters:
+            category = filters['category']
+            candidates = narrow(
+                doc_id for doc_id in self.categories_index.get(str(category).lower(), ())
+                if self.documents[self.document_index[doc_id]].get('category') == category
+            )
+        if 'tags' in filters:
+            filter_tags = set(filters['tags'])
+            tagged = set()
+            for tag in filter_tags:
+                tagged.update(self.tags_index.get(tag.lower(), ()))
+            candidates = narrow(
+                doc_id for doc_id in tagged
+                if filter_tags.intersection(self.documents[self.document_index[doc_id]].get('tags', []))
+            )
+        if 'source' in filters:
+            candidates = narrow(self.sources_index.get(filters['source'], ()))
+        
+        return candidates
+    
+    def _sort_key(self, doc: Dict, sort_field: str):
+        """Chave de ordenação de um documento"""
+        if sort_field == 'version':
+            return doc.get('version', 1)
+        return doc.get(sort_field) or doc.get('timestamp') or ''
+    
+    def _sorted_index(self, sort_field: str) -> List[Tuple[Any, str]]:
+        """Índice ordenado [(chave, id)] por campo, construído sob demanda"""
+        index = self.sorted_indexes.get(sort_field)
+        if index is None:
+            index = sorted(
+                (self._sort_key(doc, sort_field), doc['id'])
+                for doc in self.documents if doc.get('id')
+            )
+            self.sorted_indexes[sort_field] = index
+        return index
+    
+    @staticmethod
+    def _encode_cursor(sort_by: str, order: str, key: Any, doc_id: str) -> str:
+        """Cursor opaco com a última posição retornada"""
+        raw = json.dumps([sort_by, order, key, doc_id], ensure_ascii=False).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, str, Any, str]:
+        """Decodifica cursor gerado por _encode_cursor"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            sort_by, order, key, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+            return sort_by, order, key, doc_id
+        except Exception:
+            raise ValueError("Cursor inválido")
+    
+    @staticmethod
+    def _project(doc: Dict, fields: Optional[List[str]] = None) -> Dict:
+        """Projeta apenas os campos pedidos (content_preview é derivado)"""
+        projected = {}
+        for name in fields or LIST_SUMMARY_FIELDS:
+            if name == 'content_preview':
+                content = doc.get('content', '')
+                projected[name] = content[:100] + '...' if len(content) > 100 else content
+            elif name == 'tags':
+                projected[name] = doc.get('tags', [])
+            elif name == 'version':
+                projected[name] = doc.get('version', 1)
+            else:
+                projected[name] = doc.get(name)
+        return projected
     
     def get_stats(self) -> Dict:
         """Estatísticas detalhadas do cache"""
+        self.refresh()
         total_size = 0
         categories = defaultdict(int)
         sources = defaultdict(int)
@@ -617,12 +1410,17 @@ class RAGServer:
         stats = {
             'server_version': __version__,
             'server_mode': self.mode,
+            'read_only': self.read_only,
+            'generation': self.generation,
+            'segments': len(self.store.segment_names),
+            'memtable_documents': len(self.store.memtable),
             'total_documents': len(self.documents),
             'total_size_bytes': total_size,
             'total_size_mb': round(total_size / (1024 * 1024), 2),
             'cache_file': str(CACHE_FILE),
             'cache_dir': str(CACHE_PATH),
             'has_embeddings': self.embeddings is not None,
+            'embedding_bytes': int(getattr(self.embeddings, 'nbytes', 0)),
             'embedding_model': config.EMBEDDING_MODEL if self.model else None,
             'has_tfidf': self.tfidf_matrix is not None,
             'categories': dict(categories),
@@ -659,12 +1457,217 @@ def get_server_mode():
     else:
         return 'classic'
 
-# Instância global do servidor
+# Instância global do servidor (criada sob demanda: importar o módulo não
+# deve carregar corpus e modelo em consumidores que usam suas próprias instâncias)
 server_mode = get_server_mode()
-server = RAGServer(mode=server_mode)
+server = None
+
+def get_server() -> RAGServer:
+    """Retorna a instância global, criando-a no primeiro uso"""
+    global server
+    if server is None:
+        server = RAGServer(mode=server_mode)
+    return server
+
+# ============================================================================
+# SERIALIZAÇÃO
+# ============================================================================
+
+@timed_phase('serialize')
+def dumps(obj) -> str:
+    """Serializa o payload de uma resposta uma única vez (orjson quando disponível)"""
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(
+                obj,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+                default=str
+            ).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+def write_message(message: Dict):
+    """Escreve uma mensagem JSON-RPC (uma linha) no stdout"""
+    if HAS_ORJSON:
+        # Bytes direto no buffer: o payload interno já é string e só é escapado
+        sys.stdout.buffer.write(orjson.dumps(message, default=str) + b'\n')
+    else:
+        sys.stdout.write(json.dumps(message, default=str) + '\n')
+    sys.stdout.flush()
+
+def send_notification(method: str, params: Dict):
+    """Envia notificação JSON-RPC (sem id) ao cliente"""
+    write_message({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+def _stream_list(server: RAGServer, filters: Optional[Dict], args: Dict, progress_token, notify) -> Dict:
+    """
+    Envia a listagem em blocos de LIST_STREAM_CHUNK documentos via
+    notifications/progress (o campo message carrega o bloco serializado);
+    a resposta final traz apenas o resumo. Só um bloco fica em memória.
+    """
+    limit = int(args['limit']) if 'limit' in args else None
+    cursor = args.get('cursor')
+    sent = 0
+    chunks = 0
+    total = 0
+    
+    while limit is None or sent < limit:
+        size = config.LIST_STREAM_CHUNK if limit is None else min(config.LIST_STREAM_CHUNK, limit - sent)
+        page = server.list_documents_page(
+            filters,
+            limit=size,
+            cursor=cursor,
+            sort_by=args.get('sort_by', 'created_at'),
+            order=args.get('order', 'asc'),
+            fields=args.get('fields')
+        )
+        total = page['total'] if limit is None else min(page['total'], limit)
+        sent += len(page['documents'])
+        chunks += 1
+        notify('notifications/progress', {
+            'progressToken': progress_token,
+            'progress': sent,
+            'total': total,
+            'message': dumps({'documents': page['documents']})
+        })
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    
+    return {
+        'content': [{
+            'type': 'text',
+            'text': dumps({
+                'streamed': True,
+                'sent': sent,
+                'chunks': chunks,
+                'total': total,
+                'next_cursor': cursor
+            })
+        }]
+    }
+
+_last_metrics_export = 0.0
+
+def record_request_metrics(label: str, success: bool, elapsed: float, phases: Dict):
+    """Alimenta o MetricsCollector e regrava o arquivo Prometheus a cada METRICS_EXPORT_INTERVAL"""
+    global _last_metrics_export
+    if not (HAS_MONITORING and config.METRICS_ENABLED):
+        return
+    metrics_collector.record_request(label, success, elapsed, phases)
+    
+    now = time.monotonic()
+    if now - _last_metrics_export >= config.METRICS_EXPORT_INTERVAL:
+        _last_metrics_export = now
+        export_prometheus()
+        publish_process_info()
+
+def publish_process_info():
+    """
+    Grava pid e coletas do GC deste processo para o monitor.py, que roda em
+    outro processo e mediria a si mesmo com psutil/gc
+    """
+    info = {
+        'pid': os.getpid(),
+        'gc_collections': sum(generation['collections'] for generation in gc.get_stats()),
+        'updated_at': time.time()
+    }
+    try:
+        CACHE_PATH.mkdir(parents=True, exist_ok=True)
+        path = CACHE_PATH / SERVER_PROCESS_FILENAME
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(info))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Falha ao publicar dados do processo: {e}")
+
+def export_prometheus():
+    """Grava a exposição Prometheus em CACHE_PATH/metrics.prom"""
+    if not (HAS_MONITORING and config.METRICS_ENABLED):
+        return
+    try:
+        CACHE_PATH.mkdir(parents=True, exist_ok=True)
+        metrics_collector.write_prometheus(CACHE_PATH / PROMETHEUS_FILENAME)
+    except OSError as e:
+        logger.warning(f"Falha ao gravar métricas Prometheus: {e}")
+
+# ============================================================================
+# PROFILING
+# ============================================================================
+
+profiler = SamplingProfiler()
+
+PROFILE_ACTIONS = ('start', 'stop', 'status', 'tracemalloc_start', 'tracemalloc_snapshot', 'tracemalloc_stop')
+SUBSCRIPTION_ACTIONS = ('list', 'register', 'remove', 'matches')
+
+def run_profile_action(action: str, args: Dict) -> Dict:
+    """Executa uma ação do profiler; arquivos vão para CACHE_PATH/profiles"""
+    output_dir = CACHE_PATH / PROFILES_DIRNAME
+    
+    if action == 'start':
+        duration = min(float(args.get('duration', config.PROFILE_DEFAULT_SECONDS)), config.PROFILE_MAX_SECONDS)
+        interval = float(args.get('interval_ms', config.PROFILE_INTERVAL_MS)) / 1000.0
+        logger.info(f"Profiler iniciado por {duration}s (intervalo {interval * 1000:.1f}ms)")
+        return profiler.start(output_dir, duration, interval)
+    if action == 'stop':
+        return profiler.stop()
+    if action == 'status':
+        return {'sampler': profiler.status(), 'tracemalloc': tracemalloc_status()}
+    if action == 'tracemalloc_start':
+        return start_tracemalloc(int(args.get('frames', 1)))
+    if action == 'tracemalloc_snapshot':
+        return allocation_snapshot(int(args.get('limit', 20)), output_dir)
+    if action == 'tracemalloc_stop':
+        return stop_tracemalloc()
+    raise ValueError(f"Ação de profiling inválida: {action}")
 
-def handle_request(request):
-    """Processa requisições MCP"""
+def run_subscription_action(server: RAGServer, action: str, args: Dict) -> Dict:
+    """Consultas permanentes: registro, remoção e leitura do log de correspondências"""
+    if action == 'list':
+        return {'queries': server.percolator.describe(), 'last_seq': server.percolator.tail_seq()}
+    if action == 'register':
+        filters = {key: args[key] for key in ('category', 'tags', 'source') if key in args}
+        return {'registered': server.register_standing_query(
+            args['name'], args['query'], filters, args.get('threshold'))}
+    if action == 'remove':
+        return {'removed': server.remove_standing_query(args['name'])}
+    if action == 'matches':
+        return server.percolator.matches(int(args.get('since', 0)), args.get('name'),
+                                         int(args.get('limit', 100)))
+    raise ValueError(f"Ação de consultas permanentes inválida: {action}")
+
+def toggle_profiler(signum=None, frame=None):
+    """Handler de SIGUSR2: inicia uma janela padrão ou encerra a corrente"""
+    if profiler.running:
+        status = profiler.stop()
+        logger.info(f"Profiler encerrado via sinal: {status['last_profile']}")
+    else:
+        run_profile_action('start', {})
+
+def handle_request(request, notify=None):
+    """
+    Processa requisições MCP medindo a latência total e por fase
+    
+    `notify(method, params)` envia notificações durante o processamento
+    (progresso/streaming); sem ele as respostas são sempre únicas.
+    """
+    method = request.get('method')
+    label = request.get('params', {}).get('name') if method == 'tools/call' else method
+    phases = {}
+    token = _request_phases.set(phases)
+    start = time.perf_counter()
+    response = None
+    try:
+        response = _dispatch_request(request, notify)
+        return response
+    finally:
+        _request_phases.reset(token)
+        success = response is None or 'error' not in response
+        record_request_metrics(label or 'unknown', success, time.perf_counter() - start, phases)
+
+def _dispatch_request(request, notify=None):
+    """Executa o método MCP requisitado"""
     method = request.get('method')
     params = request.get('params', {})
     
@@ -685,7 +1688,7 @@ def handle_request(request):
         return None
     
     elif method == 'tools/list':
-        # Lista completa de 8 ferramentas
+        # Lista completa de 12 ferramentas
         return {
             'tools': [
                 {
@@ -696,7 +1699,12 @@ def handle_request(request):
                         'properties': {
                             'query': {'type': 'string'},
                             'limit': {'type': 'number', 'default': 5},
-                            'use_semantic': {'type': 'boolean', 'default': True}
+                            'use_semantic': {'type': 'boolean', 'default': True},
+                            'category': {'type': 'string'},
+                            'tags': {'type': 'array', 'items': {'type': 'string'}},
+                            'source': {'type': 'string'},
+                            'content_mode': {'type': 'string', 'enum': list(CONTENT_MODES), 'default': 'snippet'},
+                            'max_chars': {'type': 'number', 'default': config.SEARCH_SNIPPET_CHARS}
                         },
                         'required': ['query']
                     }
@@ -708,7 +1716,9 @@ def handle_request(request):
                         'type': 'object',
                         'properties': {
                             'tags': {'type': 'array', 'items': {'type': 'string'}},
-                            'limit': {'type': 'number', 'default': 10}
+                            'limit': {'type': 'number', 'default': 10},
+                            'content_mode': {'type': 'string', 'enum': list(CONTENT_MODES), 'default': 'full'},
+                            'max_chars': {'type': 'number', 'default': config.SEARCH_SNIPPET_CHARS}
                         },
                         'required': ['tags']
                     }
@@ -720,7 +1730,9 @@ def handle_request(request):
                         'type': 'object',
                         'properties': {
                             'category': {'type': 'string'},
-                            'limit': {'type': 'number', 'default': 10}
+                            'limit': {'type': 'number', 'default': 10},
+                            'content_mode': {'type': 'string', 'enum': list(CONTENT_MODES), 'default': 'full'},
+                            'max_chars': {'type': 'number', 'default': config.SEARCH_SNIPPET_CHARS}
                         },
                         'required': ['category']
                     }
@@ -767,15 +1779,32 @@ def handle_request(request):
                         'required': ['id']
                     }
                 },
+                {
+                    'name': 'get',
+                    'description': 'Retorna o documento completo (content integral) pelo ID',
+                    'inputSchema': {
+                        'type': 'object',
+                        'properties': {
+                            'id': {'type': 'string'},
+                            'fields': {'type': 'array', 'items': {'type': 'string'}}
+                        },
+                        'required': ['id']
+                    }
+                },
                 {
                     'name': 'list',
-                    'description': 'Lista documentos com filtros',
+                    'description': 'Lista documentos com filtros, ordenação e paginação por cursor',
                     'inputSchema': {
                         'type': 'object',
                         'properties': {
                             'category': {'type': 'string'},
                             'tags': {'type': 'array', 'items': {'type': 'string'}},
-                            'source': {'type': 'string'}
+                            'source': {'type': 'string'},
+                            'limit': {'type': 'number', 'default': config.LIST_DEFAULT_LIMIT},
+                            'cursor': {'type': 'string'},
+                            'sort_by': {'type': 'string', 'enum': list(SORTABLE_FIELDS), 'default': 'created_at'},
+                            'order': {'type': 'string', 'enum': ['asc', 'desc'], 'default': 'asc'},
+                            'fields': {'type': 'array', 'items': {'type': 'string'}}
                         }
                     }
                 },
@@ -786,6 +1815,47 @@ def handle_request(request):
                         'type': 'object',
                         'properties': {}
                     }
+                },
+                {
+                    'name': 'metrics',
+                    'description': 'Latência por ferramenta e fase (p50/p90/p99) e contadores de requisições',
+                    'inputSchema': {
+                        'type': 'object',
+                        'properties': {}
+                    }
+                },
+                {
+                    'name': 'profile',
+                    'description': 'Profiler por amostragem (flamegraph collapsed) e top alocadores via tracemalloc',
+                    'inputSchema': {
+                        'type': 'object',
+                        'properties': {
+                            'action': {'type': 'string', 'enum': list(PROFILE_ACTIONS), 'default': 'status'},
+                            'duration': {'type': 'number', 'default': config.PROFILE_DEFAULT_SECONDS},
+                            'interval_ms': {'type': 'number', 'default': config.PROFILE_INTERVAL_MS},
+                            'frames': {'type': 'number', 'default': 1},
+                            'limit': {'type': 'number', 'default': 20}
+                        }
+                    }
+                },
+                {
+                    'name': 'subscriptions',
+                    'description': 'Consultas permanentes: documentos novos ou atualizados que as satisfazem '
+                                   'vão para um log (leitura com since) e para notificações MCP',
+                    'inputSchema': {
+                        'type': 'object',
+                        'properties': {
+                            'action': {'type': 'string', 'enum': list(SUBSCRIPTION_ACTIONS), 'default': 'list'},
+                            'name': {'type': 'string'},
+                            'query': {'type': 'string'},
+                            'category': {'type': 'string'},
+                            'tags': {'type': 'array', 'items': {'type': 'string'}},
+                            'source': {'type': 'string'},
+                            'threshold': {'type': 'number', 'default': config.PERCOLATE_THRESHOLD},
+                            'since': {'type': 'number', 'default': 0},
+                            'limit': {'type': 'number', 'default': 100}
+                        }
+                    }
                 }
             ]
         }
@@ -795,50 +1865,68 @@ def handle_request(request):
         args = params.get('arguments', {})
         
         try:
+            server = get_server()
+            
             if tool_name == 'search':
-                # Usar busca apropriada baseada no modo
-                results = server.search(
-                    args['query'], 
-                    args.get('limit', 5),
-                    context=args.get('context')
-                )
+                filters = {key: args[key] for key in ('category', 'tags', 'source') if key in args}
+                if filters:
+                    results = server.search_filtered(args['query'], args.get('limit', 5), filters)
+                else:
+                    # Usar busca apropriada baseada no modo
+                    results = server.search(
+                        args['query'], 
+                        args.get('limit', 5),
+                        context=args.get('context')
+                    )
+                results = [
+                    server.shape_result(doc, args['query'], args.get('content_mode', 'snippet'), args.get('max_chars'))
+                    for doc in results
+                ]
                 
                 return {
                     'content': [{
                         'type': 'text',
-                        'text': json.dumps({
+                        'text': dumps({
                             'results': results,
                             'query': args['query'],
                             'total': len(results),
                             'server_mode': server_mode,
                             'server_version': __version__
-                        }, ensure_ascii=False)
+                        })
                     }]
                 }
             
             elif tool_name == 'search_by_tags':
                 results = server.search_by_tags(args['tags'], args.get('limit', 10))
+                results = [
+                    server.shape_result(doc, None, args.get('content_mode', 'full'), args.get('max_chars'))
+                    for doc in results
+                ]
                 return {
                     'content': [{
                         'type': 'text',
-                        'text': json.dumps({
+                        'text': dumps({
                             'results': results,
                             'tags': args['tags'],
                             'total': len(results)
-                        }, ensure_ascii=False)
+                        })
                     }]
                 }
             
             elif tool_name == 'search_by_category':
                 results = server.search_by_category(args['category'], args.get('limit', 10))
+                results = [
+                    server.shape_result(doc, None, args.get('content_mode', 'full'), args.get('max_chars'))
+                    for doc in results
+                ]
                 return {
                     'content': [{
                         'type': 'text',
-                        'text': json.dumps({
+                        'text': dumps({
                             'results': results,
                             'category': args['category'],
                             'total': len(results)
-                        }, ensure_ascii=False)
+                        })
                     }]
                 }
             
@@ -854,10 +1942,10 @@ def handle_request(request):
                 return {
                     'content': [{
                         'type': 'text',
-                        'text': json.dumps({
+                        'text': dumps({
                             'success': True,
                             'document': doc
-                        }, ensure_ascii=False)
+                        })
                     }]
                 }
             
@@ -866,10 +1954,10 @@ def handle_request(request):
                 return {
                     'content': [{
                         'type': 'text',
-                        'text': json.dumps({
+                        'text': dumps({
                             'success': success,
                             'id': args['id']
-                        }, ensure_ascii=False)
+                        })
                     }]
                 }
             
@@ -878,22 +1966,48 @@ def handle_request(request):
                 return {
                     'content': [{
                         'type': 'text',
-                        'text': json.dumps({
+                        'text': dumps({
                             'success': success,
                             'id': args['id']
-                        }, ensure_ascii=False)
+                        })
+                    }]
+                }
+            
+            elif tool_name == 'get':
+                doc = server.get_document(args['id'])
+                if doc is not None and args.get('fields'):
+                    doc = server._project(doc, args['fields'])
+                return {
+                    'content': [{
+                        'type': 'text',
+                        'text': dumps({
+                            'found': doc is not None,
+                            'id': args['id'],
+                            'document': doc
+                        })
                     }]
                 }
             
             elif tool_name == 'list':
-                results = server.list_documents(args if args else None)
+                filters = {key: args[key] for key in ('category', 'tags', 'source') if key in args}
+                
+                # Com progressToken, a listagem é enviada em blocos
+                progress_token = params.get('_meta', {}).get('progressToken')
+                if progress_token is not None and notify is not None:
+                    return _stream_list(server, filters or None, args, progress_token, notify)
+                
+                page = server.list_documents_page(
+                    filters or None,
+                    limit=min(int(args.get('limit', config.LIST_DEFAULT_LIMIT)), config.LIST_MAX_LIMIT),
+                    cursor=args.get('cursor'),
+                    sort_by=args.get('sort_by', 'created_at'),
+                    order=args.get('order', 'asc'),
+                    fields=args.get('fields')
+                )
                 return {
                     'content': [{
                         'type': 'text',
-                        'text': json.dumps({
-                            'documents': results,
-                            'total': len(results)
-                        }, ensure_ascii=False)
+                        'text': dumps(page)
                     }]
                 }
             
@@ -902,7 +2016,40 @@ def handle_request(request):
                 return {
                     'content': [{
                         'type': 'text',
-                        'text': json.dumps(stats, ensure_ascii=False, indent=2)
+                        'text': dumps(stats)
+                    }]
+                }
+            
+            elif tool_name == 'metrics':
+                if not (HAS_MONITORING and config.METRICS_ENABLED):
+                    raise RuntimeError("Métricas indisponíveis (monitoring desativado ou psutil ausente)")
+                export_prometheus()
+                return {
+                    'content': [{
+                        'type': 'text',
+                        'text': dumps({
+                            'latency': metrics_collector.get_latency_summary(),
+                            'requests': metrics_collector.performance_stats,
+                            'prometheus_file': str(CACHE_PATH / PROMETHEUS_FILENAME)
+                        })
+                    }]
+                }
+            
+            elif tool_name == 'profile':
+                result = run_profile_action(args.get('action', 'status'), args)
+                return {
+                    'content': [{
+                        'type': 'text',
+                        'text': dumps(result)
+                    }]
+                }
+            
+            elif tool_name == 'subscriptions':
+                result = run_subscription_action(server, args.get('action', 'list'), args)
+                return {
+                    'content': [{
+                        'type': 'text',
+                        'text': dumps(result)
                     }]
                 }
             
@@ -929,7 +2076,29 @@ def main():
     logger.info(f"Cache: {CACHE_PATH}")
     logger.info(f"Embeddings: {HAS_EMBEDDINGS}")
     logger.info(f"TF-IDF: {HAS_TFIDF}")
-    logger.info(f"Documentos carregados: {len(server.documents)}")
+    logger.info(f"Documentos carregados: {len(get_server().documents)}")
+    
+    # Merge de segmentos e export legado fora do caminho das requisições
+    get_server().start_background_merge()
+    
+    # monitor.py observa este pid; GC é republicado junto com as métricas
+    publish_process_info()
+    
+    # Monitoramento no mesmo processo lê a contagem direto do servidor
+    if HAS_MONITORING:
+        metrics_collector.register_gauge('document_count', lambda: len(get_server().documents))
+        metrics_collector.register_gauge('embedding_bytes', lambda: getattr(get_server().embeddings, 'nbytes', 0))
+    
+    # Correspondências de consultas permanentes chegam ao cliente como log MCP
+    if config.PERCOLATE_NOTIFY:
+        get_server().percolator.listeners.append(
+            lambda match: send_notification('notifications/message',
+                                            {'level': 'info', 'logger': 'percolator', 'data': match})
+        )
+    
+    # `kill -USR2 <pid>` liga/desliga o profiler sem passar pelo cliente MCP
+    if hasattr(signal, 'SIGUSR2'):
+        signal.signal(signal.SIGUSR2, toggle_profiler)
     
     while True:
         try:
@@ -937,6 +2106,8 @@ def main():
             line = sys.stdin.readline()
             if not line:
                 logger.info("EOF recebido, encerrando servidor")
+                get_server().close()
+                export_prometheus()
                 break
             
             # Parse JSON-RPC request
@@ -944,7 +2115,7 @@ def main():
             logger.debug(f"Request recebido: {request.get('method', 'unknown')}")
             
             # Processar requisição
-            response = handle_request(request)
+            response = handle_request(request, notify=send_notification)
             
             # Construir resposta JSON-RPC
             if response is not None:
@@ -962,8 +2133,7 @@ def main():
                     }
                 
                 # Enviar resposta
-                print(json.dumps(output))
-                sys.stdout.flush()
+                write_message(output)
         
         except json.JSONDecodeError as e:
             # Erro de parsing
@@ -976,8 +2146,7 @@ def main():
                     'message': 'Parse error'
                 }
             }
-            print(json.dumps(error_response))
-            sys.stdout.flush()
+            write_message(error_response)
         
         except Exception as e:
             # Erro interno
@@ -990,8 +2159,7 @@ def main():
                     'message': f'Internal error: {str(e)}'
                 }
             }
-            print(json.dumps(error_response))
-            sys.stdout.flush()
+            write_message(error_response)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
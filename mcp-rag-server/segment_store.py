@@ -0,0 +1,948 @@
+#!/usr/bin/env python3
+"""
+Segment Store - Armazenamento segmentado (estilo LSM) do MCP RAG Server
+========================================================================
+Substitui o par mutável documents.json + vectors.npy por segmentos imutáveis.
+
+Layout em disco (diretório `segments/` dentro do cache):
+
+    manifest.json            segmentos vivos (em ordem), tombstones e obsoletos
+    wal-<ts>-<pid>.jsonl     escritas recentes de cada writer (memtable)
+    seg-<ts>-<id>/
+        meta.json            ids dos documentos e dimensão dos vetores
+        documents.jsonl      um documento por linha
+        vectors.npy          embeddings normalizados (L2), alinhados às linhas
+        postings.json        termo -> {linha: [offsets no content]}
+
+Escritas vão para a memtable e são registradas no WAL do writer; quando a
+memtable atinge `flush_threshold` documentos ela vira um novo segmento e os
+documentos substituídos recebem tombstone no segmento antigo. A política de
+merge junta segmentos adjacentes pequenos (em background), descartando as
+linhas com tombstone. Segmentos nunca são reescritos, então réplicas podem
+mapeá-los em memória e backups só precisam copiar os segmentos novos.
+snapshot() tira uma cópia consistente por hard links, sem parar o writer.
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Lock entre processos (POSIX)
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
+logger = logging.getLogger("segment-store")
+
+MANIFEST_FILENAME = "manifest.json"
+WAL_PREFIX = "wal-"
+SEGMENT_PREFIX = "seg-"
+SNAPSHOT_FILENAME = "snapshot.json"
+EXPORT_DEBOUNCE_SECONDS = 1.0
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+# ============================================================================
+# UTILITÁRIOS
+# ============================================================================
+
+def tokenize(text: str) -> Iterator[Tuple[str, int]]:
+    """Tokeniza texto em pares (termo minúsculo, offset inicial)"""
+    for match in TOKEN_PATTERN.finditer(text or ''):
+        yield match.group().lower(), match.start()
+
+
+def build_postings(documents: List[Dict]) -> Dict[str, Dict[str, List[int]]]:
+    """Índice invertido posicional: termo -> {linha: [offsets no content]}"""
+    postings: Dict[str, Dict[str, List[int]]] = {}
+    for row, doc in enumerate(documents):
+        key = str(row)
+        for term, offset in tokenize(doc.get('content', '')):
+            postings.setdefault(term, {}).setdefault(key, []).append(offset)
+    return postings
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Normaliza linhas (L2) para similaridade de cosseno por produto escalar"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def atomic_write_json(path: Path, data: Any, **kwargs):
+    """Escreve JSON em arquivo temporário e troca atomicamente"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **kwargs)
+    os.replace(tmp_path, path)
+
+
+def link_or_copy(source: Path, destination: Path) -> Path:
+    """Hard link (mesmo inode, custo zero) ou cópia entre sistemas de arquivos"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+    return Path(destination)
+
+
+# ============================================================================
+# SEGMENTOS E VISÕES
+# ============================================================================
+
+class Segment:
+    """Segmento imutável em disco"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.name = path.name
+        with open(path / 'meta.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.ids: List[str] = meta['ids']
+        self.dim: Optional[int] = meta.get('dim')
+        self._documents = None
+        self._vectors = None
+        self._postings = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def read_documents(self) -> List[Dict]:
+        """Lê os documentos do disco (cópia nova a cada chamada)"""
+        with open(self.path / 'documents.jsonl', 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    @property
+    def documents(self) -> List[Dict]:
+        """Documentos em cache (somente leitura)"""
+        if self._documents is None:
+            self._documents = self.read_documents()
+        return self._documents
+
+    @property
+    def vectors(self) -> Optional[np.ndarray]:
+        """Vetores mapeados em memória (None se o segmento não tem embeddings)"""
+        if self._vectors is None and (self.path / 'vectors.npy').exists():
+            self._vectors = np.load(self.path / 'vectors.npy', mmap_mode='r')
+        return self._vectors
+
+    @property
+    def postings(self) -> Dict[str, Dict[str, List[int]]]:
+        """Índice invertido posicional do segmento"""
+        if self._postings is None:
+            with open(self.path / 'postings.json', 'r', encoding='utf-8') as f:
+                self._postings = json.load(f)
+        return self._postings
+
+    @classmethod
+    def write(cls, path: Path, documents: List[Dict],
+              vectors: Optional[List[Optional[np.ndarray]]] = None) -> 'Segment':
+        """Grava um segmento novo (diretório temporário + rename atômico)"""
+        tmp_path = path.with_name(path.name + '.tmp')
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+
+        with open(tmp_path / 'documents.jsonl', 'w', encoding='utf-8') as f:
+            for doc in documents:
+                f.write(json.dumps(doc, ensure_ascii=False) + '\n')
+
+        dim = None
+        if vectors is not None and documents and all(v is not None for v in vectors):
+            matrix = normalize_rows(np.vstack([np.asarray(v, dtype=np.float32).reshape(1, -1) for v in vectors]))
+            np.save(tmp_path / 'vectors.npy', matrix)
+            dim = int(matrix.shape[1])
+
+        with open(tmp_path / 'postings.json', 'w', encoding='utf-8') as f:
+            json.dump(build_postings(documents), f, ensure_ascii=False)
+
+        with open(tmp_path / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'ids': [doc['id'] for doc in documents],
+                'dim': dim,
+                'created_at': datetime.now().isoformat()
+            }, f)
+
+        os.replace(tmp_path, path)
+        return cls(path)
+
+
+class VectorView:
+    """
+    Visão somente leitura dos vetores vivos, bloco a bloco
+
+    Cada bloco é (matriz normalizada, linhas vivas ou None). Os blocos de
+    segmentos são memmaps: a similaridade é calculada sem copiar a matriz.
+    """
+
+    def __init__(self, blocks: List[Tuple[np.ndarray, Optional[np.ndarray]]]):
+        self.blocks = blocks
+        self._length = sum(len(block) if rows is None else len(rows) for block, rows in blocks)
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        dim = self.blocks[0][0].shape[1] if self.blocks else 0
+        return (self._length, dim)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes dos blocos (mapeados ou em memória), incluindo linhas mortas"""
+        return sum(block.nbytes for block, _ in self.blocks)
+
+    @property
+    def is_memory_mapped(self) -> bool:
+        return bool(self.blocks) and all(isinstance(block, np.memmap) for block, _ in self.blocks)
+
+    def similarities(self, query_embedding, positions=None) -> np.ndarray:
+        """
+        Similaridade de cosseno da query contra os vetores vivos
+
+        Com positions (posições globais, na ordem dos documentos), lê de cada
+        bloco só as linhas candidatas em vez de pontuar o corpus inteiro.
+        """
+        query = normalize_rows(query_embedding)[0]
+        if positions is not None:
+            return self._similarities_at(query, np.asarray(positions, dtype=np.int64))
+        parts = []
+        for block, rows in self.blocks:
+            scores = np.asarray(block @ query)
+            parts.append(scores if rows is None else scores[rows])
+        if not parts:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(parts)
+
+    def _similarities_at(self, query: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        scores = np.zeros(len(positions), dtype=np.float32)
+        start = 0
+        for block, rows in self.blocks:
+            count = len(block) if rows is None else len(rows)
+            selected = np.nonzero((positions >= start) & (positions < start + count))[0]
+            if len(selected):
+                local = positions[selected] - start
+                if rows is not None:
+                    local = rows[local]
+                scores[selected] = np.asarray(block[local]) @ query
+            start += count
+        return scores
+
+    def materialize(self) -> np.ndarray:
+        """Copia os vetores vivos para uma única matriz em memória"""
+        return np.vstack([
+            np.asarray(block) if rows is None else np.asarray(block[rows])
+            for block, rows in self.blocks
+        ])
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class SegmentStore:
+    """Índice segmentado com memtable + WAL, tombstones e merge em background"""
+
+    def __init__(self, root: Path, generation_file: Path, lock_file: Path,
+                 read_only: bool = False, flush_threshold: int = 256,
+                 max_segments: int = 8, merge_factor: int = 4,
+                 obsolete_grace: float = 300.0, export_file: Optional[Path] = None):
+        self.root = Path(root)
+        self.generation_file = Path(generation_file)
+        self.lock_file = Path(lock_file)
+        self.read_only = read_only
+        self.flush_threshold = max(1, flush_threshold)
+        self.max_segments = max(1, max_segments)
+        self.merge_factor = max(2, merge_factor)
+        self.obsolete_grace = obsolete_grace
+        self.export_file = export_file
+
+        self.lock = threading.RLock()
+        self.manifest = self._empty_manifest()
+        self.generation = 0
+        self._segments: Dict[str, Segment] = {}
+
+        # Memtable: escritas deste writer ainda não consolidadas em segmento
+        self.memtable: Dict[str, Tuple[Dict, Optional[np.ndarray]]] = {}
+        self.deleted: set = set()
+        self.locations: Dict[str, Tuple[str, int]] = {}  # id -> (segmento, linha) vivos
+        self._pending: List[Tuple[str, str]] = []  # ops ainda não gravadas no WAL
+        self._wal_path: Optional[Path] = None
+        self._wal_file = None
+        self._adopted_wals: Dict[Path, Any] = {}  # WALs órfãos assumidos (com lock)
+
+        # Manutenção em background (merge, purge e export legado)
+        self._maintenance_thread = None
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._export_dirty = False
+
+    # ------------------------------------------------------------------
+    # Coordenação entre processos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _empty_manifest() -> Dict:
+        return {'version': 1, 'segments': [], 'tombstones': {}, 'obsolete': []}
+
+    def exists(self) -> bool:
+        """Indica se o store já foi inicializado em disco"""
+        return (self.root / MANIFEST_FILENAME).exists()
+
+    def read_generation(self) -> int:
+        """Lê o contador de geração publicado pelo writer"""
+        try:
+            self.generation = int(self.generation_file.read_text().strip() or 0)
+        except (OSError, ValueError):
+            self.generation = 0
+        return self.generation
+
+    def _bump_generation(self) -> int:
+        """Publica nova geração para as réplicas (chamar com o lock de processo)"""
+        generation = self.read_generation() + 1
+        tmp_path = self.generation_file.with_name(self.generation_file.name + '.tmp')
+        tmp_path.write_text(str(generation))
+        os.replace(tmp_path, self.generation_file)
+        self.generation = generation
+        return generation
+
+    @contextmanager
+    def _process_lock(self):
+        """Serializa commits entre processos writer via flock"""
+        self.lock_file.parent.mkdir(parents=True, exist_ok=True)
+        if not HAS_FCNTL:
+            yield
+            return
+        with open(self.lock_file, 'a') as lock_handle:
+            fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def writer_lock(self):
+        """Exclui commits de writers enquanto arquivos do store são trocados por fora (restauração)"""
+        with self.lock, self._process_lock():
+            yield
+
+    def publish_generation(self) -> int:
+        """Publica nova geração sem alterar dados (ex.: arquivos restaurados por fora)"""
+        with self._process_lock():
+            return self._bump_generation()
+
+    def _read_manifest(self) -> Dict:
+        path = self.root / MANIFEST_FILENAME
+        if not path.exists():
+            return self._empty_manifest()
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        for key, value in self._empty_manifest().items():
+            manifest.setdefault(key, value)
+        return manifest
+
+    def _write_manifest(self, manifest: Dict):
+        """Grava o manifest e publica nova geração (chamar com o lock de processo)"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        manifest['updated_at'] = datetime.now().isoformat()
+        atomic_write_json(self.root / MANIFEST_FILENAME, manifest, indent=2)
+        self.manifest = manifest
+        self._export_dirty = True
+        self._bump_generation()
+
+    def _check_writable(self):
+        if self.read_only:
+            raise PermissionError("SegmentStore aberto em modo somente leitura")
+
+    def _segment(self, name: str) -> Segment:
+        """Abre (com cache) um segmento pelo nome"""
+        segment = self._segments.get(name)
+        if segment is None:
+            segment = Segment(self.root / name)
+            self._segments[name] = segment
+        return segment
+
+    def _new_segment_name(self) -> str:
+        return f"{SEGMENT_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+    def _locations(self, manifest: Dict) -> Dict[str, str]:
+        """Mapa id -> segmento para as linhas vivas do manifest"""
+        locations = {}
+        for entry in manifest['segments']:
+            tombstones = set(manifest['tombstones'].get(entry['name'], []))
+            for doc_id in self._segment(entry['name']).ids:
+                if doc_id not in tombstones:
+                    locations[doc_id] = entry['name']
+        return locations
+
+    # ------------------------------------------------------------------
+    # WAL
+    # ------------------------------------------------------------------
+
+    def _own_wal(self):
+        """Abre (e trava) o WAL deste writer na primeira escrita"""
+        if self._wal_file is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._wal_path = self.root / f"{WAL_PREFIX}{time.time_ns():020d}-{os.getpid()}.jsonl"
+            self._wal_file = open(self._wal_path, 'a', encoding='utf-8')
+            if HAS_FCNTL:
+                fcntl.flock(self._wal_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return self._wal_file
+
+    def _try_adopt_wal(self, path: Path) -> bool:
+        """Assume um WAL órfão (writer encerrado) para consolidá-lo no próximo flush"""
+        if path == self._wal_path or path in self._adopted_wals:
+            return True
+        if not HAS_FCNTL:
+            self._adopted_wals[path] = None
+            return True
+        handle = open(path, 'a', encoding='utf-8')
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._adopted_wals[path] = handle
+        return True
+
+    def _read_wal_ops(self) -> List[Tuple[Path, Dict]]:
+        """Lê as operações de todos os WALs, em ordem de criação"""
+        ops = []
+        if not self.root.exists():
+            return ops
+        for path in sorted(self.root.glob(f"{WAL_PREFIX}*.jsonl")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            ops.append((path, json.loads(line)))
+                        except json.JSONDecodeError:
+                            # Linha parcial de um append em andamento
+                            continue
+            except FileNotFoundError:
+                continue
+        return ops
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+
+    def _build_view(self, manifest: Dict, ops: List[Tuple[Path, Dict]], fresh_documents: bool
+                    ) -> Tuple[List[Dict], Optional[VectorView], Dict[str, Tuple[str, int]]]:
+        """
+        Combina segmentos (em ordem) e WAL na visão lógica atual
+
+        Retorna documentos, vetores e o mapa id -> (segmento, linha) das linhas
+        vivas em segmentos (usado para consultar postings).
+        """
+        segments = [self._segment(entry['name']) for entry in manifest['segments']]
+
+        # Última ocorrência de cada id vence; tombstones e deletes removem
+        winner: Dict[str, Any] = {}
+        for index, segment in enumerate(segments):
+            tombstones = set(manifest['tombstones'].get(segment.name, []))
+            for row, doc_id in enumerate(segment.ids):
+                if doc_id not in tombstones:
+                    winner[doc_id] = (index, row)
+
+        wal_docs: Dict[str, Tuple[Dict, Optional[list]]] = {}
+        for _, op in ops:
+            doc_id = op.get('id') or op.get('doc', {}).get('id')
+            if op.get('op') == 'put':
+                wal_docs.pop(doc_id, None)
+                wal_docs[doc_id] = (op['doc'], op.get('vector'))
+                winner[doc_id] = 'wal'
+            elif op.get('op') == 'delete':
+                wal_docs.pop(doc_id, None)
+                winner.pop(doc_id, None)
+
+        documents: List[Dict] = []
+        blocks: List[Tuple[np.ndarray, Optional[np.ndarray]]] = []
+        locations: Dict[str, Tuple[str, int]] = {}
+        has_vectors = True
+
+        for index, segment in enumerate(segments):
+            rows = [row for row, doc_id in enumerate(segment.ids) if winner.get(doc_id) == (index, row)]
+            if not rows:
+                continue
+            seg_docs = segment.read_documents() if fresh_documents else segment.documents
+            documents.extend(seg_docs[row] for row in rows)
+            for row in rows:
+                locations[segment.ids[row]] = (segment.name, row)
+            vectors = segment.vectors
+            if vectors is None:
+                has_vectors = False
+            else:
+                blocks.append((vectors, None if len(rows) == len(segment) else np.asarray(rows)))
+
+        if wal_docs:
+            documents.extend(doc for doc, _ in wal_docs.values())
+            wal_vectors = [vector for _, vector in wal_docs.values()]
+            if all(vector is not None for vector in wal_vectors):
+                blocks.append((normalize_rows(wal_vectors), None))
+            else:
+                has_vectors = False
+
+        if not documents or not has_vectors or not blocks:
+            return documents, None, locations
+        return documents, VectorView(blocks), locations
+
+    def load(self) -> Tuple[List[Dict], Optional[VectorView]]:
+        """
+        Carrega a visão atual (segmentos + WALs)
+
+        Writers recebem cópias novas dos documentos e reconstroem a memtable a
+        partir do próprio WAL e de WALs órfãos; réplicas reutilizam os
+        documentos já parseados de segmentos imutáveis.
+        """
+        with self.lock:
+            self.read_generation()
+            self.manifest = self._read_manifest()
+            ops = self._read_wal_ops()
+
+            if not self.read_only:
+                self.memtable.clear()
+                self.deleted.clear()
+                self._pending.clear()
+                for path, op in ops:
+                    if not self._try_adopt_wal(path):
+                        continue
+                    if op.get('op') == 'put':
+                        doc = op['doc']
+                        vector = op.get('vector')
+                        self.memtable[doc['id']] = (doc, None if vector is None else np.asarray(vector, dtype=np.float32))
+                        self.deleted.discard(doc['id'])
+                    elif op.get('op') == 'delete':
+                        self.memtable.pop(op['id'], None)
+                        self.deleted.add(op['id'])
+
+            documents, vectors, self.locations = self._build_view(
+                self.manifest, ops, fresh_documents=not self.read_only
+            )
+
+            # Writers compartilham os dicts da memtable com a visão retornada
+            if not self.read_only and self.memtable:
+                by_id = {doc['id']: i for i, doc in enumerate(documents)}
+                for doc_id, (doc, vector) in self.memtable.items():
+                    if doc_id in by_id:
+                        self.memtable[doc_id] = (documents[by_id[doc_id]], vector)
+
+            # Liberar segmentos que saíram do manifest
+            live = {entry['name'] for entry in self.manifest['segments']}
+            for name in list(self._segments):
+                if name not in live:
+                    del self._segments[name]
+
+            return documents, vectors
+
+    def snapshot_documents(self) -> List[Dict]:
+        """Documentos persistidos (segmentos + WALs), sem efeitos colaterais"""
+        with self.lock:
+            manifest = self._read_manifest()
+            ops = self._read_wal_ops()
+            documents, _, _ = self._build_view(manifest, ops, fresh_documents=True)
+            return documents
+
+    def positions(self, doc_id: str, terms: List[str]) -> Optional[Dict[str, List[int]]]:
+        """
+        Offsets (no content) de cada termo no documento, lidos dos postings
+        do segmento. None se o documento não está em um segmento (memtable/WAL).
+        """
+        location = self.locations.get(doc_id)
+        if location is None:
+            return None
+        name, row = location
+        segment = self._segments.get(name)
+        if segment is None:
+            return None
+        try:
+            postings = segment.postings
+        except FileNotFoundError:
+            return None
+        key = str(row)
+        return {term: postings.get(term, {}).get(key, []) for term in terms}
+
+    @property
+    def segment_names(self) -> List[str]:
+        return [entry['name'] for entry in self.manifest['segments']]
+
+    def live_segments(self) -> List[Segment]:
+        """Segmentos vivos do manifest carregado"""
+        return [self._segment(name) for name in self.segment_names]
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+
+    def put(self, doc: Dict, vector=None):
+        """Registra inserção/atualização na memtable"""
+        self._check_writable()
+        with self.lock:
+            doc_id = doc['id']
+            self.memtable.pop(doc_id, None)
+            self.memtable[doc_id] = (doc, None if vector is None else np.asarray(vector, dtype=np.float32))
+            self.locations.pop(doc_id, None)
+            self.deleted.discard(doc_id)
+            self._pending.append(('put', doc_id))
+
+    def delete(self, doc_id: str):
+        """Registra remoção (tombstone no próximo flush)"""
+        self._check_writable()
+        with self.lock:
+            self.memtable.pop(doc_id, None)
+            self.locations.pop(doc_id, None)
+            self.deleted.add(doc_id)
+            self._pending.append(('delete', doc_id))
+
+    def sync(self) -> bool:
+        """
+        Grava as operações pendentes no WAL e publica nova geração
+
+        Quando a memtable atinge `flush_threshold` ela é consolidada em um
+        segmento. Retorna True se algo foi gravado.
+        """
+        self._check_writable()
+        with self.lock:
+            if not self._pending:
+                return False
+
+            lines = []
+            for op, doc_id in self._pending:
+                if op == 'put':
+                    if doc_id not in self.memtable:
+                        continue
+                    doc, vector = self.memtable[doc_id]
+                    lines.append(json.dumps({
+                        'op': 'put',
+                        'doc': doc,
+                        'vector': None if vector is None else vector.tolist()
+                    }, ensure_ascii=False) + '\n')
+                else:
+                    lines.append(json.dumps({'op': 'delete', 'id': doc_id}) + '\n')
+
+            with self._process_lock():
+                if not self.exists():
+                    self._write_manifest(self._read_manifest())
+                wal = self._own_wal()
+                wal.write(''.join(lines))
+                wal.flush()
+                self._pending.clear()
+                self._export_dirty = True
+                self._bump_generation()
+
+            if len(self.memtable) + len(self.deleted) >= self.flush_threshold:
+                self.flush()
+            return True
+
+    def flush(self) -> Optional[str]:
+        """Consolida a memtable em um segmento novo e aplica tombstones"""
+        self._check_writable()
+        with self.lock:
+            if not self.memtable and not self.deleted:
+                return None
+
+            name = None
+            segment = None
+            if self.memtable:
+                name = self._new_segment_name()
+                documents = [doc for doc, _ in self.memtable.values()]
+                vectors = [vector for _, vector in self.memtable.values()]
+                segment = Segment.write(self.root / name, documents, vectors)
+                self._segments[name] = segment
+                for row, doc_id in enumerate(segment.ids):
+                    self.locations[doc_id] = (name, row)
+
+            with self._process_lock():
+                manifest = self._read_manifest()
+                locations = self._locations(manifest)
+                tombstones = {k: set(v) for k, v in manifest['tombstones'].items()}
+                for doc_id in list(self.memtable) + list(self.deleted):
+                    location = locations.get(doc_id)
+                    if location:
+                        tombstones.setdefault(location, set()).add(doc_id)
+                manifest['tombstones'] = {k: sorted(v) for k, v in tombstones.items() if v}
+                if segment is not None:
+                    manifest['segments'].append({
+                        'name': name,
+                        'count': len(segment),
+                        'created_at': datetime.now().isoformat()
+                    })
+                self._write_manifest(manifest)
+
+                self.memtable.clear()
+                self.deleted.clear()
+                self._pending.clear()
+                self._truncate_wals()
+
+            logger.info(f"Memtable consolidada no segmento {name} ({len(segment) if segment else 0} docs)")
+            return name
+
+    def _truncate_wals(self):
+        """Descarta WALs já consolidados (próprio é truncado, órfãos removidos)"""
+        if self._wal_file is not None:
+            self._wal_file.truncate(0)
+            self._wal_file.seek(0)
+        for path, handle in list(self._adopted_wals.items()):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            if handle is not None:
+                handle.close()
+            del self._adopted_wals[path]
+
+    def import_documents(self, documents: List[Dict], vectors=None) -> Optional[str]:
+        """Inicializa o store a partir do cache legado (documents.json + vectors.npy)"""
+        self._check_writable()
+        with self.lock, self._process_lock():
+            manifest = self._read_manifest()
+            name = None
+            if documents:
+                rows = None
+                if vectors is not None and len(vectors) == len(documents):
+                    rows = [vectors[i] for i in range(len(documents))]
+                name = self._new_segment_name()
+                segment = Segment.write(self.root / name, documents, rows)
+                manifest['segments'].append({
+                    'name': name,
+                    'count': len(segment),
+                    'created_at': datetime.now().isoformat()
+                })
+            self._write_manifest(manifest)
+            return name
+
+    # ------------------------------------------------------------------
+    # Merge e manutenção
+    # ------------------------------------------------------------------
+
+    def _pick_merge_window(self, manifest: Dict, force: bool) -> List[Dict]:
+        """Escolhe segmentos adjacentes para merge (janela de menor tamanho)"""
+        segments = manifest['segments']
+        if force:
+            if len(segments) > 1 or any(manifest['tombstones'].get(e['name']) for e in segments):
+                return list(segments)
+            return []
+        if len(segments) <= self.max_segments:
+            return []
+        width = min(self.merge_factor, len(segments))
+        best_start = min(
+            range(len(segments) - width + 1),
+            key=lambda i: sum(entry.get('count', 0) for entry in segments[i:i + width])
+        )
+        return segments[best_start:best_start + width]
+
+    def merge(self, force: bool = False) -> Optional[str]:
+        """
+        Junta segmentos adjacentes descartando linhas com tombstone
+
+        O trabalho pesado acontece fora dos locks; tombstones gravados durante
+        o merge são transferidos para o segmento resultante.
+        """
+        if self.read_only:
+            return None
+
+        with self.lock, self._process_lock():
+            manifest = self._read_manifest()
+            window = self._pick_merge_window(manifest, force)
+            if not window:
+                return None
+            names = [entry['name'] for entry in window]
+            snapshot = {name: set(manifest['tombstones'].get(name, [])) for name in names}
+
+        documents: List[Dict] = []
+        vectors: List[Optional[np.ndarray]] = []
+        for name in names:
+            segment = self._segment(name)
+            seg_vectors = segment.vectors
+            for row, doc in enumerate(segment.read_documents()):
+                if doc['id'] in snapshot[name]:
+                    continue
+                documents.append(doc)
+                vectors.append(None if seg_vectors is None else np.asarray(seg_vectors[row]))
+
+        merged_name = self._new_segment_name() if documents else None
+        merged = Segment.write(self.root / merged_name, documents, vectors) if documents else None
+
+        with self.lock, self._process_lock():
+            manifest = self._read_manifest()
+            current = [entry['name'] for entry in manifest['segments']]
+            start = current.index(names[0]) if names[0] in current else -1
+            if start < 0 or current[start:start + len(names)] != names:
+                # Outro writer alterou os segmentos no meio do caminho
+                if merged is not None:
+                    shutil.rmtree(merged.path, ignore_errors=True)
+                return None
+
+            late_tombstones = set()
+            for name in names:
+                late_tombstones |= set(manifest['tombstones'].pop(name, [])) - snapshot[name]
+
+            segments = manifest['segments']
+            replacement = []
+            if merged is not None:
+                replacement.append({
+                    'name': merged_name,
+                    'count': len(merged),
+                    'created_at': datetime.now().isoformat()
+                })
+                if late_tombstones:
+                    manifest['tombstones'][merged_name] = sorted(late_tombstones)
+            manifest['segments'] = segments[:start] + replacement + segments[start + len(names):]
+            now = time.time()
+            manifest['obsolete'].extend({'name': name, 'obsoleted_at': now} for name in names)
+            self._write_manifest(manifest)
+
+            # Apontar postings das linhas mescladas para o segmento novo
+            if merged is not None:
+                merged_from = set(names)
+                for row, doc_id in enumerate(merged.ids):
+                    location = self.locations.get(doc_id)
+                    if location and location[0] in merged_from:
+                        self.locations[doc_id] = (merged_name, row)
+
+        logger.info(f"Merge de {len(names)} segmentos em {merged_name} ({len(documents)} docs)")
+        return merged_name
+
+    def purge_obsolete(self, force: bool = False) -> int:
+        """Remove segmentos substituídos após o período de carência"""
+        if self.read_only:
+            return 0
+        with self.lock, self._process_lock():
+            manifest = self._read_manifest()
+            now = time.time()
+            keep, purged = [], 0
+            for entry in manifest['obsolete']:
+                if force or now - entry['obsoleted_at'] >= self.obsolete_grace:
+                    shutil.rmtree(self.root / entry['name'], ignore_errors=True)
+                    self._segments.pop(entry['name'], None)
+                    purged += 1
+                else:
+                    keep.append(entry)
+            if purged:
+                manifest['obsolete'] = keep
+                self._write_manifest(manifest)
+            return purged
+
+    def snapshot(self, target: Path) -> Dict:
+        """
+        Cópia consistente (ponto no tempo) do store em `target`
+
+        Sob o lock de processo nenhum writer grava WAL nem troca o manifest,
+        então o conjunto manifest + WALs + segmentos vivos é coerente. Os
+        segmentos são imutáveis e entram por hard link (copiados só entre
+        sistemas de arquivos diferentes); manifest e WALs são pequenos e
+        copiados. O lock fica retido só durante essas operações de metadados,
+        e buscas nunca o usam. Escritas ainda na memtable deste processo não
+        entram: chame sync() antes para incluí-las.
+        """
+        target = Path(target)
+        target.mkdir(parents=True, exist_ok=True)
+        with self.lock, self._process_lock():
+            generation = self.read_generation()
+            files: Dict[str, Path] = {}
+            if self.exists():
+                manifest = self._read_manifest()
+                for entry in manifest['segments']:
+                    segment_dir = target / entry['name']
+                    segment_dir.mkdir(exist_ok=True)
+                    for source in sorted((self.root / entry['name']).iterdir()):
+                        files[f"{entry['name']}/{source.name}"] = link_or_copy(source, segment_dir / source.name)
+                for source in sorted(self.root.glob(f"{WAL_PREFIX}*.jsonl")):
+                    if source.stat().st_size:
+                        files[source.name] = Path(shutil.copy2(source, target / source.name))
+                files[MANIFEST_FILENAME] = Path(shutil.copy2(self.root / MANIFEST_FILENAME,
+                                                             target / MANIFEST_FILENAME))
+
+        info = {
+            'generation': generation,
+            'created_at': datetime.now().isoformat(),
+            'files': sorted(files)
+        }
+        atomic_write_json(target / SNAPSHOT_FILENAME, info, indent=2)
+        return dict(info, files=files)
+
+    def export_documents(self, documents: Optional[List[Dict]] = None) -> bool:
+        """
+        Exporta a visão atual para o documents.json legado (leitores externos)
+
+        Com a manutenção em background ativa, o export é adiado para o
+        próximo ciclo e feito a partir do disco.
+        """
+        if self.export_file is None or not self._export_dirty:
+            return False
+        if self.maintenance_running:
+            self._wake_event.set()
+            return False
+        if documents is None:
+            documents = self.snapshot_documents()
+        atomic_write_json(self.export_file, {'documents': documents}, ensure_ascii=False, indent=2)
+        self._export_dirty = False
+        return True
+
+    @property
+    def maintenance_running(self) -> bool:
+        return self._maintenance_thread is not None and self._maintenance_thread.is_alive()
+
+    def start_maintenance(self, interval: float = 30.0):
+        """Inicia thread de merge/purge/export em background"""
+        if self.read_only or self.maintenance_running:
+            return
+        self._stop_event.clear()
+        self._maintenance_thread = threading.Thread(
+            target=self._maintenance_loop, args=(interval,), daemon=True
+        )
+        self._maintenance_thread.start()
+        logger.info("Manutenção de segmentos iniciada")
+
+    def stop_maintenance(self):
+        """Para a thread de manutenção"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._maintenance_thread:
+            self._maintenance_thread.join(timeout=5)
+        self._maintenance_thread = None
+
+    def _maintenance_loop(self, interval: float):
+        while not self._stop_event.is_set():
+            if self._wake_event.wait(interval):
+                # Agrupa rajadas de escrita antes de exportar
+                self._stop_event.wait(EXPORT_DEBOUNCE_SECONDS)
+            self._wake_event.clear()
+            if self._stop_event.is_set():
+                break
+            try:
+                while self.merge():
+                    pass
+                self.purge_obsolete()
+                if self._export_dirty and self.export_file is not None:
+                    atomic_write_json(self.export_file, {'documents': self.snapshot_documents()},
+                                      ensure_ascii=False, indent=2)
+                    self._export_dirty = False
+            except Exception as e:
+                logger.error(f"Erro na manutenção de segmentos: {e}", exc_info=True)
+
+    def close(self):
+        """Para a manutenção e libera os WALs"""
+        self.stop_maintenance()
+        with self.lock:
+            if self._wal_file is not None:
+                self._wal_file.close()
+                self._wal_file = None
+            for handle in self._adopted_wals.values():
+                if handle is not None:
+                    handle.close()
+            self._adopted_wals.clear()
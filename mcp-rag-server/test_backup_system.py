@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Testes do sistema de backup incremental
+Executa com: pytest test_backup_system.py -v
+"""
+
+import pytest
+import sys
+import os
+import json
+import random
+import hashlib
+import tempfile
+import shutil
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import backup_system
+import rag_server
+from segment_store import SegmentStore
+from chunk_store import ChunkStore, CODEC_ZLIB, CODEC_ZSTD
+from backup_catalog import BackupCatalog, COMPACT_MIN_RECORDS
+
+
+def make_documents(count: int, seed: int = 1) -> dict:
+    rng = random.Random(seed)
+    words = [f"palavra{i}" for i in range(2000)]
+    return {'documents': [
+        {'id': f'doc-{i}', 'content': ' '.join(rng.choice(words) for _ in range(400))}
+        for i in range(count)
+    ]}
+
+
+class TestBackupSystem:
+    """Testes para o BackupSystem"""
+
+    @pytest.fixture
+    def cache(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        base = temp_dir / 'cache'
+        base.mkdir()
+        backups = base / 'backups'
+        with patch('backup_system.BASE_PATH', base), \
+             patch('backup_system.BACKUP_BASE_PATH', backups), \
+             patch('backup_system.SEGMENTS_PATH', base / 'segments'), \
+             patch('backup_system.CHUNKS_PATH', backups / 'chunks'):
+            yield base, backup_system.BackupSystem()
+        shutil.rmtree(temp_dir)
+
+    def test_incremental_backup_skips_unchanged(self, cache):
+        """Segundo backup sem mudanças é pulado; mudança grava só chunks novos"""
+        base, system = cache
+        documents = make_documents(300)
+        (base / 'documents.json').write_text(json.dumps(documents))
+
+        first = system.create_backup('manual', include_logs=False)
+        first_manifest = json.loads(first.read_text())
+        assert first_manifest['new_chunks'] == first_manifest['total_chunks'] > 3
+
+        assert system.create_backup('manual', include_logs=False) == first
+
+        documents['documents'][150]['content'] = 'conteúdo alterado'
+        (base / 'documents.json').write_text(json.dumps(documents))
+        second = system.create_backup('manual', include_logs=False)
+        second_manifest = json.loads(second.read_text())
+        assert second != first
+        assert 0 < second_manifest['new_chunks'] <= 2
+        assert second_manifest['size_bytes'] < first_manifest['size_bytes']
+
+        restored = base.parent / 'restored'
+        with patch.object(system, 'create_backup'):
+            assert system.restore_backup(first, restored)
+        assert json.loads((restored / 'documents.json').read_text())['documents'][150] != documents['documents'][150]
+
+    def test_segmented_store_round_trip(self, cache):
+        """Backup do store segmentado restaura segmentos e WAL"""
+        base, system = cache
+        store = SegmentStore(base / 'segments', generation_file=base / 'generation',
+                             lock_file=base / 'writer.lock', flush_threshold=2)
+        for i in range(3):
+            store.put({'id': f'doc-{i}', 'content': f'conteúdo {i}'})
+        store.sync()
+        store.close()
+
+        backup_file = system.create_backup('manual', include_logs=False)
+        files = json.loads(backup_file.read_text())['files']
+        assert 'segments/manifest.json' in files
+        assert any(name.endswith('/documents.jsonl') for name in files)
+
+        restored = base.parent / 'restored'
+        with patch.object(system, 'create_backup'):
+            assert system.restore_backup(backup_file, restored)
+        replica = SegmentStore(restored / 'segments', generation_file=restored / 'generation',
+                               lock_file=restored / 'writer.lock', read_only=True)
+        documents, _ = replica.load()
+        assert sorted(doc['id'] for doc in documents) == ['doc-0', 'doc-1', 'doc-2']
+
+    def test_retention_collects_unreferenced_chunks(self, cache):
+        """Limpeza remove manifests excedentes e os chunks que só eles usavam"""
+        base, system = cache
+        for seed in range(3):
+            (base / 'documents.json').write_text(json.dumps(make_documents(50, seed)))
+            system.create_backup('hourly', include_logs=False)
+
+        chunk_store = system._chunk_store()
+        before = len(list(chunk_store.iter_digests()))
+        system.cleanup_old_backups('hourly', 1)
+
+        remaining = system.list_backups('hourly')
+        assert len(remaining) == 1
+        kept = json.loads(Path(remaining[0]['file']).read_text())
+        referenced = {digest for entry in kept['files'].values() for digest in entry['chunks']}
+        assert set(chunk_store.iter_digests()) == referenced
+        assert len(referenced) < before
+
+    def test_parallel_store_matches_serial(self, cache):
+        """Pool de compressão gera os mesmos chunks e restaura o mesmo arquivo"""
+        base, _ = cache
+        source = base / 'documents.json'
+        source.write_text(json.dumps(make_documents(200)))
+
+        with ChunkStore(base / 'serial', workers=1) as serial, \
+             ChunkStore(base / 'parallel', workers=4) as parallel:
+            serial_entry = serial.store_file(source)
+            parallel_entry = parallel.store_file(source)
+            assert parallel_entry['chunks'] == serial_entry['chunks']
+            assert parallel_entry['sha256'] == serial_entry['sha256']
+
+            parallel.restore_file(parallel_entry, base / 'restored.json')
+        assert (base / 'restored.json').read_bytes() == source.read_bytes()
+
+    def test_zlib_fallback_without_zstandard(self, cache):
+        """Sem zstandard grava zlib; chunk zstd existente falha com mensagem clara"""
+        base, _ = cache
+        with patch('chunk_store.HAS_ZSTD', False):
+            store = ChunkStore(base / 'chunks')
+            assert store.codec == CODEC_ZLIB
+            data = b'abc' * 10000
+            store.put(data)
+            assert store.get(hashlib.sha256(data).hexdigest()) == data
+            with pytest.raises(RuntimeError):
+                ChunkStore.decode(CODEC_ZSTD + b'payload')
+
+    def test_backup_from_server_snapshot(self, cache):
+        """Backup consome o snapshot do servidor e registra a geração"""
+        base, _ = cache
+        with patch('rag_server.CACHE_PATH', base), \
+             patch('rag_server.CACHE_FILE', base / 'documents.json'), \
+             patch('rag_server.STATS_FILE', base / 'stats.json'):
+            server = rag_server.RAGServer(mode='classic')
+            server.add_document({'title': 'Primeiro', 'content': 'primeiro documento'})
+            system = backup_system.BackupSystem(snapshot_provider=server.snapshot)
+            backup_file = system.create_backup('manual', include_logs=False)
+            server.add_document({'title': 'Segundo', 'content': 'segundo documento'})
+
+            manifest = json.loads(backup_file.read_text())
+            assert manifest['generation'] == server.store.generation - 1
+            assert 'segments/manifest.json' in manifest['files']
+            assert not list(base.glob('.backup-snapshot-*'))
+
+            restored = base.parent / 'restored'
+            with patch.object(system, 'create_backup'):
+                assert system.restore_backup(backup_file, restored)
+            server.close()
+        replica = SegmentStore(restored / 'segments', generation_file=restored / 'generation',
+                               lock_file=restored / 'writer.lock', read_only=True)
+        documents, _ = replica.load()
+        assert [doc['title'] for doc in documents] == ['Primeiro']
+
+    def test_restore_is_point_in_time(self, cache):
+        """WALs e segmentos posteriores ao backup saem do destino na restauração"""
+        base, _ = cache
+        with patch('rag_server.CACHE_PATH', base), \
+             patch('rag_server.CACHE_FILE', base / 'documents.json'), \
+             patch('rag_server.STATS_FILE', base / 'stats.json'):
+            server = rag_server.RAGServer()
+            server.add_documents([{'title': f'doc{i}', 'content': f'documento {i}'} for i in range(3)])
+            server.store.flush()
+            system = backup_system.BackupSystem(snapshot_provider=server.snapshot)
+            backup_file = system.create_backup('manual', include_logs=False)
+            server.close()
+
+            other = rag_server.RAGServer()
+            other.add_document({'title': 'AFTER BACKUP', 'content': 'escrito depois do backup'})
+            other.store.flush()
+            other.add_document({'title': 'AFTER FLUSH', 'content': 'ainda no WAL'})
+            other.close()
+
+            assert system.restore_backup(backup_file, base, pre_restore=False)
+            replica = rag_server.RAGServer(read_only=True)
+        assert sorted(doc['title'] for doc in replica.documents) == ['doc0', 'doc1', 'doc2']
+        listed = {name.split('/')[1] for name in json.loads(backup_file.read_text())['files']
+                  if name.startswith('segments/')}
+        assert {path.name for path in (base / 'segments').iterdir()} <= listed
+
+    def test_lazy_restore_serves_before_vectors(self, cache):
+        """Restauração preguiçosa publica documentos antes dos vetores"""
+        base, system = cache
+        store = SegmentStore(base / 'segments', generation_file=base / 'generation',
+                             lock_file=base / 'writer.lock', flush_threshold=2)
+        for i in range(3):
+            store.put({'id': f'doc-{i}', 'content': f'conteúdo {i}'}, np.ones(8) * (i + 1))
+        store.sync()
+        store.close()
+        backup_file = system.create_backup('manual', include_logs=False)
+
+        release = threading.Event()
+        original = ChunkStore.restore_file
+
+        def gated(chunk_store, entry, target):
+            if Path(target).name == 'vectors.npy':
+                release.wait(5)
+            return original(chunk_store, entry, target)
+
+        restored = base.parent / 'restored'
+        with patch.object(ChunkStore, 'restore_file', gated):
+            assert system.restore_backup(backup_file, restored, lazy_vectors=True, pre_restore=False)
+            replica = SegmentStore(restored / 'segments', generation_file=restored / 'generation',
+                                   lock_file=restored / 'writer.lock', read_only=True)
+            documents, vectors = replica.load()
+            assert len(documents) == 3 and vectors is None
+            generation = replica.generation
+
+            release.set()
+            assert system.wait_for_hydration(5)
+        assert replica.read_generation() > generation
+        _, vectors = replica.load()
+        assert len(vectors) == 3
+
+    def test_restore_checks_chunks_before_writing(self, cache):
+        """Chunk ausente aborta a restauração sem tocar no destino"""
+        base, system = cache
+        (base / 'documents.json').write_text(json.dumps(make_documents(20)))
+        backup_file = system.create_backup('manual', include_logs=False)
+        manifest = json.loads(backup_file.read_text())
+        digest = manifest['files']['documents.json']['chunks'][-1]
+        system._chunk_store().path_for(digest).unlink()
+
+        restored = base.parent / 'restored'
+        assert not system.restore_backup(backup_file, restored, pre_restore=False)
+        assert not restored.exists()
+
+
+class TestBackupCatalog:
+    """Testes para o catálogo append-only de backups"""
+
+    @pytest.fixture
+    def base(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_rebuild_then_follow_other_writer(self, base):
+        """Sem catálogo varre os diretórios; depois enxerga appends de outra instância"""
+        (base / 'daily').mkdir()
+        legacy = base / 'daily' / 'rag_backup_daily_20240101_020000.tar.gz'
+        legacy.write_bytes(b'x' * 2048)
+        legacy.with_suffix('.json').write_text(json.dumps({'segments': ['seg-1']}))
+
+        reader = BackupCatalog(base, ['daily', 'manual'])
+        assert [Path(r['file']).name for r in reader.backups()] == [legacy.name]
+        assert reader.backups()[0]['metadata'] == {'segments': ['seg-1']}
+
+        writer = BackupCatalog(base, ['daily', 'manual'])
+        writer.add(base / 'manual' / 'rag_backup_manual_1.manifest.json', 'manual', 1.5)
+        writer.remove(legacy)
+
+        assert [r['type'] for r in reader.backups()] == ['manual']
+        assert reader.latest('manual') == base / 'manual' / 'rag_backup_manual_1.manifest.json'
+        summary = reader.summary(['daily', 'manual'])
+        assert summary['by_type'] == {'daily': {'count': 0, 'size_mb': 0.0},
+                                      'manual': {'count': 1, 'size_mb': 1.5}}
+
+    def test_compaction_keeps_live_records(self, base):
+        """Catálogo é compactado quando os registros mortos dominam"""
+        catalog = BackupCatalog(base, ['hourly'])
+        for i in range(COMPACT_MIN_RECORDS):
+            backup_file = base / 'hourly' / f'rag_backup_hourly_{i:04d}.manifest.json'
+            catalog.add(backup_file, 'hourly', 0.1)
+            if i < COMPACT_MIN_RECORDS - 2:
+                catalog.remove(backup_file)
+
+        lines = (base / 'catalog.jsonl').read_text().splitlines()
+        assert len(lines) < COMPACT_MIN_RECORDS
+        reopened = BackupCatalog(base, ['hourly'])
+        assert [Path(r['file']).name for r in reopened.backups()] == [
+            f'rag_backup_hourly_{i:04d}.manifest.json' for i in (COMPACT_MIN_RECORDS - 2, COMPACT_MIN_RECORDS - 1)
+        ]
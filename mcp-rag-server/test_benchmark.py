@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Testes do benchmark (corpus sintético, embedder determinístico e comparação)
+Executa com: pytest test_benchmark.py -v
+"""
+
+import pytest
+import sys
+import os
+
+import numpy as np
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rag_server
+from benchmark import (StubEmbedder, generate_corpus, percentile, run_scenario, compare_runs,
+                       run_backup_benchmark, run_crawl_benchmark)
+
+
+class TestBenchmark:
+    """Testes para o benchmark"""
+
+    def test_corpus_and_embedder_are_deterministic(self):
+        """Mesma seed gera o mesmo corpus e os mesmos vetores"""
+        first, second = generate_corpus(5, seed=1), generate_corpus(5, seed=1)
+        assert first == second
+
+        embedder = StubEmbedder(dim=32)
+        vectors = embedder.encode([first[0]['content'], first[0]['content']])
+        assert vectors.shape == (2, 32)
+        assert np.allclose(vectors[0], vectors[1])
+        assert np.linalg.norm(vectors[0]) == pytest.approx(1.0)
+
+    def test_percentile_nearest_rank(self):
+        """Percentis por nearest-rank"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 50) == 0.0
+
+    def test_run_scenario_restores_server_paths(self):
+        """Cenário pequeno roda isolado e devolve todas as métricas"""
+        cache_path = rag_server.CACHE_PATH
+        result = run_scenario(30, 'enhanced', queries=5, adds=3)
+
+        assert rag_server.CACHE_PATH == cache_path
+        assert result['size'] == 30 and result['mode'] == 'enhanced'
+        assert result['add_docs_per_s'] > 0
+        assert result['search_p99_ms'] >= result['search_p50_ms'] > 0
+        assert result['peak_rss_mb'] > 0
+
+    def test_compare_flags_regressions(self):
+        """Comparação respeita a direção de cada métrica"""
+        baseline = {'results': [{'size': 10, 'mode': 'classic', 'search_p50_ms': 10.0, 'add_docs_per_s': 100.0}]}
+        current = {'results': [{'size': 10, 'mode': 'classic', 'search_p50_ms': 12.0, 'add_docs_per_s': 120.0}]}
+
+        regressions = compare_runs(baseline, current, threshold=0.10)
+        assert [r['metric'] for r in regressions] == ['search_p50_ms']
+        assert regressions[0]['change_pct'] == 20.0
+        assert compare_runs(baseline, baseline) == []
+
+    def test_backup_benchmark_reports_both_formats(self):
+        """Benchmark de backup mede tar.gz e chunk store com restauração"""
+        result = run_backup_benchmark(docs=100, workers=2)
+        for fmt in ('tar_gz', 'chunked'):
+            assert result[fmt]['ratio'] > 1
+            assert result[fmt]['backup_ms'] > 0 and result[fmt]['restore_ms'] > 0
+        assert result['chunked']['codec'] in ('zstd', 'zlib')
+        assert 0 < result['chunked']['incremental_mb'] <= result['chunked']['size_mb']
+
+    def test_crawl_benchmark_respects_robots(self):
+        """Fronteira busca só as páginas liberadas pelo robots.txt, reaproveitando conexões"""
+        result = run_crawl_benchmark(pages=30, latency=0.0, per_host=2)
+        assert result['serial']['pages'] == 30
+        assert result['frontier']['pages'] == 27
+        assert result['frontier']['crawl']['robots_blocked'] == 3
+        assert result['frontier']['http']['connections'] <= 2
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Testes da indexação paralela de conversas
+Executa com: pytest test_chat_indexer.py -v
+"""
+
+import pytest
+import sys
+import os
+import json
+import time
+import tempfile
+import shutil
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rag_server
+import file_watcher
+from chat_indexer import ChatIndexer
+
+
+def write_chat(path: Path, session_id: str, question: str):
+    lines = [
+        {'type': 'user', 'sessionId': session_id, 'timestamp': '2025-01-01T10:00:00',
+         'message': {'role': 'user', 'content': question}},
+        {'type': 'assistant', 'sessionId': session_id, 'timestamp': '2025-01-01T10:00:05',
+         'message': {'content': [{'type': 'tool_use', 'name': 'Bash', 'input': {}}]}},
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(json.dumps(line) + '\n')
+
+
+class TestParallelIndexing:
+    """Testes para o pipeline de extração em processos + writer em lotes"""
+
+    @pytest.fixture
+    def indexer(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        cache_dir = temp_dir / 'cache'
+        with patch('rag_server.CACHE_PATH', cache_dir), \
+             patch('rag_server.CACHE_FILE', cache_dir / 'documents.json'), \
+             patch('rag_server.STATS_FILE', cache_dir / 'stats.json'):
+            indexer = ChatIndexer()
+            indexer.projects_dir = temp_dir / 'projects'
+            indexer.projects_dir.mkdir()
+            indexer.indexed_cache = cache_dir / 'indexed_chats.json'
+            indexer.indexed_chats = {}
+            yield indexer
+            indexer.server.close()
+        shutil.rmtree(temp_dir)
+
+    def test_pool_indexes_in_batches_and_isolates_errors(self, indexer):
+        """Arquivo ilegível vira erro sem derrubar os demais; lotes substituem versões antigas"""
+        for i in range(5):
+            write_chat(indexer.projects_dir / f'session-{i}.jsonl', f'session-{i}', f'pergunta {i}')
+        # Diretório com nome de conversa: a leitura falha no processo auxiliar
+        (indexer.projects_dir / 'broken.jsonl').mkdir()
+
+        stats = indexer.index_all_chats(workers=2, batch_size=2)
+        assert stats['indexed'] == 5
+        assert stats['batches'] == 3
+        assert list(stats['errors']) == [str(indexer.projects_dir / 'broken.jsonl')]
+        assert len([doc for doc in indexer.server.documents if doc['type'] == 'chat']) == 5
+        assert 'broken' not in indexer.indexed_chats
+        assert json.loads(indexer.indexed_cache.read_text()).keys() == indexer.indexed_chats.keys()
+
+        # Conversa reescrita é relida inteira e atualiza o documento; as demais são puladas
+        write_chat(indexer.projects_dir / 'session-0.jsonl', 'session-0', 'pergunta reescrita')
+        stats = indexer.index_all_chats(workers=1)
+        assert stats['files'] == 2  # session-0 e o diretório com erro
+        assert stats['indexed'] == 1
+        chats = [doc for doc in indexer.server.documents if doc['source'] == 'chat-session-0']
+        assert len(chats) == 1
+        assert 'reescrita' in chats[0]['content']
+
+    def test_appended_session_updates_document_in_place(self, indexer):
+        """Append relê só o trecho novo e atualiza o mesmo documento"""
+        path = indexer.projects_dir / 'session-a.jsonl'
+        write_chat(path, 'session-a', 'pergunta sobre git')
+        indexer.index_all_chats(workers=1)
+        doc_id = next(iter(indexer.server.sources_index['chat-session-a']))
+        size = path.stat().st_size
+
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'assistant', 'sessionId': 'session-a', 'timestamp': '2025-01-01T11:00:00',
+                                'message': {'content': [{'type': 'tool_use', 'name': 'Edit', 'input': {}}]}}) + '\n')
+        assert indexer.index_chat(path)
+
+        assert indexer.last_extract_stats['start_offset'] == size
+        assert indexer.last_extract_stats['lines'] == 1
+        assert list(indexer.server.sources_index['chat-session-a']) == [doc_id]
+        metadata = indexer.server.get_document(doc_id)['metadata']
+        assert metadata['message_count'] == 3
+        assert metadata['tools_used'] == ['Bash', 'Edit']
+        assert metadata['timestamp_end'] == '2025-01-01T11:00:00'
+        assert indexer.indexed_chats['session-a']['offset'] == path.stat().st_size
+
+    def test_reindex_after_other_writer_targets_the_right_documents(self, indexer):
+        """Remoção por outro writer antes do lote não desloca as gravações"""
+        for i in range(3):
+            write_chat(indexer.projects_dir / f'session-{i}.jsonl', f'session-{i}', f'pergunta {i}')
+        indexer.index_all_chats(workers=1)
+        other = rag_server.RAGServer()
+        other.remove_document(next(iter(other.sources_index['chat-session-0'])))
+        other.save_documents()
+        other.close()
+
+        write_chat(indexer.projects_dir / 'session-2.jsonl', 'session-2', 'pergunta reescrita')
+        indexer.index_all_chats(workers=1)
+        reloaded = rag_server.RAGServer()
+        chats = {doc['source']: doc['content'] for doc in reloaded.documents if doc['type'] == 'chat'}
+        reloaded.close()
+        assert sorted(chats) == ['chat-session-1', 'chat-session-2']
+        assert 'pergunta 1' in chats['chat-session-1']
+        assert 'reescrita' in chats['chat-session-2']
+
+    def test_reindex_drops_turns_of_shortened_session(self, indexer):
+        """Com o cache limpo (--reindex), turnos que a sessão não tem mais são removidos"""
+        def turn(question, ts):
+            return [
+                {'type': 'user', 'sessionId': 'sess-a', 'timestamp': ts, 'message': {'content': question}},
+                {'type': 'assistant', 'sessionId': 'sess-a', 'timestamp': ts,
+                 'message': {'content': [{'type': 'text', 'text': f'answer to {question}'}]}},
+            ]
+        path = indexer.projects_dir / 'sess-a.jsonl'
+        for turns in ([turn('first question', 't1'), turn('second question', 't2'), turn('third question', 't3')],
+                      [turn('rewritten question', 't4')]):
+            with open(path, 'w', encoding='utf-8') as f:
+                for line in sum(turns, []):
+                    f.write(json.dumps(line) + '\n')
+            indexer.indexed_chats = {}
+            indexer.index_all_chats(workers=1)
+
+        turn_docs = [doc for doc in indexer.server.documents if doc['type'] == 'chat-turn']
+        assert [doc['source'] for doc in turn_docs] == ['chat-sess-a#0']
+        assert 'rewritten' in turn_docs[0]['content']
+
+    def test_watch_indexes_new_sessions_across_directories(self, indexer, monkeypatch):
+        """Daemon indexa conversas novas de vários diretórios em segundos"""
+        monkeypatch.setattr(file_watcher, 'MISSING_RETRY_INTERVAL', 0.1)
+        other = indexer.projects_dir.parent / 'other-project'
+        indexer.project_dirs = [indexer.projects_dir, other]
+        stop = threading.Event()
+        thread = threading.Thread(target=indexer.watch,
+                                  kwargs={'debounce': 0.1, 'max_delay': 1.0, 'workers': 1, 'stop': stop})
+        thread.start()
+        try:
+            time.sleep(0.3)
+            other.mkdir()
+            write_chat(indexer.projects_dir / 'live-1.jsonl', 'live-1', 'pergunta ao vivo')
+            write_chat(other / 'live-2.jsonl', 'live-2', 'outra pergunta')
+
+            deadline = time.monotonic() + 15
+            while time.monotonic() < deadline and not {'chat-live-1', 'chat-live-2'} <= set(indexer.server.sources_index):
+                time.sleep(0.1)
+        finally:
+            stop.set()
+            thread.join(10)
+        assert {'chat-live-1', 'chat-live-2'} <= set(indexer.server.sources_index)
+        assert not thread.is_alive()
+
+    def test_turns_are_indexed_and_search_groups_by_session(self, indexer):
+        """Cada turno vira documento; a busca devolve uma entrada por sessão com os turnos"""
+        def turn(session_id, question, answer, ts):
+            return [
+                {'type': 'user', 'sessionId': session_id, 'timestamp': ts, 'message': {'content': question}},
+                {'type': 'assistant', 'sessionId': session_id, 'timestamp': ts,
+                 'message': {'content': [{'type': 'text', 'text': answer}]}},
+            ]
+        sessions = {
+            'sess-a': turn('sess-a', 'configure docker compose', 'compose file written', 't1')
+                      + turn('sess-a', 'deploy kubernetes cluster', 'kubernetes helm chart installed', 't2'),
+            'sess-b': turn('sess-b', 'rebase git branch', 'git history rewritten', 't3'),
+        }
+        for session_id, lines in sessions.items():
+            with open(indexer.projects_dir / f'{session_id}.jsonl', 'w', encoding='utf-8') as f:
+                for line in lines:
+                    f.write(json.dumps(line) + '\n')
+
+        indexer.index_all_chats(workers=1)
+        turn_docs = [doc for doc in indexer.server.documents if doc['type'] == 'chat-turn']
+        assert sorted(doc['source'] for doc in turn_docs) == ['chat-sess-a#0', 'chat-sess-a#1', 'chat-sess-b#0']
+
+        found = indexer.search_sessions('kubernetes helm')
+        assert found[0]['session_id'] == 'sess-a'
+        assert [session['session_id'] for session in found].count('sess-a') == 1
+        assert found[0]['turns'][0]['turn'] == 1
+        assert 'kubernetes' in found[0]['turns'][0]['snippet']
+        assert found[0]['title'].startswith('Chat: configure docker compose')
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Testes do parser em streaming de conversas JSONL
+Executa com: pytest test_chat_parser.py -v
+"""
+
+import pytest
+import sys
+import os
+import json
+import tempfile
+import shutil
+from pathlib import Path
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import chat_parser
+from chat_parser import ChatSummary, extract_chat_info
+
+
+def session_lines(payload_size: int = 100):
+    """Sessão sintética: pergunta, tool_use, resultado (com payload) e resposta"""
+    return [
+        {'type': 'user', 'sessionId': 'abcdef123456', 'timestamp': '2025-01-01T10:00:00',
+         'message': {'role': 'user', 'content': 'Como configurar o servidor MCP com docker?'}},
+        {'type': 'assistant', 'sessionId': 'abcdef123456', 'timestamp': '2025-01-01T10:00:05',
+         'message': {'content': [{'type': 'tool_use', 'id': 'toolu_1', 'name': 'Bash',
+                                  'input': {'command': 'x' * payload_size}}]}},
+        {'type': 'user', 'sessionId': 'abcdef123456', 'timestamp': '2025-01-01T10:00:09',
+         'message': {'content': [{'type': 'tool_result', 'content': 'y' * payload_size}]},
+         'toolUseResult': {'stdout': '/Users/ana/app/server.py ok\n' + 'z "q" ' * payload_size,
+                           'nested': {'timestamp': 'nested-should-not-win'}}},
+        {'type': 'assistant', 'sessionId': 'abcdef123456', 'timestamp': '2025-01-01T10:01:00',
+         'message': {'content': [{'type': 'tool_use', 'id': 'toolu_2', 'name': 'Edit', 'input': {}}]}},
+    ]
+
+
+class TestChatParser:
+    """Testes para o parser de conversas"""
+
+    @pytest.fixture
+    def root(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def write_session(self, root: Path, lines) -> Path:
+        path = root / 'session.jsonl'
+        with open(path, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(json.dumps(line) + '\n')
+            f.write('{linha truncada\n')
+        return path
+
+    def test_payload_before_fields_falls_back_to_full_parse(self):
+        """Sem os campos no prefixo (ou com chave aninhada) a linha é decodificada inteira"""
+        big = 'w' * (chat_parser.LARGE_LINE_BYTES + 10)
+        summary = ChatSummary()
+        summary.add_line(json.dumps({'toolUseResult': {'out': '/Users/ana/a.py ' + big},
+                                     'type': 'user', 'timestamp': 't1'}).encode())
+        summary.add_line(json.dumps({'type': 'user', 'timestamp': 't2',
+                                     'extra': {'toolUseResult': big + ' /Users/ana/b.py'}}).encode())
+        assert summary.skipped_payloads == 0
+        assert summary.message_count == 2
+        assert summary.timestamp_end == 't2'
+        assert list(summary.files_modified) == ['/Users/ana/a.py']
+
+    def test_large_payloads_are_skipped_with_same_result(self, root):
+        """Linhas grandes dão o mesmo documento sem decodificar o payload"""
+        small, small_stats = extract_chat_info(self.write_session(root, session_lines(100)))
+        large, large_stats = extract_chat_info(self.write_session(root, session_lines(200000)))
+
+        assert small_stats['skipped_payloads'] == 0
+        assert large_stats['skipped_payloads'] == 1
+        assert large_stats['bytes'] > chat_parser.LARGE_LINE_BYTES
+        assert large_stats['lines'] == 5
+        for doc in (small, large):
+            metadata = doc['metadata']
+            assert doc['title'] == 'Chat: Como configurar o servidor MCP com docker?'
+            assert metadata['tools_used'] == ['Bash', 'Edit']
+            assert metadata['files_modified'] == ['/Users/ana/app/server.py']
+            assert metadata['message_count'] == 4
+            assert metadata['timestamp_end'] == '2025-01-01T10:01:00'
+            assert 'docker' in doc['tags'] and 'rag' in doc['tags']
+
+    def test_empty_session_has_no_document(self):
+        """Sessão sem mensagens válidas não gera documento"""
+        summary = ChatSummary()
+        summary.add_line(b'not json\n')
+        assert summary.to_document(Path('x.jsonl')) is None
+
+    def test_resume_from_state_matches_full_parse(self, root):
+        """Retomar do offset salvo dá o mesmo documento que reler tudo"""
+        lines = [json.dumps(line) + '\n' for line in session_lines(100)]
+        path = root / 'session.jsonl'
+        # Última linha ainda sendo escrita: não é consumida
+        path.write_text(''.join(lines[:2]) + lines[2][:40])
+
+        first = chat_parser.extract_for_index(path)
+        assert first['stats']['lines'] == 2
+        assert first['offset'] == len(''.join(lines[:2]).encode())
+
+        path.write_text(''.join(lines))
+        resumed = chat_parser.extract_for_index(path, first)
+        assert resumed['incremental']
+        assert resumed['stats']['lines'] == 2
+        assert resumed['doc'] == extract_chat_info(path)[0]
+
+        # Arquivo reescrito (não é mais append): volta a ler do início
+        path.write_text(''.join(reversed(lines)))
+        rewritten = chat_parser.extract_for_index(path, resumed)
+        assert not rewritten['incremental']
+        assert rewritten['stats']['lines'] == 4
+
+    def test_turns_split_on_user_text_and_resume(self, root):
+        """Turnos fecham na próxima pergunta; retomar continua o turno aberto"""
+        def msg(kind, content, ts):
+            return {'type': kind, 'sessionId': 'abcdef123456', 'timestamp': ts, 'message': {'content': content}}
+        lines = [json.dumps(line) + '\n' for line in [
+            msg('user', 'Como configurar docker?', 't1'),
+            msg('assistant', [{'type': 'text', 'text': 'Use compose'},
+                              {'type': 'tool_use', 'name': 'Bash', 'input': {}}], 't2'),
+            msg('user', [{'type': 'tool_result', 'content': 'ok'}], 't3'),
+            msg('assistant', [{'type': 'text', 'text': 'Pronto'}], 't4'),
+            msg('user', 'E o kubernetes?', 't5'),
+            msg('assistant', [{'type': 'text', 'text': 'Use helm'}], 't6'),
+        ]]
+        path = root / 'session.jsonl'
+        path.write_text(''.join(lines))
+        full = chat_parser.extract_for_index(path)['turn_docs']
+
+        assert [doc['source'] for doc in full] == ['chat-abcdef123456#0', 'chat-abcdef123456#1']
+        assert full[0]['content'] == 'Usuário: Como configurar docker?\n\nAssistente: Use compose\nPronto\n\nFerramentas: Bash'
+        assert full[1]['metadata']['parent_source'] == 'chat-abcdef123456'
+        assert full[1]['metadata']['timestamp_end'] == 't6'
+
+        path.write_text(''.join(lines[:3]))
+        first = chat_parser.extract_for_index(path)
+        path.write_text(''.join(lines))
+        resumed = chat_parser.extract_for_index(path, first)
+        assert resumed['incremental']
+        assert resumed['turn_docs'] == full
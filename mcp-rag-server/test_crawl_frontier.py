@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Testes da fronteira de crawl e do scraper A2A
+Executa com: pytest test_crawl_frontier.py -v
+"""
+
+import pytest
+import sys
+import os
+import time
+import asyncio
+import tempfile
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import fixture_site
+from crawl_frontier import CrawlFrontier, DomainLimiter, iter_sitemap
+from web_fetch import AsyncFetcher
+
+
+def run_frontier(coro_fn, **kwargs):
+    async def run():
+        async with AsyncFetcher(per_host=4) as fetcher:
+            frontier = CrawlFrontier(fetcher, **kwargs)
+            return await coro_fn(frontier), frontier
+    return asyncio.run(run())
+
+
+class TestCrawlFrontier:
+    """Testes para descoberta por sitemap, robots.txt e ritmo por domínio"""
+
+    def test_discover_follows_robots_sitemap_index(self):
+        """Sitemap do robots.txt, index com parte .xml.gz; outros domínios ficam de fora"""
+        with fixture_site(pages=25, per_sitemap=10) as (base_url, server):
+            urls, frontier = run_frontier(lambda f: f.discover(base_url), domain_delay=0.0)
+        assert len(urls) == 25
+        assert all(url.startswith(base_url) for url in urls)
+        assert frontier.stats['sitemaps'] == 4  # index + 3 partes (a última comprimida)
+        assert frontier.lastmod[urls[0]] == '2025-01-01'
+        assert '/sitemap.xml' not in server.hits  # robots.txt tem precedência
+
+    def test_discover_respects_max_pages(self):
+        with fixture_site(pages=25, per_sitemap=10) as (base_url, server):
+            urls, _ = run_frontier(lambda f: f.discover(base_url), domain_delay=0.0, max_pages=12)
+        assert len(urls) == 12
+
+    def test_robots_fetched_once_and_enforced(self):
+        """Chamadas concorrentes compartilham uma busca do robots.txt; /private/ fica bloqueada"""
+        with fixture_site(pages=20) as (base_url, server):
+            urls = [f"{base_url}/docs/page-{i}.html" for i in range(9)] + [f"{base_url}/private/page-9.html"]
+            results, frontier = run_frontier(lambda f: f.fetch_all(urls), domain_delay=0.0)
+            assert server.hits['/robots.txt'] == 1
+            assert '/private/page-9.html' not in server.hits
+        assert results[-1] is None
+        assert all(result.ok for result in results[:-1])
+        assert frontier.stats['robots_blocked'] == 1
+
+    def test_missing_robots_allows_everything(self):
+        with fixture_site(pages=10) as (base_url, server):
+            del server.files['/robots.txt']
+            results, frontier = run_frontier(
+                lambda f: f.fetch_all([f"{base_url}/private/page-9.html"]), domain_delay=0.0)
+        assert results[0].ok
+
+    def test_domain_delay_spaces_requests_per_domain(self):
+        """Cinco URLs do mesmo domínio com intervalo de 0.1s levam ao menos 0.4s"""
+        with fixture_site(pages=10) as (base_url, server):
+            urls = [f"{base_url}/docs/page-{i}.html" for i in range(5)]
+            start = time.monotonic()
+            run_frontier(lambda f: f.fetch_all(urls), domain_delay=0.1)
+            assert time.monotonic() - start >= 0.4
+
+    def test_limiter_runs_domains_in_parallel(self):
+        async def run():
+            limiter = DomainLimiter()
+            start = asyncio.get_running_loop().time()
+            await asyncio.gather(*(limiter.wait(domain, 0.1) for domain in ['a', 'b', 'a', 'b']))
+            return asyncio.get_running_loop().time() - start
+        assert 0.09 <= asyncio.run(run()) < 0.19
+
+    def test_iter_sitemap_streams_entries(self):
+        xml = (b'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+               b'<url><loc> https://a.example/x </loc><lastmod>2025-02-01</lastmod></url>'
+               b'<url><loc>https://a.example/y</loc></url></urlset>')
+        assert list(iter_sitemap(xml)) == [('url', 'https://a.example/x', '2025-02-01'),
+                                           ('url', 'https://a.example/y', None)]
+
+
+class TestWebScraper:
+    """Testes para o scraper sobre a fronteira"""
+
+    @pytest.fixture
+    def scraper(self, monkeypatch):
+        temp_dir = Path(tempfile.mkdtemp())
+        cache_dir = temp_dir / 'cache'
+        monkeypatch.setenv('HOME', str(temp_dir))
+        monkeypatch.setenv('RAG_CACHE_DIR', str(cache_dir))
+        monkeypatch.setenv('RAG_FETCH_EXTRACT_WORKERS', '1')
+        monkeypatch.setenv('RAG_CRAWL_DOMAIN_DELAY', '0')
+        # Sem cache em disco: os 304 vêm dos validadores do estado de crawl
+        monkeypatch.setenv('RAG_FETCH_CACHE', 'false')
+        with patch('rag_server.CACHE_PATH', cache_dir), \
+             patch('rag_server.CACHE_FILE', cache_dir / 'documents.json'), \
+             patch('rag_server.STATS_FILE', cache_dir / 'stats.json'):
+            from a2a_web_scraper import A2AWebScraper
+            scraper = A2AWebScraper()
+            yield scraper
+            scraper.server.close()
+        shutil.rmtree(temp_dir)
+
+    def test_scrape_site_indexes_pages_and_upserts_by_url(self, scraper):
+        with fixture_site(pages=20, per_sitemap=10) as (base_url, server):
+            success, errors = scraper.scrape_site(base_url)
+            assert (success, errors) == (18, 0)  # 2 páginas sob /private/
+            assert scraper.last_crawl_stats['crawl']['robots_blocked'] == 2
+
+            page_url = f"{base_url}/docs/page-0.html"
+            doc_id = scraper.url_index[page_url]
+            doc = scraper.server.get_document(doc_id[0])
+            assert doc['title'] == 'A2A: Fixture page 0'
+            assert doc['content'].startswith('Fixture page 0\n')
+            assert doc['metadata']['sitemap_lastmod'] == '2025-01-01'
+
+            # Nada vencido: nenhuma página é buscada de novo
+            hits = server.hits['/docs/page-0.html']
+            assert scraper.scrape_site(base_url) == (0, 0)
+            assert server.hits['/docs/page-0.html'] == hits
+
+            # Verificação forçada: GET condicional, 304 sem reindexar
+            assert scraper.scrape_site(base_url, force=True) == (0, 0)
+            assert scraper.last_crawl_stats['recrawl']['not_modified'] == 18
+
+            # Uma página muda de texto, outra só no script: só a primeira é reescrita
+            for number, old, new in ((0, b'<p>', b'<p>revisado '), (1, b'var i', b'var j')):
+                path = f"/docs/page-{number}.html"
+                body, content_type = server.files[path]
+                server.files[path] = (body.replace(old, new), content_type)
+            assert scraper.scrape_site(base_url, force=True) == (1, 0)
+            assert scraper.last_crawl_stats['recrawl']['unchanged'] == 1
+        index = scraper.build_url_index()
+        assert index[page_url] == doc_id
+        assert len([d for d in scraper.server.documents if d['type'] == 'webpage']) == 18
+        doc = scraper.server.get_document(doc_id[0])
+        assert doc['version'] == 2
+        assert 'revisado' in doc['content']
+        state = scraper.crawl_state.entries[page_url]
+        assert (state.checks, state.changes) == (2, 1)
+        assert state.etag and state.next_fetch > state.fetched_at
+
+    def test_scrape_after_other_writer_updates_the_right_document(self, scraper):
+        """Remoção feita por outro writer não desloca a atualização para outro documento"""
+        from rag_server import RAGServer
+        with fixture_site(pages=6) as (base_url, server):
+            scraper.scrape_site(base_url)
+            other = RAGServer()
+            other.remove_document(scraper.url_index[f"{base_url}/docs/page-0.html"][0])
+            other.save_documents()
+            other.close()
+
+            body, content_type = server.files['/docs/page-3.html']
+            server.files['/docs/page-3.html'] = (body.replace(b'<p>', b'<p>revisado '), content_type)
+            assert scraper.scrape_site(base_url, force=True) == (1, 0)
+
+        reloaded = RAGServer()
+        pages = {doc['metadata']['url'].rsplit('/', 1)[-1]: doc for doc in reloaded.documents}
+        reloaded.close()
+        assert sorted(pages) == [f"page-{i}.html" for i in range(1, 6)]
+        assert 'revisado' in pages['page-3.html']['content']
+        for name, doc in pages.items():
+            assert doc['title'] == f"A2A: Fixture page {name[5:-5]}"
+            assert ('revisado' in doc['content']) == (name == 'page-3.html')
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Testes do estado por URL e do agendamento de recrawl
+Executa com: pytest test_crawl_state.py -v
+"""
+
+import pytest
+import sys
+import os
+import json
+import math
+import tempfile
+import shutil
+from pathlib import Path
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from crawl_state import CrawlState, parse_lastmod
+from web_fetch import FetchResult
+
+HOUR = 3600.0
+DAY = 86400.0
+T0 = 1_700_000_000.0
+
+
+def ok(etag='"a"'):
+    return FetchResult('u', 200, {'etag': etag})
+
+
+def check(state, url, versions, start=T0):
+    """Busca a URL uma vez por intervalo agendado; versions[i] = hash na i-ésima busca"""
+    now = start
+    for content_hash in versions:
+        state.record(url, ok(), content_hash, now)
+        now = state.entries[url].next_fetch
+    return state.entries[url]
+
+
+class TestCrawlState:
+    """Testes para estimativa de mudança, agenda e persistência"""
+
+    @pytest.fixture
+    def temp_dir(self):
+        path = Path(tempfile.mkdtemp())
+        yield path
+        shutil.rmtree(path)
+
+    @pytest.fixture
+    def state(self, temp_dir):
+        return CrawlState(temp_dir / 'crawl_state.json', min_interval=HOUR, max_interval=30 * DAY)
+
+    def test_interval_adapts_to_change_frequency(self, state):
+        """Página que sempre muda encurta o intervalo; estável alonga, dentro dos limites"""
+        busy = check(state, 'busy', [f"v{i}" for i in range(12)])
+        stable = check(state, 'stable', ['same'] * 12)
+        assert busy.interval <= 4 * HOUR
+        assert stable.interval == 30 * DAY
+        assert busy.change_rate() > stable.change_rate() == 0.0
+        assert (busy.checks, busy.changes) == (11, 11)
+
+    def test_interval_changes_gradually(self, state):
+        """Uma mudança em uma verificação: taxa ln(3)/dia, intervalo encurta sem cair à metade"""
+        first = check(state, 'u', ['a'])
+        assert first.interval == DAY
+        second = check(state, 'u', ['b'], start=first.next_fetch)
+        assert second.interval == pytest.approx(DAY / math.log(3))
+        assert DAY / 2 < second.interval < DAY
+
+    def test_due_orders_new_hinted_then_most_overdue(self, state):
+        for url, interval in (('hourly', HOUR), ('daily', DAY), ('fresh', DAY)):
+            state.record(url, ok(), 'h', now=T0)
+            state.entries[url].interval = interval
+            state.entries[url].next_fetch = T0 + interval
+        now = T0 + 2 * DAY
+        state.entries['fresh'].next_fetch = now + DAY  # não vencida
+        lastmod = {'fresh': '2023-11-15'}              # mas o sitemap diz que mudou depois da busca
+
+        assert state.due(['daily', 'hourly', 'fresh', 'never'], now=now, lastmod=lastmod) == \
+            ['never', 'fresh', 'hourly', 'daily']
+        assert state.due(['daily', 'hourly'], now=now, limit=1) == ['hourly']
+        assert state.due(['fresh'], now=now) == []
+
+    def test_not_modified_keeps_hash_and_validators(self, state):
+        state.record('u', ok('"v1"'), 'h1', now=T0)
+        assert state.validators('u') == {'If-None-Match': '"v1"'}
+        changed = state.record('u', FetchResult('u', 304, {}, not_modified=True), None, now=T0 + DAY)
+        entry = state.entries['u']
+        assert not changed
+        assert (entry.content_hash, entry.etag, entry.checks, entry.changes) == ('h1', '"v1"', 1, 0)
+
+    def test_failures_retry_soon_or_back_off(self, state):
+        state.record('u', ok(), 'h', now=T0)
+        state.record_failure('u', 0, now=T0 + 10)
+        assert state.entries['u'].next_fetch == T0 + 10 + HOUR
+        state.record_failure('u', 404, now=T0 + 10)
+        assert state.entries['u'].interval == 2 * DAY
+
+    def test_failure_backoff_applies_before_first_success(self, state):
+        """URL que nunca respondeu bem espera o recuo em vez de voltar a cada execução"""
+        state.touch('new')
+        state.record_failure('dead', 404, now=T0)
+        state.record_failure('flaky', 0, now=T0)
+        assert state.due(['dead', 'flaky', 'new'], now=T0 + 10) == ['new']
+        assert state.due(['dead', 'flaky'], now=T0 + HOUR) == ['flaky']
+        assert state.due(['dead', 'flaky'], now=T0 + 2 * DAY) == ['dead', 'flaky']
+
+    def test_persistence_and_legacy_import(self, state, temp_dir):
+        legacy = temp_dir / 'scraped_urls.json'
+        legacy.write_text(json.dumps(['https://a.example/x']))
+        state.load(legacy_path=legacy)
+        assert state.due(['https://a.example/x'], now=T0) == ['https://a.example/x']
+
+        state.record('https://a.example/x', ok(), 'h', now=T0)
+        state.save()
+        reloaded = CrawlState(state.path)
+        reloaded.load(legacy_path=legacy)
+        assert reloaded.entries['https://a.example/x'] == state.entries['https://a.example/x']
+
+    def test_parse_lastmod(self):
+        assert parse_lastmod('1970-01-02') == DAY
+        assert parse_lastmod('1970-01-01T01:00:00+01:00') == 0.0
+        assert parse_lastmod('ontem') is None
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Testes da observação de diretórios
+Executa com: pytest test_file_watcher.py -v
+"""
+
+import pytest
+import sys
+import os
+import time
+import tempfile
+import shutil
+from pathlib import Path
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import file_watcher
+from file_watcher import PollingWatcher, InotifyWatcher
+
+
+def collect(watcher, seconds: float = 2.0, expected: int = 1):
+    """Acumula eventos até ver `expected` caminhos ou estourar o prazo"""
+    changed = set()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline and len(changed) < expected:
+        changed |= watcher.poll(0.1)
+    return changed
+
+
+class TestFileWatcher:
+    """Testes para os backends de observação"""
+
+    @pytest.fixture
+    def dirs(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        first, second = temp_dir / 'a', temp_dir / 'b'
+        first.mkdir()
+        yield first, second
+        shutil.rmtree(temp_dir)
+
+    def backends(self, dirs):
+        yield PollingWatcher(dirs, '.jsonl', interval=0.05)
+        if file_watcher.HAS_INOTIFY:
+            yield InotifyWatcher(dirs, '.jsonl')
+
+    def test_reports_appends_and_new_files_by_suffix(self, dirs):
+        """Append e arquivo novo aparecem; outros sufixos não"""
+        first, second = dirs
+        (first / 'old.jsonl').write_text('{}\n')
+        for watcher in self.backends(dirs):
+            try:
+                with open(first / 'old.jsonl', 'a') as f:
+                    f.write('{"x": 1}\n')
+                (first / 'notes.txt').write_text('ignorar')
+                assert collect(watcher) == {first / 'old.jsonl'}
+                assert watcher.poll(0.1) == set()
+            finally:
+                watcher.close()
+
+    def test_directory_created_later_is_picked_up(self, dirs, monkeypatch):
+        """Diretório ausente na partida passa a ser observado quando surge"""
+        first, second = dirs
+        monkeypatch.setattr(file_watcher, 'MISSING_RETRY_INTERVAL', 0.05)
+        for watcher in self.backends(dirs):
+            try:
+                second.mkdir()
+                (second / 'new.jsonl').write_text('{}\n')
+                assert collect(watcher) == {second / 'new.jsonl'}
+            finally:
+                watcher.close()
+                shutil.rmtree(second)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Testes das consultas permanentes (percolator)
+Executa com: pytest test_percolator.py -v
+"""
+
+import pytest
+import sys
+import os
+import json
+import tempfile
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rag_server
+
+VOCABULARY = ('agent', 'protocol', 'recipe')
+
+
+class KeywordModel:
+    """Embedding de contagem de palavras-chave: similaridade previsível"""
+
+    def encode(self, texts, **kwargs):
+        return np.array([[text.lower().count(word) for word in VOCABULARY] for text in texts],
+                        dtype=np.float32)
+
+
+class TestPercolator:
+    """Testes para registro, avaliação vetorizada e log de correspondências"""
+
+    @pytest.fixture
+    def cache_dir(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        with patch('rag_server.CACHE_PATH', temp_dir), \
+             patch('rag_server.CACHE_FILE', temp_dir / 'documents.json'), \
+             patch('rag_server.STATS_FILE', temp_dir / 'stats.json'):
+            yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    @pytest.fixture
+    def server(self, cache_dir):
+        server = rag_server.RAGServer()
+        server.add_document({'title': 'Seed', 'content': 'initial corpus text about gardening'})
+        return server
+
+    def test_batch_add_matches_queries_and_filters(self, server):
+        server.register_standing_query('protocol', 'agent protocol', threshold=0.2)
+        server.register_standing_query('docs_only', 'agent protocol', {'category': 'docs'}, threshold=0.2)
+        server.add_documents([
+            {'title': 'Handshake', 'content': 'agent protocol handshake', 'category': 'blog'},
+            {'title': 'Soup', 'content': 'tomato soup recipe'},
+        ])
+        found = server.percolator.matches()
+        assert [(m['query'], m['title'], m['event']) for m in found['matches']] == [('protocol', 'Handshake', 'add')]
+        assert found['next_since'] == found['last_seq'] == 1
+
+        server.update_document(found['matches'][0]['doc_id'], {'category': 'docs'})
+        later = server.percolator.matches(since=found['next_since'])
+        assert {(m['query'], m['event']) for m in later['matches']} == {('protocol', 'update'), ('docs_only', 'update')}
+        assert server.percolator.matches(since=0, name='docs_only')['matches'][0]['seq'] == 3
+
+    def test_embeddings_scored_in_one_matrix(self, cache_dir):
+        with patch('rag_server.HAS_EMBEDDINGS', True):
+            server = rag_server.RAGServer()
+            server.model = KeywordModel()
+            server.register_standing_query('agents', 'agent', threshold=0.9)
+            server.register_standing_query('cooking', 'recipe', threshold=0.9)
+            with patch.object(server.model, 'encode', wraps=server.model.encode) as encode:
+                server.add_documents([{'title': 'A', 'content': 'agent agent'},
+                                      {'title': 'B', 'content': 'recipe'},
+                                      {'title': 'C', 'content': 'agent recipe'}])
+                # Um encode do lote e um das consultas; a comparação é uma multiplicação
+                assert encode.call_count == 2
+        titles = {(m['query'], m['title']) for m in server.percolator.matches()['matches']}
+        assert titles == {('agents', 'A'), ('cooking', 'B')}
+
+    def test_queries_and_sequence_persist(self, server, cache_dir):
+        server.register_standing_query('protocol', 'agent protocol', threshold=0.2)
+        server.add_document({'title': 'Handshake', 'content': 'agent protocol handshake'})
+        assert server.remove_standing_query('missing') is False
+
+        reloaded = rag_server.RAGServer()
+        assert list(reloaded.percolator.queries) == ['protocol']
+        assert reloaded.percolator.last_seq == 1
+        reloaded.add_document({'title': 'Again', 'content': 'another agent protocol note'})
+        assert reloaded.percolator.matches(since=1)['matches'][0]['seq'] == 2
+
+    def test_processes_share_queries_and_sequence(self, server, cache_dir):
+        """Registros de dois writers se somam; a sequência do log não se repete"""
+        other = rag_server.RAGServer()  # aberto antes dos registros
+        server.register_standing_query('q1', 'agent protocol', threshold=0.1)
+        other.register_standing_query('q2', 'agent protocol', threshold=0.1)
+        assert sorted(json.loads((cache_dir / 'standing_queries.json').read_text())) == ['q1', 'q2']
+        assert sorted(query['name'] for query in server.percolator.describe()) == ['q1', 'q2']
+
+        server.add_document({'title': 'One', 'content': 'agent protocol one'})
+        other.add_document({'title': 'Two', 'content': 'agent protocol two'})
+        server.add_document({'title': 'Three', 'content': 'agent protocol three'})
+        found = server.percolator.matches()['matches']
+        assert [m['seq'] for m in found] == list(range(1, 7))
+        assert [m['title'] for m in found[::2]] == ['One', 'Two', 'Three']
+
+        other.remove_standing_query('q1')
+        server.add_document({'title': 'Four', 'content': 'agent protocol four'})
+        assert [m['query'] for m in server.percolator.matches(since=6)['matches']] == ['q2']
+
+    def test_mcp_tool_and_notifications(self, server):
+        pushed = []
+        server.percolator.listeners.append(pushed.append)
+
+        def call(arguments):
+            request = {'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call',
+                       'params': {'name': 'subscriptions', 'arguments': arguments}}
+            with patch('rag_server.server', server):
+                return json.loads(rag_server.handle_request(request)['content'][0]['text'])
+
+        registered = call({'action': 'register', 'name': 'p', 'query': 'agent protocol',
+                           'source': 'web', 'threshold': 0.2})
+        assert registered['registered']['filters'] == {'source': 'web'}
+        server.add_document({'title': 'Local', 'content': 'agent protocol local', 'source': 'disk'})
+        server.add_document({'title': 'Web', 'content': 'agent protocol web', 'source': 'web'})
+
+        assert [m['title'] for m in pushed] == ['Web']
+        assert call({'action': 'matches', 'since': 0})['matches'] == pushed
+        assert call({'action': 'remove', 'name': 'p'}) == {'removed': True}
+        assert call({'action': 'list'})['queries'] == []
+
+    def test_saved_searches_become_standing_queries(self, server, cache_dir, monkeypatch):
+        monkeypatch.setenv('HOME', str(cache_dir))
+        from a2a_content_manager import A2AContentManager
+        manager = A2AContentManager(server=server)
+        names = manager.subscribe_saved_searches(threshold=0.1)
+        assert set(names) == set(server.percolator.queries)
+        assert server.percolator.queries['a2a_recent'].filters == {'source': 'a2a'}
+
+        server.add_document({'title': 'A2A', 'content': 'a2a agent card registry', 'source': 'a2a'})
+        assert {m['query'] for m in server.percolator.matches()['matches']} == {'a2a_all', 'a2a_recent'}
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Testes do profiler por amostragem e do tracemalloc sob demanda
+Executa com: pytest test_profiler.py -v
+"""
+
+import pytest
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+import shutil
+from pathlib import Path
+from unittest.mock import patch
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rag_server
+from profiler import SamplingProfiler, allocation_snapshot, start_tracemalloc, stop_tracemalloc
+
+
+def busy_loop(stop_event):
+    while not stop_event.is_set():
+        sum(range(1000))
+
+
+class TestProfiler:
+    """Testes para o profiler"""
+
+    @pytest.fixture
+    def output_dir(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_sampler_writes_collapsed_stacks(self, output_dir):
+        """Pilhas da thread ocupada aparecem no arquivo collapsed"""
+        stop_event = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop_event,), name='busy-worker')
+        worker.start()
+        try:
+            profiler = SamplingProfiler()
+            profiler.start(output_dir, duration=5, interval=0.005)
+            time.sleep(0.2)
+            status = profiler.stop()
+        finally:
+            stop_event.set()
+            worker.join()
+
+        assert status['running'] is False
+        assert status['samples'] > 0
+        lines = Path(status['last_profile']).read_text().splitlines()
+        busy = [line for line in lines if line.startswith('busy-worker;')]
+        assert busy and 'busy_loop (test_profiler.py:' in busy[0]
+        assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+    def test_sampler_rejects_concurrent_windows(self, output_dir):
+        """Só uma janela de amostragem por vez"""
+        profiler = SamplingProfiler()
+        profiler.start(output_dir, duration=5, interval=0.01)
+        try:
+            with pytest.raises(RuntimeError):
+                profiler.start(output_dir, duration=5, interval=0.01)
+        finally:
+            profiler.stop()
+
+    def test_tracemalloc_snapshot(self, output_dir):
+        """Snapshot lista os maiores alocadores e grava o JSON"""
+        with pytest.raises(RuntimeError):
+            allocation_snapshot()
+        start_tracemalloc()
+        try:
+            payload = [bytearray(1024) for _ in range(200)]
+            result = allocation_snapshot(limit=5, output_dir=output_dir)
+        finally:
+            stop_tracemalloc()
+
+        assert 1 <= len(result['top']) <= 5 and len(payload) == 200
+        assert 'test_profiler.py' in result['top'][0]['location']
+        assert result['top'][0]['size_kb'] >= 200
+        assert json.loads(Path(result['file']).read_text())['top'] == result['top']
+
+    def test_profile_tool(self, output_dir):
+        """Ferramenta MCP profile inicia e encerra a janela sob CACHE_PATH"""
+        with patch('rag_server.CACHE_PATH', output_dir), \
+             patch('rag_server.profiler', SamplingProfiler()):
+            for action in ('start', 'stop'):
+                response = rag_server.handle_request({
+                    'method': 'tools/call',
+                    'params': {'name': 'profile', 'arguments': {'action': action, 'interval_ms': 5}}
+                })
+            status = json.loads(response['content'][0]['text'])
+
+        assert status['running'] is False
+        assert Path(status['last_profile']).parent == output_dir / 'profiles'
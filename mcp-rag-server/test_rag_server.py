@@ -150,6 +150,39 @@ class TestRAGServer:
             results = mock_server.search_by_tags(['python'])
             assert len(results) == 2
     
+    def test_add_documents_batch(self, mock_server):
+        """Lote grava tudo de uma vez, deduplica e substitui pela source"""
+        mock_server.add_document({'title': 'Old', 'content': 'old session', 'source': 'chat-a'})
+        mock_server.add_document({'title': 'Keep', 'content': 'unrelated', 'source': 'notes'})
+
+        with patch.object(mock_server, 'build_indices', wraps=mock_server.build_indices) as build:
+            results = mock_server.add_documents([
+                {'title': 'New A', 'content': 'new session a', 'source': 'chat-a'},
+                {'title': 'New B', 'content': 'new session b', 'source': 'chat-b'},
+                {'title': 'Dup', 'content': 'unrelated', 'tags': ['extra']},
+            ], replace_sources=True)
+        assert build.call_count == 1
+
+        titles = sorted(doc['title'] for doc in mock_server.documents)
+        assert titles == ['Keep', 'New A', 'New B']
+        assert results[2]['title'] == 'Keep'
+        assert 'extra' in results[2]['tags']
+        assert len(mock_server.sources_index['chat-a']) == 1
+        assert mock_server.get_document(results[0]['id'])['content'] == 'new session a'
+
+    def test_add_documents_batch_classic_ids(self, temp_cache_dir):
+        """Modo classic: IDs distintos dentro do mesmo lote, e todos sobrevivem à recarga"""
+        with patch('rag_server.CACHE_PATH', temp_cache_dir), \
+             patch('rag_server.CACHE_FILE', temp_cache_dir / 'documents.json'), \
+             patch('rag_server.STATS_FILE', temp_cache_dir / 'stats.json'):
+            server = rag_server.RAGServer(mode='classic')
+            docs = server.add_documents([{'title': f'Doc {i}', 'content': f'classic {i}'} for i in range(3)])
+            assert len({doc['id'] for doc in docs}) == 3
+            assert all(doc['id'].startswith('doc_') for doc in docs)
+            server.save_documents()
+            server.close()
+            assert len(rag_server.RAGServer(mode='classic').documents) == 3
+    
     def test_remove_document(self, mock_server):
         """Testa remoção de documento"""
         doc = {'title': 'To Remove', 'content': 'This will be removed'}
@@ -161,6 +194,19 @@ class TestRAGServer:
         assert removed == True
         assert len(mock_server.documents) == 0
     
+    def test_remove_documents_batch(self, mock_server):
+        """Remoção em lote grava e reconstrói os índices uma vez"""
+        docs = mock_server.add_documents([{'title': f'Doc {i}', 'content': f'batch {i}'} for i in range(4)])
+        
+        with patch.object(mock_server, 'save_documents', wraps=mock_server.save_documents) as save, \
+             patch.object(mock_server, 'build_indices', wraps=mock_server.build_indices) as build:
+            removed = mock_server.remove_documents([docs[0]['id'], docs[2]['id'], 'missing'])
+        assert removed == 2
+        assert build.call_count == 1 and save.call_count <= 1
+        assert [doc['title'] for doc in mock_server.documents] == ['Doc 1', 'Doc 3']
+        assert mock_server.get_document(docs[3]['id'])['title'] == 'Doc 3'
+        assert mock_server.remove_documents(['missing']) == 0
+    
     def test_update_document(self, mock_server):
         """Testa atualização de documento"""
         doc = {'title': 'Original', 'content': 'Original content'}
@@ -195,6 +241,343 @@ class TestRAGServer:
         assert stats['unique_tags'] >= 2
 
 
+class TestReadReplica:
+    """Testes para réplicas somente leitura (single-writer / multi-reader)"""
+    
+    @pytest.fixture
+    def cache_dir(self):
+        """Diretório de cache isolado com paths do servidor redirecionados"""
+        temp_dir = Path(tempfile.mkdtemp())
+        with patch('rag_server.CACHE_PATH', temp_dir), \
+             patch('rag_server.CACHE_FILE', temp_dir / 'documents.json'), \
+             patch('rag_server.VECTORS_FILE', temp_dir / 'vectors.npy'), \
+             patch('rag_server.STATS_FILE', temp_dir / 'stats.json'):
+            yield temp_dir
+        shutil.rmtree(temp_dir)
+    
+    def test_replica_picks_up_new_generation(self, cache_dir):
+        """Réplica recarrega quando o writer publica nova geração"""
+        writer = rag_server.RAGServer()
+        writer.add_document({'title': 'First', 'content': 'first document'})
+        
+        replica = rag_server.RAGServer(read_only=True)
+        assert len(replica.documents) == 1
+        assert replica.generation == writer.generation
+        
+        writer.add_document({'title': 'Second', 'content': 'second document'})
+        assert replica.refresh(force=True) is True
+        assert len(replica.documents) == 2
+        assert replica.refresh(force=True) is False
+    
+    def test_replica_rejects_mutations(self, cache_dir):
+        """Réplica não aceita escritas"""
+        replica = rag_server.RAGServer(read_only=True)
+        with pytest.raises(rag_server.ReadOnlyError):
+            replica.add_document({'title': 'Nope', 'content': 'nope'})
+        with pytest.raises(rag_server.ReadOnlyError):
+            replica.save_documents()
+    
+    def test_replica_memory_maps_vectors(self, cache_dir):
+        """Vetores da réplica são mapeados dos segmentos, não copiados"""
+        import numpy as np
+        
+        class StubModel:
+            def encode(self, texts, **kwargs):
+                return np.ones((len(texts), 4), dtype=np.float32)
+        
+        with patch('rag_server.HAS_EMBEDDINGS', True):
+            writer = rag_server.RAGServer()
+            writer.model = StubModel()
+            writer.add_document({'title': 'Vec', 'content': 'vector document'})
+            writer.store.flush()
+            
+            replica = rag_server.RAGServer(read_only=True)
+        assert replica.embeddings.is_memory_mapped
+        assert replica.embeddings.shape == (1, 4)
+    
+    def test_legacy_cache_is_migrated_to_segments(self, cache_dir):
+        """documents.json legado vira o primeiro segmento"""
+        legacy = {'documents': [{'id': 'old-1', 'title': 'Old', 'content': 'legacy content'}]}
+        with open(cache_dir / 'documents.json', 'w') as f:
+            json.dump(legacy, f)
+        
+        writer = rag_server.RAGServer()
+        assert len(writer.store.segment_names) == 1
+        
+        replica = rag_server.RAGServer(read_only=True)
+        assert [doc['title'] for doc in replica.documents] == ['Old']
+        assert replica.documents[0]['legacy_id'] == 'old-1'
+
+
+class TestListDocuments:
+    """Testes para listagem paginada por índices"""
+    
+    @pytest.fixture
+    def server(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        with patch('rag_server.CACHE_PATH', temp_dir), \
+             patch('rag_server.CACHE_FILE', temp_dir / 'documents.json'), \
+             patch('rag_server.STATS_FILE', temp_dir / 'stats.json'):
+            server = rag_server.RAGServer()
+            for i in range(5):
+                server.add_document({
+                    'title': f'Doc {i}',
+                    'content': f'Content number {i}',
+                    'category': 'even' if i % 2 == 0 else 'odd'
+                })
+            yield server
+        shutil.rmtree(temp_dir)
+    
+    def test_cursor_walks_all_pages(self, server):
+        """Cursor percorre todas as páginas sem repetir documentos"""
+        seen = []
+        cursor = None
+        while True:
+            page = server.list_documents_page(limit=2, cursor=cursor, sort_by='created_at', order='desc')
+            assert page['total'] == 5
+            seen.extend(doc['id'] for doc in page['documents'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        
+        assert len(seen) == 5
+        assert len(set(seen)) == 5
+        expected = [doc['id'] for doc in sorted(server.documents, key=lambda d: (d['created_at'], d['id']), reverse=True)]
+        assert seen == expected
+    
+    def test_filters_and_projection(self, server):
+        """Filtros usam índices e a projeção limita os campos"""
+        page = server.list_documents_page({'category': 'even'}, limit=10, fields=['id', 'title'])
+        assert page['total'] == 3
+        assert all(set(doc) == {'id', 'title'} for doc in page['documents'])
+    
+    def test_list_streams_progress_notifications(self, server):
+        """Com progressToken a listagem sai em blocos por notificação"""
+        notifications = []
+        request = {
+            'jsonrpc': '2.0',
+            'id': 7,
+            'method': 'tools/call',
+            'params': {'name': 'list', 'arguments': {}, '_meta': {'progressToken': 'tok'}}
+        }
+        with patch('rag_server.server', server), \
+             patch.object(rag_server.config, 'LIST_STREAM_CHUNK', 2):
+            response = rag_server.handle_request(
+                request, notify=lambda method, params: notifications.append((method, params))
+            )
+        
+        summary = json.loads(response['content'][0]['text'])
+        assert summary['streamed'] is True
+        assert summary['sent'] == 5
+        assert summary['chunks'] == 3
+        assert [params['progress'] for _, params in notifications] == [2, 4, 5]
+        streamed = [doc for _, params in notifications for doc in json.loads(params['message'])['documents']]
+        assert len({doc['id'] for doc in streamed}) == 5
+    
+    def test_search_content_modes(self, server):
+        """Modos de conteúdo reduzem o payload da busca"""
+        doc = {'id': 'x', 'title': 'Long', 'content': 'a' * 500 + ' needle ' + 'b' * 500}
+        snippet = server.shape_result(doc, 'needle', 'snippet', max_chars=40)
+        assert 'needle' in snippet['snippet']
+        assert 'content' not in snippet
+        assert snippet['content_length'] == len(doc['content'])
+        
+        truncated = server.shape_result(doc, None, 'truncate', max_chars=10)
+        assert truncated['content'] == 'a' * 10
+        assert truncated['content_truncated'] is True
+        
+        assert 'content' not in server.shape_result(doc, None, 'none')
+        assert server.shape_result(doc, None, 'full') is doc
+    
+    def test_cursor_must_match_sort(self, server):
+        """Cursor de outra ordenação é rejeitado"""
+        page = server.list_documents_page(limit=1, sort_by='created_at')
+        with pytest.raises(ValueError):
+            server.list_documents_page(limit=1, cursor=page['next_cursor'], sort_by='version')
+
+
+class TestFilteredSearch:
+    """Testes para busca filtrada por máscaras e consultas compiladas"""
+    
+    @pytest.fixture
+    def server(self, monkeypatch):
+        temp_dir = Path(tempfile.mkdtemp())
+        monkeypatch.setenv('HOME', str(temp_dir))
+        with patch('rag_server.CACHE_PATH', temp_dir), \
+             patch('rag_server.CACHE_FILE', temp_dir / 'documents.json'), \
+             patch('rag_server.STATS_FILE', temp_dir / 'stats.json'):
+            server = rag_server.RAGServer()
+            server.add_documents([
+                {'title': f'Filler {i}', 'content': f'unrelated filler text {i}',
+                 'category': 'guides', 'source': 'a2a'}
+                for i in range(6)
+            ] + [
+                {'title': 'Protocol', 'content': 'a2a agent protocol handshake', 'category': 'guides', 'source': 'a2a'},
+                {'title': 'Other', 'content': 'agent protocol handshake elsewhere', 'category': 'blog', 'source': 'web'},
+            ])
+            for i, doc in enumerate(server.documents):
+                doc['created_at'] = f'2025-01-{i + 1:02d}'
+            server.build_indices()
+            yield server
+        shutil.rmtree(temp_dir)
+    
+    def test_ranks_all_candidates_within_filters(self, server):
+        """O documento relevante vence mesmo sendo o último candidato do filtro"""
+        results = server.search_filtered('protocol handshake', limit=2, filters={'category': 'guides'})
+        assert [doc['title'] for doc in results] == ['Protocol']
+        
+        everything = server.search_filtered('protocol handshake', limit=2,
+                                            filters={'source': 'a2a'}, min_score=0.0)
+        assert everything[0]['title'] == 'Protocol'
+        assert len(everything) == 2 and everything[1]['score'] == 0.0
+        assert server.search_filtered('protocol', filters={'category': 'missing'}) == []
+    
+    def test_compiled_results_cached_until_corpus_changes(self, server):
+        compiled = server.compile_query('protocol handshake', {'source': 'a2a'})
+        first = server.search_compiled(compiled, 5)
+        first[0]['title'] = 'mutated'
+        with patch.object(server, '_run_compiled', side_effect=AssertionError('recalculou')):
+            assert server.search_compiled(compiled, 5)[0]['title'] == 'Protocol'
+        assert ('source', '"a2a"') in server.filter_bitmaps
+        
+        server.add_document({'title': 'New', 'content': 'protocol handshake protocol', 'source': 'a2a'})
+        assert not server.filter_bitmaps
+        titles = [doc['title'] for doc in server.search_compiled(compiled, 5)]
+        assert set(titles) == {'Protocol', 'New'}
+    
+    def test_sort_by_date(self, server):
+        compiled = server.compile_query('filler', {'category': 'guides', 'sort': 'date_desc'}, min_score=0.0)
+        assert compiled.filters == {'category': 'guides'}
+        results = server.search_compiled(compiled, 3)
+        assert [doc['title'] for doc in results] == ['Protocol', 'Filler 5', 'Filler 4']
+        with pytest.raises(ValueError):
+            server.compile_query('x', {'sort': 'random'})
+    
+    def test_saved_search_uses_compiled_query(self, server):
+        from a2a_content_manager import A2AContentManager
+        manager = A2AContentManager(server=server)
+        results = manager.execute_saved_search('a2a_all', limit=3)
+        assert len(results) == 3 and all(doc['source'] == 'a2a' for doc in results)
+        assert results[0]['title'] == 'Protocol'
+        compiled = manager.compiled_searches['a2a_all'][1]
+        assert manager.execute_saved_search('a2a_all', limit=3) == results
+        assert manager.compiled_searches['a2a_all'][1] is compiled
+        
+        recent = manager.execute_saved_search('a2a_recent', limit=2)
+        assert [doc['title'] for doc in recent] == ['Protocol', 'Filler 5']
+    
+    def test_saved_search_sees_other_writer(self, server):
+        """Documentos gravados por outro processo entram mesmo com o cache quente"""
+        from a2a_content_manager import A2AContentManager
+        manager = A2AContentManager(server=server)
+        assert 'Remote' not in [doc['title'] for doc in manager.execute_saved_search('a2a_all')]
+        
+        rag_server.RAGServer().add_document({'title': 'Remote', 'content': 'a2a agent protocol handshake remote',
+                                             'source': 'a2a'})
+        titles = [doc['title'] for doc in manager.execute_saved_search('a2a_all')]
+        assert 'Remote' in titles
+
+
+class TestSnippets:
+    """Testes para snippets guiados pela query"""
+    
+    def test_densest_window_and_highlights(self):
+        """Janela escolhida cobre mais termos distintos da query"""
+        content = 'python ' + 'x ' * 200 + 'python tutorial avançado ' + 'y ' * 200
+        terms = rag_server.query_terms('Python tutorial')
+        positions = {'python': [0, 407], 'tutorial': [414]}
+        result = rag_server.build_snippet(content, terms, positions, max_chars=60)
+        
+        assert 'python tutorial' in result['snippet']
+        for start, end in result['highlights']:
+            assert result['snippet'][start:end] in ('python', 'tutorial')
+        assert len(result['highlights']) == 2
+    
+    def test_search_uses_segment_postings(self):
+        """Snippet de documento em segmento vem dos postings e get traz o content"""
+        temp_dir = Path(tempfile.mkdtemp())
+        try:
+            with patch('rag_server.CACHE_PATH', temp_dir), \
+                 patch('rag_server.CACHE_FILE', temp_dir / 'documents.json'), \
+                 patch('rag_server.STATS_FILE', temp_dir / 'stats.json'):
+                server = rag_server.RAGServer()
+                doc = server.add_document({
+                    'title': 'Long',
+                    'content': ' '.join(f'w{i}' for i in range(200)) + ' segment postings offsets ' +
+                               ' '.join(f'z{i}' for i in range(200))
+                })
+                server.store.flush()
+                offset = doc['content'].index('postings')
+                assert server.store.positions(doc['id'], ['postings'])['postings'] == [offset]
+                
+                request = {
+                    'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call',
+                    'params': {'name': 'search', 'arguments': {'query': 'postings offsets'}}
+                }
+                with patch('rag_server.server', server):
+                    response = rag_server.handle_request(request)
+                    hit = json.loads(response['content'][0]['text'])['results'][0]
+                    assert 'content' not in hit
+                    assert 'postings offsets' in hit['snippet']
+                    
+                    request['params'] = {'name': 'get', 'arguments': {'id': doc['id']}}
+                    response = rag_server.handle_request(request)
+                    fetched = json.loads(response['content'][0]['text'])['document']
+                    assert fetched['content'] == doc['content']
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class TestRequestMetrics:
+    """Testes para histogramas de latência por ferramenta e fase"""
+
+    def test_histogram_percentiles(self):
+        """Percentis pelo limite do bucket e máximo no +Inf"""
+        from monitoring import LatencyHistogram
+        histogram = LatencyHistogram()
+        for value in [0.3] * 90 + [40.0] * 9 + [20000.0]:
+            histogram.record(value)
+
+        snapshot = histogram.snapshot()
+        assert snapshot['count'] == 100
+        assert snapshot['p50_ms'] == 0.5
+        assert snapshot['p99_ms'] == 50
+        assert histogram.percentile(100) == 20000.0
+
+    def test_handle_request_records_phases(self):
+        """search registra total e fases; metrics e metrics.prom expõem os histogramas"""
+        from monitoring import MetricsCollector
+        temp_dir = Path(tempfile.mkdtemp())
+        try:
+            with patch('rag_server.CACHE_PATH', temp_dir), \
+                 patch('rag_server.CACHE_FILE', temp_dir / 'documents.json'), \
+                 patch('rag_server.STATS_FILE', temp_dir / 'stats.json'), \
+                 patch('rag_server.metrics_collector', MetricsCollector()) as collector:
+                server = rag_server.RAGServer()
+                server.add_document({'title': 'Python', 'content': 'Python metrics test'})
+
+                with patch('rag_server.server', server):
+                    rag_server.handle_request({
+                        'method': 'tools/call',
+                        'params': {'name': 'search', 'arguments': {'query': 'python'}}
+                    })
+                    response = rag_server.handle_request({
+                        'method': 'tools/call',
+                        'params': {'name': 'metrics', 'arguments': {}}
+                    })
+
+                latency = json.loads(response['content'][0]['text'])['latency']
+                assert {'total', 'rank', 'serialize'} <= set(latency['search'])
+                assert latency['search']['total']['count'] == 1
+                assert collector.performance_stats['search_count'] == 1
+
+                exposition = (temp_dir / 'metrics.prom').read_text()
+                assert 'rag_request_duration_seconds_count{tool="search",phase="total"} 1' in exposition
+                assert 'le="+Inf"' in exposition
+        finally:
+            shutil.rmtree(temp_dir)
+
+
 class TestMCPProtocol:
     """Testes para protocolo MCP"""
     
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Testes do armazenamento segmentado (memtable, flush, tombstones e merge)
+Executa com: pytest test_segment_store.py -v
+"""
+
+import pytest
+import sys
+import os
+import tempfile
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from segment_store import SegmentStore, tokenize
+
+
+def make_store(root: Path, **kwargs) -> SegmentStore:
+    return SegmentStore(
+        root / 'segments',
+        generation_file=root / 'generation',
+        lock_file=root / 'writer.lock',
+        **kwargs
+    )
+
+
+def doc(doc_id: str, content: str = 'conteúdo') -> dict:
+    return {'id': doc_id, 'title': doc_id, 'content': content}
+
+
+class TestSegmentStore:
+    """Testes para o SegmentStore"""
+
+    @pytest.fixture
+    def root(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_wal_replay_without_flush(self, root):
+        """Escritas sincronizadas aparecem para réplicas antes do flush"""
+        writer = make_store(root)
+        writer.put(doc('a'))
+        writer.put(doc('b'))
+        assert writer.sync() is True
+        assert writer.segment_names == []
+
+        replica = make_store(root, read_only=True)
+        documents, _ = replica.load()
+        assert [d['id'] for d in documents] == ['a', 'b']
+        assert replica.generation == writer.generation
+
+    def test_flush_tombstones_replaced_rows(self, root):
+        """Atualizações e remoções marcam tombstone no segmento antigo"""
+        writer = make_store(root, flush_threshold=2)
+        writer.put(doc('a', 'versão um'))
+        writer.put(doc('b'))
+        writer.sync()
+        assert len(writer.segment_names) == 1
+
+        writer.put(doc('a', 'versão dois'))
+        writer.delete('b')
+        writer.sync()
+        assert len(writer.segment_names) == 2
+
+        documents, _ = make_store(root, read_only=True).load()
+        assert [(d['id'], d['content']) for d in documents] == [('a', 'versão dois')]
+
+    def test_merge_drops_tombstoned_rows(self, root):
+        """Merge junta segmentos e descarta linhas mortas"""
+        writer = make_store(root, flush_threshold=1, max_segments=2, merge_factor=2)
+        for doc_id in ['a', 'b', 'c']:
+            writer.put(doc(doc_id))
+            writer.sync()
+        writer.delete('a')
+        writer.sync()
+        assert len(writer.segment_names) == 3
+
+        while writer.merge():
+            pass
+        assert len(writer.segment_names) <= 2
+        assert len(writer.manifest['obsolete']) >= 2
+
+        documents, _ = make_store(root, read_only=True).load()
+        assert sorted(d['id'] for d in documents) == ['b', 'c']
+
+        assert writer.purge_obsolete(force=True) >= 2
+        assert writer.manifest['obsolete'] == []
+
+    def test_orphan_wal_is_adopted(self, root):
+        """WAL de um writer encerrado é consolidado pelo próximo writer"""
+        crashed = make_store(root)
+        crashed.put(doc('a'))
+        crashed.sync()
+        crashed.close()
+
+        writer = make_store(root)
+        documents, _ = writer.load()
+        assert [d['id'] for d in documents] == ['a']
+        assert writer.flush() is not None
+        assert list((root / 'segments').glob('wal-*.jsonl')) == []
+
+    def test_vector_view_blocks(self, root):
+        """Similaridade por blocos respeita tombstones e linhas do WAL"""
+        writer = make_store(root, flush_threshold=2)
+        writer.put(doc('a'), np.array([1.0, 0.0]))
+        writer.put(doc('b'), np.array([0.0, 1.0]))
+        writer.sync()
+        writer.delete('a')
+        writer.put(doc('c'), np.array([1.0, 1.0]))
+        writer.sync()
+
+        documents, vectors = make_store(root, read_only=True).load()
+        assert [d['id'] for d in documents] == ['b', 'c']
+        scores = vectors.similarities(np.array([[0.0, 2.0]]))
+        assert scores.shape == (2,)
+        assert scores[0] == pytest.approx(1.0)
+        assert scores[1] == pytest.approx(np.sqrt(0.5))
+        assert vectors.materialize().shape == (2, 2)
+
+    def test_vector_view_candidate_positions(self, root):
+        """Com posições, só as linhas candidatas são lidas, na ordem pedida"""
+        writer = make_store(root, flush_threshold=2)
+        writer.put(doc('a'), np.array([1.0, 0.0]))
+        writer.put(doc('b'), np.array([0.0, 1.0]))
+        writer.sync()
+        writer.put(doc('c'), np.array([1.0, 1.0]))
+        writer.put(doc('d'), np.array([3.0, 0.0]))
+        writer.sync()
+        writer.delete('a')
+        writer.put(doc('e'), np.array([0.0, 5.0]))
+        writer.sync()
+
+        documents, vectors = make_store(root, read_only=True).load()
+        query = np.array([[1.0, 0.0]])
+        full = vectors.similarities(query)
+        positions = np.array([len(documents) - 1, 0, 2])
+        assert vectors.similarities(query, positions) == pytest.approx(full[positions])
+        assert vectors.similarities(query, np.array([], dtype=int)).shape == (0,)
+
+    def test_postings_have_offsets(self, root):
+        """Segmentos guardam postings com offsets de caractere"""
+        writer = make_store(root, flush_threshold=1)
+        writer.put(doc('a', 'Python e mais python'))
+        writer.sync()
+
+        segment = writer.live_segments()[0]
+        assert segment.postings['python'] == {'0': [0, 14]}
+        assert list(tokenize('Olá mundo')) == [('olá', 0), ('mundo', 4)]
+
+    def test_read_only_store_rejects_writes(self, root):
+        """Store somente leitura não aceita mutações"""
+        replica = make_store(root, read_only=True)
+        with pytest.raises(PermissionError):
+            replica.put(doc('a'))
+
+    def test_snapshot_survives_merge_and_purge(self, root):
+        """Snapshot é um ponto no tempo: merge/purge posteriores não o afetam"""
+        writer = make_store(root, flush_threshold=2)
+        for name in 'abcde':
+            writer.put(doc(name), np.ones(4))
+            writer.sync()
+
+        info = writer.snapshot(root / 'snapshot')
+        assert info['generation'] == writer.generation
+        assert 'manifest.json' in info['files']
+        assert any(name.startswith('wal-') for name in info['files'])
+        segment_file = next(path for name, path in info['files'].items() if name.endswith('/vectors.npy'))
+        assert segment_file.stat().st_nlink == 2
+
+        writer.put(doc('f'))
+        writer.sync()
+        writer.merge(force=True)
+        writer.purge_obsolete(force=True)
+
+        copy = SegmentStore(root / 'snapshot', generation_file=root / 'snapshot-generation',
+                            lock_file=root / 'snapshot.lock', read_only=True)
+        documents, vectors = copy.load()
+        assert [d['id'] for d in documents] == list('abcde')
+        assert len(vectors) == 5
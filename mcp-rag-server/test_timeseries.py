@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Testes das séries temporais em ring buffer e da coleta de métricas
+Executa com: pytest test_timeseries.py -v
+"""
+
+import pytest
+import sys
+import os
+import json
+import time
+import tempfile
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import monitoring
+from timeseries import RingBuffer, TimeSeriesStore
+
+
+class TestTimeSeries:
+    """Testes para RingBuffer e TimeSeriesStore"""
+
+    @pytest.fixture
+    def root(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_ring_wraps_and_persists(self, root):
+        """Amostra mais antiga é sobrescrita; conteúdo sobrevive a reabertura"""
+        path = root / 'raw.ring'
+        ring = RingBuffer(path, ['a', 'b'], slots=3)
+        for i in range(5):
+            ring.append(float(i), {'a': i * 10.0} if i % 2 else {'a': i * 10.0, 'b': 1.0})
+        size = path.stat().st_size
+        ring.close()
+
+        reopened = RingBuffer(path, ['a', 'b'], slots=3)
+        rows = reopened.rows()
+        assert [t for t, _ in rows] == [2.0, 3.0, 4.0]
+        assert rows[1][1] == {'a': 30.0}
+        assert reopened.rows(since=3.5) == [(4.0, {'a': 40.0, 'b': 1.0})]
+        assert path.stat().st_size == size
+        reopened.close()
+
+    def test_metric_change_migrates_common_columns(self, root):
+        """Novas métricas recriam o arquivo mantendo colunas em comum"""
+        path = root / 'raw.ring'
+        ring = RingBuffer(path, ['a'], slots=4)
+        ring.append(1.0, {'a': 5.0})
+        ring.close()
+
+        migrated = RingBuffer(path, ['a', 'rss_mb'], slots=4)
+        migrated.append(2.0, {'rss_mb': 100.0})
+        assert migrated.rows() == [(1.0, {'a': 5.0}), (2.0, {'rss_mb': 100.0})]
+        assert RingBuffer.open_read(path).metrics == ['a', 'rss_mb']
+        migrated.close()
+
+    def test_rollups_average_closed_buckets(self, root):
+        """Rollup de 1m grava a média quando o minuto fecha"""
+        store = TimeSeriesStore(root, ['cpu'], {'raw': (0, 10), '1m': (60, 10)})
+        for timestamp, value in [(0, 10.0), (30, 20.0), (60, 40.0), (125, 1.0)]:
+            store.append(timestamp, {'cpu': value})
+
+        assert store.read('1m') == [(0.0, {'cpu': 15.0}), (60.0, {'cpu': 40.0})]
+        assert len(store.read('raw')) == 4
+        with pytest.raises(ValueError):
+            store.read('1d')
+        store.close()
+
+
+class TestMetricsCollector:
+    """Testes para a coleta do MetricsCollector"""
+
+    @pytest.fixture
+    def root(self):
+        temp_dir = Path(tempfile.mkdtemp())
+        yield temp_dir
+        shutil.rmtree(temp_dir)
+
+    def test_collector_uses_gauge_and_ring(self, root):
+        """Coletor conta documentos pelo gauge e grava uma linha por ciclo"""
+        with patch('monitoring.BASE_PATH', root), \
+             patch('monitoring.TIMESERIES_PATH', root / 'timeseries'), \
+             patch('monitoring.METRICS_FILE', root / 'metrics.json'), \
+             patch('monitoring.ALERTS_FILE', root / 'alerts.json'):
+            collector = monitoring.MetricsCollector()
+            collector.register_gauge('document_count', lambda: 42)
+            for _ in range(2):
+                collector._collect_rag_metrics()
+                collector._save_metrics()
+
+            assert [value for _, value in collector.get_history('document_count')] == [42.0, 42.0]
+            summary = json.loads((root / 'metrics.json').read_text())
+            assert summary['current']['document_count'] == 42
+            assert 'metrics' not in summary
+            collector.stop_monitoring()
+
+    def test_process_metrics_are_non_blocking_deltas(self):
+        """Coleta do processo não bloqueia e calcula taxas entre amostras"""
+        collector = monitoring.MetricsCollector(interval=5)
+        collector.register_gauge('embedding_bytes', lambda: 2 * 1024 * 1024)
+
+        start = time.perf_counter()
+        collector._collect_system_metrics()
+        sum(range(200000))
+        collector._collect_system_metrics()
+        assert time.perf_counter() - start < 0.5
+
+        current = collector.get_current_metrics()
+        assert current['process_rss_mb'] > 0
+        assert current['process_threads'] >= 1
+        assert current['embedding_mb'] == 2.0
+        assert len(collector.metrics['process_cpu_percent']) == 1
+        assert 'gc_collections_per_min' in current
+
+    def test_separate_process_reads_server_stats(self, root):
+        """Sem gauges no processo, contagem e embeddings vêm do stats.json do servidor"""
+        stats_file = root / 'stats.json'
+        stats_file.write_text(json.dumps({'total_documents': 7, 'embedding_bytes': 3 * 1024 * 1024}))
+        with patch('monitoring.STATS_FILE', stats_file):
+            collector = monitoring.MetricsCollector()
+            collector._collect_system_metrics()
+            collector._collect_rag_metrics()
+
+        current = collector.get_current_metrics()
+        assert current['embedding_mb'] == 3.0
+        assert current['document_count'] == 7
+
+    def test_server_collector_follows_published_pid(self, root):
+        """monitor.py mede o processo do servidor, com o GC que ele publicou"""
+        server = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+        process_file = root / 'server_process.json'
+        try:
+            with patch('monitoring.SERVER_PROCESS_FILE', process_file):
+                assert monitoring.server_collector() is monitoring.metrics_collector
+
+                process_file.write_text(json.dumps({'pid': server.pid, 'gc_collections': 10}))
+                collector = monitoring.server_collector()
+                assert collector.process.pid == server.pid
+                collector._collect_process_metrics(time.time() - 60)
+                process_file.write_text(json.dumps({'pid': server.pid, 'gc_collections': 25}))
+                collector._collect_process_metrics(time.time())
+        finally:
+            server.kill()
+            server.wait()
+
+        assert collector.get_current_metrics()['gc_collections_per_min'] == pytest.approx(15, rel=0.01)
+        assert collector.get_current_metrics()['process_threads'] >= 1
+
+    def test_error_rate_uses_interval_delta(self):
+        """Taxa de erro considera só as requisições do intervalo"""
+        collector = monitoring.MetricsCollector()
+        collector.record_request('search', False, 0.01)
+        collector._collect_rag_metrics()
+        for _ in range(4):
+            collector.record_request('search', True, 0.02)
+        collector._collect_rag_metrics()
+
+        rates = [value for _, value in collector.metrics['error_rate_percent']]
+        assert rates == [100.0, 0.0]
+        assert collector.get_current_metrics()['avg_response_time_ms'] == pytest.approx(20.0)
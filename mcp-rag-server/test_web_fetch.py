@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Testes do cliente HTTP assíncrono e da ingestão de URLs
+Executa com: pytest test_web_fetch.py -v
+"""
+
+import pytest
+import sys
+import os
+import gzip
+import time
+import asyncio
+import tempfile
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+# Adicionar diretório ao path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from web_fetch import AsyncFetcher, MAX_BODY_BYTES, extract_page
+
+PAGE = (b'<html><head><title>A2A Agents</title><style>.x{}</style></head>'
+        b'<body><nav>menu</nav><h1>Agent Card</h1><p>agent discovery &amp; '
+        b'communication</p><script>var x = 1;</script></body></html>')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body: bytes, status: int = 200, **headers):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        for name, value in headers.items():
+            self.send_header(name.replace('_', '-'), value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+        try:
+            if self.path.startswith('/page'):
+                time.sleep(0.05)
+                self.send_body(PAGE)
+            elif self.path == '/etag':
+                if self.headers.get('If-None-Match') == '"v1"':
+                    self.send_response(304)
+                    self.send_header('ETag', '"v1"')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                else:
+                    self.send_body(PAGE, ETag='"v1"')
+            elif self.path == '/gzip':
+                self.send_body(gzip.compress(PAGE), Content_Encoding='gzip')
+            elif self.path == '/gzip-truncated':
+                self.send_body(gzip.compress(PAGE)[:-12], Content_Encoding='gzip')
+            elif self.path == '/gzip-bomb':
+                self.send_body(gzip.compress(b'\0' * (MAX_BODY_BYTES + 1)), Content_Encoding='gzip')
+            elif self.path == '/chunked':
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for part in (b'hello ', b'chunked ', b'world'):
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(part), part))
+                self.wfile.write(b'0\r\n\r\n')
+            elif self.path == '/redirect':
+                self.send_body(b'', 302, Location='/page-final')
+            elif self.path == '/slow':
+                time.sleep(1.0)
+                try:
+                    self.send_body(PAGE)
+                except BrokenPipeError:
+                    pass  # cliente já desistiu (timeout)
+            else:
+                self.send_body(b'not found', 404)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.active = server.max_active = 0
+    server.hits = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def temp_dir():
+    path = Path(tempfile.mkdtemp())
+    yield path
+    shutil.rmtree(path)
+
+
+def fetch_all(urls, **kwargs):
+    async def run():
+        async with AsyncFetcher(**kwargs) as fetcher:
+            results = await asyncio.gather(*(fetcher.fetch(url) for url in urls))
+            return results, fetcher.stats
+    return asyncio.run(run())
+
+
+class TestAsyncFetcher:
+    """Testes para o pool de conexões e o cache condicional"""
+
+    def test_pool_reuses_connections_and_limits_per_host(self, http_server):
+        """20 URLs com limite 3 por host: nunca mais de 3 simultâneas e conexões reaproveitadas"""
+        server, base = http_server
+        results, stats = fetch_all([f"{base}/page{i}" for i in range(20)], per_host=3)
+        assert all(result.ok for result in results)
+        assert server.max_active <= 3
+        assert stats['connections'] <= 3
+        assert stats['reused'] == 20 - stats['connections']
+
+    def test_conditional_requests_served_from_disk_cache(self, http_server, temp_dir):
+        """Segunda busca (outro fetcher) manda If-None-Match e recebe o corpo do cache no 304"""
+        server, base = http_server
+        first, _ = fetch_all([f"{base}/etag"], cache_dir=temp_dir)
+        second, stats = fetch_all([f"{base}/etag"], cache_dir=temp_dir)
+        assert first[0].status == 200 and not first[0].not_modified
+        assert second[0].not_modified and second[0].ok
+        assert second[0].body == PAGE
+        assert stats['not_modified'] == 1
+
+    def test_gzip_chunked_redirect_and_errors(self, http_server):
+        server, base = http_server
+        results, stats = fetch_all([f"{base}/gzip", f"{base}/chunked", f"{base}/redirect", f"{base}/missing"])
+        gzipped, chunked, redirected, missing = results
+        assert gzipped.body == PAGE
+        assert chunked.body == b'hello chunked world'
+        assert redirected.url == f"{base}/page-final" and redirected.body == PAGE
+        assert missing.status == 404 and not missing.ok
+
+    def test_bad_compressed_bodies_become_errors(self, http_server):
+        """Gzip truncado ou que passa do limite ao descomprimir vira erro, sem derrubar o lote"""
+        server, base = http_server
+        results, stats = fetch_all([f"{base}/gzip-truncated", f"{base}/gzip-bomb", f"{base}/gzip"])
+        truncated, bomb, gzipped = results
+        assert truncated.error and not truncated.ok
+        assert 'maior que' in bomb.error
+        assert gzipped.body == PAGE
+        assert stats['errors'] == 2
+
+    def test_timeout_does_not_block_other_urls(self, http_server):
+        server, base = http_server
+        start = time.monotonic()
+        results, stats = fetch_all([f"{base}/slow", f"{base}/page"], timeout=0.3)
+        assert 'timeout' in results[0].error
+        assert results[1].ok
+        assert time.monotonic() - start < 1.0
+        assert stats['errors'] == 1
+
+    def test_extract_page_skips_boilerplate(self):
+        page = extract_page(PAGE, 'text/html; charset=utf-8')
+        assert page['title'] == 'A2A Agents'
+        assert page['text'] == 'Agent Card\nagent discovery & communication'
+        assert extract_page('café'.encode('latin-1'), 'text/plain; charset=latin-1')['text'] == 'café'
+
+
+class TestURLIngestion:
+    """Testes para a ingestão de URLs no A2AContentManager"""
+
+    def test_batch_ingest_fetches_urls_concurrently(self, http_server, temp_dir, monkeypatch):
+        server, base = http_server
+        cache_dir = temp_dir / 'cache'
+        monkeypatch.setenv('HOME', str(temp_dir))
+        monkeypatch.setenv('RAG_CACHE_DIR', str(cache_dir))
+        monkeypatch.setenv('RAG_FETCH_EXTRACT_WORKERS', '1')
+        with patch('rag_server.CACHE_PATH', cache_dir), \
+             patch('rag_server.CACHE_FILE', cache_dir / 'documents.json'), \
+             patch('rag_server.STATS_FILE', cache_dir / 'stats.json'):
+            from a2a_content_manager import A2AContentManager
+            manager = A2AContentManager()
+            try:
+                items = [{'type': 'url', 'content': f"{base}/page{i}"} for i in range(4)]
+                items.append({'type': 'url', 'content': f"{base}/missing"})
+                items.append({'type': 'text', 'content': 'texto sobre agent card', 'title': 'Nota'})
+                success, errors = manager.batch_ingest(items)
+                assert (success, errors) == (5, 1)
+                # Páginas iguais têm o mesmo hash: cada uma substitui a anterior
+                assert len([d for d in manager.server.documents if d['type'] == 'webpage']) == 1
+                assert manager.last_fetch_stats['requests'] == 5
+
+                doc = manager.ingest_url(f"{base}/etag")
+                assert doc['title'] == 'A2A: A2A Agents'
+                assert doc['content'].startswith('Agent Card')
+                assert doc['metadata']['etag'] == '"v1"'
+                assert 'discovery' in doc['tags']
+                assert (cache_dir / 'web_cache').exists()
+            finally:
+                manager.server.close()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Séries temporais em ring buffer memory-mapped
+==============================================
+Cada resolução é um arquivo de tamanho fixo: um cabeçalho (slots, largura,
+posição de escrita, nomes das métricas) seguido de uma matriz float64
+[slots x (1 + métricas)] onde cada linha é `timestamp, valores...`.
+Gravar uma amostra altera só uma linha e o cabeçalho, sem reescrever o
+histórico; métricas ausentes ficam como NaN.
+
+TimeSeriesStore mantém a série bruta e rollups por média (1m e 1h).
+"""
+
+import json
+import math
+import mmap
+import struct
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+MAGIC = b'RAGTS1\x00\x00'
+HEADER_SIZE = 4096
+HEADER_STRUCT = struct.Struct('<8sQQQQI')  # magic, slots, width, head, count, names_len
+
+# resolução -> (passo em segundos, slots); passo 0 = amostra bruta
+RESOLUTIONS = {
+    'raw': (0, 2880),    # 24h com coleta a cada 30s
+    '1m': (60, 1440),    # 24h
+    '1h': (3600, 720)    # 30 dias
+}
+
+logger = logging.getLogger("timeseries")
+
+
+class RingBuffer:
+    """Arquivo de slots fixos com a amostra mais antiga sobrescrita primeiro"""
+
+    def __init__(self, path: Path, metrics: List[str], slots: int):
+        self.path = Path(path)
+        self.metrics = list(metrics)
+        self.slots = slots
+        self.width = len(self.metrics) + 1
+        self._columns = {name: i + 1 for i, name in enumerate(self.metrics)}
+
+        previous = self._read_existing()
+        if previous != 'same':
+            self._create()
+        self._open()
+        for timestamp, values in (previous if isinstance(previous, list) else []):
+            self.append(timestamp, values)
+
+    def _read_existing(self):
+        """'same' se o arquivo serve como está, linhas antigas para migrar ou None"""
+        if not self.path.exists():
+            return None
+        try:
+            old = RingBuffer.open_read(self.path)
+        except (ValueError, OSError) as e:
+            logger.warning(f"Série {self.path.name} ilegível, recriando: {e}")
+            return None
+        try:
+            if old.metrics == self.metrics and old.slots == self.slots:
+                return 'same'
+            logger.info(f"Métricas de {self.path.name} mudaram, migrando colunas em comum")
+            return old.rows()
+        finally:
+            old.close()
+
+    @classmethod
+    def open_read(cls, path: Path) -> 'RingBuffer':
+        """Abre um arquivo existente usando as métricas gravadas no cabeçalho"""
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_STRUCT.size:
+            raise ValueError("cabeçalho truncado")
+        magic, slots, width, _, _, names_len = HEADER_STRUCT.unpack_from(header)
+        if magic != MAGIC:
+            raise ValueError("formato desconhecido")
+        names = json.loads(header[HEADER_STRUCT.size:HEADER_STRUCT.size + names_len].decode('utf-8'))
+        if len(names) + 1 != width:
+            raise ValueError("cabeçalho inconsistente")
+
+        buffer = cls.__new__(cls)
+        buffer.path = Path(path)
+        buffer.metrics = names
+        buffer.slots = slots
+        buffer.width = width
+        buffer._columns = {name: i + 1 for i, name in enumerate(names)}
+        buffer._open()
+        return buffer
+
+    def _create(self):
+        names = json.dumps(self.metrics).encode('utf-8')
+        if HEADER_STRUCT.size + len(names) > HEADER_SIZE:
+            raise ValueError("Nomes de métricas não cabem no cabeçalho")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            header = bytearray(HEADER_SIZE)
+            HEADER_STRUCT.pack_into(header, 0, MAGIC, self.slots, self.width, 0, 0, len(names))
+            header[HEADER_STRUCT.size:HEADER_STRUCT.size + len(names)] = names
+            f.write(header)
+            f.truncate(HEADER_SIZE + self.slots * self.width * 8)
+        tmp_path.replace(self.path)
+
+    def _open(self):
+        self._file = open(self.path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        self.data = np.ndarray((self.slots, self.width), dtype=np.float64,
+                               buffer=self._mmap, offset=HEADER_SIZE)
+
+    def _header(self) -> Tuple[int, int]:
+        _, _, _, head, count, _ = HEADER_STRUCT.unpack_from(self._mmap, 0)
+        return head, count
+
+    def __len__(self) -> int:
+        return self._header()[1]
+
+    def append(self, timestamp: float, values: Dict[str, float]):
+        """Grava uma amostra na próxima posição (linha primeiro, cabeçalho depois)"""
+        head, count = self._header()
+        row = np.full(self.width, np.nan)
+        row[0] = timestamp
+        for name, value in values.items():
+            column = self._columns.get(name)
+            if column is not None and value is not None:
+                row[column] = value
+        self.data[head] = row
+        struct.pack_into('<QQ', self._mmap, 24, (head + 1) % self.slots, min(count + 1, self.slots))
+
+    def rows(self, since: Optional[float] = None) -> List[Tuple[float, Dict[str, float]]]:
+        """Amostras em ordem cronológica, sem os valores NaN"""
+        head, count = self._header()
+        start = (head - count) % self.slots
+        order = [(start + i) % self.slots for i in range(count)]
+        block = self.data[order]
+        if since is not None:
+            block = block[block[:, 0] >= since]
+
+        result = []
+        for row in block:
+            values = {
+                name: float(row[column])
+                for name, column in self._columns.items()
+                if not math.isnan(row[column])
+            }
+            result.append((float(row[0]), values))
+        return result
+
+    def latest(self) -> Optional[Tuple[float, Dict[str, float]]]:
+        head, count = self._header()
+        if not count:
+            return None
+        row = self.data[(head - 1) % self.slots]
+        return float(row[0]), {
+            name: float(row[column]) for name, column in self._columns.items() if not math.isnan(row[column])
+        }
+
+    def flush(self):
+        self._mmap.flush()
+
+    def close(self):
+        if getattr(self, '_mmap', None) is not None:
+            self.data = None
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+            self._file.close()
+
+
+class TimeSeriesStore:
+    """Série bruta + rollups por média em arquivos ring buffer"""
+
+    def __init__(self, directory: Path, metrics: List[str], resolutions: Dict = RESOLUTIONS):
+        self.directory = Path(directory)
+        self.metrics = list(metrics)
+        self.resolutions = resolutions
+        self.buffers = {
+            name: RingBuffer(self.directory / f"{name}.ring", self.metrics, slots)
+            for name, (_, slots) in resolutions.items()
+        }
+        # Estado dos buckets em aberto: resolução -> [início, somas, contagens]
+        self._pending = {}
+        self._last_rollup = {}
+        for name, (step, _) in resolutions.items():
+            if step:
+                latest = self.buffers[name].latest()
+                self._last_rollup[name] = latest[0] if latest else float('-inf')
+
+    def append(self, timestamp: float, values: Dict[str, float]):
+        self.buffers['raw'].append(timestamp, values)
+
+        for name, (step, _) in self.resolutions.items():
+            if not step:
+                continue
+            bucket = math.floor(timestamp / step) * step
+            pending = self._pending.get(name)
+            if pending is not None and pending[0] != bucket:
+                self._close_bucket(name, pending)
+                pending = None
+            if pending is None:
+                pending = self._pending[name] = [bucket, {}, {}]
+            for metric, value in values.items():
+                if value is None:
+                    continue
+                pending[1][metric] = pending[1].get(metric, 0.0) + value
+                pending[2][metric] = pending[2].get(metric, 0) + 1
+
+    def _close_bucket(self, name: str, pending):
+        bucket, sums, counts = pending
+        # Após reinício o primeiro bucket pode repetir um já gravado
+        if bucket <= self._last_rollup[name]:
+            return
+        self.buffers[name].append(bucket, {metric: sums[metric] / counts[metric] for metric in sums})
+        self._last_rollup[name] = bucket
+
+    def read(self, resolution: str = 'raw', since: Optional[float] = None):
+        if resolution not in self.buffers:
+            raise ValueError(f"Resolução inválida: {resolution}")
+        return self.buffers[resolution].rows(since)
+
+    def latest(self) -> Optional[Tuple[float, Dict[str, float]]]:
+        return self.buffers['raw'].latest()
+
+    def flush(self):
+        for buffer in self.buffers.values():
+            buffer.flush()
+
+    def close(self):
+        for buffer in self.buffers.values():
+            buffer.close()
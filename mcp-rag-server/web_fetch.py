@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Cliente HTTP assíncrono para ingestão de páginas
+=================================================
+HTTP/1.1 sobre asyncio (só biblioteca padrão) com:
+
+- pool de conexões keep-alive por host (esquema, host, porta);
+- limite global de requisições simultâneas e limite por host;
+- timeout por requisição HTTP (conexão + resposta; a espera na fila não conta);
+- requisições condicionais (If-None-Match / If-Modified-Since) com as
+  respostas guardadas em disco: um 304 devolve o corpo do cache;
+- corpo chunked, gzip/deflate e redirecionamentos.
+
+A extração de texto do HTML (extract_page) é uma função pura de módulo,
+para rodar num pool de processos sem bloquear o event loop.
+"""
+
+import os
+import ssl
+import zlib
+import json
+import time
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_USER_AGENT = 'mcp-rag-server/3.1 (+https://github.com/)'
+MAX_REDIRECTS = 5
+MAX_BODY_BYTES = 10 * 1024 * 1024
+STREAM_LIMIT = 1024 * 1024       # linha máxima de cabeçalho/chunk
+REDIRECT_CODES = {301, 302, 303, 307, 308}
+
+# Tags cujo conteúdo não é texto da página
+SKIP_TAGS = {'script', 'style', 'noscript', 'template', 'svg', 'nav', 'footer'}
+BLOCK_TAGS = {
+    'p', 'div', 'br', 'li', 'ul', 'ol', 'tr', 'table', 'section', 'article', 'main',
+    'pre', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'dd', 'dt'
+}
+
+
+class HTTPError(Exception):
+    """Resposta HTTP malformada ou não suportada"""
+
+
+@dataclass
+class FetchResult:
+    """Resultado de um fetch (erros não levantam exceção: ficam em `error`)"""
+    url: str                                   # URL final, após redirecionamentos
+    status: int = 0
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b''
+    not_modified: bool = False                 # 304: corpo veio do cache em disco
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and (200 <= self.status < 300 or self.not_modified)
+
+
+# ----------------------------------------------------------------------
+# Cache em disco
+# ----------------------------------------------------------------------
+
+class ResponseCache:
+    """Respostas com validadores: <sha256(url)>.json (metadados) + .body"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        directory = self.root / key[:2]
+        return directory / f"{key}.json", directory / f"{key}.body"
+
+    def load(self, url: str) -> Optional[Tuple[Dict, bytes]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return meta, body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def validators(meta: Dict) -> Dict[str, str]:
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store(self, url: str, final_url: str, status: int, headers: Dict[str, str], body: bytes):
+        """Guarda só respostas revalidáveis (com ETag ou Last-Modified)"""
+        if not (headers.get('etag') or headers.get('last-modified')):
+            return
+        meta_path, body_path = self._paths(url)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            'url': url,
+            'final_url': final_url,
+            'status': status,
+            'etag': headers.get('etag'),
+            'last_modified': headers.get('last-modified'),
+            'content_type': headers.get('content-type', ''),
+            'fetched_at': time.time()
+        }
+        # Corpo antes dos metadados: metadados sempre apontam para um corpo completo
+        for path, data in ((body_path, body), (meta_path, json.dumps(meta).encode('utf-8'))):
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+
+
+# ----------------------------------------------------------------------
+# Cliente
+# ----------------------------------------------------------------------
+
+class _HostPool:
+    """Conexões ociosas e limite de requisições de um host"""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+
+class AsyncFetcher:
+    """
+    Busca URLs concorrentemente reaproveitando conexões por host.
+
+        async with AsyncFetcher(concurrency=16, per_host=4, cache_dir=path) as fetcher:
+            results = await asyncio.gather(*(fetcher.fetch(url) for url in urls))
+    """
+
+    def __init__(self, concurrency: int = 16, per_host: int = 4, timeout: float = 15.0,
+                 cache_dir: Optional[Path] = None, user_agent: str = DEFAULT_USER_AGENT):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.user_agent = user_agent
+        self._pools: Dict[Tuple[str, str, int], _HostPool] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._ssl = None
+        self.stats = {'requests': 0, 'connections': 0, 'reused': 0, 'not_modified': 0, 'errors': 0}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        for pool in self._pools.values():
+            while pool.idle:
+                _, writer = pool.idle.pop()
+                writer.close()
+        self._pools = {}
+
+    async def fetch(self, url: str, validators: Optional[Dict[str, str]] = None) -> FetchResult:
+        """
+        GET com cache condicional; nunca levanta exceção por falha de rede.
+        `validators` (If-None-Match/If-Modified-Since do chamador) valem quando
+        a URL não está no cache em disco: um 304 volta com not_modified e corpo vazio.
+        """
+        start = time.monotonic()
+        try:
+            result = await self._fetch(url, validators or {})
+        except asyncio.TimeoutError:
+            result = FetchResult(url, error=f"timeout após {self.timeout}s")
+        except (OSError, HTTPError, ValueError, zlib.error, EOFError,
+                asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            result = FetchResult(url, error=f"{type(e).__name__}: {e}")
+        result.elapsed = time.monotonic() - start
+        if result.error:
+            self.stats['errors'] += 1
+        return result
+
+    async def _fetch(self, url: str, validators: Dict[str, str]) -> FetchResult:
+        cached = self.cache.load(url) if self.cache else None
+        # Validadores valem para a cadeia toda: o destino final responde 304
+        conditional = ResponseCache.validators(cached[0]) if cached else validators
+
+        current = url.split('#', 1)[0]
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers, body = await self._request(current, conditional)
+            if status in REDIRECT_CODES and headers.get('location'):
+                current = urljoin(current, headers['location'])
+                continue
+            break
+        else:
+            raise HTTPError(f"mais de {MAX_REDIRECTS} redirecionamentos")
+
+        if status == 304 and cached:
+            self.stats['not_modified'] += 1
+            meta, cached_body = cached
+            merged = {'content-type': meta.get('content_type', ''), 'etag': meta.get('etag') or '',
+                      'last-modified': meta.get('last_modified') or ''}
+            merged.update(headers)
+            return FetchResult(current, status, merged, cached_body, not_modified=True)
+        if status == 304 and conditional:
+            self.stats['not_modified'] += 1
+            return FetchResult(current, status, headers, b'', not_modified=True)
+
+        if self.cache and status == 200:
+            self.cache.store(url, current, status, headers, body)
+        return FetchResult(current, status, headers, body)
+
+    def _pool(self, key: Tuple[str, str, int]) -> _HostPool:
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _HostPool(self.per_host)
+        return pool
+
+    async def _request(self, url: str, extra_headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f"URL não suportada: {url}")
+        https = parts.scheme == 'https'
+        port = parts.port or (443 if https else 80)
+        host_header = parts.hostname if parts.port is None else f"{parts.hostname}:{parts.port}"
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+
+        lines = [f"GET {target} HTTP/1.1", f"Host: {host_header}", f"User-Agent: {self.user_agent}",
+                 "Accept: text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.8",
+                 "Accept-Encoding: gzip, deflate", "Connection: keep-alive"]
+        lines.extend(f"{name}: {value}" for name, value in extra_headers.items())
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.concurrency)
+        pool = self._pool((parts.scheme, parts.hostname, port))
+        async with self._slots, pool.semaphore:
+            self.stats['requests'] += 1
+            # Timeout só da troca com o servidor: a espera pelos semáforos não conta
+            return await asyncio.wait_for(self._exchange(pool, https, parts.hostname, port, request),
+                                          self.timeout)
+
+    async def _exchange(self, pool: _HostPool, https: bool, host: str, port: int,
+                        request: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        for attempt in range(2):
+            reader, writer, reused = await self._acquire(pool, https, host, port)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, headers, body, keep_alive = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # Conexão ociosa fechada pelo servidor: tentar uma vez com conexão nova
+                if reused and attempt == 0:
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                pool.idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, headers, body
+        raise HTTPError("conexão perdida")  # inalcançável: o segundo erro é relançado
+
+    async def _acquire(self, pool: _HostPool, https: bool, host: str, port: int):
+        while pool.idle:
+            reader, writer = pool.idle.pop()
+            if writer.is_closing() or reader.at_eof():
+                writer.close()
+                continue
+            self.stats['reused'] += 1
+            return reader, writer, True
+        if https and self._ssl is None:
+            self._ssl = ssl.create_default_context()
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self._ssl if https else None,
+            server_hostname=host if https else None, limit=STREAM_LIMIT)
+        self.stats['connections'] += 1
+        return reader, writer, False
+
+    @staticmethod
+    async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bytes, bool]:
+        while True:
+            head = await reader.readuntil(b'\r\n\r\n')
+            status_line, *header_lines = head.decode('latin-1').split('\r\n')
+            try:
+                version, status_text = status_line.split(' ', 2)[:2]
+                status = int(status_text)
+            except ValueError:
+                raise HTTPError(f"linha de status inválida: {status_line[:80]!r}")
+            if status >= 200 or status == 101:
+                break  # 1xx informativos são descartados
+
+        headers: Dict[str, str] = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                name = name.strip().lower()
+                headers[name] = f"{headers[name]}, {value.strip()}" if name in headers else value.strip()
+
+        framed = True
+        if status in (204, 304) or status < 200:
+            body = b''
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+            size_total = 0
+            while True:
+                size_line = await reader.readuntil(b'\r\n')
+                size = int(size_line.split(b';', 1)[0].strip(), 16)
+                if size == 0:
+                    # Trailers até a linha vazia
+                    while await reader.readuntil(b'\r\n') != b'\r\n':
+                        pass
+                    break
+                size_total += size
+                if size_total > MAX_BODY_BYTES:
+                    raise HTTPError(f"corpo maior que {MAX_BODY_BYTES} bytes")
+                chunks.append((await reader.readexactly(size + 2))[:-2])
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(f"corpo maior que {MAX_BODY_BYTES} bytes")
+            body = await reader.readexactly(length)
+        else:
+            # Sem enquadramento: corpo vai até o servidor fechar
+            body = await reader.read(MAX_BODY_BYTES + 1)
+            while len(body) <= MAX_BODY_BYTES and not reader.at_eof():
+                more = await reader.read(MAX_BODY_BYTES + 1 - len(body))
+                if not more:
+                    break
+                body += more
+            if len(body) > MAX_BODY_BYTES:
+                raise HTTPError(f"corpo maior que {MAX_BODY_BYTES} bytes")
+            framed = False
+
+        encoding = headers.get('content-encoding', '').lower()
+        if encoding == 'gzip':
+            body = _decompress(body, 16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            try:
+                body = _decompress(body, zlib.MAX_WBITS)
+            except zlib.error:
+                body = _decompress(body, -zlib.MAX_WBITS)
+
+        keep_alive = (framed and version.upper() == 'HTTP/1.1'
+                      and headers.get('connection', '').lower() != 'close')
+        return status, headers, body, keep_alive
+
+
+def _decompress(body: bytes, wbits: int) -> bytes:
+    """Descomprime limitando a saída a MAX_BODY_BYTES (o limite lido vale para o corpo comprimido)"""
+    decompressor = zlib.decompressobj(wbits)
+    data = decompressor.decompress(body, MAX_BODY_BYTES + 1)
+    if len(data) > MAX_BODY_BYTES:
+        raise HTTPError(f"corpo descomprimido maior que {MAX_BODY_BYTES} bytes")
+    if not decompressor.eof:
+        raise HTTPError("corpo comprimido truncado")
+    return data
+
+
+# ----------------------------------------------------------------------
+# Extração de texto
+# ----------------------------------------------------------------------
+
+class _TextExtractor(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.title_parts: List[str] = []
+        self._skip = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag == 'title':
+            self._in_title = True
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag == 'title':
+            self._in_title = False
+        elif tag in BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+        elif not self._skip:
+            self.parts.append(data)
+
+
+def decode_body(body: bytes, content_type: str = '') -> str:
+    """Texto do corpo pelo charset do Content-Type (ou <meta charset>), utf-8 por padrão"""
+    charset = None
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            charset = value.strip().strip('"\'')
+    if charset is None:
+        head = body[:2048].lower()
+        pos = head.find(b'charset=')
+        if pos != -1:
+            value = head[pos + 8:pos + 40].lstrip(b'"\'')
+            charset = value.split(b'"')[0].split(b"'")[0].split(b';')[0].split(b'>')[0].strip().decode('ascii', 'ignore')
+    try:
+        return body.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+def extract_page(body: bytes, content_type: str = '') -> Dict[str, str]:
+    """{'title', 'text'} da página: HTML vira texto corrido por blocos, o resto é decodificado"""
+    text = decode_body(body, content_type)
+    mime = content_type.split(';', 1)[0].strip().lower()
+    if mime and 'html' not in mime and 'xml' not in mime:
+        return {'title': '', 'text': text.strip()}
+
+    parser = _TextExtractor()
+    parser.feed(text)
+    parser.close()
+    lines = (' '.join(line.split()) for line in ''.join(parser.parts).splitlines())
+    return {
+        'title': ' '.join(''.join(parser.title_parts).split()),
+        'text': '\n'.join(line for line in lines if line)
+    }
+
+
+def create_extract_executor(workers: int, jobs: int) -> Executor:
+    """Pool para extract_page: processos (spawn, importam só este módulo) quando compensa"""
+    if workers > 1 and jobs > 1:
+        return ProcessPoolExecutor(min(workers, jobs), mp_context=multiprocessing.get_context('spawn'))
+    return ThreadPoolExecutor(1)